@@ -3,15 +3,12 @@ import logging
 import redis.asyncio as redis
 from aiogram import Bot, Dispatcher, types
 from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.fsm.storage.redis import RedisStorage
 
 from app.config import settings
 from app.handlers import (
     balance,
     common,
-    contests as user_contests,
     menu,
-    polls as user_polls,
     promocode,
     referral,
     server_status,
@@ -28,15 +25,12 @@ from app.handlers.admin import (
     bot_configuration as admin_bot_configuration,
     bulk_ban as admin_bulk_ban,
     campaigns as admin_campaigns,
-    contests as admin_contests,
-    daily_contests as admin_daily_contests,
     faq as admin_faq,
     main as admin_main,
     maintenance as admin_maintenance,
     messages as admin_messages,
     monitoring as admin_monitoring,
     payments as admin_payments,
-    polls as admin_polls,
     pricing as admin_pricing,
     privacy_policy as admin_privacy_policy,
     promo_groups as admin_promo_groups,
@@ -70,7 +64,9 @@ from app.middlewares.subscription_checker import SubscriptionStatusMiddleware
 from app.middlewares.throttling import ThrottlingMiddleware
 from app.services.maintenance_service import maintenance_service
 from app.utils.cache import cache
-from app.utils.message_patch import patch_message_methods
+from app.utils.callback_index import install_callback_index
+from app.utils.lazy_router import LazyHandlersRouter
+from app.utils.message_patch import load_logo_file_id, patch_message_methods
 
 
 patch_message_methods()
@@ -85,6 +81,66 @@ async def debug_callback_handler(callback: types.CallbackQuery):
     logger.info(f'  - Username: {callback.from_user.username}')
 
 
+def register_handlers(dp: Dispatcher) -> None:
+    """Регистрирует все обработчики бота в порядке приоритета."""
+    start.register_handlers(dp)
+    menu.register_handlers(dp)
+    subscription.register_handlers(dp)
+    balance.register_balance_handlers(dp)
+    promocode.register_handlers(dp)
+    referral.register_handlers(dp)
+    support.register_handlers(dp)
+    server_status.register_handlers(dp)
+    tickets.register_handlers(dp)
+    admin_main.register_handlers(dp)
+    admin_users.register_handlers(dp)
+    admin_subscriptions.register_handlers(dp)
+    admin_servers.register_handlers(dp)
+    admin_promocodes.register_handlers(dp)
+    admin_messages.register_handlers(dp)
+    admin_monitoring.register_handlers(dp)
+    admin_referrals.register_handlers(dp)
+    admin_rules.register_handlers(dp)
+    admin_remnawave.register_handlers(dp)
+    admin_statistics.register_handlers(dp)
+    admin_promo_groups.register_handlers(dp)
+    admin_campaigns.register_handlers(dp)
+    admin_promo_offers.register_handlers(dp)
+    admin_maintenance.register_handlers(dp)
+    admin_user_messages.register_handlers(dp)
+    admin_updates.register_handlers(dp)
+    admin_backup.register_handlers(dp)
+    admin_system_logs.register_handlers(dp)
+    admin_welcome_text.register_welcome_text_handlers(dp)
+    admin_tickets.register_handlers(dp)
+    admin_reports.register_handlers(dp)
+    admin_bot_configuration.register_handlers(dp)
+    admin_pricing.register_handlers(dp)
+    admin_privacy_policy.register_handlers(dp)
+    admin_public_offer.register_handlers(dp)
+    admin_faq.register_handlers(dp)
+    admin_payments.register_handlers(dp)
+    admin_trials.register_handlers(dp)
+    admin_tariffs.register_handlers(dp)
+    admin_bulk_ban.register_bulk_ban_handlers(dp)
+    admin_blacklist.register_blacklist_handlers(dp)
+    admin_blocked_users.register_handlers(dp)
+    common.register_handlers(dp)
+    register_stars_handlers(dp)
+    simple_subscription.register_simple_subscription_handlers(dp)
+
+    # Редко используемые разделы: модуль импортируется при первом обращении,
+    # пользовательские конкурсы — только если они включены
+    for lazy_router in (
+        LazyHandlersRouter('app.handlers.admin.polls'),
+        LazyHandlersRouter('app.handlers.admin.contests'),
+        LazyHandlersRouter('app.handlers.admin.daily_contests'),
+        LazyHandlersRouter('app.handlers.contests', enabled=settings.is_contests_enabled),
+        LazyHandlersRouter('app.handlers.polls'),
+    ):
+        dp.include_router(lazy_router)
+
+
 async def setup_bot() -> tuple[Bot, Dispatcher]:
     try:
         await cache.connect()
@@ -92,6 +148,11 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     except Exception as e:
         logger.warning(f'Кеш не инициализирован: {e}')
 
+    try:
+        await load_logo_file_id()
+    except Exception as e:
+        logger.warning(f'Не удалось загрузить file_id логотипа из кеша: {e}')
+
     from aiogram.client.default import DefaultBotProperties
     from aiogram.enums import ParseMode
 
@@ -101,6 +162,8 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     logger.info('Бот установлен в maintenance_service')
 
     try:
+        from aiogram.fsm.storage.redis import RedisStorage
+
         redis_client = redis.from_url(settings.REDIS_URL)
         await redis_client.ping()
         storage = RedisStorage(redis_client)
@@ -146,56 +209,8 @@ async def setup_bot() -> tuple[Bot, Dispatcher]:
     dp.pre_checkout_query.middleware(AuthMiddleware())
     dp.message.middleware(SubscriptionStatusMiddleware())
     dp.callback_query.middleware(SubscriptionStatusMiddleware())
-    start.register_handlers(dp)
-    menu.register_handlers(dp)
-    subscription.register_handlers(dp)
-    balance.register_balance_handlers(dp)
-    promocode.register_handlers(dp)
-    referral.register_handlers(dp)
-    support.register_handlers(dp)
-    server_status.register_handlers(dp)
-    tickets.register_handlers(dp)
-    admin_main.register_handlers(dp)
-    admin_users.register_handlers(dp)
-    admin_subscriptions.register_handlers(dp)
-    admin_servers.register_handlers(dp)
-    admin_promocodes.register_handlers(dp)
-    admin_messages.register_handlers(dp)
-    admin_monitoring.register_handlers(dp)
-    admin_referrals.register_handlers(dp)
-    admin_rules.register_handlers(dp)
-    admin_remnawave.register_handlers(dp)
-    admin_statistics.register_handlers(dp)
-    admin_polls.register_handlers(dp)
-    admin_promo_groups.register_handlers(dp)
-    admin_campaigns.register_handlers(dp)
-    admin_contests.register_handlers(dp)
-    admin_daily_contests.register_handlers(dp)
-    admin_promo_offers.register_handlers(dp)
-    admin_maintenance.register_handlers(dp)
-    admin_user_messages.register_handlers(dp)
-    admin_updates.register_handlers(dp)
-    admin_backup.register_handlers(dp)
-    admin_system_logs.register_handlers(dp)
-    admin_welcome_text.register_welcome_text_handlers(dp)
-    admin_tickets.register_handlers(dp)
-    admin_reports.register_handlers(dp)
-    admin_bot_configuration.register_handlers(dp)
-    admin_pricing.register_handlers(dp)
-    admin_privacy_policy.register_handlers(dp)
-    admin_public_offer.register_handlers(dp)
-    admin_faq.register_handlers(dp)
-    admin_payments.register_handlers(dp)
-    admin_trials.register_handlers(dp)
-    admin_tariffs.register_handlers(dp)
-    admin_bulk_ban.register_bulk_ban_handlers(dp)
-    admin_blacklist.register_blacklist_handlers(dp)
-    admin_blocked_users.register_handlers(dp)
-    common.register_handlers(dp)
-    register_stars_handlers(dp)
-    user_contests.register_handlers(dp)
-    user_polls.register_handlers(dp)
-    simple_subscription.register_simple_subscription_handlers(dp)
+    register_handlers(dp)
+    install_callback_index(dp)
     logger.info('⭐ Зарегистрированы обработчики Telegram Stars платежей')
     logger.info('⚡ Зарегистрированы обработчики простой покупки')
     logger.info('⚡ Зарегистрированы обработчики простой подписки')
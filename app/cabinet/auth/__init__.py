@@ -6,7 +6,14 @@ from .jwt_handler import (
     decode_token,
     get_token_payload,
 )
-from .password_utils import hash_password, verify_password
+from .password_utils import (
+    hash_password,
+    hash_password_async,
+    needs_rehash,
+    verify_and_update_password,
+    verify_password,
+    verify_password_async,
+)
 from .telegram_auth import validate_telegram_init_data, validate_telegram_login_widget
 
 
@@ -16,7 +23,11 @@ __all__ = [
     'decode_token',
     'get_token_payload',
     'hash_password',
+    'hash_password_async',
+    'needs_rehash',
     'validate_telegram_init_data',
     'validate_telegram_login_widget',
+    'verify_and_update_password',
     'verify_password',
+    'verify_password_async',
 ]
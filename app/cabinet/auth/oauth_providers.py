@@ -10,6 +10,7 @@ from pydantic import BaseModel
 
 from app.config import settings
 from app.utils.cache import cache, cache_key
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -130,6 +131,11 @@ class OAuthProvider(ABC):
         self.client_secret = client_secret
         self.redirect_uri = redirect_uri
 
+    @property
+    def upstream(self) -> str:
+        """Upstream name in the shared HTTP client registry."""
+        return f'oauth_{self.name}'
+
     @abstractmethod
     def get_authorization_url(self, state: str) -> str:
         """Build the authorization URL for the provider."""
@@ -165,30 +171,32 @@ class GoogleProvider(OAuthProvider):
         return str(request.url)
 
     async def exchange_code(self, code: str) -> OAuthTokenResponse:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                self.TOKEN_URL,
-                json={
-                    'client_id': self.client_id,
-                    'client_secret': self.client_secret,
-                    'code': code,
-                    'grant_type': 'authorization_code',
-                    'redirect_uri': self.redirect_uri,
-                },
-            )
-            response.raise_for_status()
-            data: OAuthTokenResponse = response.json()
-            return data
+        response = await http_clients.send(
+            self.upstream,
+            'POST',
+            self.TOKEN_URL,
+            json={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'code': code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': self.redirect_uri,
+            },
+        )
+        response.raise_for_status()
+        data: OAuthTokenResponse = response.json()
+        return data
 
     async def get_user_info(self, token_data: OAuthTokenResponse) -> OAuthUserInfo:
         access_token = token_data['access_token']
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                self.USERINFO_URL,
-                headers={'Authorization': f'Bearer {access_token}'},
-            )
-            response.raise_for_status()
-            data: GoogleUserInfoResponse = response.json()
+        response = await http_clients.send(
+            self.upstream,
+            'GET',
+            self.USERINFO_URL,
+            headers={'Authorization': f'Bearer {access_token}'},
+        )
+        response.raise_for_status()
+        data: GoogleUserInfoResponse = response.json()
 
         return OAuthUserInfo(
             provider='google',
@@ -222,30 +230,32 @@ class YandexProvider(OAuthProvider):
         return str(request.url)
 
     async def exchange_code(self, code: str) -> OAuthTokenResponse:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                self.TOKEN_URL,
-                data={
-                    'client_id': self.client_id,
-                    'client_secret': self.client_secret,
-                    'code': code,
-                    'grant_type': 'authorization_code',
-                },
-            )
-            response.raise_for_status()
-            data: OAuthTokenResponse = response.json()
-            return data
+        response = await http_clients.send(
+            self.upstream,
+            'POST',
+            self.TOKEN_URL,
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'code': code,
+                'grant_type': 'authorization_code',
+            },
+        )
+        response.raise_for_status()
+        data: OAuthTokenResponse = response.json()
+        return data
 
     async def get_user_info(self, token_data: OAuthTokenResponse) -> OAuthUserInfo:
         access_token = token_data['access_token']
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                self.USERINFO_URL,
-                params={'format': 'json'},
-                headers={'Authorization': f'OAuth {access_token}'},
-            )
-            response.raise_for_status()
-            data: YandexUserInfoResponse = response.json()
+        response = await http_clients.send(
+            self.upstream,
+            'GET',
+            self.USERINFO_URL,
+            params={'format': 'json'},
+            headers={'Authorization': f'OAuth {access_token}'},
+        )
+        response.raise_for_status()
+        data: YandexUserInfoResponse = response.json()
 
         default_email = data.get('default_email')
         emails = data.get('emails', [])
@@ -288,30 +298,32 @@ class DiscordProvider(OAuthProvider):
         return str(request.url)
 
     async def exchange_code(self, code: str) -> OAuthTokenResponse:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.post(
-                self.TOKEN_URL,
-                data={
-                    'client_id': self.client_id,
-                    'client_secret': self.client_secret,
-                    'code': code,
-                    'grant_type': 'authorization_code',
-                    'redirect_uri': self.redirect_uri,
-                },
-            )
-            response.raise_for_status()
-            data: OAuthTokenResponse = response.json()
-            return data
+        response = await http_clients.send(
+            self.upstream,
+            'POST',
+            self.TOKEN_URL,
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'code': code,
+                'grant_type': 'authorization_code',
+                'redirect_uri': self.redirect_uri,
+            },
+        )
+        response.raise_for_status()
+        data: OAuthTokenResponse = response.json()
+        return data
 
     async def get_user_info(self, token_data: OAuthTokenResponse) -> OAuthUserInfo:
         access_token = token_data['access_token']
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                self.USERINFO_URL,
-                headers={'Authorization': f'Bearer {access_token}'},
-            )
-            response.raise_for_status()
-            data: DiscordUserInfoResponse = response.json()
+        response = await http_clients.send(
+            self.upstream,
+            'GET',
+            self.USERINFO_URL,
+            headers={'Authorization': f'Bearer {access_token}'},
+        )
+        response.raise_for_status()
+        data: DiscordUserInfoResponse = response.json()
 
         avatar_url: str | None = None
         if data.get('avatar'):
@@ -350,19 +362,20 @@ class VKProvider(OAuthProvider):
         return str(request.url)
 
     async def exchange_code(self, code: str) -> OAuthTokenResponse:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                self.TOKEN_URL,
-                params={
-                    'client_id': self.client_id,
-                    'client_secret': self.client_secret,
-                    'code': code,
-                    'redirect_uri': self.redirect_uri,
-                },
-            )
-            response.raise_for_status()
-            data: OAuthTokenResponse = response.json()
-            return data
+        response = await http_clients.send(
+            self.upstream,
+            'GET',
+            self.TOKEN_URL,
+            params={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'code': code,
+                'redirect_uri': self.redirect_uri,
+            },
+        )
+        response.raise_for_status()
+        data: OAuthTokenResponse = response.json()
+        return data
 
     async def get_user_info(self, token_data: OAuthTokenResponse) -> OAuthUserInfo:
         access_token = token_data['access_token']
@@ -370,17 +383,18 @@ class VKProvider(OAuthProvider):
         # VK returns email in token response, not in userinfo
         email: str | None = token_data.get('email')
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(
-                self.USERINFO_URL,
-                params={
-                    'access_token': access_token,
-                    'fields': 'photo_200',
-                    'v': self.API_VERSION,
-                },
-            )
-            response.raise_for_status()
-            data: VKUserInfoResponse = response.json()
+        response = await http_clients.send(
+            self.upstream,
+            'GET',
+            self.USERINFO_URL,
+            params={
+                'access_token': access_token,
+                'fields': 'photo_200',
+                'v': self.API_VERSION,
+            },
+        )
+        response.raise_for_status()
+        data: VKUserInfoResponse = response.json()
 
         users: list[Any] = data.get('response', [])
         user_data: VKUserInfoItem = users[0] if users else {}  # type: ignore[assignment]
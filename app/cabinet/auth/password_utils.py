@@ -1,15 +1,35 @@
-"""Password hashing utilities using bcrypt."""
+"""Password hashing utilities using bcrypt.
+
+bcrypt is deliberately slow (~250 ms at 12 rounds), so async code must use the
+``*_async`` variants: they run bcrypt in a small dedicated thread pool (bcrypt
+releases the GIL while hashing) and never block the shared event loop.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
 import bcrypt
 
 
+logger = logging.getLogger(__name__)
+
 BCRYPT_ROUNDS = 12
 
+# Параллельных вычислений bcrypt; остальные запросы ждут в очереди
+PASSWORD_HASH_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
 
 def hash_password(password: str) -> str:
     """
     Hash a password using bcrypt.
 
+    Blocks for the whole bcrypt computation; use :func:`hash_password_async`
+    from async code.
+
     Args:
         password: Plain text password
 
@@ -26,6 +46,9 @@ def verify_password(password: str, password_hash: str) -> bool:
     """
     Verify a password against its hash.
 
+    Blocks for the whole bcrypt computation; use :func:`verify_password_async`
+    from async code.
+
     Args:
         password: Plain text password to verify
         password_hash: Previously hashed password
@@ -39,3 +62,129 @@ def verify_password(password: str, password_hash: str) -> bool:
         return bcrypt.checkpw(password_bytes, hash_bytes)
     except (ValueError, TypeError):
         return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """
+    Check whether a hash was created with a cost other than ``BCRYPT_ROUNDS``.
+
+    Args:
+        password_hash: bcrypt hash in modular crypt format (``$2b$12$...``)
+
+    Returns:
+        True if the hash should be recomputed with the current cost
+    """
+    try:
+        cost = int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return cost != BCRYPT_ROUNDS
+
+
+@dataclass
+class PasswordHashingStats:
+    """Queue and execution metrics of the bcrypt worker pool."""
+
+    completed: int = 0
+    waiting: int = 0
+    max_waiting: int = 0
+    total_queue_seconds: float = 0.0
+    max_queue_seconds: float = 0.0
+    total_run_seconds: float = 0.0
+
+    def to_dict(self) -> dict:
+        completed = self.completed or 1
+        return {
+            'workers': PASSWORD_HASH_WORKERS,
+            'completed': self.completed,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'avg_queue_ms': round(self.total_queue_seconds / completed * 1000, 2),
+            'max_queue_ms': round(self.max_queue_seconds * 1000, 2),
+            'avg_run_ms': round(self.total_run_seconds / completed * 1000, 2),
+        }
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded thread pool with a concurrency cap."""
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS) -> None:
+        self._workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.stats = PasswordHashingStats()
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='bcrypt')
+            self._semaphore = asyncio.Semaphore(self._workers)
+
+        queued_at = time.monotonic()
+        self.stats.waiting += 1
+        self.stats.max_waiting = max(self.stats.max_waiting, self.stats.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.stats.waiting -= 1
+
+        started = time.monotonic()
+        queue_seconds = started - queued_at
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self._semaphore.release()
+            self.stats.completed += 1
+            self.stats.total_queue_seconds += queue_seconds
+            self.stats.max_queue_seconds = max(self.stats.max_queue_seconds, queue_seconds)
+            self.stats.total_run_seconds += time.monotonic() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(verify_password, password, password_hash)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._semaphore = None
+
+
+password_hasher = PasswordHasher()
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without blocking the event loop."""
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    """Verify a password without blocking the event loop."""
+    return await password_hasher.verify(password, password_hash)
+
+
+async def verify_and_update_password(password: str, password_hash: str) -> tuple[bool, str | None]:
+    """
+    Verify a password and rehash it if the bcrypt cost has changed.
+
+    Args:
+        password: Plain text password to verify
+        password_hash: Stored hash
+
+    Returns:
+        (matches, new_hash) — new_hash is set only when the stored hash should be replaced
+    """
+    if not await verify_password_async(password, password_hash):
+        return False, None
+
+    if not needs_rehash(password_hash):
+        return True, None
+
+    logger.info('Rehashing password with bcrypt cost %s', BCRYPT_ROUNDS)
+    return True, await hash_password_async(password)
+
+
+def get_password_hashing_stats() -> dict:
+    """Metrics of the bcrypt worker pool."""
+    return password_hasher.stats.to_dict()
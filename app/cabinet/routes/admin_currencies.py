@@ -8,6 +8,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models import CurrencyRate, SubscriptionPeriodPrice, TrafficPackagePrice, User
+from app.services.currency_rate_service import currency_rate_service
 from app.utils.money import normalize_currency
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
@@ -107,6 +108,7 @@ async def upsert_currency_rate(
 
     await db.commit()
     await db.refresh(row)
+    await currency_rate_service.reload(db)
     return CurrencyRateResponse(
         from_currency=row.from_currency,
         to_currency=row.to_currency,
@@ -134,6 +136,7 @@ async def delete_currency_rate(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Currency rate not found')
     await db.delete(row)
     await db.commit()
+    await currency_rate_service.reload(db)
     return {'success': True}
 
 
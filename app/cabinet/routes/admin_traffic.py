@@ -5,8 +5,10 @@ import csv
 import io
 import logging
 import time
-from datetime import UTC, datetime, timedelta
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
 
+import numpy as np
 from aiogram import Bot
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
@@ -19,6 +21,7 @@ from sqlalchemy.orm import selectinload
 from app.config import settings
 from app.database.models import Subscription, Transaction, TransactionType, User
 from app.services.remnawave_service import RemnaWaveService
+from app.services.traffic_history_service import TrafficMatrix, traffic_history_service
 
 from ..dependencies import get_cabinet_db, get_current_admin_user
 from ..schemas.traffic import (
@@ -39,10 +42,12 @@ router = APIRouter(prefix='/admin/traffic', tags=['Admin Traffic'])
 _ALLOWED_PERIODS = frozenset({1, 3, 7, 14, 30})
 _CONCURRENCY_LIMIT = 5  # Max parallel API calls to avoid rate limiting
 
-# In-memory cache: {(start_str, end_str): (timestamp, aggregated_data, nodes_info)}
-_traffic_cache: dict[tuple[str, str], tuple[float, dict[str, dict[str, int]], list[TrafficNodeInfo]]] = {}
+# In-memory cache for the panel fallback: {(start_str, end_str): (timestamp, traffic_matrix, nodes_info)}
+_traffic_cache: dict[tuple[str, str], tuple[float, TrafficMatrix, list[TrafficNodeInfo]]] = {}
 _CACHE_TTL = 300  # 5 minutes
 _cache_lock = asyncio.Lock()
+_PANEL_MAX_RANGE_DAYS = 31
+_BYTES_IN_GB = 1024**3
 
 # Valid sort fields for the GET endpoint
 _SORT_FIELDS = frozenset({'total_bytes', 'full_name', 'tariff_name', 'device_limit', 'traffic_limit_gb'})
@@ -62,20 +67,49 @@ def _validate_period(period: int) -> None:
         )
 
 
-async def _aggregate_traffic(
-    start_str: str, end_str: str, user_uuids: list[str]
-) -> tuple[dict[str, dict[str, int]], list[TrafficNodeInfo]]:
+def _max_range_days() -> int:
+    """Custom ranges beyond the panel limit are served from the local traffic history."""
+    if settings.TRAFFIC_HISTORY_ENABLED:
+        return max(traffic_history_service.retention_days, _PANEL_MAX_RANGE_DAYS)
+    return _PANEL_MAX_RANGE_DAYS
+
+
+def _history_day_range(start_str: str, end_str: str) -> tuple[date, date]:
+    """Map an ISO range onto whole history days.
+
+    A range that does not start at midnight (period-based) begins on the next
+    day, so 'last N days' covers N calendar days including today.
+    """
+    start_dt = datetime.strptime(start_str, '%Y-%m-%dT%H:%M:%SZ')
+    end_day = datetime.strptime(end_str, '%Y-%m-%dT%H:%M:%SZ').date()
+    start_day = start_dt.date()
+    if start_dt.time() != datetime.min.time():
+        start_day += timedelta(days=1)
+    return min(start_day, end_day), end_day
+
+
+async def _aggregate_traffic(start_str: str, end_str: str) -> tuple[TrafficMatrix, list[TrafficNodeInfo]]:
     """Aggregate per-user traffic across all nodes for a given date range.
 
-    Uses legacy per-node endpoint to fetch all users' traffic per node —
+    Served from the local daily history (see traffic_history_service) when it
+    covers the range. Otherwise falls back to the legacy per-node endpoint —
     O(nodes) API calls instead of O(users). The legacy endpoint returns
     {userUuid, nodeUuid, total} per entry (non-legacy only returns topUsers
     without userUuid).
 
-    Returns (user_traffic, nodes_info) where:
-      user_traffic = {remnawave_uuid: {node_uuid: total_bytes, ...}}
+    Returns (traffic, nodes_info) where:
+      traffic = TrafficMatrix of users × nodes total bytes
       nodes_info = [TrafficNodeInfo, ...]
     """
+    start_day, end_day = _history_day_range(start_str, end_str)
+    if traffic_history_service.is_ready(start_day, end_day):
+        nodes_info = [
+            TrafficNodeInfo(node_uuid=node.uuid, node_name=node.name, country_code=node.country_code)
+            for node in traffic_history_service.store.nodes
+        ]
+        nodes_info.sort(key=lambda n: n.node_name)
+        return traffic_history_service.aggregate(start_day, end_day), nodes_info
+
     cache_key = (start_str, end_str)
 
     # Quick check without lock
@@ -94,9 +128,7 @@ async def _aggregate_traffic(
 
         service = RemnaWaveService()
         if not service.is_configured:
-            return {}, []
-
-        user_uuids_set = set(user_uuids)
+            return TrafficMatrix.empty(), []
 
         async with service.get_api_client() as api:
             nodes = await api.get_all_nodes()
@@ -121,24 +153,22 @@ async def _aggregate_traffic(
         nodes_info.sort(key=lambda n: n.node_name)
 
         # Legacy response: [{userUuid, username, nodeUuid, total, date}, ...]
-        user_traffic: dict[str, dict[str, int]] = {}
-        for node_uuid, entries in results:
-            if not isinstance(entries, list):
-                continue
-            for entry in entries:
-                uid = entry.get('userUuid', '')
-                total = int(entry.get('total', 0))
-                if uid and total > 0 and uid in user_uuids_set:
-                    user_traffic.setdefault(uid, {})[node_uuid] = user_traffic.get(uid, {}).get(node_uuid, 0) + total
-
-        _traffic_cache[cache_key] = (now, user_traffic, nodes_info)
+        entries = [
+            (entry.get('userUuid', ''), node_uuid, int(entry.get('total', 0)))
+            for node_uuid, node_entries in results
+            if isinstance(node_entries, list)
+            for entry in node_entries
+        ]
+        traffic = TrafficMatrix.from_entries([entry for entry in entries if entry[0] and entry[2] > 0])
+
+        _traffic_cache[cache_key] = (now, traffic, nodes_info)
 
         # Evict expired entries to prevent unbounded growth
         expired = [k for k, (ts, _, _) in _traffic_cache.items() if (now - ts) >= _CACHE_TTL]
         for k in expired:
             del _traffic_cache[k]
 
-        return user_traffic, nodes_info
+        return traffic, nodes_info
 
 
 def _compute_date_range(period_days: int) -> tuple[str, str]:
@@ -164,8 +194,121 @@ async def _load_user_map(db: AsyncSession) -> dict[str, User]:
     return {u.remnawave_uuid: u for u in users if u.remnawave_uuid}
 
 
+def _subscription_profile(user: User) -> tuple[str | None, str | None, float, int]:
+    """Return (tariff_name, subscription_status, traffic_limit_gb, device_limit) for a user."""
+    sub = user.subscription
+    if not sub:
+        return None, None, 0.0, 1
+    tariff_name = sub.tariff.name if sub.tariff else None
+    return tariff_name, _get_status(sub), float(sub.traffic_limit_gb or 0), sub.device_limit or 1
+
+
+@dataclass(slots=True)
+class _TrafficSelection:
+    """Filtered users aligned with their per-node traffic (rows of ``bytes``) and the requested order."""
+
+    users: list[User]
+    nodes: list[TrafficNodeInfo]
+    bytes: np.ndarray  # int64, shape (len(users), len(nodes))
+    totals: np.ndarray  # int64, shape (len(users),)
+    order: np.ndarray  # row indices, sorted
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    def item(self, row: int) -> UserTrafficItem:
+        user = self.users[row]
+        tariff_name, subscription_status, traffic_limit_gb, device_limit = _subscription_profile(user)
+        node_traffic = {
+            node.node_uuid: node_bytes
+            for node, node_bytes in zip(self.nodes, self.bytes[row].tolist(), strict=True)
+            if node_bytes
+        }
+        return UserTrafficItem(
+            user_id=user.id,
+            telegram_id=user.telegram_id,
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            tariff_name=tariff_name,
+            subscription_status=subscription_status,
+            traffic_limit_gb=traffic_limit_gb,
+            device_limit=device_limit,
+            node_traffic=node_traffic,
+            total_bytes=int(self.totals[row]),
+        )
+
+    def items(self, rows: np.ndarray) -> list[UserTrafficItem]:
+        return [self.item(row) for row in rows.tolist()]
+
+
+def _user_matches(
+    user: User,
+    search_lower: str,
+    tariff_filter: set[str] | None,
+    status_filter: set[str] | None,
+) -> bool:
+    if search_lower and not any(
+        search_lower in (value or '').lower() for value in (user.full_name, user.username, user.email)
+    ):
+        return False
+
+    tariff_name, subscription_status, _, _ = _subscription_profile(user)
+    if tariff_filter is not None and (tariff_name or '') not in tariff_filter:
+        return False
+
+    if status_filter is not None and (subscription_status or '') not in status_filter:
+        return False
+
+    return True
+
+
+def _sort_key(users: list[User], bytes_by_node: np.ndarray, totals: np.ndarray, nodes, sort_by: str):
+    """Return (key array, is_numeric) for the requested sort field."""
+    if sort_by.startswith('node_'):
+        node_uuid = sort_by[5:]
+        for column, node in enumerate(nodes):
+            if node.node_uuid == node_uuid:
+                return bytes_by_node[:, column], True
+        return np.zeros(len(users), dtype=np.int64), True
+
+    if sort_by == 'full_name':
+        return np.array([(u.full_name or '').lower() for u in users], dtype=str), False
+    if sort_by == 'tariff_name':
+        return np.array(
+            [(u.subscription.tariff.name if u.subscription and u.subscription.tariff else '').lower() for u in users],
+            dtype=str,
+        ), False
+    if sort_by == 'device_limit':
+        return np.fromiter(
+            ((u.subscription.device_limit or 1) if u.subscription else 1 for u in users),
+            dtype=np.int64,
+            count=len(users),
+        ), True
+    if sort_by == 'traffic_limit_gb':
+        return np.fromiter(
+            (float(u.subscription.traffic_limit_gb or 0) if u.subscription else 0.0 for u in users),
+            dtype=np.float64,
+            count=len(users),
+        ), True
+    return totals, True
+
+
+def _order_rows(key: np.ndarray, is_numeric: bool, sort_desc: bool, top: int | None) -> np.ndarray:
+    """Argsort ``key``; for a numeric key and a small ``top`` only the first rows are selected and sorted."""
+    if is_numeric and sort_desc:
+        key = -key
+    if is_numeric and top is not None and 0 < top < len(key):
+        head = np.argpartition(key, top - 1)[:top]
+        return head[np.argsort(key[head], kind='stable')]
+    order = np.argsort(key, kind='stable')
+    if not is_numeric and sort_desc:
+        order = order[::-1]
+    return order[:top] if top is not None else order
+
+
 def _build_traffic_items(
-    user_traffic: dict[str, dict[str, int]],
+    traffic: TrafficMatrix,
     user_map: dict[str, User],
     nodes_info: list[TrafficNodeInfo],
     search: str = '',
@@ -174,84 +317,33 @@ def _build_traffic_items(
     tariff_filter: set[str] | None = None,
     status_filter: set[str] | None = None,
     node_filter: set[str] | None = None,
-) -> list[UserTrafficItem]:
-    """Merge traffic data with user data, apply search/tariff/status/node filters, return sorted list."""
-    items: list[UserTrafficItem] = []
-    search_lower = search.lower().strip()
-
-    all_uuids = set(user_traffic.keys()) | set(user_map.keys())
-    for uuid in all_uuids:
-        user = user_map.get(uuid)
-        if not user:
-            continue
+    top: int | None = None,
+) -> _TrafficSelection:
+    """Merge traffic data with user data, apply search/tariff/status/node filters and sort.
 
-        traffic = user_traffic.get(uuid, {})
-
-        full_name = user.full_name
-        username = user.username
-        email = user.email
+    Per-node traffic stays a NumPy matrix aligned with the filtered users: node
+    filter is a column selection, totals a row sum and top-N an argpartition.
+    UserTrafficItem objects are built only for rows the caller returns.
+    """
+    search_lower = search.lower().strip()
+    users = [user for user in user_map.values() if _user_matches(user, search_lower, tariff_filter, status_filter)]
 
-        if search_lower:
-            if (
-                search_lower not in (full_name or '').lower()
-                and search_lower not in (username or '').lower()
-                and search_lower not in (email or '').lower()
-            ):
-                continue
+    # Apply node filter: keep only selected node columns, totals are recalculated from them
+    nodes = [n for n in nodes_info if n.node_uuid in node_filter] if node_filter is not None else list(nodes_info)
 
-        sub = user.subscription
-        tariff_name = None
-        subscription_status = None
-        traffic_limit_gb = 0.0
-        device_limit = 1
+    # Index -1 hits the appended zero row/column: users or nodes without traffic in the period
+    row_of = {uuid: row for row, uuid in enumerate(traffic.user_uuids)}
+    column_of = {uuid: column for column, uuid in enumerate(traffic.node_uuids)}
+    rows = np.fromiter((row_of.get(u.remnawave_uuid, -1) for u in users), dtype=np.int64, count=len(users))
+    columns = np.fromiter((column_of.get(n.node_uuid, -1) for n in nodes), dtype=np.int64, count=len(nodes))
+    padded = np.pad(traffic.bytes.reshape(len(traffic.user_uuids), len(traffic.node_uuids)), ((0, 1), (0, 1)))
+    bytes_by_node = padded[np.ix_(rows, columns)]
+    totals = bytes_by_node.sum(axis=1, dtype=np.int64)
 
-        if sub:
-            subscription_status = _get_status(sub)
-            traffic_limit_gb = float(sub.traffic_limit_gb or 0)
-            device_limit = sub.device_limit or 1
-            if sub.tariff:
-                tariff_name = sub.tariff.name
-
-        if tariff_filter is not None:
-            if (tariff_name or '') not in tariff_filter:
-                continue
-
-        if status_filter is not None:
-            if (subscription_status or '') not in status_filter:
-                continue
-
-        # Apply node filter: keep only selected nodes, recalculate total
-        if node_filter is not None:
-            traffic = {k: v for k, v in traffic.items() if k in node_filter}
-
-        total_bytes = sum(traffic.values())
-
-        items.append(
-            UserTrafficItem(
-                user_id=user.id,
-                telegram_id=user.telegram_id,
-                username=username,
-                email=email,
-                full_name=full_name,
-                tariff_name=tariff_name,
-                subscription_status=subscription_status,
-                traffic_limit_gb=traffic_limit_gb,
-                device_limit=device_limit,
-                node_traffic=traffic,
-                total_bytes=total_bytes,
-            )
-        )
-
-    # Sort by the requested field; node columns use 'node_<uuid>' prefix
-    if sort_by.startswith('node_'):
-        node_uuid = sort_by[5:]
-        items.sort(key=lambda x: x.node_traffic.get(node_uuid, 0), reverse=sort_desc)
-    elif sort_by in ('full_name', 'tariff_name'):
-        items.sort(key=lambda x: (getattr(x, sort_by, None) or '').lower(), reverse=sort_desc)
-    else:
-        items.sort(key=lambda x: getattr(x, sort_by, 0) or 0, reverse=sort_desc)
+    key, is_numeric = _sort_key(users, bytes_by_node, totals, nodes, sort_by)
+    order = _order_rows(key, is_numeric, sort_desc, top)
 
-    return items
+    return _TrafficSelection(users=users, nodes=nodes, bytes=bytes_by_node, totals=totals, order=order)
 
 
 @router.get('', response_model=TrafficUsageResponse)
@@ -285,8 +377,11 @@ async def get_traffic_usage(
         if start_dt > end_dt:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='start_date must be before end_date.')
 
-        if (end_dt - start_dt).days > 31:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Date range cannot exceed 31 days.')
+        max_range_days = _max_range_days()
+        if (end_dt - start_dt).days > max_range_days:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f'Date range cannot exceed {max_range_days} days.'
+            )
 
         start_str = start_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
         end_str = end_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -297,7 +392,7 @@ async def get_traffic_usage(
         effective_period = period
 
     user_map = await _load_user_map(db)
-    user_traffic, nodes_info = await _aggregate_traffic(start_str, end_str, list(user_map.keys()))
+    traffic, nodes_info = await _aggregate_traffic(start_str, end_str)
 
     # Collect all available tariff names (before filtering)
     available_tariffs = sorted(
@@ -337,11 +432,21 @@ async def get_traffic_usage(
     if sort_by not in _SORT_FIELDS and not is_node_sort and not is_enrichment_sort:
         sort_by = 'total_bytes'
 
-    # For enrichment sort, build items unsorted then sort by enrichment field
+    # For enrichment sort, select rows sorted by traffic then re-sort by enrichment field
     effective_sort = 'total_bytes' if is_enrichment_sort else sort_by
-    items = _build_traffic_items(
-        user_traffic, user_map, nodes_info, search, effective_sort, sort_desc, tariff_filter, status_filter, node_filter
+    selection = _build_traffic_items(
+        traffic,
+        user_map,
+        nodes_info,
+        search,
+        effective_sort,
+        sort_desc,
+        tariff_filter,
+        status_filter,
+        node_filter,
+        top=None if is_enrichment_sort else offset + limit,
     )
+    order = selection.order
 
     if is_enrichment_sort:
         enrichment_data = await _build_enrichment(db, user_map)
@@ -354,10 +459,17 @@ async def get_traffic_usage(
         }
         key_fn = enr_key_map[sort_by]
         empty = UserTrafficEnrichment()
-        items.sort(key=lambda x: key_fn(enrichment_data.get(x.user_id, empty)), reverse=sort_desc)
+        order = np.array(
+            sorted(
+                order.tolist(),
+                key=lambda row: key_fn(enrichment_data.get(selection.users[row].id, empty)),
+                reverse=sort_desc,
+            ),
+            dtype=np.int64,
+        )
 
-    total = len(items)
-    paginated = items[offset : offset + limit]
+    total = len(selection)
+    paginated = selection.items(order[offset : offset + limit])
 
     return TrafficUsageResponse(
         items=paginated,
@@ -521,6 +633,85 @@ async def get_traffic_enrichment(
         return TrafficEnrichmentResponse(data=enrichment)
 
 
+def _risk_columns(
+    selection: _TrafficSelection, period_days: int, total_threshold_gb: float, node_threshold_gb: float
+) -> dict[str, list]:
+    """Risk columns for every selected user, computed on the whole traffic matrix at once."""
+    rows = selection.order
+    days = max(period_days, 1)
+    daily_total = selection.totals[rows] / days / _BYTES_IN_GB
+    total_ratio = daily_total / total_threshold_gb if total_threshold_gb > 0 else np.zeros(len(rows))
+
+    daily_node = selection.bytes[rows] / days / _BYTES_IN_GB
+    if node_threshold_gb > 0 and daily_node.shape[1]:
+        worst_node = daily_node.argmax(axis=1)
+        worst_node_daily = daily_node[np.arange(len(rows)), worst_node]
+        max_node_ratio = worst_node_daily / node_threshold_gb
+    else:
+        worst_node_daily = max_node_ratio = np.zeros(len(rows))
+
+    ratio = np.maximum(total_ratio, max_node_ratio)
+    risk_level = np.select([ratio < 0.5, ratio < 0.8, ratio < 1.2], ['low', 'medium', 'high'], default='critical')
+    risk_daily = np.where(total_ratio >= max_node_ratio, daily_total, worst_node_daily)
+
+    return {
+        'Total GB/day': np.round(daily_total, 4).tolist(),
+        'Risk Level': risk_level.tolist(),
+        'Risk Ratio': np.round(ratio, 3).tolist(),
+        'Risk GB/day': np.round(risk_daily, 4).tolist(),
+    }
+
+
+def _render_traffic_csv(
+    selection: _TrafficSelection,
+    enrichment: dict[int, UserTrafficEnrichment],
+    period_days: int,
+    total_threshold_gb: float = 0,
+    node_threshold_gb: float = 0,
+) -> bytes:
+    """Build the CSV column by column: traffic columns come straight from the matrix."""
+    rows = selection.order
+    if not len(rows):
+        return ''.encode('utf-8-sig')
+
+    users = [selection.users[row] for row in rows.tolist()]
+    profiles = [_subscription_profile(user) for user in users]
+    empty = UserTrafficEnrichment()
+    enrichments = [enrichment.get(user.id, empty) for user in users]
+    totals = selection.totals[rows]
+
+    columns: dict[str, list] = {
+        'User ID': [user.id for user in users],
+        'Telegram ID': [user.telegram_id or '' for user in users],
+        'Username': [user.username or '' for user in users],
+        'Email': [user.email or '' for user in users],
+        'Full Name': [user.full_name for user in users],
+        'Tariff': [tariff_name or '' for tariff_name, _, _, _ in profiles],
+        'Status': [subscription_status or '' for _, subscription_status, _, _ in profiles],
+        'Traffic Limit (GB)': [traffic_limit_gb for _, _, traffic_limit_gb, _ in profiles],
+        'Device Limit': [device_limit for _, _, _, device_limit in profiles],
+        'Connected Devices': [enr.devices_connected for enr in enrichments],
+        'Total Spent (RUB)': [round(enr.total_spent_kopeks / 100, 2) for enr in enrichments],
+        'Sub Start': [enr.subscription_start_date or '' for enr in enrichments],
+        'Sub End': [enr.subscription_end_date or '' for enr in enrichments],
+        'Last Node': [enr.last_node_name or '' for enr in enrichments],
+    }
+    node_bytes = selection.bytes[rows].T.tolist()
+    for node, values in zip(selection.nodes, node_bytes, strict=True):
+        columns[f'{node.node_name} (bytes)'] = values
+    columns['Total (bytes)'] = totals.tolist()
+    columns['Total (GB)'] = np.round(totals / _BYTES_IN_GB, 2).tolist()
+
+    if total_threshold_gb > 0 or node_threshold_gb > 0:
+        columns.update(_risk_columns(selection, period_days, total_threshold_gb, node_threshold_gb))
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(columns.keys())
+    writer.writerows(zip(*columns.values(), strict=True))
+    return output.getvalue().encode('utf-8-sig')
+
+
 @router.post('/export-csv', response_model=ExportCsvResponse)
 async def export_traffic_csv(
     request: ExportCsvRequest,
@@ -548,8 +739,11 @@ async def export_traffic_csv(
         end_dt = min(end_dt, now)
         if start_dt > end_dt:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='start_date must be before end_date.')
-        if (end_dt - start_dt).days > 31:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Date range cannot exceed 31 days.')
+        max_range_days = _max_range_days()
+        if (end_dt - start_dt).days > max_range_days:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=f'Date range cannot exceed {max_range_days} days.'
+            )
 
         start_str = start_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
         end_str = end_dt.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -560,7 +754,7 @@ async def export_traffic_csv(
         period_label = f'{request.period}d'
 
     user_map = await _load_user_map(db)
-    user_traffic, nodes_info = await _aggregate_traffic(start_str, end_str, list(user_map.keys()))
+    traffic, nodes_info = await _aggregate_traffic(start_str, end_str)
     enrichment = await _build_enrichment(db, user_map)
 
     # Parse filters
@@ -579,8 +773,8 @@ async def export_traffic_csv(
         if not node_filter:
             node_filter = None
 
-    items = _build_traffic_items(
-        user_traffic,
+    selection = _build_traffic_items(
+        traffic,
         user_map,
         nodes_info,
         sort_by='total_bytes',
@@ -590,85 +784,20 @@ async def export_traffic_csv(
         node_filter=node_filter,
     )
 
-    # Determine which nodes to include in CSV columns
-    csv_nodes = [n for n in nodes_info if n.node_uuid in node_filter] if node_filter else nodes_info
-
     # Compute period days for risk calculation
     if request.start_date and request.end_date:
         period_days = max((end_dt - start_dt).days, 1)
     else:
         period_days = request.period
 
-    total_thr = request.total_threshold_gb or 0
-    node_thr = request.node_threshold_gb or 0
-    has_risk = total_thr > 0 or node_thr > 0
-
-    # Build CSV rows
-    rows: list[dict] = []
-    for item in items:
-        row: dict = {
-            'User ID': item.user_id,
-            'Telegram ID': item.telegram_id or '',
-            'Username': item.username or '',
-            'Email': item.email or '',
-            'Full Name': item.full_name,
-            'Tariff': item.tariff_name or '',
-            'Status': item.subscription_status or '',
-            'Traffic Limit (GB)': item.traffic_limit_gb,
-            'Device Limit': item.device_limit,
-        }
-        # Enrichment columns
-        enr = enrichment.get(item.user_id)
-        row['Connected Devices'] = enr.devices_connected if enr else 0
-        row['Total Spent (RUB)'] = round(enr.total_spent_kopeks / 100, 2) if enr else 0
-        row['Sub Start'] = enr.subscription_start_date or '' if enr else ''
-        row['Sub End'] = enr.subscription_end_date or '' if enr else ''
-        row['Last Node'] = enr.last_node_name or '' if enr else ''
-
-        for node in csv_nodes:
-            row[f'{node.node_name} (bytes)'] = item.node_traffic.get(node.node_uuid, 0)
-        row['Total (bytes)'] = item.total_bytes
-        row['Total (GB)'] = round(item.total_bytes / (1024**3), 2) if item.total_bytes else 0
-
-        if has_risk:
-            daily_total = item.total_bytes / period_days / (1024**3) if period_days > 0 else 0
-            row['Total GB/day'] = round(daily_total, 4)
-
-            total_ratio = daily_total / total_thr if total_thr > 0 else 0
-
-            max_node_ratio = 0.0
-            worst_node_daily = 0.0
-            for node_bytes in item.node_traffic.values():
-                if node_bytes > 0 and node_thr > 0:
-                    daily_node = node_bytes / period_days / (1024**3) if period_days > 0 else 0
-                    ratio = daily_node / node_thr
-                    if ratio > max_node_ratio:
-                        max_node_ratio = ratio
-                        worst_node_daily = daily_node
-
-            ratio = max(total_ratio, max_node_ratio)
-            if ratio < 0.5:
-                risk_level = 'low'
-            elif ratio < 0.8:
-                risk_level = 'medium'
-            elif ratio < 1.2:
-                risk_level = 'high'
-            else:
-                risk_level = 'critical'
-
-            row['Risk Level'] = risk_level
-            row['Risk Ratio'] = round(ratio, 3)
-            row['Risk GB/day'] = round(daily_total if total_ratio >= max_node_ratio else worst_node_daily, 4)
-
-        rows.append(row)
-
-    # Generate CSV
-    output = io.StringIO()
-    if rows:
-        writer = csv.DictWriter(output, fieldnames=rows[0].keys())
-        writer.writeheader()
-        writer.writerows(rows)
-    csv_bytes = output.getvalue().encode('utf-8-sig')
+    csv_bytes = _render_traffic_csv(
+        selection,
+        enrichment,
+        period_days,
+        total_threshold_gb=request.total_threshold_gb or 0,
+        node_threshold_gb=request.node_threshold_gb or 0,
+    )
+    users_count = len(selection)
 
     timestamp = datetime.now(UTC).strftime('%Y%m%d_%H%M%S')
     filename = f'traffic_usage_{period_label}_{timestamp}.csv'
@@ -682,7 +811,7 @@ async def export_traffic_csv(
             await bot.send_document(
                 chat_id=admin.telegram_id,
                 document=BufferedInputFile(csv_bytes, filename=filename),
-                caption=f'Traffic usage report ({period_label})\nUsers: {len(rows)}',
+                caption=f'Traffic usage report ({period_label})\nUsers: {users_count}',
             )
     except Exception:
         logger.error('Failed to send CSV to admin %s', admin.telegram_id, exc_info=True)
@@ -691,4 +820,4 @@ async def export_traffic_csv(
             detail='Failed to send CSV report. Please try again later.',
         )
 
-    return ExportCsvResponse(success=True, message=f'CSV sent ({len(rows)} users)')
+    return ExportCsvResponse(success=True, message=f'CSV sent ({users_count} users)')
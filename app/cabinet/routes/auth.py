@@ -31,10 +31,10 @@ from ..auth import (
     create_access_token,
     create_refresh_token,
     get_token_payload,
-    hash_password,
+    hash_password_async,
     validate_telegram_init_data,
     validate_telegram_login_widget,
-    verify_password,
+    verify_and_update_password,
 )
 from ..auth.email_verification import (
     generate_email_change_code,
@@ -416,7 +416,7 @@ async def register_email(
     # Update user
     user.email = request.email
     user.email_verified = False
-    user.password_hash = hash_password(request.password)
+    user.password_hash = await hash_password_async(request.password)
     user.email_verification_token = verification_token
     user.email_verification_expires = verification_expires
 
@@ -503,7 +503,7 @@ async def register_email_standalone(
         )
 
     # Хешировать пароль
-    password_hash = hash_password(request.password)
+    password_hash = await hash_password_async(request.password)
 
     # Найти реферера по коду (если указан)
     referrer = None
@@ -725,7 +725,7 @@ async def login_email(
         # For test email - auto-create user if not exists
         if is_test_email and settings.validate_test_email_password(request.email, request.password):
             logger.info(f'Test email login - creating new user: {request.email}')
-            password_hash = hash_password(request.password)
+            password_hash = await hash_password_async(request.password)
             user = await create_user_by_email(
                 db=db,
                 email=request.email,
@@ -748,7 +748,8 @@ async def login_email(
             detail='Password login not configured for this account',
         )
 
-    if not verify_password(request.password, user.password_hash):
+    password_matches, rehashed_password = await verify_and_update_password(request.password, user.password_hash)
+    if not password_matches:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail='Invalid email or password',
@@ -767,6 +768,10 @@ async def login_email(
             detail='User account is not active',
         )
 
+    if rehashed_password:
+        # Стоимость bcrypt изменилась — сохраняем хеш с актуальными параметрами
+        user.password_hash = rehashed_password
+
     user.cabinet_last_login = datetime.utcnow()
     await db.commit()
 
@@ -935,7 +940,7 @@ async def reset_password(
         )
 
     # Update password
-    user.password_hash = hash_password(request.password)
+    user.password_hash = await hash_password_async(request.password)
     user.password_reset_token = None
     user.password_reset_expires = None
 
@@ -7,7 +7,7 @@ import re
 from datetime import UTC, datetime, timedelta
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -34,6 +34,7 @@ from app.services.subscription_purchase_service import (
     PurchaseValidationError,
 )
 from app.services.subscription_service import SubscriptionService
+from app.services.subscription_view_service import subscription_view_service
 from app.services.system_settings_service import bot_configuration_service
 from app.services.user_cart_service import user_cart_service
 from app.utils.cache import RateLimitCache, cache, cache_key
@@ -240,15 +241,33 @@ def _subscription_to_response(
 
 @router.get('', response_model=SubscriptionStatusResponse)
 async def get_subscription(
+    request: Request,
     user: User = Depends(get_current_cabinet_user),
     db: AsyncSession = Depends(get_cabinet_db),
 ):
-    """Get current user's subscription details."""
+    """Get current user's subscription details.
+
+    Served from the per-user subscription view cache with an ETag; a matching
+    ``If-None-Match`` gets 304 without a body.
+    """
+    view = await subscription_view_service.get_or_build(
+        'cabinet',
+        user.id,
+        lambda: _build_subscription_status(db, user.id),
+    )
+    headers = {'ETag': view.etag, 'Cache-Control': 'private, no-cache'}
+    if view.matches(request.headers.get('if-none-match')):
+        subscription_view_service.record_not_modified()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=view.body, media_type='application/json', headers=headers)
+
+
+async def _build_subscription_status(db: AsyncSession, user_id: int) -> SubscriptionStatusResponse:
     # Reload user from current session to get fresh data
     # (user object is from different session in get_current_cabinet_user)
     from app.database.crud.user import get_user_by_id
 
-    fresh_user = await get_user_by_id(db, user.id)
+    fresh_user = await get_user_by_id(db, user_id)
 
     if not fresh_user or not fresh_user.subscription:
         # Return 200 with has_subscription: false instead of 404
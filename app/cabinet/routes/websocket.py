@@ -2,13 +2,13 @@
 
 from __future__ import annotations
 
-import asyncio
 import json
 import logging
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 from app.cabinet.auth.jwt_handler import get_token_payload
+from app.cabinet.services.websocket_hub import cabinet_ws_manager, serialize_message
 from app.config import settings
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
@@ -18,108 +18,7 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-
-class CabinetConnectionManager:
-    """Менеджер WebSocket подключений для кабинета."""
-
-    def __init__(self):
-        # user_id -> set of websocket connections
-        self._user_connections: dict[int, set[WebSocket]] = {}
-        # admin user_ids -> set of websocket connections
-        self._admin_connections: dict[int, set[WebSocket]] = {}
-        self._lock = asyncio.Lock()
-
-    async def connect(self, websocket: WebSocket, user_id: int, is_admin: bool) -> None:
-        """Зарегистрировать подключение."""
-        async with self._lock:
-            if user_id not in self._user_connections:
-                self._user_connections[user_id] = set()
-            self._user_connections[user_id].add(websocket)
-
-            if is_admin:
-                if user_id not in self._admin_connections:
-                    self._admin_connections[user_id] = set()
-                self._admin_connections[user_id].add(websocket)
-
-        logger.debug(
-            'Cabinet WS connected: user_id=%d, is_admin=%s, total_users=%d',
-            user_id,
-            is_admin,
-            len(self._user_connections),
-        )
-
-    async def disconnect(self, websocket: WebSocket, user_id: int) -> None:
-        """Отменить регистрацию подключения."""
-        async with self._lock:
-            if user_id in self._user_connections:
-                self._user_connections[user_id].discard(websocket)
-                if not self._user_connections[user_id]:
-                    del self._user_connections[user_id]
-
-            if user_id in self._admin_connections:
-                self._admin_connections[user_id].discard(websocket)
-                if not self._admin_connections[user_id]:
-                    del self._admin_connections[user_id]
-
-        logger.debug('Cabinet WS disconnected: user_id=%d', user_id)
-
-    async def send_to_user(self, user_id: int, message: dict) -> None:
-        """Отправить сообщение конкретному пользователю."""
-        # Snapshot connections under the lock to avoid mutation during iteration
-        async with self._lock:
-            connections = list(self._user_connections.get(user_id, set()))
-
-        if not connections:
-            return
-
-        disconnected = set()
-        data = json.dumps(message, default=str, ensure_ascii=False)
-
-        for ws in connections:
-            try:
-                await ws.send_text(data)
-            except Exception as e:
-                logger.warning('Failed to send to user %d: %s', user_id, e)
-                disconnected.add(ws)
-
-        # Cleanup disconnected
-        if disconnected:
-            async with self._lock:
-                for ws in disconnected:
-                    self._user_connections.get(user_id, set()).discard(ws)
-
-    async def send_to_admins(self, message: dict) -> None:
-        """Отправить сообщение всем админам."""
-        # Snapshot connections under the lock to avoid mutation during iteration
-        async with self._lock:
-            if not self._admin_connections:
-                return
-            # Create a snapshot: list of (user_id, list of websockets)
-            admin_snapshot = [(user_id, list(connections)) for user_id, connections in self._admin_connections.items()]
-
-        data = json.dumps(message, default=str, ensure_ascii=False)
-        disconnected_by_user: dict[int, set[WebSocket]] = {}
-
-        for user_id, connections in admin_snapshot:
-            for ws in connections:
-                try:
-                    await ws.send_text(data)
-                except Exception as e:
-                    logger.warning('Failed to send to admin %d: %s', user_id, e)
-                    if user_id not in disconnected_by_user:
-                        disconnected_by_user[user_id] = set()
-                    disconnected_by_user[user_id].add(ws)
-
-        # Cleanup disconnected
-        if disconnected_by_user:
-            async with self._lock:
-                for user_id, ws_set in disconnected_by_user.items():
-                    for ws in ws_set:
-                        self._admin_connections.get(user_id, set()).discard(ws)
-
-
-# Глобальный менеджер подключений
-cabinet_ws_manager = CabinetConnectionManager()
+_PONG = serialize_message({'type': 'pong'})
 
 
 async def verify_cabinet_ws_token(token: str) -> tuple[int | None, bool]:
@@ -189,17 +88,19 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
         logger.error('Cabinet WS: Failed to accept from %s: %s', client_host, e)
         return
 
-    # Регистрируем подключение
-    await cabinet_ws_manager.connect(websocket, user_id, is_admin)
+    # Регистрируем подключение; все исходящие сообщения идут через его очередь
+    connection = await cabinet_ws_manager.connect(websocket, user_id, is_admin)
 
     try:
         # Приветственное сообщение
-        await websocket.send_json(
-            {
-                'type': 'connected',
-                'user_id': user_id,
-                'is_admin': is_admin,
-            }
+        connection.offer(
+            serialize_message(
+                {
+                    'type': 'connected',
+                    'user_id': user_id,
+                    'is_admin': is_admin,
+                }
+            )
         )
 
         # Обрабатываем входящие сообщения
@@ -210,7 +111,7 @@ async def cabinet_websocket_endpoint(websocket: WebSocket):
 
                 # Ping/pong для keepalive
                 if message.get('type') == 'ping':
-                    await websocket.send_json({'type': 'pong'})
+                    connection.offer(_PONG)
 
             except json.JSONDecodeError:
                 logger.warning('Cabinet WS: Invalid JSON from user %d', user_id)
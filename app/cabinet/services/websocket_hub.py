@@ -0,0 +1,280 @@
+"""WebSocket hub for cabinet real-time notifications.
+
+Every connection gets a bounded send queue and its own writer task, so a slow
+client never delays delivery to the others. A message is serialized once and
+the same string is queued for every recipient. When a queue is full the oldest
+pending message is dropped; the frontend refetches state on the next event.
+
+With Redis available, every message is also published to
+``CABINET_WS_REDIS_CHANNEL``. Other replicas deliver it to their own sockets,
+so admins connected to any replica receive ticket and payment events.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from typing import Any
+
+import redis.asyncio as redis
+from fastapi import WebSocket
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+_TARGET_USER = 'user'
+_TARGET_ADMINS = 'admins'
+
+
+def serialize_message(message: dict[str, Any]) -> str:
+    return json.dumps(message, default=str, ensure_ascii=False)
+
+
+class CabinetConnection:
+    """Одно WebSocket-подключение с очередью отправки и задачей-писателем."""
+
+    __slots__ = ('dropped', 'hub', 'is_admin', 'queue', 'user_id', 'websocket', 'writer')
+
+    def __init__(self, hub: CabinetWebSocketHub, websocket: WebSocket, user_id: int, is_admin: bool) -> None:
+        self.hub = hub
+        self.websocket = websocket
+        self.user_id = user_id
+        self.is_admin = is_admin
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=max(1, settings.CABINET_WS_SEND_QUEUE_SIZE))
+        self.dropped = 0
+        self.writer: asyncio.Task | None = None
+
+    def offer(self, data: str) -> None:
+        """Поставить сообщение в очередь без ожидания; при переполнении вытесняется самое старое."""
+        try:
+            self.queue.put_nowait(data)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self.queue.get_nowait()
+        self.dropped += 1
+        self.hub._stats['dropped'] += 1
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            logger.warning(
+                'Cabinet WS: очередь пользователя %d переполнена, отброшено сообщений: %d', self.user_id, self.dropped
+            )
+        self.queue.put_nowait(data)
+
+    async def run_writer(self) -> None:
+        try:
+            while True:
+                data = await self.queue.get()
+                await self.websocket.send_text(data)
+                self.hub._stats['sent'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            logger.warning('Failed to send to user %d: %s', self.user_id, error)
+            self.hub._stats['send_errors'] += 1
+            self.hub._unregister(self)
+
+
+class CabinetWebSocketHub:
+    """Реестр подключений кабинета с fan-out по очередям и relay между репликами через Redis."""
+
+    def __init__(self) -> None:
+        self._connections: dict[WebSocket, CabinetConnection] = {}
+        self._user_connections: dict[int, set[CabinetConnection]] = {}
+        self._admin_connections: set[CabinetConnection] = set()
+        self._instance_id = uuid.uuid4().hex[:12]
+        self._redis: redis.Redis | None = None
+        self._relay_task: asyncio.Task | None = None
+        self._relay_ready = False
+        self._stats = {
+            'messages': 0,
+            'sent': 0,
+            'dropped': 0,
+            'send_errors': 0,
+            'relay_published': 0,
+            'relay_received': 0,
+            'relay_errors': 0,
+        }
+
+    # ------------------------------------------------------------------
+    # Подключения
+    # ------------------------------------------------------------------
+
+    async def connect(self, websocket: WebSocket, user_id: int, is_admin: bool) -> CabinetConnection:
+        """Зарегистрировать подключение и запустить его писателя."""
+        connection = CabinetConnection(self, websocket, user_id, is_admin)
+        self._connections[websocket] = connection
+        self._user_connections.setdefault(user_id, set()).add(connection)
+        if is_admin:
+            self._admin_connections.add(connection)
+        connection.writer = asyncio.create_task(connection.run_writer(), name=f'cabinet-ws-writer-{user_id}')
+
+        logger.debug(
+            'Cabinet WS connected: user_id=%d, is_admin=%s, total_users=%d',
+            user_id,
+            is_admin,
+            len(self._user_connections),
+        )
+        return connection
+
+    async def disconnect(self, websocket: WebSocket, user_id: int) -> None:
+        """Отменить регистрацию подключения и остановить его писателя."""
+        connection = self._connections.get(websocket)
+        if connection is None:
+            return
+
+        self._unregister(connection)
+        writer = connection.writer
+        if writer is not None and not writer.done() and writer is not asyncio.current_task():
+            writer.cancel()
+            try:
+                await writer
+            except asyncio.CancelledError:
+                pass
+
+        logger.debug('Cabinet WS disconnected: user_id=%d', user_id)
+
+    def _unregister(self, connection: CabinetConnection) -> None:
+        if self._connections.get(connection.websocket) is not connection:
+            return
+        del self._connections[connection.websocket]
+        user_connections = self._user_connections.get(connection.user_id)
+        if user_connections is not None:
+            user_connections.discard(connection)
+            if not user_connections:
+                del self._user_connections[connection.user_id]
+        self._admin_connections.discard(connection)
+
+    # ------------------------------------------------------------------
+    # Отправка
+    # ------------------------------------------------------------------
+
+    async def send_to_user(self, user_id: int, message: dict) -> None:
+        """Отправить сообщение конкретному пользователю на всех репликах."""
+        data = serialize_message(message)
+        self._deliver(_TARGET_USER, user_id, data)
+        await self._publish(_TARGET_USER, user_id, data)
+
+    async def send_to_admins(self, message: dict) -> None:
+        """Отправить сообщение всем админам на всех репликах."""
+        data = serialize_message(message)
+        self._deliver(_TARGET_ADMINS, None, data)
+        await self._publish(_TARGET_ADMINS, None, data)
+
+    def _deliver(self, target: str, user_id: int | None, data: str) -> None:
+        # Постановка в очереди синхронна: между итерациями нет await, набор не меняется
+        if target == _TARGET_ADMINS:
+            connections = self._admin_connections
+        else:
+            connections = self._user_connections.get(user_id, ())
+        if not connections:
+            return
+        self._stats['messages'] += 1
+        for connection in connections:
+            connection.offer(data)
+
+    # ------------------------------------------------------------------
+    # Relay между репликами
+    # ------------------------------------------------------------------
+
+    def _encode_envelope(self, target: str, user_id: int | None, data: str) -> str:
+        # Заголовок отделён от тела, чтобы принимающая реплика не разбирала JSON заново
+        return f'{self._instance_id}|{target}|{"" if user_id is None else user_id}|{data}'
+
+    def _handle_envelope(self, raw: bytes | str) -> None:
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        try:
+            origin, target, user_id, data = raw.split('|', 3)
+        except ValueError:
+            self._stats['relay_errors'] += 1
+            logger.warning('Cabinet WS relay: некорректное сообщение из Redis')
+            return
+        if origin == self._instance_id:
+            return
+        self._stats['relay_received'] += 1
+        self._deliver(target, int(user_id) if user_id else None, data)
+
+    async def _publish(self, target: str, user_id: int | None, data: str) -> None:
+        if not self._relay_ready or self._redis is None:
+            return
+        try:
+            await self._redis.publish(settings.CABINET_WS_REDIS_CHANNEL, self._encode_envelope(target, user_id, data))
+            self._stats['relay_published'] += 1
+        except Exception as error:
+            self._stats['relay_errors'] += 1
+            logger.warning('Cabinet WS relay: не удалось опубликовать сообщение: %s', error)
+
+    def is_running(self) -> bool:
+        return self._relay_task is not None and not self._relay_task.done()
+
+    async def start(self) -> None:
+        if self.is_running() or not settings.CABINET_WS_REDIS_RELAY_ENABLED:
+            return
+        self._redis = redis.from_url(settings.REDIS_URL)
+        self._relay_task = asyncio.create_task(self._relay_loop(), name='cabinet-ws-relay')
+
+    async def stop(self) -> None:
+        if self._relay_task and not self._relay_task.done():
+            self._relay_task.cancel()
+            try:
+                await self._relay_task
+            except asyncio.CancelledError:
+                pass
+        self._relay_task = None
+        self._relay_ready = False
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def _relay_loop(self) -> None:
+        delay = 1
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CABINET_WS_REDIS_CHANNEL)
+                self._relay_ready = True
+                delay = 1
+                logger.info('✅ Cabinet WS relay подписан на %s', settings.CABINET_WS_REDIS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self._handle_envelope(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                self._stats['relay_errors'] += 1
+                logger.warning('⚠️ Cabinet WS relay недоступен, повтор через %s с: %s', delay, error)
+            finally:
+                self._relay_ready = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    # ------------------------------------------------------------------
+    # Метрики
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> dict:
+        depths = [connection.queue.qsize() for connection in self._connections.values()]
+        return {
+            **self._stats,
+            'connections': len(self._connections),
+            'users': len(self._user_connections),
+            'admin_connections': len(self._admin_connections),
+            'queue_depth_total': sum(depths),
+            'queue_depth_max': max(depths, default=0),
+            'queue_size': max(1, settings.CABINET_WS_SEND_QUEUE_SIZE),
+            'relay_enabled': settings.CABINET_WS_REDIS_RELAY_ENABLED,
+            'relay_connected': self._relay_ready,
+            'instance_id': self._instance_id,
+        }
+
+
+cabinet_ws_manager = CabinetWebSocketHub()
@@ -54,11 +54,17 @@ class Settings(BaseSettings):
     ADMIN_NOTIFICATIONS_TOPIC_ID: int | None = None
     ADMIN_NOTIFICATIONS_TICKET_TOPIC_ID: int | None = None
     ADMIN_NOTIFICATIONS_NALOG_TOPIC_ID: int | None = None
+    # Сводки админ-уведомлений: события одного типа за окно объединяются в одно сообщение
+    ADMIN_NOTIFICATIONS_DIGEST_ENABLED: bool = False
+    ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS: int = 60
+    ADMIN_NOTIFICATIONS_DIGEST_URGENT_AMOUNT_KOPEKS: int = 0  # 0 - без срочных, иначе сумма для немедленной отправки
 
     # Настройки очереди чеков NaloGO
     NALOGO_QUEUE_CHECK_INTERVAL: int = 300  # Интервал проверки очереди (секунды)
-    NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Задержка между отправкой чеков (секунды)
+    NALOGO_QUEUE_RECEIPT_DELAY: int = 3  # Начальная задержка между отправкой чеков (секунды)
     NALOGO_QUEUE_MAX_ATTEMPTS: int = 10  # Максимум попыток отправки чека
+    NALOGO_QUEUE_MAX_CONCURRENCY: int = 4  # Максимум одновременных отправок при разгрузке очереди
+    NALOGO_QUEUE_VISIBILITY_TIMEOUT: int = 300  # Через сколько секунд зависший в обработке чек вернётся в очередь
 
     ADMIN_REPORTS_ENABLED: bool = False
     ADMIN_REPORTS_CHAT_ID: str | None = None
@@ -89,6 +95,7 @@ class Settings(BaseSettings):
     DEFAULT_REPORTING_CURRENCY: str = 'RUB'
     SUPPORTED_BALANCE_CURRENCIES: str = 'RUB,IRR'
     SUPPORTED_DISPLAY_CURRENCIES: str = 'RUB,IRR,TMN'
+    CURRENCY_RATES_REFRESH_INTERVAL_MINUTES: int = 30  # Фоновое обновление таблицы курсов (админские + рыночные)
 
     DATABASE_MODE: str = 'auto'
 
@@ -158,6 +165,7 @@ class Settings(BaseSettings):
     SERVER_STATUS_METRICS_VERIFY_SSL: bool = True
     SERVER_STATUS_REQUEST_TIMEOUT: int = 10
     SERVER_STATUS_ITEMS_PER_PAGE: int = 10
+    SERVER_STATUS_POLL_INTERVAL: int = 30
 
     BASE_SUBSCRIPTION_PRICE: int = 50000
     AVAILABLE_SUBSCRIPTION_PERIODS: str = '14,30,60,90,180,360'
@@ -295,6 +303,11 @@ class Settings(BaseSettings):
     TRAFFIC_CHECK_CONCURRENCY: int = 10  # Параллельных запросов
     TRAFFIC_NOTIFICATION_COOLDOWN_MINUTES: int = 60  # Кулдаун уведомлений (минуты)
     TRAFFIC_SNAPSHOT_TTL_HOURS: int = 24  # TTL для snapshot трафика в Redis (часы)
+
+    # Локальная история трафика по дням (пользователь × нода) для страницы трафика в кабинете
+    TRAFFIC_HISTORY_ENABLED: bool = True
+    TRAFFIC_HISTORY_COLLECT_INTERVAL_MINUTES: int = 30  # Интервал сбора статистики с панели
+    TRAFFIC_HISTORY_RETENTION_DAYS: int = 90  # Сколько дней хранить историю
     # Настройки суточных подписок
     DAILY_SUBSCRIPTIONS_ENABLED: bool = True  # Включить автоматическое списание для суточных тарифов
     DAILY_SUBSCRIPTIONS_CHECK_INTERVAL_MINUTES: int = 30  # Интервал проверки в минутах
@@ -311,6 +324,10 @@ class Settings(BaseSettings):
     MONITORING_INTERVAL: int = 60
     INACTIVE_USER_DELETE_MONTHS: int = 3
 
+    AUTH_IDENTITY_CACHE_TTL: int = 30  # Сколько секунд AuthMiddleware доверяет снимку статуса пользователя
+    AUTH_IDENTITY_CACHE_SIZE: int = 10000
+    AUTH_LAST_ACTIVITY_UPDATE_INTERVAL: int = 60  # last_activity пишется не чаще раза в интервал
+
     MAINTENANCE_MODE: bool = False
     MAINTENANCE_CHECK_INTERVAL: int = 30
     MAINTENANCE_AUTO_ENABLE: bool = True
@@ -532,6 +549,10 @@ class Settings(BaseSettings):
     MINIAPP_SERVICE_NAME_RU: str = 'Bedolaga VPN'
     MINIAPP_SERVICE_DESCRIPTION_EN: str = 'Secure & Fast Connection'
     MINIAPP_SERVICE_DESCRIPTION_RU: str = 'Безопасное и быстрое подключение'
+    # Кеш экрана подписки (мини-приложение и кабинет) и частота синхронизации трафика с панелью
+    MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL: int = 60
+    MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE: int = 2000
+    MINIAPP_USAGE_SYNC_INTERVAL: int = 120
     CONNECT_BUTTON_HAPP_DOWNLOAD_ENABLED: bool = False
     HAPP_CRYPTOLINK_REDIRECT_TEMPLATE: str | None = None
     HAPP_DOWNLOAD_LINK_IOS: str | None = None
@@ -690,6 +711,8 @@ class Settings(BaseSettings):
     BACKUP_TIME: str = '03:00'
     BACKUP_MAX_KEEP: int = 7
     BACKUP_COMPRESSION: bool = True
+    BACKUP_COMPRESSION_LEVEL: int = 6
+    BACKUP_EXPORT_CONCURRENCY: int = 4
     BACKUP_INCLUDE_LOGS: bool = False
     BACKUP_LOCATION: str = '/app/data/backups'
     BACKUP_SEND_ENABLED: bool = False
@@ -712,6 +735,9 @@ class Settings(BaseSettings):
     CABINET_EMAIL_CHANGE_CODE_EXPIRE_MINUTES: int = 15  # Email change verification code expiration
     CABINET_EMAIL_AUTH_ENABLED: bool = True  # Enable email registration/login in cabinet
     CABINET_URL: str = 'https://example.com/cabinet'  # Base URL for cabinet (used in verification emails)
+    CABINET_WS_SEND_QUEUE_SIZE: int = 100  # Max pending WebSocket messages per connection
+    CABINET_WS_REDIS_RELAY_ENABLED: bool = True  # Relay WebSocket events between replicas via Redis pub/sub
+    CABINET_WS_REDIS_CHANNEL: str = 'cabinet:ws'
 
     # OAuth 2.0 provider settings for cabinet
     OAUTH_GOOGLE_CLIENT_ID: str = ''
@@ -2365,6 +2391,9 @@ class Settings(BaseSettings):
     def get_server_status_request_timeout(self) -> int:
         return max(1, self.SERVER_STATUS_REQUEST_TIMEOUT)
 
+    def get_server_status_poll_interval(self) -> int:
+        return max(5, self.SERVER_STATUS_POLL_INTERVAL)
+
     def is_web_api_enabled(self) -> bool:
         return bool(self.WEB_API_ENABLED)
 
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, User, UserPromoGroup
+from app.services.pricing_catalog import invalidate_pricing_catalog
 
 
 def _normalize_period_discounts(period_discounts: dict[int, int] | None) -> dict[int, int]:
@@ -124,6 +125,7 @@ async def create_promo_group(
         await db.execute(update(PromoGroup).where(PromoGroup.id != promo_group.id).values(is_default=False))
 
     await db.commit()
+    invalidate_pricing_catalog('promo_group')
     await db.refresh(promo_group)
 
     logger.info(
@@ -192,6 +194,7 @@ async def update_promo_group(
                 group.is_default = True
 
     await db.commit()
+    invalidate_pricing_catalog('promo_group')
     await db.refresh(group)
 
     logger.info(
@@ -244,6 +247,7 @@ async def delete_promo_group(db: AsyncSession, group: PromoGroup) -> bool:
 
     await db.delete(group)
     await db.commit()
+    invalidate_pricing_catalog('promo_group')
 
     logger.info(
         "Промогруппа '%s' (id=%s) удалена, пользователи переведены в '%s'",
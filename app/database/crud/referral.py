@@ -1,11 +1,11 @@
 import logging
 from datetime import datetime, timedelta
 
-from sqlalchemy import and_, func, select
+from sqlalchemy import and_, case, func, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.database.models import ReferralEarning, User
+from app.database.models import ReferralEarning, ReferrerLedger, Transaction, TransactionType, User
 
 
 logger = logging.getLogger(__name__)
@@ -73,142 +73,79 @@ async def get_referral_earnings_sum(
     return result.scalar()
 
 
-async def get_referral_statistics(db: AsyncSession) -> dict:
-    users_with_referrals_result = await db.execute(
-        select(func.count(func.distinct(User.id))).where(User.referred_by_id.isnot(None))
-    )
-    users_with_referrals = users_with_referrals_result.scalar()
-
-    active_referrers_result = await db.execute(
-        select(func.count(func.distinct(User.referred_by_id))).where(User.referred_by_id.isnot(None))
-    )
-    active_referrers = active_referrers_result.scalar()
+def _referral_display_name(user) -> str:
+    if user.first_name:
+        display_name = user.first_name
+        if user.last_name:
+            display_name += f' {user.last_name}'
+        return display_name
+    if user.username:
+        return f'@{user.username}'
+    if user.telegram_id:
+        return f'ID{user.telegram_id}'
+    return user.email or f'#{user.id}'
 
-    referral_paid_result = await db.execute(select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0)))
-    referral_paid = referral_paid_result.scalar()
-
-    from app.database.models import Transaction, TransactionType
-
-    transaction_paid_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            Transaction.type == TransactionType.REFERRAL_REWARD.value
-        )
-    )
-    transaction_paid = transaction_paid_result.scalar()
 
-    total_paid = referral_paid + transaction_paid
-
-    referrals_stats_result = await db.execute(
-        select(User.referred_by_id.label('referrer_id'), func.count(User.id).label('referrals_count'))
-        .where(User.referred_by_id.isnot(None))
-        .group_by(User.referred_by_id)
-    )
-    referrals_stats = {row.referrer_id: row.referrals_count for row in referrals_stats_result.all()}
-
-    referral_earnings_result = await db.execute(
+async def get_referral_statistics(db: AsyncSession) -> dict:
+    """Сводка по реферальной программе: итоги и топ-5 читаются из referrer_ledger, суммы за период — одним запросом."""
+    totals_result = await db.execute(
         select(
-            ReferralEarning.user_id.label('referrer_id'),
-            func.sum(ReferralEarning.amount_kopeks).label('referral_earnings'),
-        ).group_by(ReferralEarning.user_id)
+            func.coalesce(func.sum(ReferrerLedger.referrals_count), 0),
+            func.coalesce(func.sum(case((ReferrerLedger.referrals_count > 0, 1), else_=0)), 0),
+            func.coalesce(func.sum(ReferrerLedger.total_earned_kopeks), 0),
+        )
     )
-    referral_earnings = {row.referrer_id: row.referral_earnings for row in referral_earnings_result.all()}
+    users_with_referrals, active_referrers, total_paid = totals_result.one()
 
-    transaction_earnings_result = await db.execute(
+    top_result = await db.execute(
         select(
-            Transaction.user_id.label('referrer_id'), func.sum(Transaction.amount_kopeks).label('transaction_earnings')
+            User.id,
+            User.username,
+            User.first_name,
+            User.last_name,
+            User.telegram_id,
+            User.email,
+            ReferrerLedger.total_earned_kopeks,
+            ReferrerLedger.referrals_count,
         )
-        .where(Transaction.type == TransactionType.REFERRAL_REWARD.value)
-        .group_by(Transaction.user_id)
-    )
-    transaction_earnings = {row.referrer_id: row.transaction_earnings for row in transaction_earnings_result.all()}
-
-    top_referrers_data = {}
-
-    for referrer_id, count in referrals_stats.items():
-        if referrer_id not in top_referrers_data:
-            top_referrers_data[referrer_id] = {'referrals_count': 0, 'total_earned': 0}
-        top_referrers_data[referrer_id]['referrals_count'] = count
-
-    for referrer_id, earnings in referral_earnings.items():
-        if referrer_id not in top_referrers_data:
-            top_referrers_data[referrer_id] = {'referrals_count': 0, 'total_earned': 0}
-        top_referrers_data[referrer_id]['total_earned'] += earnings or 0
-
-    for referrer_id, earnings in transaction_earnings.items():
-        if referrer_id not in top_referrers_data:
-            top_referrers_data[referrer_id] = {'referrals_count': 0, 'total_earned': 0}
-        top_referrers_data[referrer_id]['total_earned'] += earnings or 0
-
-    sorted_referrers = sorted(
-        top_referrers_data.items(), key=lambda x: (x[1]['total_earned'], x[1]['referrals_count']), reverse=True
+        .join(ReferrerLedger, ReferrerLedger.referrer_id == User.id)
+        .where(or_(ReferrerLedger.total_earned_kopeks != 0, ReferrerLedger.referrals_count > 0))
+        .order_by(ReferrerLedger.total_earned_kopeks.desc(), ReferrerLedger.referrals_count.desc())
+        .limit(5)
     )
+    top_referrers = [
+        {
+            'user_id': row.id,  # Use internal ID, not telegram_id
+            'display_name': _referral_display_name(row),
+            'username': row.username,
+            'telegram_id': row.telegram_id,  # Can be None for email users
+            'total_earned_kopeks': row.total_earned_kopeks,
+            'referrals_count': row.referrals_count,
+        }
+        for row in top_result.all()
+    ]
 
-    top_referrers = []
-    for referrer_id, stats in sorted_referrers[:5]:
-        user_result = await db.execute(
-            select(User.id, User.username, User.first_name, User.last_name, User.telegram_id).where(
-                User.id == referrer_id
-            )
-        )
-        user = user_result.first()
-
-        if user:
-            display_name = ''
-            if user.first_name:
-                display_name = user.first_name
-                if user.last_name:
-                    display_name += f' {user.last_name}'
-            elif user.username:
-                display_name = f'@{user.username}'
-            elif user.telegram_id:
-                display_name = f'ID{user.telegram_id}'
-            else:
-                display_name = user.email or f'#{user.id}'
-
-            top_referrers.append(
-                {
-                    'user_id': user.id,  # Use internal ID, not telegram_id
-                    'display_name': display_name,
-                    'username': user.username,
-                    'telegram_id': user.telegram_id,  # Can be None for email users
-                    'total_earned_kopeks': stats['total_earned'],
-                    'referrals_count': stats['referrals_count'],
-                }
-            )
-
-    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-
-    today_referral_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0)).where(ReferralEarning.created_at >= today)
-    )
-    today_transaction_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= today)
-        )
-    )
-    today_earnings = today_referral_earnings_result.scalar() + today_transaction_earnings_result.scalar()
+    now = datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+
+    recent = union_all(
+        select(ReferralEarning.amount_kopeks, ReferralEarning.created_at).where(
+            ReferralEarning.created_at >= month_ago
+        ),
+        select(Transaction.amount_kopeks, Transaction.created_at).where(
+            and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= month_ago)
+        ),
+    ).subquery()
 
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    week_referral_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0)).where(ReferralEarning.created_at >= week_ago)
-    )
-    week_transaction_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= week_ago)
-        )
-    )
-    week_earnings = week_referral_earnings_result.scalar() + week_transaction_earnings_result.scalar()
+    def _sum_since(moment: datetime):
+        return func.coalesce(func.sum(case((recent.c.created_at >= moment, recent.c.amount_kopeks), else_=0)), 0)
 
-    month_ago = datetime.utcnow() - timedelta(days=30)
-    month_referral_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(ReferralEarning.amount_kopeks), 0)).where(ReferralEarning.created_at >= month_ago)
+    period_result = await db.execute(
+        select(_sum_since(today), _sum_since(week_ago), func.coalesce(func.sum(recent.c.amount_kopeks), 0))
     )
-    month_transaction_earnings_result = await db.execute(
-        select(func.coalesce(func.sum(Transaction.amount_kopeks), 0)).where(
-            and_(Transaction.type == TransactionType.REFERRAL_REWARD.value, Transaction.created_at >= month_ago)
-        )
-    )
-    month_earnings = month_referral_earnings_result.scalar() + month_transaction_earnings_result.scalar()
+    today_earnings, week_earnings, month_earnings = period_result.one()
 
     logger.info(
         f'Реферальная статистика: {users_with_referrals} рефералов, {active_referrers} рефереров, выплачено {total_paid} копеек'
@@ -242,8 +179,6 @@ async def get_top_referrers_by_period(
     Returns:
         Список словарей с данными рефереров
     """
-    from app.database.models import Transaction, TransactionType
-
     now = datetime.utcnow()
     if period == 'week':
         start_date = now - timedelta(days=7)
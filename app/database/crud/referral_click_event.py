@@ -0,0 +1,54 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ReferralClickEvent
+
+
+logger = logging.getLogger(__name__)
+
+
+async def create_referral_click_event(
+    db: AsyncSession,
+    *,
+    telegram_id: int,
+    raw_code: str,
+    clean_code: str,
+    source: str,
+    clicked_at: datetime | None = None,
+) -> ReferralClickEvent:
+    event = ReferralClickEvent(
+        telegram_id=telegram_id,
+        raw_code=raw_code[:64],
+        clean_code=clean_code[:64],
+        source=source,
+        clicked_at=clicked_at or datetime.utcnow(),
+    )
+    db.add(event)
+    await db.commit()
+    return event
+
+
+async def get_referral_click_events(
+    db: AsyncSession,
+    start_utc: datetime,
+    end_utc: datetime,
+) -> list[ReferralClickEvent]:
+    """Возвращает переходы за [start_utc, end_utc) по индексу clicked_at."""
+    result = await db.execute(
+        select(ReferralClickEvent)
+        .where(
+            ReferralClickEvent.clicked_at >= start_utc,
+            ReferralClickEvent.clicked_at < end_utc,
+        )
+        .order_by(ReferralClickEvent.clicked_at, ReferralClickEvent.id)
+    )
+    return list(result.scalars().all())
+
+
+async def get_first_referral_click_time(db: AsyncSession) -> datetime | None:
+    """Момент первой записи в журнале — всё, что раньше, есть только в логах."""
+    result = await db.execute(select(func.min(ReferralClickEvent.clicked_at)))
+    return result.scalar()
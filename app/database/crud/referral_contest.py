@@ -218,6 +218,49 @@ async def get_contest_leaderboard(
     return leaderboard
 
 
+async def get_contest_scores(
+    db: AsyncSession,
+    contest_id: int,
+) -> list[tuple[int, int, int]]:
+    """Счёт участников конкурса без загрузки пользователей: (referrer_id, referral_count, total_amount).
+
+    Использует те же границы периода, что и get_contest_leaderboard.
+    """
+    contest = await get_referral_contest(db, contest_id)
+    if not contest:
+        return []
+
+    contest_start = contest.start_at
+    contest_end = contest.end_at
+    if contest_end.hour == 0 and contest_end.minute == 0 and contest_end.second == 0:
+        contest_end = contest_end.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    result = await db.execute(
+        select(
+            ReferralContestEvent.referrer_id,
+            func.count(ReferralContestEvent.id),
+            func.coalesce(func.sum(ReferralContestEvent.amount_kopeks), 0),
+        )
+        .where(
+            and_(
+                ReferralContestEvent.contest_id == contest_id,
+                ReferralContestEvent.occurred_at >= contest_start,
+                ReferralContestEvent.occurred_at <= contest_end,
+            )
+        )
+        .group_by(ReferralContestEvent.referrer_id)
+    )
+    return [(int(referrer_id), int(count), int(amount)) for referrer_id, count, amount in result.all()]
+
+
+async def get_contest_referrers(db: AsyncSession, referrer_ids: Sequence[int]) -> dict[int, User]:
+    if not referrer_ids:
+        return {}
+
+    result = await db.execute(select(User).where(User.id.in_(set(referrer_ids))))
+    return {user.id: user for user in result.scalars().all()}
+
+
 async def get_contest_participants(
     db: AsyncSession,
     contest_id: int,
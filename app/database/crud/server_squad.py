@@ -26,6 +26,7 @@ from app.database.models import (
     Tariff,
     User,
 )
+from app.services.pricing_catalog import invalidate_pricing_catalog
 
 
 logger = logging.getLogger(__name__)
@@ -82,6 +83,7 @@ async def create_server_squad(
 
     db.add(server_squad)
     await db.commit()
+    invalidate_pricing_catalog('server_squad')
     await db.refresh(server_squad)
 
     logger.info(f'✅ Создан сервер {display_name} (UUID: {squad_uuid})')
@@ -223,6 +225,7 @@ async def update_server_squad_promo_groups(
 
     server.allowed_promo_groups = promo_groups
     await db.commit()
+    invalidate_pricing_catalog('server_squad')
     await db.refresh(server)
 
     logger.info(
@@ -256,6 +259,7 @@ async def update_server_squad(db: AsyncSession, server_id: int, **updates) -> Se
     await db.execute(update(ServerSquad).where(ServerSquad.id == server_id).values(**filtered_updates))
 
     await db.commit()
+    invalidate_pricing_catalog('server_squad')
 
     return await get_server_squad_by_id(db, server_id)
 
@@ -272,6 +276,7 @@ async def delete_server_squad(db: AsyncSession, server_id: int) -> bool:
 
     await db.execute(delete(ServerSquad).where(ServerSquad.id == server_id))
     await db.commit()
+    invalidate_pricing_catalog('server_squad')
 
     logger.info(f'🗑️ Удален сервер (ID: {server_id})')
     return True
@@ -398,6 +403,7 @@ async def sync_with_remnawave(db: AsyncSession, remnawave_squads: list[dict]) ->
             )
 
     await db.commit()
+    invalidate_pricing_catalog('server_squad')
 
     logger.info(f'🔄 Синхронизация завершена: +{created} ~{updated} -{removed}')
     return created, updated, removed
@@ -3,7 +3,7 @@ from collections.abc import Iterable
 from datetime import UTC, datetime, timedelta
 from typing import Optional
 
-from sqlalchemy import and_, delete, func, select
+from sqlalchemy import and_, case, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from sqlalchemy.orm.exc import StaleDataError
@@ -18,6 +18,7 @@ from app.database.models import (
     User,
     UserPromoGroup,
 )
+from app.services.subscription_view_service import invalidate_on_commit
 from app.utils.pricing_utils import calculate_months_from_days, get_remaining_months
 from app.utils.timezone import format_local_datetime
 
@@ -35,6 +36,18 @@ def is_recently_updated_by_webhook(subscription: Subscription) -> bool:
     return elapsed < _WEBHOOK_GUARD_SECONDS
 
 
+async def get_subscription_by_id(db: AsyncSession, subscription_id: int) -> Subscription | None:
+    result = await db.execute(
+        select(Subscription)
+        .options(
+            selectinload(Subscription.user),
+            selectinload(Subscription.tariff),
+        )
+        .where(Subscription.id == subscription_id)
+    )
+    return result.scalar_one_or_none()
+
+
 async def get_subscription_by_user_id(db: AsyncSession, user_id: int) -> Subscription | None:
     result = await db.execute(
         select(Subscription)
@@ -1065,58 +1078,10 @@ async def get_servers_monthly_prices(
     user: Optional['User'] = None,
 ) -> list[int]:
     """Получает месячные цены серверов с проверкой доступности для промогруппы пользователя."""
-    from sqlalchemy.orm import selectinload
+    from app.services.pricing_catalog import get_pricing_catalog, resolve_promo_group_id
 
-    from app.database.models import ServerSquad
-
-    prices = []
-
-    # Загружаем промогруппы пользователя если нужно
-    user_promo_group = None
-    user_promo_group_id = None
-    if user:
-        try:
-            # Пробуем загрузить промогруппы если ещё не загружены
-            await db.refresh(user, ['user_promo_groups', 'promo_group'])
-        except Exception:
-            pass
-        try:
-            user_promo_group = user.get_primary_promo_group()
-            user_promo_group_id = user_promo_group.id if user_promo_group else None
-        except Exception as e:
-            logger.warning(f'Не удалось получить промогруппу пользователя: {e}')
-
-    for server_id in server_squad_ids:
-        # Загружаем сервер с промогруппами
-        result = await db.execute(
-            select(ServerSquad)
-            .options(selectinload(ServerSquad.allowed_promo_groups))
-            .where(ServerSquad.id == server_id)
-        )
-        server = result.scalar_one_or_none()
-
-        if not server:
-            prices.append(0)
-            continue
-
-        # Проверяем доступность сервера для промогруппы пользователя
-        is_allowed = True
-        if user_promo_group_id is not None and server.allowed_promo_groups:
-            allowed_ids = {pg.id for pg in server.allowed_promo_groups}
-            is_allowed = user_promo_group_id in allowed_ids
-
-        if server.is_available and is_allowed:
-            prices.append(server.price_kopeks)
-        else:
-            # Сервер недоступен для промогруппы пользователя
-            logger.warning(
-                f'⚠️ Сервер {server.display_name} (id={server_id}) недоступен для '
-                f'промогруппы пользователя (promo_group_id={user_promo_group_id}), '
-                f'allowed_promo_groups={[pg.id for pg in server.allowed_promo_groups] if server.allowed_promo_groups else []}'
-            )
-            prices.append(server.price_kopeks)  # Всё равно берём реальную цену
-
-    return prices
+    catalog = await get_pricing_catalog(db)
+    return catalog.get_server_prices(server_squad_ids, resolve_promo_group_id(user))
 
 
 def _get_discount_percent(
@@ -1148,107 +1113,31 @@ async def calculate_subscription_total_cost(
     user: User | None = None,
     promo_group: PromoGroup | None = None,
 ) -> tuple[int, dict]:
-    from app.config import PERIOD_PRICES
-
-    months_in_period = calculate_months_from_days(period_days)
-
-    base_price_original = PERIOD_PRICES.get(period_days, 0)
-    period_discount_percent = _get_discount_percent(
-        user,
-        promo_group,
-        'period',
-        period_days=period_days,
+    from app.services.pricing_catalog import calculate_total_cost, get_pricing_catalog
+
+    catalog = await get_pricing_catalog(db)
+    total_cost, details = calculate_total_cost(
+        catalog,
+        period_days,
+        traffic_gb,
+        server_squad_ids,
+        devices,
+        user=user,
+        promo_group=promo_group,
     )
-    base_discount_total = base_price_original * period_discount_percent // 100
-    base_price = base_price_original - base_discount_total
 
-    promo_group = promo_group or (user.promo_group if user else None)
-
-    traffic_price_per_month = settings.get_traffic_price(traffic_gb)
-    traffic_discount_percent = _get_discount_percent(
-        user,
-        promo_group,
-        'traffic',
-        period_days=period_days,
-    )
-    traffic_discount_per_month = traffic_price_per_month * traffic_discount_percent // 100
-    discounted_traffic_per_month = traffic_price_per_month - traffic_discount_per_month
-    total_traffic_price = discounted_traffic_per_month * months_in_period
-    total_traffic_discount = traffic_discount_per_month * months_in_period
-
-    servers_prices = await get_servers_monthly_prices(db, server_squad_ids, user=user)
-    servers_price_per_month = sum(servers_prices)
-    servers_discount_percent = _get_discount_percent(
-        user,
-        promo_group,
-        'servers',
-        period_days=period_days,
-    )
-    servers_discount_per_month = servers_price_per_month * servers_discount_percent // 100
-    discounted_servers_per_month = servers_price_per_month - servers_discount_per_month
-    total_servers_price = discounted_servers_per_month * months_in_period
-    total_servers_discount = servers_discount_per_month * months_in_period
-
-    additional_devices = max(0, devices - settings.DEFAULT_DEVICE_LIMIT)
-    devices_price_per_month = additional_devices * settings.PRICE_PER_DEVICE
-    devices_discount_percent = _get_discount_percent(
-        user,
-        promo_group,
-        'devices',
-        period_days=period_days,
+    logger.debug(
+        '📊 Расчет стоимости подписки на %s дней (%s мес, каталог v%s): база %s₽, трафик %s₽, серверы %s₽, '
+        'устройства %s₽, ИТОГО %s₽',
+        period_days,
+        details['months_in_period'],
+        catalog.version,
+        details['base_price'] / 100,
+        details['total_traffic_price'] / 100,
+        details['total_servers_price'] / 100,
+        details['total_devices_price'] / 100,
+        total_cost / 100,
     )
-    devices_discount_per_month = devices_price_per_month * devices_discount_percent // 100
-    discounted_devices_per_month = devices_price_per_month - devices_discount_per_month
-    total_devices_price = discounted_devices_per_month * months_in_period
-    total_devices_discount = devices_discount_per_month * months_in_period
-
-    total_cost = base_price + total_traffic_price + total_servers_price + total_devices_price
-
-    details = {
-        'base_price': base_price,
-        'base_price_original': base_price_original,
-        'base_discount_percent': period_discount_percent,
-        'base_discount_total': base_discount_total,
-        'traffic_price_per_month': traffic_price_per_month,
-        'traffic_discount_percent': traffic_discount_percent,
-        'traffic_discount_total': total_traffic_discount,
-        'total_traffic_price': total_traffic_price,
-        'servers_price_per_month': servers_price_per_month,
-        'servers_discount_percent': servers_discount_percent,
-        'servers_discount_total': total_servers_discount,
-        'total_servers_price': total_servers_price,
-        'devices_price_per_month': devices_price_per_month,
-        'devices_discount_percent': devices_discount_percent,
-        'devices_discount_total': total_devices_discount,
-        'total_devices_price': total_devices_price,
-        'months_in_period': months_in_period,
-        'servers_individual_prices': [
-            (price - (price * servers_discount_percent // 100)) * months_in_period for price in servers_prices
-        ],
-    }
-
-    logger.debug(f'📊 Расчет стоимости подписки на {period_days} дней ({months_in_period} мес):')
-    logger.debug(f'   Базовый период: {base_price / 100}₽')
-    if total_traffic_price > 0:
-        message = f'   Трафик: {traffic_price_per_month / 100}₽/мес × {months_in_period} = {total_traffic_price / 100}₽'
-        if total_traffic_discount > 0:
-            message += f' (скидка {traffic_discount_percent}%: -{total_traffic_discount / 100}₽)'
-        logger.debug(message)
-    if total_servers_price > 0:
-        message = (
-            f'   Серверы: {servers_price_per_month / 100}₽/мес × {months_in_period} = {total_servers_price / 100}₽'
-        )
-        if total_servers_discount > 0:
-            message += f' (скидка {servers_discount_percent}%: -{total_servers_discount / 100}₽)'
-        logger.debug(message)
-    if total_devices_price > 0:
-        message = (
-            f'   Устройства: {devices_price_per_month / 100}₽/мес × {months_in_period} = {total_devices_price / 100}₽'
-        )
-        if total_devices_discount > 0:
-            message += f' (скидка {devices_discount_percent}%: -{total_devices_discount / 100}₽)'
-        logger.debug(message)
-    logger.debug(f'   ИТОГО: {total_cost / 100}₽')
 
     return total_cost, details
 
@@ -1873,6 +1762,22 @@ async def activate_pending_trial_subscription(
 # ==================== СУТОЧНЫЕ ПОДПИСКИ ====================
 
 
+def _daily_charge_conditions(now: datetime) -> tuple:
+    """Условия суточного списания; проверяются и при выборке, и повторно под блокировкой."""
+    from app.database.models import Tariff
+
+    one_day_ago = now - timedelta(hours=24)
+    return (
+        Tariff.is_daily.is_(True),
+        Tariff.is_active.is_(True),
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.is_daily_paused.is_(False),
+        Subscription.is_trial.is_(False),  # Не списываем с триальных подписок
+        # Списания ещё не было ИЛИ прошло более 24 часов
+        (Subscription.last_daily_charge_at.is_(None)) | (Subscription.last_daily_charge_at < one_day_ago),
+    )
+
+
 async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscription]:
     """
     Получает все суточные подписки, которые нужно обработать для списания.
@@ -1885,9 +1790,6 @@ async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscript
     """
     from app.database.models import Tariff
 
-    now = datetime.utcnow()
-    one_day_ago = now - timedelta(hours=24)
-
     query = (
         select(Subscription)
         .join(Tariff, Subscription.tariff_id == Tariff.id)
@@ -1895,17 +1797,7 @@ async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscript
             selectinload(Subscription.user),
             selectinload(Subscription.tariff),
         )
-        .where(
-            and_(
-                Tariff.is_daily.is_(True),
-                Tariff.is_active.is_(True),
-                Subscription.status == SubscriptionStatus.ACTIVE.value,
-                Subscription.is_daily_paused.is_(False),
-                Subscription.is_trial.is_(False),  # Не списываем с триальных подписок
-                # Списания ещё не было ИЛИ прошло более 24 часов
-                ((Subscription.last_daily_charge_at.is_(None)) | (Subscription.last_daily_charge_at < one_day_ago)),
-            )
-        )
+        .where(and_(*_daily_charge_conditions(datetime.utcnow())))
     )
 
     result = await db.execute(query)
@@ -1916,6 +1808,92 @@ async def get_daily_subscriptions_for_charge(db: AsyncSession) -> list[Subscript
     return list(subscriptions)
 
 
+async def get_daily_subscription_ids_for_charge(db: AsyncSession) -> list[int]:
+    """ID суточных подписок к списанию — по тем же критериям, что и get_daily_subscriptions_for_charge."""
+    from app.database.models import Tariff
+
+    result = await db.execute(
+        select(Subscription.id)
+        .join(Tariff, Subscription.tariff_id == Tariff.id)
+        .where(*_daily_charge_conditions(datetime.utcnow()))
+        .order_by(Subscription.id)
+    )
+    subscription_ids = list(result.scalars().all())
+
+    logger.info(f'🔍 Найдено {len(subscription_ids)} суточных подписок для списания')
+
+    return subscription_ids
+
+
+async def lock_daily_subscriptions_for_charge(
+    db: AsyncSession,
+    subscription_ids: list[int],
+    now: datetime | None = None,
+) -> list:
+    """
+    Блокирует пачку суточных подписок (SELECT ... FOR UPDATE) и повторно проверяет
+    все условия списания: подписку, переведённую на другой тариф, в триал или
+    уже списанную параллельным запуском, пачка пропустит.
+
+    Returns:
+        list: строки (id, user_id, tariff_name, daily_price_kopeks) в порядке id
+    """
+    from app.database.models import Tariff
+
+    if not subscription_ids:
+        return []
+
+    result = await db.execute(
+        select(Subscription.id, Subscription.user_id, Tariff.name.label('tariff_name'), Tariff.daily_price_kopeks)
+        .join(Tariff, Subscription.tariff_id == Tariff.id)
+        .where(Subscription.id.in_(subscription_ids), *_daily_charge_conditions(now or datetime.utcnow()))
+        .order_by(Subscription.id)
+        .with_for_update(of=Subscription)
+    )
+    return list(result.all())
+
+
+async def extend_daily_subscriptions(db: AsyncSession, subscription_ids: list[int], now: datetime) -> None:
+    """Отмечает суточное списание и продлевает подписки на сутки одним UPDATE (как update_daily_charge_time)."""
+    if not subscription_ids:
+        return
+
+    new_end_date = now + timedelta(days=1)
+    result = await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(subscription_ids))
+        .values(
+            last_daily_charge_at=now,
+            end_date=case(
+                (
+                    Subscription.end_date.is_(None) | (Subscription.end_date < new_end_date),
+                    new_end_date,
+                ),
+                else_=Subscription.end_date,
+            ),
+        )
+        .returning(Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    # Пакетный UPDATE минует flush — экран подписки сбрасываем после коммита явно
+    invalidate_on_commit(db, result.scalars().all())
+
+
+async def suspend_daily_subscriptions(db: AsyncSession, subscription_ids: list[int]) -> None:
+    """Приостанавливает подписки из-за недостатка баланса одним UPDATE."""
+    if not subscription_ids:
+        return
+
+    result = await db.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(subscription_ids))
+        .values(status=SubscriptionStatus.DISABLED.value)
+        .returning(Subscription.user_id)
+        .execution_options(synchronize_session=False)
+    )
+    invalidate_on_commit(db, result.scalars().all())
+
+
 async def get_disabled_daily_subscriptions_for_resume(
     db: AsyncSession,
 ) -> list[Subscription]:
@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.database.models import PromoGroup, Subscription, Tariff
+from app.services.pricing_catalog import invalidate_pricing_catalog
 
 
 logger = logging.getLogger(__name__)
@@ -582,6 +583,7 @@ async def load_period_prices_from_db(db: AsyncSession) -> None:
 
         if period_prices:
             set_period_prices_from_db(period_prices)
+            invalidate_pricing_catalog('period_prices')
             logger.info(
                 "Загружены периоды из тарифа '%s': %s",
                 tariff.name,
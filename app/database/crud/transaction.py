@@ -1,4 +1,5 @@
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 from sqlalchemy import and_, func, or_, select
@@ -31,8 +32,21 @@ REAL_PAYMENT_METHODS = [
 ]
 
 
-async def create_transaction(
+@dataclass(slots=True)
+class TransactionEntry:
+    """Данные транзакции для пакетной вставки через :func:`add_transactions_batch`."""
+
+    user_id: int
+    type: TransactionType
+    amount_kopeks: int
+    description: str
+    payment_method: PaymentMethod | None = None
+    currency: str | None = None
+
+
+async def _build_transaction(
     db: AsyncSession,
+    *,
     user_id: int,
     type: TransactionType,
     amount_kopeks: int,
@@ -73,7 +87,7 @@ async def create_transaction(
             except Exception:
                 tx_reporting_amount_minor = tx_amount_minor
 
-    transaction = Transaction(
+    return Transaction(
         user_id=user_id,
         type=type.value,
         amount_kopeks=amount_kopeks,
@@ -89,6 +103,36 @@ async def create_transaction(
         **({'created_at': created_at} if created_at else {}),
     )
 
+
+async def create_transaction(
+    db: AsyncSession,
+    user_id: int,
+    type: TransactionType,
+    amount_kopeks: int,
+    description: str,
+    payment_method: PaymentMethod | None = None,
+    external_id: str | None = None,
+    is_completed: bool = True,
+    created_at: datetime | None = None,
+    currency: str | None = None,
+    reporting_currency: str | None = None,
+    reporting_amount_minor: int | None = None,
+) -> Transaction:
+    transaction = await _build_transaction(
+        db,
+        user_id=user_id,
+        type=type,
+        amount_kopeks=amount_kopeks,
+        description=description,
+        payment_method=payment_method,
+        external_id=external_id,
+        is_completed=is_completed,
+        created_at=created_at,
+        currency=currency,
+        reporting_currency=reporting_currency,
+        reporting_amount_minor=reporting_amount_minor,
+    )
+
     db.add(transaction)
     await db.commit()
     await db.refresh(transaction)
@@ -96,29 +140,67 @@ async def create_transaction(
     logger.info(
         '💳 Создана транзакция: %s на %s %s для пользователя %s',
         type.value,
-        tx_amount_minor,
-        tx_currency,
+        transaction.amount_minor,
+        transaction.currency,
         user_id,
     )
 
+    await run_transaction_hooks(db, transaction)
+
+    return transaction
+
+
+async def add_transactions_batch(db: AsyncSession, entries: list[TransactionEntry]) -> list[Transaction]:
+    """
+    Добавляет пачку транзакций в сессию без коммита.
+
+    Все строки уходят в БД одним INSERT при flush, в той же транзакции, что и
+    остальные изменения вызывающего кода. После коммита нужно вызвать
+    :func:`run_transaction_hooks` для каждой транзакции.
+    """
+    transactions = []
+    for entry in entries:
+        transactions.append(
+            await _build_transaction(
+                db,
+                user_id=entry.user_id,
+                type=entry.type,
+                amount_kopeks=entry.amount_kopeks,
+                description=entry.description,
+                payment_method=entry.payment_method,
+                currency=entry.currency,
+            )
+        )
+
+    db.add_all(transactions)
+    await db.flush()
+    return transactions
+
+
+async def run_transaction_hooks(db: AsyncSession, transaction: Transaction) -> None:
+    """Событие о транзакции, автовыдача промогруппы и учёт в конкурсах (после коммита)."""
+    user_id = transaction.user_id
+    amount_kopeks = transaction.amount_kopeks
+    is_deposit = transaction.type == TransactionType.DEPOSIT.value
+
     # Отправляем событие о транзакции
     try:
         from app.services.event_emitter import event_emitter
 
         await event_emitter.emit(
-            'payment.completed' if type == TransactionType.DEPOSIT else 'transaction.created',
+            'payment.completed' if is_deposit else 'transaction.created',
             {
                 'transaction_id': transaction.id,
                 'user_id': user_id,
-                'type': type.value,
+                'type': transaction.type,
                 'amount_kopeks': amount_kopeks,
-                'amount_minor': tx_amount_minor,
-                'currency': tx_currency,
+                'amount_minor': transaction.amount_minor,
+                'currency': transaction.currency,
                 'amount_rubles': amount_kopeks / 100,
-                'payment_method': payment_method.value if payment_method else None,
-                'external_id': external_id,
-                'is_completed': is_completed,
-                'description': description,
+                'payment_method': transaction.payment_method,
+                'external_id': transaction.external_id,
+                'is_completed': transaction.is_completed,
+                'description': transaction.description,
             },
             db=db,
         )
@@ -137,7 +219,7 @@ async def create_transaction(
             user_id,
             exc,
         )
-    if type == TransactionType.SUBSCRIPTION_PAYMENT:
+    if transaction.type == TransactionType.SUBSCRIPTION_PAYMENT.value:
         try:
             from app.services.referral_contest_service import referral_contest_service
 
@@ -153,8 +235,6 @@ async def create_transaction(
                 exc,
             )
 
-    return transaction
-
 
 async def get_transaction_by_id(db: AsyncSession, transaction_id: int) -> Transaction | None:
     result = await db.execute(
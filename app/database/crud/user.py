@@ -3,10 +3,10 @@ import secrets
 import string
 from datetime import UTC, datetime, timedelta
 
-from sqlalchemy import and_, case, func, nullslast, or_, select, text
+from sqlalchemy import and_, case, func, nullslast, or_, select, text, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 
 from app.config import settings
 from app.database.crud.discount_offer import get_latest_claimed_offer_for_user
@@ -23,6 +23,7 @@ from app.database.models import (
     UserPromoGroup,
     UserStatus,
 )
+from app.services.subscription_view_service import invalidate_on_commit
 from app.utils.validators import sanitize_telegram_name
 
 
@@ -103,14 +104,82 @@ async def get_user_by_id(db: AsyncSession, user_id: int) -> User | None:
     return user
 
 
+async def debit_user_balances(
+    db: AsyncSession,
+    charges: dict[int, int],
+    currency: str,
+    now: datetime | None = None,
+) -> dict:
+    """
+    Списывает с пользователей суммы ``{user_id: amount_kopeks}`` UPDATE-запросами,
+    по одному на каждую сумму.
+
+    Списание проходит только при достаточном балансе в валюте ``currency`` —
+    проверка выполняется в самом UPDATE, под блокировкой строки.
+
+    Returns:
+        dict: user_id -> строка (id, telegram_id, email, email_verified, language, balance_kopeks)
+              для пользователей, с которых списано
+    """
+    now = now or datetime.utcnow()
+    by_amount: dict[int, list[int]] = {}
+    for user_id, amount_kopeks in charges.items():
+        by_amount.setdefault(amount_kopeks, []).append(user_id)
+
+    debited = {}
+    for amount_kopeks, user_ids in sorted(by_amount.items()):
+        result = await db.execute(
+            update(User)
+            .where(
+                User.id.in_(sorted(user_ids)),
+                User.balance_kopeks >= amount_kopeks,
+                func.upper(User.balance_currency) == currency.upper(),
+            )
+            .values(balance_kopeks=User.balance_kopeks - amount_kopeks, updated_at=now)
+            .returning(
+                User.id,
+                User.telegram_id,
+                User.email,
+                User.email_verified,
+                User.language,
+                User.balance_kopeks,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        debited.update({row.id: row for row in result.all()})
+
+    invalidate_on_commit(db, debited)
+    return debited
+
+
+async def get_user_balances(db: AsyncSession, user_ids: list[int]) -> dict:
+    """Баланс и контакты пользователей без загрузки ORM-объектов: user_id -> строка."""
+    if not user_ids:
+        return {}
+
+    result = await db.execute(
+        select(
+            User.id,
+            User.telegram_id,
+            User.email,
+            User.email_verified,
+            User.language,
+            User.balance_kopeks,
+            User.balance_currency,
+        ).where(User.id.in_(user_ids))
+    )
+    return {row.id: row for row in result.all()}
+
+
 async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
     result = await db.execute(
         select(User)
         .options(
-            selectinload(User.subscription),
-            selectinload(User.user_promo_groups).selectinload(UserPromoGroup.promo_group),
+            # Подписка и основная промогруппа приходят одним запросом вместе с пользователем
+            joinedload(User.subscription),
+            joinedload(User.promo_group),
+            selectinload(User.user_promo_groups).joinedload(UserPromoGroup.promo_group),
             selectinload(User.referrer),
-            selectinload(User.promo_group),
         )
         .where(User.telegram_id == telegram_id)
     )
@@ -123,6 +192,14 @@ async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int) -> User |
     return user
 
 
+async def get_user_identity_by_telegram_id(db: AsyncSession, telegram_id: int) -> User | None:
+    """Пользователь только с подпиской — для хендлеров, которым не нужны промогруппы и рефералы."""
+    result = await db.execute(
+        select(User).options(joinedload(User.subscription)).where(User.telegram_id == telegram_id)
+    )
+    return result.scalar_one_or_none()
+
+
 async def get_user_by_username(db: AsyncSession, username: str) -> User | None:
     if not username:
         return None
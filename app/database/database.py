@@ -13,6 +13,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from app.config import settings
+from app.database import referrer_ledger  # noqa: F401 - регистрирует обработчики событий Session
 from app.database.models import Base
 
 
@@ -976,7 +976,7 @@ class User(Base):
     display_currency = Column(String(16), nullable=True)
     used_promocodes = Column(Integer, default=0)
     has_had_paid_subscription = Column(Boolean, default=False, nullable=False)
-    referred_by_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    referred_by_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
     referral_code = Column(String(20), unique=True, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1476,7 +1476,7 @@ class ReferralEarning(Base):
     __tablename__ = 'referral_earnings'
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     referral_id = Column(Integer, ForeignKey('users.id'), nullable=False)
 
     amount_kopeks = Column(Integer, nullable=False)
@@ -1495,6 +1495,25 @@ class ReferralEarning(Base):
         return self.amount_kopeks / 100
 
 
+class ReferrerLedger(Base):
+    """Итоги реферера: приглашённые и заработок. Поддерживается app.database.referrer_ledger."""
+
+    __tablename__ = 'referrer_ledger'
+    __table_args__ = (
+        Index('ix_referrer_ledger_total_earned', 'total_earned_kopeks', 'referrals_count'),
+        Index('ix_referrer_ledger_earnings', 'earnings_kopeks', 'referrals_count'),
+    )
+
+    referrer_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    referrals_count = Column(Integer, nullable=False, default=0)
+    earnings_kopeks = Column(BigInteger, nullable=False, default=0)  # ReferralEarning
+    rewards_kopeks = Column(BigInteger, nullable=False, default=0)  # транзакции REFERRAL_REWARD
+    total_earned_kopeks = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+
+    referrer = relationship('User')
+
+
 class WithdrawalRequestStatus(Enum):
     """Статусы заявки на вывод реферального баланса."""
 
@@ -1795,6 +1814,28 @@ class MonitoringLog(Base):
     created_at = Column(DateTime, default=func.now())
 
 
+class UserNodeTrafficDaily(Base):
+    """Суточный трафик пользователя на ноде. Заполняется app.services.traffic_history_service."""
+
+    __tablename__ = 'user_node_traffic_daily'
+    __table_args__ = (Index('ix_user_node_traffic_daily_day', 'day'),)
+
+    day = Column(Date, primary_key=True)
+    user_uuid = Column(String(64), primary_key=True)
+    node_uuid = Column(String(64), primary_key=True)
+    total_bytes = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=func.now())
+
+
+class TrafficHistoryDay(Base):
+    """Сутки, за которые история трафика собрана со всех нод (в т.ч. без трафика)."""
+
+    __tablename__ = 'traffic_history_days'
+
+    day = Column(Date, primary_key=True)
+    collected_at = Column(DateTime, nullable=False, default=func.now())
+
+
 class SentNotification(Base):
     __tablename__ = 'sent_notifications'
 
@@ -2451,6 +2492,22 @@ class ButtonClickLog(Base):
         return f"<ButtonClickLog id={self.id} button='{self.button_id}' user={self.user_id} at={self.clicked_at}>"
 
 
+class ReferralClickEvent(Base):
+    """Переходы по реферальным ссылкам (append-only журнал для диагностики)."""
+
+    __tablename__ = 'referral_click_events'
+
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(BigInteger, nullable=False, index=True)
+    raw_code = Column(String(64), nullable=False)  # Код как пришёл в /start (может быть ref_refXXX)
+    clean_code = Column(String(64), nullable=False)  # Очищенный код (refXXX)
+    source = Column(String(20), nullable=False)  # start, payload
+    clicked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self) -> str:
+        return f"<ReferralClickEvent id={self.id} tg={self.telegram_id} code='{self.clean_code}' at={self.clicked_at}>"
+
+
 class Webhook(Base):
     """Webhook конфигурация для подписки на события."""
 
@@ -0,0 +1,352 @@
+"""Maintenance of the ``referrer_ledger`` table.
+
+The ledger keeps, per referrer, the number of invited users and the earned
+amounts, so referral statistics read the top referrers with ``ORDER BY ...
+LIMIT k`` instead of grouping all users, earnings and transactions.
+
+It is kept up to date by session events, so every write path is covered
+without touching the handlers:
+
+* ``after_flush`` turns new/changed/deleted ``User``, ``ReferralEarning`` and
+  REFERRAL_REWARD ``Transaction`` objects into per-referrer deltas applied with
+  an upsert;
+* ``do_orm_execute`` recomputes the referrers affected by bulk
+  ``update()``/``delete()`` statements on those tables.
+
+Ledger writes run in a savepoint: a failure never breaks the business
+transaction. Instead the affected referrers are remembered once the transaction
+commits and recomputed later by ``reconcile_referrer_ledger`` (called from the
+monitoring cycle); on startup ``ledger_matches_source`` compares checksums of the
+ledger and the source tables. ``rebuild_referrer_ledger`` recreates the whole table.
+"""
+
+import logging
+from collections import defaultdict
+from collections.abc import Iterable
+
+from sqlalchemy import delete, event, func, insert, inspect, literal, select, union_all
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.database.models import ReferralEarning, ReferrerLedger, Transaction, TransactionType, User
+from app.database.session_hooks import defer_until_commit, on_commit
+
+
+logger = logging.getLogger(__name__)
+
+_REFERRAL_REWARD = TransactionType.REFERRAL_REWARD.value
+_LEDGER_COLUMNS = ('referrals_count', 'earnings_kopeks', 'rewards_kopeks')
+
+_STALE_KEY = 'referrer_ledger_stale'
+_RECONCILED_KEY = 'referrer_ledger_reconciled'
+# Рефереры, чьи записи в ledger разошлись с данными после закоммиченной транзакции.
+# None означает, что затронутых определить не удалось и нужна сверка всей таблицы.
+_stale_referrers: set[int | None] = set()
+
+
+def _is_referral_reward(transaction: Transaction) -> bool:
+    return getattr(transaction.type, 'value', transaction.type) == _REFERRAL_REWARD
+
+
+def _ledger_source(referrer_ids: Iterable[int] | None = None):
+    """Union of ledger contributions: one row per referral, earning and reward transaction."""
+    referrals = select(
+        User.referred_by_id.label('referrer_id'),
+        literal(1).label('referrals_count'),
+        literal(0).label('earnings_kopeks'),
+        literal(0).label('rewards_kopeks'),
+    ).where(User.referred_by_id.isnot(None))
+    earnings = select(
+        ReferralEarning.user_id.label('referrer_id'),
+        literal(0).label('referrals_count'),
+        ReferralEarning.amount_kopeks.label('earnings_kopeks'),
+        literal(0).label('rewards_kopeks'),
+    )
+    rewards = select(
+        Transaction.user_id.label('referrer_id'),
+        literal(0).label('referrals_count'),
+        literal(0).label('earnings_kopeks'),
+        Transaction.amount_kopeks.label('rewards_kopeks'),
+    ).where(Transaction.type == _REFERRAL_REWARD)
+
+    if referrer_ids is not None:
+        ids = sorted(set(referrer_ids))
+        referrals = referrals.where(User.referred_by_id.in_(ids))
+        earnings = earnings.where(ReferralEarning.user_id.in_(ids))
+        rewards = rewards.where(Transaction.user_id.in_(ids))
+
+    return union_all(referrals, earnings, rewards).subquery()
+
+
+def build_ledger_insert(referrer_ids: Iterable[int] | None = None):
+    source = _ledger_source(referrer_ids)
+    referrals_count = func.coalesce(func.sum(source.c.referrals_count), 0)
+    earnings_kopeks = func.coalesce(func.sum(source.c.earnings_kopeks), 0)
+    rewards_kopeks = func.coalesce(func.sum(source.c.rewards_kopeks), 0)
+    aggregated = select(
+        source.c.referrer_id,
+        referrals_count,
+        earnings_kopeks,
+        rewards_kopeks,
+        earnings_kopeks + rewards_kopeks,
+        func.now(),
+    ).group_by(source.c.referrer_id)
+    return insert(ReferrerLedger).from_select(
+        ['referrer_id', *_LEDGER_COLUMNS, 'total_earned_kopeks', 'updated_at'],
+        aggregated,
+    )
+
+
+async def rebuild_referrer_ledger(db) -> int:
+    """Пересобрать ledger целиком. Принимает AsyncSession или AsyncConnection; коммит на вызывающем."""
+    await db.execute(delete(ReferrerLedger))
+    await db.execute(build_ledger_insert())
+    result = await db.execute(select(func.count()).select_from(ReferrerLedger))
+    return int(result.scalar() or 0)
+
+
+def _checksums(referrer_id, values) -> list:
+    # Суммы и суммы, взвешенные по referrer_id: ловят и потерянные дельты, и записи не у того реферера
+    return [func.coalesce(func.sum(value), 0) for value in values] + [
+        func.coalesce(func.sum(referrer_id * value), 0) for value in values
+    ]
+
+
+def ledger_matches_source(connection: Connection | Session) -> bool:
+    """Сверить контрольные суммы ledger с исходными таблицами одним проходом по каждой."""
+    source = _ledger_source()
+    expected = select(*_checksums(source.c.referrer_id, [source.c[name] for name in _LEDGER_COLUMNS]))
+    actual = select(
+        *_checksums(ReferrerLedger.referrer_id, [getattr(ReferrerLedger, name) for name in _LEDGER_COLUMNS])
+    )
+    return tuple(map(int, connection.execute(expected).one())) == tuple(map(int, connection.execute(actual).one()))
+
+
+def recompute_referrers(connection: Connection, referrer_ids: Iterable[int]) -> None:
+    ids = sorted({referrer_id for referrer_id in referrer_ids if referrer_id})
+    if not ids:
+        return
+    connection.execute(delete(ReferrerLedger).where(ReferrerLedger.referrer_id.in_(ids)))
+    connection.execute(build_ledger_insert(ids))
+
+
+def _upsert_statement(dialect_name: str, referrer_id: int, referrals: int, earnings: int, rewards: int):
+    values = {
+        'referrer_id': referrer_id,
+        'referrals_count': referrals,
+        'earnings_kopeks': earnings,
+        'rewards_kopeks': rewards,
+        'total_earned_kopeks': earnings + rewards,
+        'updated_at': func.now(),
+    }
+    increments = {
+        'referrals_count': ReferrerLedger.referrals_count + referrals,
+        'earnings_kopeks': ReferrerLedger.earnings_kopeks + earnings,
+        'rewards_kopeks': ReferrerLedger.rewards_kopeks + rewards,
+        'total_earned_kopeks': ReferrerLedger.total_earned_kopeks + earnings + rewards,
+        'updated_at': func.now(),
+    }
+
+    if dialect_name == 'postgresql':
+        statement = postgresql_insert(ReferrerLedger).values(**values)
+        return statement.on_conflict_do_update(index_elements=['referrer_id'], set_=increments)
+    if dialect_name == 'sqlite':
+        statement = sqlite_insert(ReferrerLedger).values(**values)
+        return statement.on_conflict_do_update(index_elements=['referrer_id'], set_=increments)
+    if dialect_name in {'mysql', 'mariadb'}:
+        return mysql_insert(ReferrerLedger).values(**values).on_duplicate_key_update(**increments)
+    return None
+
+
+def _apply_deltas(connection: Connection, deltas: dict[int, list[int]]) -> None:
+    for referrer_id, (referrals, earnings, rewards) in deltas.items():
+        if not (referrals or earnings or rewards):
+            continue
+        statement = _upsert_statement(connection.dialect.name, referrer_id, referrals, earnings, rewards)
+        if statement is None:
+            recompute_referrers(connection, [referrer_id])
+            continue
+        connection.execute(statement)
+
+
+def collect_flush_deltas(session: Session) -> tuple[dict[int, list[int]], set[int]]:
+    """Per-referrer deltas (referrals, earnings, rewards) and ids of deleted users from the pending flush."""
+    deltas: dict[int, list[int]] = defaultdict(lambda: [0, 0, 0])
+    removed: set[int] = set()
+
+    for obj in session.new:
+        if isinstance(obj, User) and obj.referred_by_id:
+            deltas[obj.referred_by_id][0] += 1
+        elif isinstance(obj, ReferralEarning) and obj.user_id:
+            deltas[obj.user_id][1] += obj.amount_kopeks or 0
+        elif isinstance(obj, Transaction) and obj.user_id and _is_referral_reward(obj):
+            deltas[obj.user_id][2] += obj.amount_kopeks or 0
+
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        history = inspect(obj).attrs.referred_by_id.history
+        if not history.has_changes():
+            continue
+        for previous in history.deleted:
+            if previous:
+                deltas[previous][0] -= 1
+        for current in history.added:
+            if current:
+                deltas[current][0] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            removed.add(obj.id)
+            if obj.referred_by_id:
+                deltas[obj.referred_by_id][0] -= 1
+        elif isinstance(obj, ReferralEarning) and obj.user_id:
+            deltas[obj.user_id][1] -= obj.amount_kopeks or 0
+        elif isinstance(obj, Transaction) and obj.user_id and _is_referral_reward(obj):
+            deltas[obj.user_id][2] -= obj.amount_kopeks or 0
+
+    for referrer_id in removed:
+        deltas.pop(referrer_id, None)
+    return dict(deltas), removed
+
+
+def _mark_stale(session: Session, referrer_ids: Iterable[int | None]) -> None:
+    defer_until_commit(session, _STALE_KEY, referrer_ids)
+
+
+def _run_in_savepoint(session: Session, action, description: str, referrer_ids: Iterable[int]) -> None:
+    connection = session.connection()
+    try:
+        with connection.begin_nested():
+            action()
+    except Exception as error:
+        logger.error('❌ Не удалось обновить referrer_ledger (%s): %s', description, error)
+        _mark_stale(session, referrer_ids)
+
+
+def reconcile_stale_referrers(session: Session) -> int:
+    """Пересчитать рефереров, чьи записи не удалось обновить. Коммит на вызывающем."""
+    stale = set(_stale_referrers)
+    if not stale:
+        return 0
+
+    connection = session.connection()
+    if None in stale and not ledger_matches_source(connection):
+        connection.execute(delete(ReferrerLedger))
+        connection.execute(build_ledger_insert())
+        reconciled = len(stale)
+    else:
+        referrer_ids = stale - {None}
+        recompute_referrers(connection, referrer_ids)
+        reconciled = len(referrer_ids)
+
+    # Из списка убираем только после коммита: при откате пересчёт повторится в следующий раз
+    defer_until_commit(session, _RECONCILED_KEY, stale)
+    return reconciled
+
+
+async def reconcile_referrer_ledger(db: AsyncSession) -> int:
+    return await db.run_sync(reconcile_stale_referrers)
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session: Session, flush_context) -> None:
+    deltas, removed = collect_flush_deltas(session)
+    if not deltas and not removed:
+        return
+
+    connection = session.connection()
+
+    def apply() -> None:
+        _apply_deltas(connection, deltas)
+        if removed:
+            connection.execute(delete(ReferrerLedger).where(ReferrerLedger.referrer_id.in_(sorted(removed))))
+
+    _run_in_savepoint(session, apply, 'flush', deltas.keys() | removed)
+
+
+def _forget_reconciled(reconciled: set[int | None]) -> None:
+    _stale_referrers.difference_update(reconciled)
+
+
+def _remember_stale(stale: set[int | None]) -> None:
+    _stale_referrers.update(stale)
+    logger.warning('⚠️ referrer_ledger требует пересчёта для %s рефереров', len(stale))
+
+
+# Сначала снимаем пересчитанных, затем добавляем новые расхождения той же транзакции.
+# При откате вместе с транзакцией откатились и изменения, которые ledger не учёл.
+on_commit(_RECONCILED_KEY, _forget_reconciled)
+on_commit(_STALE_KEY, _remember_stale)
+
+
+# Колонки, изменение которых массовым update() влияет на ledger
+_TRACKED_COLUMNS = {
+    User: {'referred_by_id'},
+    ReferralEarning: {'user_id', 'amount_kopeks'},
+    Transaction: {'user_id', 'amount_kopeks', 'type'},
+}
+
+
+def _updated_columns(statement) -> dict[str, object]:
+    values = getattr(statement, '_values', None) or {}
+    return {getattr(column, 'key', column): value for column, value in values.items()}
+
+
+def _affected_referrers(state: ORMExecuteState) -> list[int]:
+    """Referrers whose totals may change after a bulk update/delete, read before the statement runs."""
+    mapper = state.bind_mapper
+    entity = mapper.class_ if mapper is not None else None
+    if entity not in _TRACKED_COLUMNS or state.is_executemany:
+        return []
+
+    statement = state.statement
+    if state.is_update:
+        updated = _updated_columns(statement)
+        if not _TRACKED_COLUMNS[entity] & updated.keys():
+            return []
+
+    if entity is User:
+        columns = [User.referred_by_id, User.id] if state.is_delete else [User.referred_by_id]
+        query = select(*columns)
+    elif entity is ReferralEarning:
+        query = select(ReferralEarning.user_id)
+    else:
+        query = select(Transaction.user_id)
+        if not (state.is_update and 'type' in updated):
+            query = query.where(Transaction.type == _REFERRAL_REWARD)
+
+    if statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+
+    ids = {value for row in state.session.connection().execute(query) for value in row if value}
+    if state.is_update:
+        for name in ('referred_by_id', 'user_id'):
+            value = getattr(updated.get(name), 'value', None)
+            if isinstance(value, int):
+                ids.add(value)
+    return sorted(ids)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _on_bulk_statement(state: ORMExecuteState):
+    if not (state.is_update or state.is_delete):
+        return None
+
+    try:
+        referrer_ids = _affected_referrers(state)
+    except Exception as error:
+        logger.error('❌ Не удалось определить затронутых рефереров: %s', error)
+        _mark_stale(state.session, [None])
+        return None
+    if not referrer_ids:
+        return None
+
+    result = state.invoke_statement()
+    connection = state.session.connection()
+    _run_in_savepoint(state.session, lambda: recompute_referrers(connection, referrer_ids), 'bulk', referrer_ids)
+    return result
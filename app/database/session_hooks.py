@@ -0,0 +1,50 @@
+"""Commit-scoped bookkeeping for the ``Session`` listeners.
+
+Caches kept in sync by session events collect what a transaction changed while
+it is still open and act on it only once it commits; a rollback discards what
+was collected. The values live in ``session.info`` under a per-listener key:
+:func:`defer_until_commit` adds to them and :func:`on_commit` registers the
+``after_flush``/``after_commit``/``after_rollback`` listeners around them.
+"""
+
+from collections.abc import Callable, Hashable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def defer_until_commit(session: Session | AsyncSession, key: str, values: Iterable[Hashable]) -> None:
+    """Remember ``values`` under ``key`` until the session commits or rolls back."""
+    session.info.setdefault(key, set()).update(values)
+
+
+def on_commit(
+    key: str,
+    apply: Callable[[set], None],
+    *,
+    collect: Callable[[Session], Iterable[Hashable]] | None = None,
+) -> None:
+    """Call ``apply`` with the values deferred under ``key`` after each commit.
+
+    With ``collect`` every flush defers what it returns for the session. Listeners
+    run in registration order, so several keys of one module are applied in the
+    order they were registered.
+    """
+    if collect is not None:
+
+        @event.listens_for(Session, 'after_flush')
+        def _after_flush(session: Session, flush_context) -> None:
+            values = collect(session)
+            if values:
+                defer_until_commit(session, key, values)
+
+    @event.listens_for(Session, 'after_commit')
+    def _after_commit(session: Session) -> None:
+        values = session.info.pop(key, None)
+        if values:
+            apply(values)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _after_rollback(session: Session) -> None:
+        session.info.pop(key, None)
@@ -1,21 +1,221 @@
+import hashlib
 import logging
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from sqlalchemy import select, text
+from sqlalchemy import event, select, text
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal, engine
 from app.database.models import WebApiToken
+from app.database.referrer_ledger import ledger_matches_source, rebuild_referrer_ledger
 from app.utils.security import hash_api_token
 
 
+if TYPE_CHECKING:
+    from app.utils.startup_timeline import StageHandle
+
+
 logger = logging.getLogger(__name__)
 
+# Увеличьте, чтобы принудительно прогнать все шаги на уже мигрированных БД
+MIGRATION_SCHEMA_VERSION = 1
+MIGRATION_STATE_TABLE = 'schema_migration_state'
+_MIGRATION_STATE_KEY = 'universal_migration'
+
+_DDL_PATTERN = re.compile(r'\b(CREATE|ALTER|DROP|RENAME)\b', re.IGNORECASE)
+
 
 async def get_database_type():
     return engine.dialect.name
 
 
+class SchemaCatalog:
+    """
+    In-memory snapshot of tables, columns, constraints and indexes.
+
+    Loaded with a handful of batched ``information_schema`` queries instead of one
+    round trip per ``check_*_exists`` call. Any DDL statement executed through the
+    engine marks the snapshot stale, so the next check reloads it.
+    """
+
+    SUPPORTED_DIALECTS = ('postgresql', 'mysql')
+
+    def __init__(self) -> None:
+        self.active = False
+        self.loads = 0
+        self._stale = True
+        self._columns: dict[str, set[str]] = {}
+        self._constraints: set[tuple[str, str]] = set()
+        self._indexes: set[tuple[str, str]] = set()
+
+    def _on_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if not self._stale and _DDL_PATTERN.search(statement):
+            self._stale = True
+
+    @asynccontextmanager
+    async def track(self, db_type: str):
+        if db_type not in self.SUPPORTED_DIALECTS:
+            yield self
+            return
+
+        self.active = True
+        self._stale = True
+        event.listen(engine.sync_engine, 'before_cursor_execute', self._on_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(engine.sync_engine, 'before_cursor_execute', self._on_cursor_execute)
+            self.active = False
+            self._columns.clear()
+            self._constraints.clear()
+            self._indexes.clear()
+
+    async def _load(self) -> None:
+        db_type = await get_database_type()
+        schema_filter = "= 'public'" if db_type == 'postgresql' else '= DATABASE()'
+        if db_type == 'postgresql':
+            indexes_sql = "SELECT tablename, indexname FROM pg_indexes WHERE schemaname = 'public'"
+        else:
+            indexes_sql = (
+                f'SELECT table_name, index_name FROM information_schema.statistics WHERE table_schema {schema_filter}'
+            )
+
+        columns: dict[str, set[str]] = {}
+        async with engine.connect() as conn:
+            tables = await conn.execute(
+                text(f'SELECT table_name FROM information_schema.tables WHERE table_schema {schema_filter}')
+            )
+            for (table_name,) in tables:
+                columns[table_name] = set()
+
+            rows = await conn.execute(
+                text(
+                    f'SELECT table_name, column_name FROM information_schema.columns WHERE table_schema {schema_filter}'
+                )
+            )
+            for table_name, column_name in rows:
+                columns.setdefault(table_name, set()).add(column_name)
+
+            constraints = await conn.execute(
+                text(
+                    'SELECT table_name, constraint_name FROM information_schema.table_constraints '
+                    f'WHERE table_schema {schema_filter}'
+                )
+            )
+            self._constraints = {(table_name, name) for table_name, name in constraints}
+
+            indexes = await conn.execute(text(indexes_sql))
+            self._indexes = {(table_name, name) for table_name, name in indexes}
+
+        self._columns = columns
+        self._stale = False
+        self.loads += 1
+
+    async def _ensure_loaded(self) -> None:
+        if self._stale:
+            await self._load()
+
+    async def has_table(self, table_name: str) -> bool:
+        await self._ensure_loaded()
+        return table_name in self._columns
+
+    async def has_column(self, table_name: str, column_name: str) -> bool:
+        await self._ensure_loaded()
+        return column_name in self._columns.get(table_name, ())
+
+    async def has_constraint(self, table_name: str, constraint_name: str) -> bool:
+        await self._ensure_loaded()
+        return (table_name, constraint_name) in self._constraints
+
+    async def has_index(self, table_name: str, index_name: str) -> bool:
+        await self._ensure_loaded()
+        return (table_name, index_name) in self._indexes
+
+
+schema_catalog = SchemaCatalog()
+
+
+@dataclass
+class MigrationStepTiming:
+    name: str
+    duration: float
+    ok: bool
+
+
+_step_timings: list[MigrationStepTiming] = []
+
+
+async def _run_step(step):
+    """Runs one migration step and records its duration."""
+    started = time.perf_counter()
+    result = await step()
+    _step_timings.append(
+        MigrationStepTiming(
+            name=step.__name__,
+            duration=time.perf_counter() - started,
+            ok=result is not False,
+        )
+    )
+    return result
+
+
+def get_migration_step_timings() -> list[MigrationStepTiming]:
+    return list(_step_timings)
+
+
+def get_migration_fingerprint(db_type: str) -> str:
+    """Hash of the migration steps: changes whenever this module or the schema version changes."""
+    digest = hashlib.sha256(f'{MIGRATION_SCHEMA_VERSION}:{db_type}:'.encode())
+    digest.update(Path(__file__).read_bytes())
+    return digest.hexdigest()
+
+
+async def get_stored_migration_fingerprint() -> str | None:
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text(f'SELECT fingerprint FROM {MIGRATION_STATE_TABLE} WHERE name = :name'),
+                {'name': _MIGRATION_STATE_KEY},
+            )
+            return result.scalar_one_or_none()
+    except Exception as error:
+        logger.debug('Fingerprint схемы не найден: %s', error)
+        return None
+
+
+async def store_migration_fingerprint(fingerprint: str) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"""
+                CREATE TABLE IF NOT EXISTS {MIGRATION_STATE_TABLE} (
+                    name VARCHAR(64) PRIMARY KEY,
+                    fingerprint VARCHAR(64) NOT NULL,
+                    applied_at TIMESTAMP NULL
+                )
+                """
+            )
+        )
+        await conn.execute(
+            text(f'DELETE FROM {MIGRATION_STATE_TABLE} WHERE name = :name'),
+            {'name': _MIGRATION_STATE_KEY},
+        )
+        await conn.execute(
+            text(
+                f'INSERT INTO {MIGRATION_STATE_TABLE} (name, fingerprint, applied_at) '
+                'VALUES (:name, :fingerprint, :applied_at)'
+            ),
+            {'name': _MIGRATION_STATE_KEY, 'fingerprint': fingerprint, 'applied_at': datetime.utcnow()},
+        )
+
+
 async def sync_postgres_sequences() -> bool:
     """Ensure PostgreSQL sequences match the current max values after restores."""
 
@@ -103,6 +303,9 @@ async def sync_postgres_sequences() -> bool:
 
 async def check_table_exists(table_name: str) -> bool:
     try:
+        if schema_catalog.active:
+            return await schema_catalog.has_table(table_name)
+
         async with engine.begin() as conn:
             db_type = await get_database_type()
 
@@ -144,6 +347,9 @@ async def check_table_exists(table_name: str) -> bool:
 
 async def check_column_exists(table_name: str, column_name: str) -> bool:
     try:
+        if schema_catalog.active:
+            return await schema_catalog.has_column(table_name, column_name)
+
         async with engine.begin() as conn:
             db_type = await get_database_type()
 
@@ -185,6 +391,9 @@ async def check_column_exists(table_name: str, column_name: str) -> bool:
 
 async def check_constraint_exists(table_name: str, constraint_name: str) -> bool:
     try:
+        if schema_catalog.active:
+            return await schema_catalog.has_constraint(table_name, constraint_name)
+
         async with engine.begin() as conn:
             db_type = await get_database_type()
 
@@ -232,6 +441,9 @@ async def check_constraint_exists(table_name: str, constraint_name: str) -> bool
 
 async def check_index_exists(table_name: str, index_name: str) -> bool:
     try:
+        if schema_catalog.active:
+            return await schema_catalog.has_index(table_name, index_name)
+
         async with engine.begin() as conn:
             db_type = await get_database_type()
 
@@ -4400,6 +4612,68 @@ async def fix_button_click_logs_fk() -> bool:
         return False
 
 
+async def create_referral_click_events_table() -> bool:
+    """Создаёт журнал переходов по реферальным ссылкам."""
+    table_exists = await check_table_exists('referral_click_events')
+    if table_exists:
+        logger.info('ℹ️ Таблица referral_click_events уже существует')
+        return True
+
+    try:
+        async with engine.begin() as conn:
+            db_type = await get_database_type()
+
+            if db_type == 'sqlite':
+                create_table_sql = """
+                CREATE TABLE referral_click_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    telegram_id BIGINT NOT NULL,
+                    raw_code VARCHAR(64) NOT NULL,
+                    clean_code VARCHAR(64) NOT NULL,
+                    source VARCHAR(20) NOT NULL,
+                    clicked_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            elif db_type == 'postgresql':
+                create_table_sql = """
+                CREATE TABLE referral_click_events (
+                    id SERIAL PRIMARY KEY,
+                    telegram_id BIGINT NOT NULL,
+                    raw_code VARCHAR(64) NOT NULL,
+                    clean_code VARCHAR(64) NOT NULL,
+                    source VARCHAR(20) NOT NULL,
+                    clicked_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                """
+            else:
+                create_table_sql = """
+                CREATE TABLE referral_click_events (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    telegram_id BIGINT NOT NULL,
+                    raw_code VARCHAR(64) NOT NULL,
+                    clean_code VARCHAR(64) NOT NULL,
+                    source VARCHAR(20) NOT NULL,
+                    clicked_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ) ENGINE=InnoDB
+                """
+
+            await conn.execute(text(create_table_sql))
+
+            index_statements = [
+                'CREATE INDEX ix_referral_click_events_telegram_id ON referral_click_events(telegram_id)',
+                'CREATE INDEX ix_referral_click_events_clicked_at ON referral_click_events(clicked_at)',
+            ]
+            for stmt in index_statements:
+                await conn.execute(text(stmt))
+
+            logger.info('✅ Таблица referral_click_events создана')
+            return True
+
+    except Exception as error:
+        logger.error(f'❌ Ошибка создания таблицы referral_click_events: {error}')
+        return False
+
+
 async def create_web_api_tokens_table() -> bool:
     table_exists = await check_table_exists('web_api_tokens')
     if table_exists:
@@ -6612,6 +6886,139 @@ async def create_currency_rates_table() -> bool:
         return False
 
 
+async def create_referrer_ledger_table() -> bool:
+    """Таблица накопленных счётчиков рефереров и индексы для её пересборки."""
+    try:
+        db_type = await get_database_type()
+        async with engine.begin() as conn:
+            if not await check_table_exists('referrer_ledger'):
+                if db_type == 'sqlite':
+                    await conn.execute(
+                        text(
+                            """
+                            CREATE TABLE referrer_ledger (
+                                referrer_id INTEGER PRIMARY KEY,
+                                referrals_count INTEGER NOT NULL DEFAULT 0,
+                                earnings_kopeks BIGINT NOT NULL DEFAULT 0,
+                                rewards_kopeks BIGINT NOT NULL DEFAULT 0,
+                                total_earned_kopeks BIGINT NOT NULL DEFAULT 0,
+                                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                                FOREIGN KEY(referrer_id) REFERENCES users(id) ON DELETE CASCADE
+                            )
+                            """
+                        )
+                    )
+                elif db_type == 'postgresql':
+                    await conn.execute(
+                        text(
+                            """
+                            CREATE TABLE referrer_ledger (
+                                referrer_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+                                referrals_count INTEGER NOT NULL DEFAULT 0,
+                                earnings_kopeks BIGINT NOT NULL DEFAULT 0,
+                                rewards_kopeks BIGINT NOT NULL DEFAULT 0,
+                                total_earned_kopeks BIGINT NOT NULL DEFAULT 0,
+                                updated_at TIMESTAMP DEFAULT NOW()
+                            )
+                            """
+                        )
+                    )
+                else:
+                    await conn.execute(
+                        text(
+                            """
+                            CREATE TABLE referrer_ledger (
+                                referrer_id INT PRIMARY KEY,
+                                referrals_count INT NOT NULL DEFAULT 0,
+                                earnings_kopeks BIGINT NOT NULL DEFAULT 0,
+                                rewards_kopeks BIGINT NOT NULL DEFAULT 0,
+                                total_earned_kopeks BIGINT NOT NULL DEFAULT 0,
+                                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                                CONSTRAINT fk_referrer_ledger_referrer
+                                    FOREIGN KEY (referrer_id) REFERENCES users(id) ON DELETE CASCADE
+                            ) ENGINE=InnoDB
+                            """
+                        )
+                    )
+
+            indexes = {
+                'ix_referrer_ledger_total_earned': 'referrer_ledger(total_earned_kopeks, referrals_count)',
+                'ix_referrer_ledger_earnings': 'referrer_ledger(earnings_kopeks, referrals_count)',
+                'ix_users_referred_by_id': 'users(referred_by_id)',
+                'ix_referral_earnings_user_id': 'referral_earnings(user_id)',
+            }
+            for index_name, target in indexes.items():
+                table_name = target.split('(', 1)[0]
+                if not await check_index_exists(table_name, index_name):
+                    await conn.execute(text(f'CREATE INDEX {index_name} ON {target}'))
+        return True
+    except Exception as error:
+        logger.error(f'❌ Ошибка создания referrer_ledger: {error}')
+        return False
+
+
+async def reconcile_referrer_ledger_table() -> bool:
+    """Заполняет пустую referrer_ledger и пересобирает её, если контрольные суммы разошлись с исходными таблицами."""
+    try:
+        async with engine.begin() as conn:
+            ledger_rows = await conn.execute(text('SELECT COUNT(*) FROM referrer_ledger'))
+            if not ledger_rows.scalar():
+                rebuilt = await rebuild_referrer_ledger(conn)
+                logger.info(f'✅ referrer_ledger заполнена: {rebuilt} рефереров')
+            elif not await conn.run_sync(ledger_matches_source):
+                rebuilt = await rebuild_referrer_ledger(conn)
+                logger.warning(f'⚠️ referrer_ledger разошлась с исходными таблицами, пересобрана: {rebuilt} рефереров')
+        return True
+    except Exception as error:
+        logger.error(f'❌ Ошибка сверки referrer_ledger: {error}')
+        return False
+
+
+async def create_traffic_history_tables() -> bool:
+    """Таблицы локальной истории трафика: суточные объёмы пользователь × нода и журнал собранных суток."""
+    try:
+        db_type = await get_database_type()
+        timestamp_type = 'DATETIME' if db_type == 'sqlite' else 'TIMESTAMP'
+        timestamp_default = 'NOW()' if db_type == 'postgresql' else 'CURRENT_TIMESTAMP'
+        table_suffix = ' ENGINE=InnoDB' if db_type not in ('sqlite', 'postgresql') else ''
+
+        async with engine.begin() as conn:
+            if not await check_table_exists('user_node_traffic_daily'):
+                await conn.execute(
+                    text(
+                        f"""
+                        CREATE TABLE user_node_traffic_daily (
+                            day DATE NOT NULL,
+                            user_uuid VARCHAR(64) NOT NULL,
+                            node_uuid VARCHAR(64) NOT NULL,
+                            total_bytes BIGINT NOT NULL DEFAULT 0,
+                            updated_at {timestamp_type} DEFAULT {timestamp_default},
+                            PRIMARY KEY (day, user_uuid, node_uuid)
+                        ){table_suffix}
+                        """
+                    )
+                )
+
+            if not await check_index_exists('user_node_traffic_daily', 'ix_user_node_traffic_daily_day'):
+                await conn.execute(text('CREATE INDEX ix_user_node_traffic_daily_day ON user_node_traffic_daily(day)'))
+
+            if not await check_table_exists('traffic_history_days'):
+                await conn.execute(
+                    text(
+                        f"""
+                        CREATE TABLE traffic_history_days (
+                            day DATE PRIMARY KEY,
+                            collected_at {timestamp_type} DEFAULT {timestamp_default}
+                        ){table_suffix}
+                        """
+                    )
+                )
+        return True
+    except Exception as error:
+        logger.error(f'❌ Ошибка создания таблиц истории трафика: {error}')
+        return False
+
+
 async def create_subscription_period_prices_table() -> bool:
     table_exists = await check_table_exists('subscription_period_prices')
     if table_exists:
@@ -6835,8 +7242,33 @@ async def create_payment_method_currency_limits_table() -> bool:
         return False
 
 
-async def run_universal_migration():
+def _report_step_timings(stage: 'StageHandle | None') -> None:
+    if not _step_timings:
+        return
+
+    failed = [timing.name for timing in _step_timings if not timing.ok]
+    total = sum(timing.duration for timing in _step_timings)
+    logger.info('⏱️ Шагов миграции: %s, суммарно %.2fs', len(_step_timings), total)
+    if failed:
+        logger.warning('⚠️ Шаги миграции с ошибками: %s', ', '.join(failed))
+
+    if stage is not None:
+        for timing in _step_timings:
+            stage.add_substep(timing.name, timing.duration)
+
+
+async def run_universal_migration(stage: 'StageHandle | None' = None) -> bool:
+    """
+    Applies idempotent schema steps.
+
+    If the stored fingerprint matches the current set of steps, the schema is
+    already up to date and only the data repair steps (``_run_data_repair_steps``)
+    and the API token bootstrap are executed. Otherwise all steps run against a
+    batched schema catalog and the fingerprint is saved once every step has
+    succeeded.
+    """
     logger.info('=== НАЧАЛО УНИВЕРСАЛЬНОЙ МИГРАЦИИ ===')
+    _step_timings.clear()
 
     try:
         db_type = await get_database_type()
@@ -6844,108 +7276,207 @@ async def run_universal_migration():
 
         if db_type == 'postgresql':
             logger.info('=== СИНХРОНИЗАЦИЯ ПОСЛЕДОВАТЕЛЬНОСТЕЙ PostgreSQL ===')
-            sequences_synced = await sync_postgres_sequences()
+            sequences_synced = await _run_step(sync_postgres_sequences)
             if sequences_synced:
                 logger.info('✅ Последовательности PostgreSQL синхронизированы')
             else:
                 logger.warning('⚠️ Не удалось синхронизировать последовательности PostgreSQL')
 
-        referral_migration_success = await add_referral_system_columns()
+        fingerprint = get_migration_fingerprint(db_type)
+        force_migration = os.getenv('FORCE_MIGRATION', 'false').lower() == 'true'
+
+        if not force_migration and await get_stored_migration_fingerprint() == fingerprint:
+            logger.info('✅ Схема БД актуальна (fingerprint %s), шаги схемы пропущены', fingerprint[:12])
+            repaired = await _run_data_repair_steps()
+            # Бутстрап токен зависит от настроек, а не от схемы — проверяем при каждом запуске
+            if not await _run_step(ensure_default_web_api_token):
+                logger.warning('⚠️ Не удалось создать бутстрап токен веб-API')
+            return repaired
+
+        async with schema_catalog.track(db_type):
+            success = await _run_migration_steps()
+
+        logger.info('📚 Каталог схемы загружен %s раз(а)', schema_catalog.loads)
+        schema_catalog.loads = 0
+
+        if success and all(timing.ok for timing in _step_timings):
+            await store_migration_fingerprint(fingerprint)
+            logger.info('✅ Fingerprint схемы сохранён: %s', fingerprint[:12])
+        elif success:
+            logger.warning('⚠️ Не все шаги миграции выполнены, fingerprint не сохранён — повтор при следующем запуске')
+
+        return success
+
+    except Exception as e:
+        logger.error(f'=== ОШИБКА ВЫПОЛНЕНИЯ МИГРАЦИИ: {e} ===')
+        return False
+    finally:
+        _report_step_timings(stage)
+
+
+async def _repair_subscription_duplicates() -> bool:
+    """Находит и исправляет дубликаты подписок; False — если дубликаты остались."""
+    async with engine.begin() as conn:
+        total_subs = await conn.execute(text('SELECT COUNT(*) FROM subscriptions'))
+        unique_users = await conn.execute(text('SELECT COUNT(DISTINCT user_id) FROM subscriptions'))
+
+        total_count = total_subs.fetchone()[0]
+        unique_count = unique_users.fetchone()[0]
+
+        logger.info(f'Всего подписок: {total_count}')
+        logger.info(f'Уникальных пользователей: {unique_count}')
+
+        if total_count == unique_count:
+            logger.info('База данных уже в корректном состоянии')
+            return True
+
+    await _run_step(fix_subscription_duplicates_universal)
+
+    async with engine.begin() as conn:
+        final_check = await conn.execute(
+            text("""
+            SELECT user_id, COUNT(*) as count
+            FROM subscriptions
+            GROUP BY user_id
+            HAVING COUNT(*) > 1
+        """)
+        )
+
+        remaining_duplicates = final_check.fetchall()
+
+    if remaining_duplicates:
+        logger.warning(f'Остались дубликаты у {len(remaining_duplicates)} пользователей')
+        return False
+    logger.info('✅ Дубликаты подписок исправлены')
+    return True
+
+
+async def _run_data_repair_steps() -> bool:
+    """
+    Шаги, которые исправляют данные, а не схему. Совпавший fingerprint схемы
+    не гарантирует корректность данных, поэтому они выполняются при каждом запуске.
+    """
+    try:
+        for step in (
+            migrate_existing_user_promo_groups_data,
+            ensure_promo_groups_setup,
+            fix_foreign_keys_for_user_deletion,
+            reconcile_referrer_ledger_table,
+        ):
+            if not await _run_step(step):
+                logger.warning(f'⚠️ Проблемы с шагом {step.__name__}')
+
+        return await _repair_subscription_duplicates()
+    except Exception as e:
+        logger.error(f'Ошибка исправления данных при миграции: {e}')
+        return False
+
+
+async def _run_migration_steps() -> bool:
+    try:
+        referral_migration_success = await _run_step(add_referral_system_columns)
         if not referral_migration_success:
             logger.warning('⚠️ Проблемы с миграцией реферальной системы')
 
-        commission_column_ready = await add_referral_commission_percent_column()
+        commission_column_ready = await _run_step(add_referral_commission_percent_column)
         if commission_column_ready:
             logger.info('✅ Колонка referral_commission_percent готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой referral_commission_percent')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ SYSTEM_SETTINGS ===')
-        system_settings_ready = await create_system_settings_table()
+        system_settings_ready = await _run_step(create_system_settings_table)
         if system_settings_ready:
             logger.info('✅ Таблица system_settings готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей system_settings')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ WEB_API_TOKENS ===')
-        web_api_tokens_ready = await create_web_api_tokens_table()
+        web_api_tokens_ready = await _run_step(create_web_api_tokens_table)
         if web_api_tokens_ready:
             logger.info('✅ Таблица web_api_tokens готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей web_api_tokens')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ MENU_LAYOUT_HISTORY ===')
-        menu_layout_history_ready = await create_menu_layout_history_table()
+        menu_layout_history_ready = await _run_step(create_menu_layout_history_table)
         if menu_layout_history_ready:
             logger.info('✅ Таблица menu_layout_history готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей menu_layout_history')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ BUTTON_CLICK_LOGS ===')
-        button_click_logs_ready = await create_button_click_logs_table()
+        button_click_logs_ready = await _run_step(create_button_click_logs_table)
         if button_click_logs_ready:
             logger.info('✅ Таблица button_click_logs готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей button_click_logs')
 
         logger.info('=== ИСПРАВЛЕНИЕ FK BUTTON_CLICK_LOGS ===')
-        fk_fixed = await fix_button_click_logs_fk()
+        fk_fixed = await _run_step(fix_button_click_logs_fk)
         if fk_fixed:
             logger.info('✅ FK button_click_logs проверен')
         else:
             logger.warning('⚠️ Проблемы с FK button_click_logs')
 
+        logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ REFERRAL_CLICK_EVENTS ===')
+        referral_click_events_ready = await _run_step(create_referral_click_events_table)
+        if referral_click_events_ready:
+            logger.info('✅ Таблица referral_click_events готова')
+        else:
+            logger.warning('⚠️ Проблемы с таблицей referral_click_events')
+
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ ДЛЯ ТРИАЛЬНЫХ СКВАДОВ ===')
-        trial_column_ready = await add_server_trial_flag_column()
+        trial_column_ready = await _run_step(add_server_trial_flag_column)
         if trial_column_ready:
             logger.info('✅ Колонка is_trial_eligible готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой is_trial_eligible')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PRIVACY_POLICIES ===')
-        privacy_policies_ready = await create_privacy_policies_table()
+        privacy_policies_ready = await _run_step(create_privacy_policies_table)
         if privacy_policies_ready:
             logger.info('✅ Таблица privacy_policies готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей privacy_policies')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PUBLIC_OFFERS ===')
-        public_offers_ready = await create_public_offers_table()
+        public_offers_ready = await _run_step(create_public_offers_table)
         if public_offers_ready:
             logger.info('✅ Таблица public_offers готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей public_offers')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ FAQ_SETTINGS ===')
-        faq_settings_ready = await create_faq_settings_table()
+        faq_settings_ready = await _run_step(create_faq_settings_table)
         if faq_settings_ready:
             logger.info('✅ Таблица faq_settings готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей faq_settings')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ FAQ_PAGES ===')
-        faq_pages_ready = await create_faq_pages_table()
+        faq_pages_ready = await _run_step(create_faq_pages_table)
         if faq_pages_ready:
             logger.info('✅ Таблица faq_pages готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей faq_pages')
 
         logger.info('=== ПРОВЕРКА БАЗОВЫХ ТОКЕНОВ ВЕБ-API ===')
-        default_token_ready = await ensure_default_web_api_token()
+        default_token_ready = await _run_step(ensure_default_web_api_token)
         if default_token_ready:
             logger.info('✅ Бутстрап токен веб-API готов')
         else:
             logger.warning('⚠️ Не удалось создать бутстрап токен веб-API')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ CRYPTOBOT ===')
-        cryptobot_created = await create_cryptobot_payments_table()
+        cryptobot_created = await _run_step(create_cryptobot_payments_table)
         if cryptobot_created:
             logger.info('✅ Таблица CryptoBot payments готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей CryptoBot payments')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ HELEKET ===')
-        heleket_created = await create_heleket_payments_table()
+        heleket_created = await _run_step(create_heleket_payments_table)
         if heleket_created:
             logger.info('✅ Таблица Heleket payments готова')
         else:
@@ -6953,308 +7484,308 @@ async def run_universal_migration():
 
         mulenpay_name = settings.get_mulenpay_display_name()
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ %s ===', mulenpay_name)
-        mulenpay_created = await create_mulenpay_payments_table()
+        mulenpay_created = await _run_step(create_mulenpay_payments_table)
         if mulenpay_created:
             logger.info('✅ Таблица %s payments готова', mulenpay_name)
         else:
             logger.warning('⚠️ Проблемы с таблицей %s payments', mulenpay_name)
 
-        mulenpay_schema_ok = await ensure_mulenpay_payment_schema()
+        mulenpay_schema_ok = await _run_step(ensure_mulenpay_payment_schema)
         if mulenpay_schema_ok:
             logger.info('✅ Схема %s payments актуальна', mulenpay_name)
         else:
             logger.warning('⚠️ Не удалось обновить схему %s payments', mulenpay_name)
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PAL24 ===')
-        pal24_created = await create_pal24_payments_table()
+        pal24_created = await _run_step(create_pal24_payments_table)
         if pal24_created:
             logger.info('✅ Таблица Pal24 payments готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей Pal24 payments')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ WATA ===')
-        wata_created = await create_wata_payments_table()
+        wata_created = await _run_step(create_wata_payments_table)
         if wata_created:
             logger.info('✅ Таблица Wata payments готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей Wata payments')
 
-        wata_schema_ok = await ensure_wata_payment_schema()
+        wata_schema_ok = await _run_step(ensure_wata_payment_schema)
         if wata_schema_ok:
             logger.info('✅ Схема Wata payments актуальна')
         else:
             logger.warning('⚠️ Не удалось обновить схему Wata payments')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ FREEKASSA ===')
-        freekassa_created = await create_freekassa_payments_table()
+        freekassa_created = await _run_step(create_freekassa_payments_table)
         if freekassa_created:
             logger.info('✅ Таблица Freekassa payments готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей Freekassa payments')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ KASSA_AI ===')
-        kassa_ai_created = await create_kassa_ai_payments_table()
+        kassa_ai_created = await _run_step(create_kassa_ai_payments_table)
         if kassa_ai_created:
             logger.info('✅ Таблица KassaAI payments готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей KassaAI payments')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ DISCOUNT_OFFERS ===')
-        discount_created = await create_discount_offers_table()
+        discount_created = await _run_step(create_discount_offers_table)
         if discount_created:
             logger.info('✅ Таблица discount_offers готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей discount_offers')
 
-        discount_columns_ready = await ensure_discount_offer_columns()
+        discount_columns_ready = await _run_step(ensure_discount_offer_columns)
         if discount_columns_ready:
             logger.info('✅ Колонки discount_offers в актуальном состоянии')
         else:
             logger.warning('⚠️ Не удалось обновить колонки discount_offers')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦ ДЛЯ РЕФЕРАЛЬНЫХ КОНКУРСОВ ===')
-        contests_table_ready = await create_referral_contests_table()
+        contests_table_ready = await _run_step(create_referral_contests_table)
         if contests_table_ready:
             logger.info('✅ Таблица referral_contests готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей referral_contests')
 
-        contest_events_ready = await create_referral_contest_events_table()
+        contest_events_ready = await _run_step(create_referral_contest_events_table)
         if contest_events_ready:
             logger.info('✅ Таблица referral_contest_events готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей referral_contest_events')
 
-        virtual_participants_ready = await create_referral_contest_virtual_participants_table()
+        virtual_participants_ready = await _run_step(create_referral_contest_virtual_participants_table)
         if virtual_participants_ready:
             logger.info('✅ Таблица referral_contest_virtual_participants готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей referral_contest_virtual_participants')
 
-        contest_type_ready = await ensure_referral_contest_type_column()
+        contest_type_ready = await _run_step(ensure_referral_contest_type_column)
         if contest_type_ready:
             logger.info('✅ Колонка contest_type для referral_contests готова')
         else:
             logger.warning('⚠️ Не удалось добавить contest_type в referral_contests')
 
-        contest_summary_ready = await ensure_referral_contest_summary_columns()
+        contest_summary_ready = await _run_step(ensure_referral_contest_summary_columns)
         if contest_summary_ready:
             logger.info('✅ Колонки daily_summary_times/last_daily_summary_at готовы')
         else:
             logger.warning('⚠️ Не удалось обновить колонки сводок для referral_contests')
 
-        contest_templates_ready = await create_contest_templates_table()
+        contest_templates_ready = await _run_step(create_contest_templates_table)
         if contest_templates_ready:
             logger.info('✅ Таблица contest_templates готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей contest_templates')
 
         logger.info('=== МИГРАЦИЯ КОЛОНОК ПРИЗА В CONTEST_TEMPLATES ===')
-        prize_columns_ready = await migrate_contest_templates_prize_columns()
+        prize_columns_ready = await _run_step(migrate_contest_templates_prize_columns)
         if prize_columns_ready:
             logger.info('✅ Колонки prize_type и prize_value готовы')
         else:
             logger.warning('⚠️ Проблемы с миграцией prize_type/prize_value')
 
-        contest_rounds_ready = await create_contest_rounds_table()
+        contest_rounds_ready = await _run_step(create_contest_rounds_table)
         if contest_rounds_ready:
             logger.info('✅ Таблица contest_rounds готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей contest_rounds')
 
-        contest_attempts_ready = await create_contest_attempts_table()
+        contest_attempts_ready = await _run_step(create_contest_attempts_table)
         if contest_attempts_ready:
             logger.info('✅ Таблица contest_attempts готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей contest_attempts')
 
-        user_discount_columns_ready = await ensure_user_promo_offer_discount_columns()
+        user_discount_columns_ready = await _run_step(ensure_user_promo_offer_discount_columns)
         if user_discount_columns_ready:
             logger.info('✅ Колонки пользовательских промо-скидок готовы')
         else:
             logger.warning('⚠️ Не удалось обновить пользовательские промо-скидки')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ NOTIFICATION_SETTINGS ===')
-        notification_settings_ready = await ensure_user_notification_settings_column()
+        notification_settings_ready = await _run_step(ensure_user_notification_settings_column)
         if notification_settings_ready:
             logger.info('✅ Колонка notification_settings готова')
         else:
             logger.warning('⚠️ Не удалось добавить колонку notification_settings')
 
-        effect_types_updated = await migrate_discount_offer_effect_types()
+        effect_types_updated = await _run_step(migrate_discount_offer_effect_types)
         if effect_types_updated:
             logger.info('✅ Типы эффектов промо-предложений обновлены')
         else:
             logger.warning('⚠️ Не удалось обновить типы эффектов промо-предложений')
 
-        bonuses_reset = await reset_discount_offer_bonuses()
+        bonuses_reset = await _run_step(reset_discount_offer_bonuses)
         if bonuses_reset:
             logger.info('✅ Бонусные начисления промо-предложений отключены')
         else:
             logger.warning('⚠️ Не удалось обнулить бонусы промо-предложений')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PROMO_OFFER_TEMPLATES ===')
-        promo_templates_created = await create_promo_offer_templates_table()
+        promo_templates_created = await _run_step(create_promo_offer_templates_table)
         if promo_templates_created:
             logger.info('✅ Таблица promo_offer_templates готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей promo_offer_templates')
 
         logger.info('=== ДОБАВЛЕНИЕ ПРИОРИТЕТА В ПРОМОГРУППЫ ===')
-        priority_column_ready = await add_promo_group_priority_column()
+        priority_column_ready = await _run_step(add_promo_group_priority_column)
         if priority_column_ready:
             logger.info('✅ Колонка priority в promo_groups готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением priority в promo_groups')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ USER_PROMO_GROUPS ===')
-        user_promo_groups_ready = await create_user_promo_groups_table()
+        user_promo_groups_ready = await _run_step(create_user_promo_groups_table)
         if user_promo_groups_ready:
             logger.info('✅ Таблица user_promo_groups готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей user_promo_groups')
 
         logger.info('=== МИГРАЦИЯ ДАННЫХ В USER_PROMO_GROUPS ===')
-        data_migrated = await migrate_existing_user_promo_groups_data()
+        data_migrated = await _run_step(migrate_existing_user_promo_groups_data)
         if data_migrated:
             logger.info('✅ Данные перенесены в user_promo_groups')
         else:
             logger.warning('⚠️ Проблемы с миграцией данных в user_promo_groups')
 
         logger.info('=== ДОБАВЛЕНИЕ PROMO_GROUP_ID В PROMOCODES ===')
-        promocode_column_ready = await add_promocode_promo_group_column()
+        promocode_column_ready = await _run_step(add_promocode_promo_group_column)
         if promocode_column_ready:
             logger.info('✅ Колонка promo_group_id в promocodes готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением promo_group_id в promocodes')
 
         logger.info('=== ДОБАВЛЕНИЕ FIRST_PURCHASE_ONLY В PROMOCODES ===')
-        first_purchase_ready = await add_promocode_first_purchase_only_column()
+        first_purchase_ready = await _run_step(add_promocode_first_purchase_only_column)
         if first_purchase_ready:
             logger.info('✅ Колонка first_purchase_only в promocodes готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением first_purchase_only в promocodes')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ MAIN_MENU_BUTTONS ===')
-        main_menu_buttons_created = await create_main_menu_buttons_table()
+        main_menu_buttons_created = await _run_step(create_main_menu_buttons_table)
         if main_menu_buttons_created:
             logger.info('✅ Таблица main_menu_buttons готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей main_menu_buttons')
 
-        template_columns_ready = await ensure_promo_offer_template_active_duration_column()
+        template_columns_ready = await _run_step(ensure_promo_offer_template_active_duration_column)
         if template_columns_ready:
             logger.info('✅ Колонка active_discount_hours промо-предложений готова')
         else:
             logger.warning('⚠️ Не удалось обновить колонку active_discount_hours промо-предложений')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PROMO_OFFER_LOGS ===')
-        promo_logs_created = await create_promo_offer_logs_table()
+        promo_logs_created = await _run_step(create_promo_offer_logs_table)
         if promo_logs_created:
             logger.info('✅ Таблица promo_offer_logs готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей promo_offer_logs')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ SUBSCRIPTION_TEMPORARY_ACCESS ===')
-        temp_access_created = await create_subscription_temporary_access_table()
+        temp_access_created = await _run_step(create_subscription_temporary_access_table)
         if temp_access_created:
             logger.info('✅ Таблица subscription_temporary_access готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей subscription_temporary_access')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ USER_MESSAGES ===')
-        user_messages_created = await create_user_messages_table()
+        user_messages_created = await _run_step(create_user_messages_table)
         if user_messages_created:
             logger.info('✅ Таблица user_messages готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей user_messages')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PINNED_MESSAGES ===')
-        pinned_messages_created = await create_pinned_messages_table()
+        pinned_messages_created = await _run_step(create_pinned_messages_table)
         if pinned_messages_created:
             logger.info('✅ Таблица pinned_messages готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей pinned_messages')
 
         logger.info('=== СОЗДАНИЕ/ОБНОВЛЕНИЕ ТАБЛИЦЫ WELCOME_TEXTS ===')
-        welcome_texts_created = await create_welcome_texts_table()
+        welcome_texts_created = await _run_step(create_welcome_texts_table)
         if welcome_texts_created:
             logger.info('✅ Таблица welcome_texts готова с полем is_enabled')
         else:
             logger.warning('⚠️ Проблемы с таблицей welcome_texts')
 
         logger.info('=== ОБНОВЛЕНИЕ СХЕМЫ PINNED_MESSAGES ===')
-        pinned_media_ready = await ensure_pinned_message_media_columns()
+        pinned_media_ready = await _run_step(ensure_pinned_message_media_columns)
         if pinned_media_ready:
             logger.info('✅ Медиа поля для pinned_messages готовы')
         else:
             logger.warning('⚠️ Проблемы с медиа полями pinned_messages')
 
         logger.info('=== ДОБАВЛЕНИЕ СЛЕДА ОТПРАВКИ ЗАКРЕПА ДЛЯ ПОЛЬЗОВАТЕЛЕЙ ===')
-        last_pinned_ready = await ensure_user_last_pinned_column()
+        last_pinned_ready = await _run_step(ensure_user_last_pinned_column)
         if last_pinned_ready:
             logger.info('✅ Колонка last_pinned_message_id добавлена')
         else:
             logger.warning('⚠️ Не удалось обновить колонку last_pinned_message_id')
 
         logger.info('=== ДОБАВЛЕНИЕ МЕДИА ПОЛЕЙ В BROADCAST_HISTORY ===')
-        media_fields_added = await add_media_fields_to_broadcast_history()
+        media_fields_added = await _run_step(add_media_fields_to_broadcast_history)
         if media_fields_added:
             logger.info('✅ Медиа поля в broadcast_history готовы')
         else:
             logger.warning('⚠️ Проблемы с добавлением медиа полей')
 
         logger.info('=== ДОБАВЛЕНИЕ EMAIL ПОЛЕЙ В BROADCAST_HISTORY ===')
-        email_fields_added = await add_email_fields_to_broadcast_history()
+        email_fields_added = await _run_step(add_email_fields_to_broadcast_history)
         if email_fields_added:
             logger.info('✅ Email поля в broadcast_history готовы')
         else:
             logger.warning('⚠️ Проблемы с добавлением email полей')
 
         logger.info('=== ДОБАВЛЕНИЕ ПОЛЕЙ БЛОКИРОВКИ В TICKETS ===')
-        tickets_block_cols_added = await add_ticket_reply_block_columns()
+        tickets_block_cols_added = await _run_step(add_ticket_reply_block_columns)
         if tickets_block_cols_added:
             logger.info('✅ Поля блокировок в tickets готовы')
         else:
             logger.warning('⚠️ Проблемы с добавлением полей блокировок в tickets')
 
         logger.info('=== ДОБАВЛЕНИЕ ПОЛЕЙ SLA В TICKETS ===')
-        sla_cols_added = await add_ticket_sla_columns()
+        sla_cols_added = await _run_step(add_ticket_sla_columns)
         if sla_cols_added:
             logger.info('✅ Поля SLA в tickets готовы')
         else:
             logger.warning('⚠️ Проблемы с добавлением полей SLA в tickets')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ CRYPTO LINK ДЛЯ ПОДПИСОК ===')
-        crypto_link_added = await add_subscription_crypto_link_column()
+        crypto_link_added = await _run_step(add_subscription_crypto_link_column)
         if crypto_link_added:
             logger.info('✅ Колонка subscription_crypto_link готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением колонки subscription_crypto_link')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ MODEM_ENABLED ДЛЯ ПОДПИСОК ===')
-        modem_enabled_added = await add_subscription_modem_enabled_column()
+        modem_enabled_added = await _run_step(add_subscription_modem_enabled_column)
         if modem_enabled_added:
             logger.info('✅ Колонка modem_enabled готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением колонки modem_enabled')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ PURCHASED_TRAFFIC_GB ДЛЯ ПОДПИСОК ===')
-        purchased_traffic_added = await add_subscription_purchased_traffic_column()
+        purchased_traffic_added = await _run_step(add_subscription_purchased_traffic_column)
         if purchased_traffic_added:
             logger.info('✅ Колонка purchased_traffic_gb готова')
         else:
             logger.warning('⚠️ Проблемы с добавлением колонки purchased_traffic_gb')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК ОГРАНИЧЕНИЙ ПОЛЬЗОВАТЕЛЕЙ ===')
-        restrictions_added = await add_user_restriction_columns()
+        restrictions_added = await _run_step(add_user_restriction_columns)
         if restrictions_added:
             logger.info('✅ Колонки ограничений пользователей готовы')
         else:
             logger.warning('⚠️ Проблемы с добавлением колонок ограничений пользователей')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК ЛИЧНОГО КАБИНЕТА ===')
-        cabinet_added = await add_user_cabinet_columns()
+        cabinet_added = await _run_step(add_user_cabinet_columns)
         if cabinet_added:
             logger.info('✅ Колонки личного кабинета готовы')
         else:
@@ -7327,270 +7858,257 @@ async def run_universal_migration():
             logger.warning(f'⚠️ Проблемы с созданием таблицы support_audit_logs: {e}')
 
         logger.info('=== НАСТРОЙКА ПРОМО ГРУПП ===')
-        promo_groups_ready = await ensure_promo_groups_setup()
+        promo_groups_ready = await _run_step(ensure_promo_groups_setup)
         if promo_groups_ready:
             logger.info('✅ Промо группы готовы')
         else:
             logger.warning('⚠️ Проблемы с настройкой промо групп')
 
-        server_promo_groups_ready = await ensure_server_promo_groups_setup()
+        server_promo_groups_ready = await _run_step(ensure_server_promo_groups_setup)
         if server_promo_groups_ready:
             logger.info('✅ Доступ серверов по промогруппам настроен')
         else:
             logger.warning('⚠️ Проблемы с настройкой доступа серверов к промогруппам')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ ДОКУПОК ТРАФИКА ===')
-        traffic_purchases_ready = await create_traffic_purchases_table()
+        traffic_purchases_ready = await _run_step(create_traffic_purchases_table)
         if traffic_purchases_ready:
             logger.info('✅ Таблица traffic_purchases готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей traffic_purchases')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦ ДЛЯ РЕЖИМА ТАРИФОВ ===')
-        tariffs_table_ready = await create_tariffs_table()
+        tariffs_table_ready = await _run_step(create_tariffs_table)
         if tariffs_table_ready:
             logger.info('✅ Таблица tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей tariffs')
 
-        tariff_promo_groups_ready = await create_tariff_promo_groups_table()
+        tariff_promo_groups_ready = await _run_step(create_tariff_promo_groups_table)
         if tariff_promo_groups_ready:
             logger.info('✅ Таблица tariff_promo_groups готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей tariff_promo_groups')
 
-        tariff_id_column_ready = await add_subscription_tariff_id_column()
+        tariff_id_column_ready = await _run_step(add_subscription_tariff_id_column)
         if tariff_id_column_ready:
             logger.info('✅ Колонка tariff_id в subscriptions готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой tariff_id в subscriptions')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК ТАРИФОВ В РЕКЛАМНЫЕ КАМПАНИИ ===')
-        campaign_tariff_columns_ready = await add_campaign_tariff_columns()
+        campaign_tariff_columns_ready = await _run_step(add_campaign_tariff_columns)
         if campaign_tariff_columns_ready:
             logger.info('✅ Колонки tariff в рекламных кампаниях готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками tariff в рекламных кампаниях')
 
-        device_price_column_ready = await add_tariff_device_price_column()
+        device_price_column_ready = await _run_step(add_tariff_device_price_column)
         if device_price_column_ready:
             logger.info('✅ Колонка device_price_kopeks в tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой device_price_kopeks в tariffs')
 
-        max_device_limit_ready = await ensure_tariff_max_device_limit_column()
+        max_device_limit_ready = await _run_step(ensure_tariff_max_device_limit_column)
         if max_device_limit_ready:
             logger.info('✅ Колонка max_device_limit в tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой max_device_limit в tariffs')
 
-        server_traffic_limits_ready = await add_tariff_server_traffic_limits_column()
+        server_traffic_limits_ready = await _run_step(add_tariff_server_traffic_limits_column)
         if server_traffic_limits_ready:
             logger.info('✅ Колонка server_traffic_limits в tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой server_traffic_limits в tariffs')
 
-        allow_traffic_topup_ready = await add_tariff_allow_traffic_topup_column()
+        allow_traffic_topup_ready = await _run_step(add_tariff_allow_traffic_topup_column)
         if allow_traffic_topup_ready:
             logger.info('✅ Колонка allow_traffic_topup в tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой allow_traffic_topup в tariffs')
 
-        traffic_topup_columns_ready = await add_tariff_traffic_topup_columns()
+        traffic_topup_columns_ready = await _run_step(add_tariff_traffic_topup_columns)
         if traffic_topup_columns_ready:
             logger.info('✅ Колонки докупки трафика в tariffs готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками докупки трафика в tariffs')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК СУТОЧНЫХ ТАРИФОВ ===')
-        daily_tariff_columns_ready = await add_tariff_daily_columns()
+        daily_tariff_columns_ready = await _run_step(add_tariff_daily_columns)
         if daily_tariff_columns_ready:
             logger.info('✅ Колонки суточных тарифов в tariffs готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками суточных тарифов в tariffs')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК ПРОИЗВОЛЬНЫХ ДНЕЙ/ТРАФИКА ===')
-        custom_days_traffic_ready = await add_tariff_custom_days_traffic_columns()
+        custom_days_traffic_ready = await _run_step(add_tariff_custom_days_traffic_columns)
         if custom_days_traffic_ready:
             logger.info('✅ Колонки произвольных дней/трафика в tariffs готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками произвольных дней/трафика в tariffs')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ РЕЖИМА СБРОСА ТРАФИКА В ТАРИФАХ ===')
-        traffic_reset_mode_ready = await add_tariff_traffic_reset_mode_column()
+        traffic_reset_mode_ready = await _run_step(add_tariff_traffic_reset_mode_column)
         if traffic_reset_mode_ready:
             logger.info('✅ Колонка traffic_reset_mode в tariffs готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой traffic_reset_mode в tariffs')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК СУТОЧНЫХ ПОДПИСОК ===')
-        daily_subscription_columns_ready = await add_subscription_daily_columns()
+        daily_subscription_columns_ready = await _run_step(add_subscription_daily_columns)
         if daily_subscription_columns_ready:
             logger.info('✅ Колонки суточных подписок в subscriptions готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками суточных подписок в subscriptions')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ СБРОСА ТРАФИКА ===')
-        traffic_reset_column_ready = await add_subscription_traffic_reset_at_column()
+        traffic_reset_column_ready = await _run_step(add_subscription_traffic_reset_at_column)
         if traffic_reset_column_ready:
             logger.info('✅ Колонка traffic_reset_at в subscriptions готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой traffic_reset_at в subscriptions')
 
         logger.info('=== ОБНОВЛЕНИЕ ВНЕШНИХ КЛЮЧЕЙ ===')
-        fk_updated = await fix_foreign_keys_for_user_deletion()
+        fk_updated = await _run_step(fix_foreign_keys_for_user_deletion)
         if fk_updated:
             logger.info('✅ Внешние ключи обновлены')
         else:
             logger.warning('⚠️ Проблемы с обновлением внешних ключей')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ КОНВЕРСИЙ ПОДПИСОК ===')
-        conversions_created = await create_subscription_conversions_table()
+        conversions_created = await _run_step(create_subscription_conversions_table)
         if conversions_created:
             logger.info('✅ Таблица subscription_conversions готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей subscription_conversions')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ SUBSCRIPTION_EVENTS ===')
-        events_created = await create_subscription_events_table()
+        events_created = await _run_step(create_subscription_events_table)
         if events_created:
             logger.info('✅ Таблица subscription_events готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей subscription_events')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК ЧЕКОВ В TRANSACTIONS ===')
-        receipt_columns_ready = await add_transaction_receipt_columns()
+        receipt_columns_ready = await _run_step(add_transaction_receipt_columns)
         if receipt_columns_ready:
             logger.info('✅ Колонки receipt_uuid и receipt_created_at готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками чеков в transactions')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ WITHDRAWAL_REQUESTS ===')
-        withdrawal_requests_ready = await create_withdrawal_requests_table()
+        withdrawal_requests_ready = await _run_step(create_withdrawal_requests_table)
         if withdrawal_requests_ready:
             logger.info('✅ Таблица withdrawal_requests готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей withdrawal_requests')
 
         logger.info('=== НАСТРОЙКА EMAIL АУТЕНТИФИКАЦИИ ===')
-        email_auth_ready = await add_user_email_auth_columns()
+        email_auth_ready = await _run_step(add_user_email_auth_columns)
         if email_auth_ready:
             logger.info('✅ Колонки для email-аутентификации готовы')
         else:
             logger.warning('⚠️ Проблемы с настройкой email-аутентификации')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦ КОЛЕСА УДАЧИ ===')
-        wheel_tables_ready = await create_wheel_tables()
+        wheel_tables_ready = await _run_step(create_wheel_tables)
         if wheel_tables_ready:
             logger.info('✅ Таблицы колеса удачи готовы')
         else:
             logger.warning('⚠️ Проблемы с таблицами колеса удачи')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ EMAIL_TEMPLATES ===')
-        email_templates_ready = await create_email_templates_table()
+        email_templates_ready = await _run_step(create_email_templates_table)
         if email_templates_ready:
             logger.info('✅ Таблица email_templates готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей email_templates')
 
         logger.info('=== МИГРАЦИЯ CLOUDPAYMENTS TRANSACTION_ID НА BIGINT ===')
-        cloudpayments_bigint_ready = await migrate_cloudpayments_transaction_id_to_bigint()
+        cloudpayments_bigint_ready = await _run_step(migrate_cloudpayments_transaction_id_to_bigint)
         if cloudpayments_bigint_ready:
             logger.info('✅ Колонка transaction_id_cp в cloudpayments_payments обновлена до BIGINT')
         else:
             logger.warning('⚠️ Проблемы с миграцией transaction_id_cp')
 
         logger.info('=== МУЛЬТИВАЛЮТНЫЕ КОЛОНКИ USERS/TRANSACTIONS ===')
-        money_columns_ready = await add_money_columns_to_users_and_transactions()
+        money_columns_ready = await _run_step(add_money_columns_to_users_and_transactions)
         if money_columns_ready:
             logger.info('✅ Мультивалютные колонки users/transactions готовы')
         else:
             logger.warning('⚠️ Проблемы с мультивалютными колонками users/transactions')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ CURRENCY_RATES ===')
-        currency_rates_ready = await create_currency_rates_table()
+        currency_rates_ready = await _run_step(create_currency_rates_table)
         if currency_rates_ready:
             logger.info('✅ Таблица currency_rates готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей currency_rates')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ SUBSCRIPTION_PERIOD_PRICES ===')
-        subscription_prices_ready = await create_subscription_period_prices_table()
+        subscription_prices_ready = await _run_step(create_subscription_period_prices_table)
         if subscription_prices_ready:
             logger.info('✅ Таблица subscription_period_prices готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей subscription_period_prices')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ TRAFFIC_PACKAGE_PRICES ===')
-        traffic_prices_ready = await create_traffic_package_prices_table()
+        traffic_prices_ready = await _run_step(create_traffic_package_prices_table)
         if traffic_prices_ready:
             logger.info('✅ Таблица traffic_package_prices готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей traffic_package_prices')
 
         logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ PAYMENT_METHOD_CURRENCY_LIMITS ===')
-        payment_currency_limits_ready = await create_payment_method_currency_limits_table()
+        payment_currency_limits_ready = await _run_step(create_payment_method_currency_limits_table)
         if payment_currency_limits_ready:
             logger.info('✅ Таблица payment_method_currency_limits готова')
         else:
             logger.warning('⚠️ Проблемы с таблицей payment_method_currency_limits')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНОК OAUTH ПРОВАЙДЕРОВ ===')
-        oauth_columns_ready = await add_oauth_provider_columns()
+        oauth_columns_ready = await _run_step(add_oauth_provider_columns)
         if oauth_columns_ready:
             logger.info('✅ Колонки OAuth провайдеров (google_id, yandex_id, discord_id, vk_id) готовы')
         else:
             logger.warning('⚠️ Проблемы с колонками OAuth провайдеров')
 
         logger.info('=== ДОБАВЛЕНИЕ КОЛОНКИ LAST_WEBHOOK_UPDATE_AT ===')
-        webhook_column_ready = await add_subscription_last_webhook_update_column()
+        webhook_column_ready = await _run_step(add_subscription_last_webhook_update_column)
         if webhook_column_ready:
             logger.info('✅ Колонка last_webhook_update_at готова')
         else:
             logger.warning('⚠️ Проблемы с колонкой last_webhook_update_at')
 
-        async with engine.begin() as conn:
-            total_subs = await conn.execute(text('SELECT COUNT(*) FROM subscriptions'))
-            unique_users = await conn.execute(text('SELECT COUNT(DISTINCT user_id) FROM subscriptions'))
-
-            total_count = total_subs.fetchone()[0]
-            unique_count = unique_users.fetchone()[0]
-
-            logger.info(f'Всего подписок: {total_count}')
-            logger.info(f'Уникальных пользователей: {unique_count}')
-
-            if total_count == unique_count:
-                logger.info('База данных уже в корректном состоянии')
-                logger.info('=== МИГРАЦИЯ ЗАВЕРШЕНА УСПЕШНО ===')
-                return True
+        logger.info('=== СОЗДАНИЕ ТАБЛИЦЫ REFERRER_LEDGER ===')
+        referrer_ledger_ready = await _run_step(create_referrer_ledger_table)
+        if referrer_ledger_ready:
+            logger.info('✅ Таблица referrer_ledger готова')
+        else:
+            logger.warning('⚠️ Проблемы с таблицей referrer_ledger')
 
-        await fix_subscription_duplicates_universal()
+        if referrer_ledger_ready and not await _run_step(reconcile_referrer_ledger_table):
+            logger.warning('⚠️ Проблемы со сверкой referrer_ledger')
 
-        async with engine.begin() as conn:
-            final_check = await conn.execute(
-                text("""
-                SELECT user_id, COUNT(*) as count
-                FROM subscriptions
-                GROUP BY user_id
-                HAVING COUNT(*) > 1
-            """)
-            )
+        logger.info('=== СОЗДАНИЕ ТАБЛИЦ ИСТОРИИ ТРАФИКА ===')
+        traffic_history_ready = await _run_step(create_traffic_history_tables)
+        if traffic_history_ready:
+            logger.info('✅ Таблицы истории трафика готовы')
+        else:
+            logger.warning('⚠️ Проблемы с таблицами истории трафика')
 
-            remaining_duplicates = final_check.fetchall()
+        if not await _repair_subscription_duplicates():
+            return False
 
-            if remaining_duplicates:
-                logger.warning(f'Остались дубликаты у {len(remaining_duplicates)} пользователей')
-                return False
-            logger.info('=== МИГРАЦИЯ ЗАВЕРШЕНА УСПЕШНО ===')
-            logger.info('✅ Реферальная система обновлена')
-            logger.info('✅ CryptoBot таблица готова')
-            logger.info('✅ Heleket таблица готова')
-            logger.info('✅ Таблица конверсий подписок создана')
-            logger.info('✅ Таблица событий подписок создана')
-            logger.info('✅ Таблица welcome_texts с полем is_enabled готова')
-            logger.info('✅ Медиа поля в broadcast_history добавлены')
-            logger.info('✅ Дубликаты подписок исправлены')
-            return True
+        logger.info('=== МИГРАЦИЯ ЗАВЕРШЕНА УСПЕШНО ===')
+        logger.info('✅ Реферальная система обновлена')
+        logger.info('✅ CryptoBot таблица готова')
+        logger.info('✅ Heleket таблица готова')
+        logger.info('✅ Таблица конверсий подписок создана')
+        logger.info('✅ Таблица событий подписок создана')
+        logger.info('✅ Таблица welcome_texts с полем is_enabled готова')
+        logger.info('✅ Медиа поля в broadcast_history добавлены')
+        return True
 
     except Exception as e:
         logger.error(f'=== ОШИБКА ВЫПОЛНЕНИЯ МИГРАЦИИ: {e} ===')
@@ -102,7 +102,8 @@ class CryptoBotService:
             data['status'] = status
 
         if invoice_ids:
-            data['invoice_ids'] = invoice_ids
+            # API ожидает id через запятую
+            data['invoice_ids'] = ','.join(str(invoice_id) for invoice_id in invoice_ids)
 
         result = await self._make_request('GET', 'getInvoices', data)
 
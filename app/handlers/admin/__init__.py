@@ -1,4 +1,5 @@
 # Инициализация админских обработчиков
+# contests, daily_contests и polls подключаются лениво через LazyHandlersRouter (app/bot.py)
 from . import (
     backup,
     blacklist,
@@ -6,15 +7,12 @@ from . import (
     bot_configuration,
     bulk_ban,
     campaigns,
-    contests,
-    daily_contests,
     faq,
     main,
     maintenance,
     messages,
     monitoring,
     payments,
-    polls,
     pricing,
     privacy_policy,
     promo_groups,
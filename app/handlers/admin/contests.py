@@ -14,7 +14,6 @@ from app.database.crud.referral_contest import (
     delete_referral_contest,
     delete_virtual_participant,
     get_contest_events_count,
-    get_contest_leaderboard_with_virtual,
     get_referral_contest,
     get_referral_contests_count,
     list_referral_contests,
@@ -31,6 +30,7 @@ from app.keyboards.admin import (
     get_referral_contest_manage_keyboard,
 )
 from app.localization.texts import get_texts
+from app.services.referral_contest_leaderboard import contest_leaderboard
 from app.states import AdminStates
 from app.utils.decorators import admin_required, error_handler
 
@@ -290,7 +290,7 @@ async def show_contest_details(
         return
 
     tz = _ensure_timezone(contest.timezone or settings.TIMEZONE)
-    leaderboard = await get_contest_leaderboard_with_virtual(db, contest.id, limit=5)
+    leaderboard = await contest_leaderboard.get_leaderboard_with_virtual(db, contest.id, limit=5)
     virtual_list = await list_virtual_participants(db, contest.id)
     virtual_count = sum(vp.referral_count for vp in virtual_list)
     total_events = await get_contest_events_count(db, contest.id) + virtual_count
@@ -450,6 +450,7 @@ async def delete_contest(
         return
 
     await delete_referral_contest(db, contest)
+    await contest_leaderboard.drop(contest_id)
     await callback.answer(texts.t('ADMIN_CONTEST_DELETED'), show_alert=True)
     await list_contests(callback, db_user, db)
 
@@ -476,7 +477,7 @@ async def show_leaderboard(
         await callback.answer(texts.t('ADMIN_CONTEST_NOT_FOUND'), show_alert=True)
         return
 
-    leaderboard = await get_contest_leaderboard_with_virtual(db, contest_id, limit=10)
+    leaderboard = await contest_leaderboard.get_leaderboard_with_virtual(db, contest_id, limit=10)
     if not leaderboard:
         await callback.answer(texts.t('ADMIN_CONTEST_EMPTY_LEADERBOARD'), show_alert=True)
         return
@@ -12,6 +12,8 @@ from app.localization.texts import get_rules, get_texts
 
 logger = logging.getLogger(__name__)
 
+LIGHT_USER = {'light_user': True}
+
 
 async def handle_delete_ban_notification(
     callback: types.CallbackQuery,
@@ -105,16 +107,17 @@ async def show_rules(callback: types.CallbackQuery, db_user: User, db: AsyncSess
 
 def register_handlers(dp: Dispatcher):
     # Удаление уведомлений
-    dp.callback_query.register(handle_delete_ban_notification, F.data == 'ban_notify:delete')
-    dp.callback_query.register(handle_webhook_notification_close, F.data == 'webhook:close')
+    # Хендлерам этого модуля нужны только язык и статус — пользователь грузится без промогрупп
+    dp.callback_query.register(handle_delete_ban_notification, F.data == 'ban_notify:delete', flags=LIGHT_USER)
+    dp.callback_query.register(handle_webhook_notification_close, F.data == 'webhook:close', flags=LIGHT_USER)
 
-    dp.callback_query.register(show_rules, F.data == 'menu_rules')
+    dp.callback_query.register(show_rules, F.data == 'menu_rules', flags=LIGHT_USER)
 
     # No-op utility handlers used in many keyboards
-    dp.callback_query.register(handle_noop, F.data == 'noop')
-    dp.callback_query.register(handle_current_page, F.data == 'current_page')
+    dp.callback_query.register(handle_noop, F.data == 'noop', flags=LIGHT_USER)
+    dp.callback_query.register(handle_current_page, F.data == 'current_page', flags=LIGHT_USER)
 
-    dp.callback_query.register(handle_cancel, F.data.in_(['cancel', 'subscription_cancel']))
+    dp.callback_query.register(handle_cancel, F.data.in_(['cancel', 'subscription_cancel']), flags=LIGHT_USER)
 
     # Самый последний: ловим любые неизвестные текстовые сообщения
     # Исключаем специальные сервисные события (например, успешные платежи),
@@ -125,4 +128,5 @@ def register_handlers(dp: Dispatcher):
         F.successful_payment.is_(None),
         F.text.is_not(None),
         ~F.text.startswith('/'),
+        flags=LIGHT_USER,
     )
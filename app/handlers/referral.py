@@ -1,12 +1,9 @@
 import json
 import logging
-from pathlib import Path
 
-import qrcode
 from aiogram import Dispatcher, F, types
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
-from aiogram.types import FSInputFile
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
@@ -16,6 +13,7 @@ from app.localization.texts import get_texts
 from app.services.admin_notification_service import AdminNotificationService
 from app.services.referral_withdrawal_service import referral_withdrawal_service
 from app.states import ReferralWithdrawalStates
+from app.utils.media_cache import is_stale_file_id_error, send_qr_photo
 from app.utils.photo_message import edit_or_answer_photo
 from app.utils.user_utils import (
     get_detailed_referral_list,
@@ -39,7 +37,7 @@ async def show_referral_info(callback: types.CallbackQuery, db_user: User, db: A
 
     summary = await get_user_referral_summary(db, db_user.id)
 
-    bot_username = (await callback.bot.get_me()).username
+    bot_username = (await callback.bot.me()).username
     referral_link = f'https://t.me/{bot_username}?start={db_user.referral_code}'
 
     referral_text = (
@@ -217,43 +215,34 @@ async def show_referral_qr(
 
     texts = get_texts(db_user.language)
 
-    bot_username = (await callback.bot.get_me()).username
+    bot_username = (await callback.bot.me()).username
     referral_link = f'https://t.me/{bot_username}?start={db_user.referral_code}'
 
-    qr_dir = Path('data') / 'referral_qr'
-    qr_dir.mkdir(parents=True, exist_ok=True)
-
-    file_path = qr_dir / f'{db_user.id}.png'
-    if not file_path.exists():
-        img = qrcode.make(referral_link)
-        img.save(file_path)
-
-    photo = FSInputFile(file_path)
+    caption = texts.t(
+        'REFERRAL_LINK_CAPTION',
+        '🔗 Ваша реферальная ссылка:\n{link}',
+    ).format(link=referral_link)
     keyboard = types.InlineKeyboardMarkup(
         inline_keyboard=[[types.InlineKeyboardButton(text=texts.BACK, callback_data='menu_referrals')]]
     )
 
-    try:
-        await callback.message.edit_media(
-            types.InputMediaPhoto(
-                media=photo,
-                caption=texts.t(
-                    'REFERRAL_LINK_CAPTION',
-                    '🔗 Ваша реферальная ссылка:\n{link}',
-                ).format(link=referral_link),
-            ),
-            reply_markup=keyboard,
-        )
-    except TelegramBadRequest:
-        await callback.message.delete()
-        await callback.message.answer_photo(
-            photo,
-            caption=texts.t(
-                'REFERRAL_LINK_CAPTION',
-                '🔗 Ваша реферальная ссылка:\n{link}',
-            ).format(link=referral_link),
-            reply_markup=keyboard,
-        )
+    async def send(photo):
+        try:
+            return await callback.message.edit_media(
+                types.InputMediaPhoto(media=photo, caption=caption),
+                reply_markup=keyboard,
+            )
+        except TelegramBadRequest as error:
+            if is_stale_file_id_error(error):
+                raise
+            try:
+                await callback.message.delete()
+            except TelegramBadRequest:
+                pass
+            return await callback.message.answer_photo(photo, caption=caption, reply_markup=keyboard)
+
+    # QR рендерится в отдельном потоке и загружается один раз, далее отправляется по file_id
+    await send_qr_photo(send, referral_link)
 
 
 async def show_detailed_referral_list(callback: types.CallbackQuery, db_user: User, db: AsyncSession, page: int = 1):
@@ -454,7 +443,7 @@ async def show_referral_analytics(callback: types.CallbackQuery, db_user: User,
 async def create_invite_message(callback: types.CallbackQuery, db_user: User):
     texts = get_texts(db_user.language)
 
-    bot_username = (await callback.bot.get_me()).username
+    bot_username = (await callback.bot.me()).username
     referral_link = f'https://t.me/{bot_username}?start={db_user.referral_code}'
 
     invite_text = (
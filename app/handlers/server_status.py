@@ -1,5 +1,4 @@
 import logging
-from datetime import datetime
 
 from aiogram import Dispatcher, F, types
 
@@ -10,14 +9,13 @@ from app.localization.texts import get_texts
 from app.services.server_status_service import (
     ServerStatusEntry,
     ServerStatusError,
-    ServerStatusService,
+    ServerStatusSnapshot,
+    server_status_service,
 )
 
 
 logger = logging.getLogger(__name__)
 
-_status_service = ServerStatusService()
-
 
 async def show_server_status(callback: types.CallbackQuery, db_user: User) -> None:
     await _render_server_status(callback, db_user, page=1)
@@ -45,7 +43,7 @@ async def _render_server_status(
         return
 
     try:
-        servers = await _status_service.get_servers()
+        snapshot = await server_status_service.get_snapshot()
     except ServerStatusError as error:
         logger.warning('Server status error: %s', error)
         await callback.answer(
@@ -61,7 +59,7 @@ async def _render_server_status(
         )
         return
 
-    message, total_pages, current_page = _build_status_message(servers, texts, page)
+    message, total_pages, current_page = _build_status_message(snapshot, texts, page)
     keyboard = get_server_status_keyboard(db_user.language, current_page, total_pages)
 
     await callback.message.edit_text(
@@ -73,21 +71,13 @@ async def _render_server_status(
 
 
 def _build_status_message(
-    servers: list[ServerStatusEntry],
+    snapshot: ServerStatusSnapshot,
     texts,
     page: int,
 ) -> tuple[str, int, int]:
-    total_servers = len(servers)
-    online_servers = [server for server in servers if server.is_online]
-    offline_servers = [server for server in servers if not server.is_online]
-
-    items_per_page = settings.get_server_status_items_per_page()
-    pages = _split_into_pages(online_servers, offline_servers, items_per_page)
-
-    total_pages = max(1, len(pages))
-    current_index = min(max(page - 1, 0), total_pages - 1)
-
-    current_online, current_offline = pages[current_index] if pages else ([], [])
+    total_servers = len(snapshot.servers)
+    (current_online, current_offline), current_page = snapshot.page(page)
+    total_pages = snapshot.total_pages
 
     lines: list[str] = [texts.t('SERVER_STATUS_TITLE', '📊 <b>Статус серверов</b>')]
 
@@ -102,11 +92,11 @@ def _build_status_message(
         'Всего серверов: {total} (в сети: {online}, вне сети: {offline})',
     ).format(
         total=total_servers,
-        online=len(online_servers),
-        offline=len(offline_servers),
+        online=snapshot.online_count,
+        offline=snapshot.offline_count,
     )
 
-    updated_at = datetime.now().strftime('%H:%M:%S')
+    updated_at = snapshot.fetched_at.strftime('%H:%M:%S')
 
     lines.extend(
         [
@@ -130,50 +120,18 @@ def _build_status_message(
     if total_pages > 1:
         lines.append(
             texts.t('SERVER_STATUS_PAGINATION', 'Страница {current} из {total}').format(
-                current=current_index + 1,
+                current=current_page,
                 total=total_pages,
             )
         )
 
     message = '\n'.join(line for line in lines if line is not None)
     message = message.strip()
-    return message, total_pages, current_index + 1
-
-
-def _split_into_pages(
-    online: list[ServerStatusEntry],
-    offline: list[ServerStatusEntry],
-    items_per_page: int,
-) -> list[tuple[list[ServerStatusEntry], list[ServerStatusEntry]]]:
-    if not online and not offline:
-        return [([], [])]
-
-    pages: list[tuple[list[ServerStatusEntry], list[ServerStatusEntry]]] = []
-    online_index = 0
-    offline_index = 0
-
-    while online_index < len(online) or offline_index < len(offline):
-        current_online: list[ServerStatusEntry] = []
-        current_offline: list[ServerStatusEntry] = []
-        remaining = max(1, items_per_page)
-
-        while remaining > 0 and online_index < len(online):
-            current_online.append(online[online_index])
-            online_index += 1
-            remaining -= 1
-
-        while remaining > 0 and offline_index < len(offline):
-            current_offline.append(offline[offline_index])
-            offline_index += 1
-            remaining -= 1
-
-        pages.append((current_online, current_offline))
-
-    return pages if pages else [([], [])]
+    return message, total_pages, current_page
 
 
 def _format_server_lines(
-    servers: list[ServerStatusEntry],
+    servers: tuple[ServerStatusEntry, ...],
     texts,
     *,
     online: bool,
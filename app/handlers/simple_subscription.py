@@ -962,28 +962,15 @@ async def handle_simple_subscription_payment_method(
             qr_photo = None
             if qr_confirmation_data or confirmation_url:
                 try:
-                    # Импортируем необходимые модули для генерации QR-кода
-                    from io import BytesIO
-
-                    import qrcode
                     from aiogram.types import BufferedInputFile
 
+                    from app.utils.media_cache import render_qr_png
+
                     # Используем qr_confirmation_data если доступно, иначе confirmation_url
                     qr_data = qr_confirmation_data if qr_confirmation_data else confirmation_url
 
-                    # Создаем QR-код из полученных данных
-                    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-                    qr.add_data(qr_data)
-                    qr.make(fit=True)
-
-                    img = qr.make_image(fill_color='black', back_color='white')
-
-                    # Сохраняем изображение в байты
-                    img_bytes = BytesIO()
-                    img.save(img_bytes, format='PNG')
-                    img_bytes.seek(0)
-
-                    qr_photo = BufferedInputFile(img_bytes.getvalue(), filename='qrcode.png')
+                    # Рендер QR выполняется в отдельном потоке, не блокируя event loop
+                    qr_photo = BufferedInputFile(await render_qr_png(qr_data), filename='qrcode.png')
                 except ImportError:
                     logger.warning('qrcode библиотека не установлена, QR-код не будет сгенерирован')
                 except Exception as e:
@@ -43,6 +43,7 @@ from app.services.pinned_message_service import (
     get_active_pinned_message,
 )
 from app.services.privacy_policy_service import PrivacyPolicyService
+from app.services.referral_diagnostics_service import track_referral_click
 from app.services.referral_service import process_referral_registration
 from app.services.subscription_service import SubscriptionService
 from app.services.support_settings_service import SupportSettingsService
@@ -347,6 +348,7 @@ async def cmd_start(message: types.Message, state: FSMContext, db: AsyncSession,
         else:
             referral_code = start_parameter
             logger.info(f'🔎 Найден реферальный код: {referral_code}')
+            track_referral_click(message.from_user.id, referral_code, 'start')
 
     if referral_code:
         await state.update_data(referral_code=referral_code)
@@ -14,6 +14,7 @@ from app.keyboards.inline import (
     get_traffic_packages_keyboard,
 )
 from app.localization.texts import get_texts
+from app.services.pricing_catalog import get_device_quotes, get_period_quotes, get_traffic_quotes
 from app.services.subscription_checkout_service import (
     clear_subscription_checkout_draft,
 )
@@ -143,7 +144,9 @@ async def handle_subscription_config_back(
     if current_state == SubscriptionStates.selecting_traffic.state:
         await callback.message.edit_text(
             await _build_subscription_period_prompt(db_user, texts, db),
-            reply_markup=get_subscription_period_keyboard(db_user.language, db_user),
+            reply_markup=get_subscription_period_keyboard(
+                db_user.language, db_user, await get_period_quotes(db, db_user)
+            ),
             parse_mode='HTML',
         )
         await state.set_state(SubscriptionStates.selecting_period)
@@ -151,13 +154,18 @@ async def handle_subscription_config_back(
     elif current_state == SubscriptionStates.selecting_countries.state:
         if settings.is_traffic_selectable():
             await callback.message.edit_text(
-                texts.SELECT_TRAFFIC, reply_markup=get_traffic_packages_keyboard(db_user.language)
+                texts.SELECT_TRAFFIC,
+                reply_markup=get_traffic_packages_keyboard(
+                    db_user.language, await get_traffic_quotes(db, db_user, (await state.get_data()).get('period_days'))
+                ),
             )
             await state.set_state(SubscriptionStates.selecting_traffic)
         else:
             await callback.message.edit_text(
                 await _build_subscription_period_prompt(db_user, texts, db),
-                reply_markup=get_subscription_period_keyboard(db_user.language, db_user),
+                reply_markup=get_subscription_period_keyboard(
+                    db_user.language, db_user, await get_period_quotes(db, db_user)
+                ),
                 parse_mode='HTML',
             )
             await state.set_state(SubscriptionStates.selecting_period)
@@ -171,7 +179,10 @@ async def handle_subscription_config_back(
             selected_devices = data.get('devices', settings.DEFAULT_DEVICE_LIMIT)
 
             await callback.message.edit_text(
-                texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language)
+                texts.SELECT_DEVICES,
+                reply_markup=get_devices_keyboard(
+                    selected_devices, db_user.language, await get_device_quotes(db, db_user, data.get('period_days'))
+                ),
             )
             await state.set_state(SubscriptionStates.selecting_devices)
         else:
@@ -232,14 +243,17 @@ async def _show_previous_configuration_step(
 
     if settings.is_traffic_selectable():
         await callback.message.edit_text(
-            texts.SELECT_TRAFFIC, reply_markup=get_traffic_packages_keyboard(db_user.language)
+            texts.SELECT_TRAFFIC,
+            reply_markup=get_traffic_packages_keyboard(
+                db_user.language, await get_traffic_quotes(db, db_user, (await state.get_data()).get('period_days'))
+            ),
         )
         await state.set_state(SubscriptionStates.selecting_traffic)
         return
 
     await callback.message.edit_text(
         await _build_subscription_period_prompt(db_user, texts, db),
-        reply_markup=get_subscription_period_keyboard(db_user.language, db_user),
+        reply_markup=get_subscription_period_keyboard(db_user.language, db_user, await get_period_quotes(db, db_user)),
         parse_mode='HTML',
     )
     await state.set_state(SubscriptionStates.selecting_period)
@@ -16,6 +16,7 @@ from app.keyboards.inline import (
     get_manage_countries_keyboard,
 )
 from app.localization.texts import get_texts
+from app.services.pricing_catalog import get_device_quotes
 from app.services.subscription_checkout_service import (
     save_subscription_checkout_draft,
     should_offer_checkout_resume,
@@ -518,7 +519,7 @@ async def select_country(callback: types.CallbackQuery, state: FSMContext, db_us
     await callback.answer()
 
 
-async def countries_continue(callback: types.CallbackQuery, state: FSMContext, db_user: User):
+async def countries_continue(callback: types.CallbackQuery, state: FSMContext, db_user: User, db: AsyncSession):
     data = await state.get_data()
     texts = get_texts(db_user.language)
 
@@ -533,8 +534,9 @@ async def countries_continue(callback: types.CallbackQuery, state: FSMContext, d
 
     selected_devices = data.get('devices', settings.DEFAULT_DEVICE_LIMIT)
 
+    device_quotes = await get_device_quotes(db, db_user, data.get('period_days'))
     await callback.message.edit_text(
-        texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language)
+        texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language, device_quotes)
     )
 
     await state.set_state(SubscriptionStates.selecting_devices)
@@ -39,6 +39,7 @@ from app.keyboards.inline import (
 )
 from app.localization.texts import get_texts
 from app.services.admin_notification_service import AdminNotificationService
+from app.services.pricing_catalog import get_device_quotes, get_period_quotes, get_traffic_quotes
 from app.services.remnawave_service import RemnaWaveConfigurationError
 from app.services.subscription_checkout_service import (
     clear_subscription_checkout_draft,
@@ -1220,7 +1221,7 @@ async def start_subscription_purchase(
         await show_tariffs_list(callback, db_user, db, state)
         return
 
-    keyboard = get_subscription_period_keyboard(db_user.language, db_user)
+    keyboard = get_subscription_period_keyboard(db_user.language, db_user, await get_period_quotes(db, db_user))
     prompt_text = await _build_subscription_period_prompt(db_user, texts, db)
 
     await _edit_message_text_or_caption(
@@ -1537,22 +1538,22 @@ async def handle_extend_subscription(callback: types.CallbackQuery, db_user: Use
     renewal_prices = {}
     promo_offer_percent = _get_promo_offer_discount_percent(db_user)
 
+    # Цена серверов не зависит от периода — считаем её один раз для всех кнопок
+    servers_price_per_month, _ = await subscription_service.get_countries_price_by_uuids(
+        subscription.connected_squads,
+        db,
+        promo_group_id=db_user.promo_group_id,
+    )
+
     for days in available_periods:
         try:
             months_in_period = calculate_months_from_days(days)
 
-            from app.config import PERIOD_PRICES
-
             # 1. Calculate period price with promo group discount using unified system
             base_price_original = PERIOD_PRICES.get(days, 0)
             period_price_info = calculate_user_price(db_user, base_price_original, days, 'period')
 
             # 2. Calculate servers price with promo group discount
-            servers_price_per_month, _ = await subscription_service.get_countries_price_by_uuids(
-                subscription.connected_squads,
-                db,
-                promo_group_id=db_user.promo_group_id,
-            )
             servers_total_base = servers_price_per_month * months_in_period
             servers_price_info = calculate_user_price(db_user, servers_total_base, days, 'servers')
 
@@ -2037,7 +2038,7 @@ async def confirm_extend_subscription(callback: types.CallbackQuery, db_user: Us
     await callback.answer()
 
 
-async def select_period(callback: types.CallbackQuery, state: FSMContext, db_user: User):
+async def select_period(callback: types.CallbackQuery, state: FSMContext, db_user: User, db: AsyncSession):
     period_days = int(callback.data.split('_')[1])
     texts = get_texts(db_user.language)
 
@@ -2069,7 +2070,10 @@ async def select_period(callback: types.CallbackQuery, state: FSMContext, db_use
             return
 
         await callback.message.edit_text(
-            texts.SELECT_TRAFFIC, reply_markup=get_traffic_packages_keyboard(db_user.language)
+            texts.SELECT_TRAFFIC,
+            reply_markup=get_traffic_packages_keyboard(
+                db_user.language, await get_traffic_quotes(db, db_user, period_days)
+            ),
         )
         await state.set_state(SubscriptionStates.selecting_traffic)
         await callback.answer()
@@ -2101,7 +2105,10 @@ async def select_period(callback: types.CallbackQuery, state: FSMContext, db_use
         selected_devices = data.get('devices', settings.DEFAULT_DEVICE_LIMIT)
 
         await callback.message.edit_text(
-            texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language)
+            texts.SELECT_DEVICES,
+            reply_markup=get_devices_keyboard(
+                selected_devices, db_user.language, await get_device_quotes(db, db_user, period_days)
+            ),
         )
         await state.set_state(SubscriptionStates.selecting_devices)
         await callback.answer()
@@ -2111,7 +2118,7 @@ async def select_period(callback: types.CallbackQuery, state: FSMContext, db_use
         await callback.answer()
 
 
-async def select_devices(callback: types.CallbackQuery, state: FSMContext, db_user: User):
+async def select_devices(callback: types.CallbackQuery, state: FSMContext, db_user: User, db: AsyncSession):
     texts = get_texts(db_user.language)
 
     if not settings.is_devices_selection_enabled():
@@ -2156,7 +2163,11 @@ async def select_devices(callback: types.CallbackQuery, state: FSMContext, db_us
 
     if devices != previous_devices:
         try:
-            await callback.message.edit_reply_markup(reply_markup=get_devices_keyboard(devices, db_user.language))
+            await callback.message.edit_reply_markup(
+                reply_markup=get_devices_keyboard(
+                    devices, db_user.language, await get_device_quotes(db, db_user, period_days)
+                )
+            )
         except TelegramBadRequest as error:
             if 'message is not modified' in str(error).lower():
                 logger.debug('ℹ️ Пропускаем обновление клавиатуры устройств: содержимое не изменилось')
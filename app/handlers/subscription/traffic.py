@@ -19,6 +19,7 @@ from app.keyboards.inline import (
     get_reset_traffic_confirm_keyboard,
 )
 from app.localization.texts import get_texts
+from app.services.pricing_catalog import get_device_quotes
 from app.services.remnawave_service import RemnaWaveService
 from app.services.subscription_service import SubscriptionService
 from app.services.user_cart_service import user_cart_service
@@ -394,7 +395,7 @@ async def get_traffic_packages_info() -> str:
         return f'⚠️ Ошибка получения информации: {e}'
 
 
-async def select_traffic(callback: types.CallbackQuery, state: FSMContext, db_user: User):
+async def select_traffic(callback: types.CallbackQuery, state: FSMContext, db_user: User, db: AsyncSession):
     traffic_gb = int(callback.data.split('_')[1])
     texts = get_texts(db_user.language)
 
@@ -431,8 +432,9 @@ async def select_traffic(callback: types.CallbackQuery, state: FSMContext, db_us
     if settings.is_devices_selection_enabled():
         selected_devices = data.get('devices', settings.DEFAULT_DEVICE_LIMIT)
 
+        device_quotes = await get_device_quotes(db, db_user, data.get('period_days'))
         await callback.message.edit_text(
-            texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language)
+            texts.SELECT_DEVICES, reply_markup=get_devices_keyboard(selected_devices, db_user.language, device_quotes)
         )
         await state.set_state(SubscriptionStates.selecting_devices)
         await callback.answer()
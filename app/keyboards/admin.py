@@ -2,6 +2,7 @@ from typing import Any
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from app.keyboards.cache import cached_keyboard
 from app.localization.texts import get_texts
 
 
@@ -10,6 +11,7 @@ def _t(texts, key: str) -> str:
     return texts.t(key)
 
 
+@cached_keyboard
 def get_admin_main_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -76,6 +78,7 @@ def get_admin_main_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_users_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -91,6 +94,7 @@ def get_admin_users_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_promo_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -113,6 +117,7 @@ def get_admin_promo_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_communications_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -146,6 +151,7 @@ def get_admin_communications_submenu_keyboard(language: str = 'ru') -> InlineKey
     )
 
 
+@cached_keyboard
 def get_admin_support_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -164,6 +170,7 @@ def get_admin_support_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMa
     )
 
 
+@cached_keyboard
 def get_admin_settings_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -212,6 +219,7 @@ def get_admin_settings_submenu_keyboard(language: str = 'ru') -> InlineKeyboardM
     )
 
 
+@cached_keyboard
 def get_admin_system_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -228,6 +236,7 @@ def get_admin_system_submenu_keyboard(language: str = 'ru') -> InlineKeyboardMar
     )
 
 
+@cached_keyboard
 def get_admin_trials_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -244,6 +253,7 @@ def get_admin_trials_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_reports_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -257,6 +267,7 @@ def get_admin_reports_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_report_result_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -265,6 +276,7 @@ def get_admin_report_result_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_users_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -297,6 +309,7 @@ def get_admin_users_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_users_filters_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -331,6 +344,7 @@ def get_admin_users_filters_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_subscriptions_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -354,6 +368,7 @@ def get_admin_subscriptions_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_promocodes_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -374,6 +389,7 @@ def get_admin_promocodes_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_campaigns_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -394,6 +410,7 @@ def get_admin_campaigns_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_contests_root_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -418,6 +435,7 @@ def get_admin_contests_root_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_admin_contests_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -443,6 +461,7 @@ def get_admin_contests_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_contest_mode_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -734,6 +753,7 @@ def get_campaign_edit_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_campaign_bonus_type_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -782,6 +802,7 @@ def get_promocode_management_keyboard(promo_id: int, language: str = 'ru') -> In
     )
 
 
+@cached_keyboard
 def get_admin_messages_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -882,6 +903,7 @@ def get_pinned_broadcast_confirm_keyboard(
     )
 
 
+@cached_keyboard
 def get_admin_monitoring_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -906,6 +928,7 @@ def get_admin_monitoring_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_remnawave_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -935,6 +958,7 @@ def get_admin_remnawave_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_statistics_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1120,6 +1144,7 @@ def get_user_promo_group_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_confirmation_keyboard(
     confirm_action: str, cancel_action: str = 'admin_panel', language: str = 'ru'
 ) -> InlineKeyboardMarkup:
@@ -1135,6 +1160,7 @@ def get_confirmation_keyboard(
     )
 
 
+@cached_keyboard
 def get_promocode_type_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1205,6 +1231,7 @@ def get_promocode_list_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_broadcast_target_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1248,6 +1275,7 @@ def get_broadcast_target_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_custom_criteria_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1314,6 +1342,7 @@ def get_broadcast_history_keyboard(page: int, total_pages: int, language: str =
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_sync_options_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     keyboard = [
@@ -1366,6 +1395,7 @@ def get_sync_result_keyboard(sync_type: str, has_errors: bool = False, language:
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_period_selection_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1453,6 +1483,7 @@ def get_squad_edit_keyboard(squad_uuid: str, language: str = 'ru') -> InlineKeyb
     )
 
 
+@cached_keyboard
 def get_monitoring_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1493,6 +1524,7 @@ def get_monitoring_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_monitoring_logs_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1573,6 +1605,7 @@ def get_log_detail_keyboard(log_id: int, current_page: int = 1, language: str =
     )
 
 
+@cached_keyboard
 def get_monitoring_clear_confirm_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1654,6 +1687,7 @@ def get_monitoring_status_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_monitoring_settings_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1684,6 +1718,7 @@ def get_monitoring_settings_keyboard(language: str = 'ru') -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_log_type_filter_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1717,6 +1752,7 @@ def get_log_type_filter_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_admin_servers_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1876,6 +1912,7 @@ def get_maintenance_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_sync_simplified_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     keyboard = [
@@ -1978,6 +2015,7 @@ def get_message_buttons_selector_keyboard(language: str = 'ru') -> InlineKeyboar
     return get_updated_message_buttons_selector_keyboard_with_media(list(DEFAULT_BROADCAST_BUTTONS), False, language)
 
 
+@cached_keyboard
 def get_broadcast_media_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -1998,6 +2036,7 @@ def get_broadcast_media_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     )
 
 
+@cached_keyboard
 def get_media_confirm_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
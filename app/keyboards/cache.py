@@ -0,0 +1,93 @@
+"""Кеш статических inline-клавиатур.
+
+Большинство билдеров строят одну и ту же клавиатуру для данного языка, но на
+каждый вызов создают объект локализации и заново валидируют pydantic-модели.
+Билдер, помеченный ``@cached_keyboard``, строится один раз на набор аргументов;
+дальше вызывающий получает копию готовой разметки.
+
+- чистый билдер зависит только от аргументов: ``@cached_keyboard``;
+- билдер, читающий настройки, перечисляет их в ``depends_on`` — значения
+  входят в ключ, поэтому изменения вне админки тоже подхватываются сразу.
+
+Кеш сбрасывается при перезагрузке локалей и при изменении настроек из админки
+(``invalidate_keyboard_cache``).
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+from collections.abc import Callable, Hashable
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+
+logger = logging.getLogger(__name__)
+
+KeyboardBuilder = Callable[..., InlineKeyboardMarkup]
+Rows = tuple[tuple[InlineKeyboardButton, ...], ...]
+
+# Ключи с id в callback_data не повторяются; старые записи вытесняются по очереди
+_MAX_ENTRIES = 2048
+
+_cache: dict[tuple, Rows] = {}
+_version = 0
+_stats = {'hits': 0, 'misses': 0, 'uncacheable': 0}
+
+
+def keyboard_cache_version() -> int:
+    return _version
+
+
+def invalidate_keyboard_cache(reason: str | None = None) -> None:
+    global _version
+    _version += 1
+    if _cache:
+        logger.debug('Кеш клавиатур сброшен (%s): %s записей', reason or 'без причины', len(_cache))
+    _cache.clear()
+
+
+def get_keyboard_cache_stats() -> dict:
+    return {**_stats, 'entries': len(_cache), 'version': _version}
+
+
+def _to_markup(rows: Rows) -> InlineKeyboardMarkup:
+    # Строки копируются: вызывающие добавляют в клавиатуру свои ряды и кнопки.
+    # Сами кнопки общие и не изменяются
+    return InlineKeyboardMarkup.model_construct(inline_keyboard=[list(row) for row in rows])
+
+
+def cached_keyboard(
+    builder: KeyboardBuilder | None = None,
+    *,
+    depends_on: Callable[[], Hashable] | None = None,
+):
+    """Кешировать результат билдера по аргументам и значению ``depends_on()``."""
+
+    def decorate(func: KeyboardBuilder) -> KeyboardBuilder:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> InlineKeyboardMarkup:
+            key = (func, args, tuple(kwargs.items()), depends_on() if depends_on else None)
+            try:
+                rows = _cache.get(key)
+            except TypeError:
+                # Нехешируемые аргументы — строим как обычно
+                _stats['uncacheable'] += 1
+                return func(*args, **kwargs)
+
+            if rows is None:
+                _stats['misses'] += 1
+                rows = tuple(tuple(row) for row in func(*args, **kwargs).inline_keyboard)
+                if len(_cache) >= _MAX_ENTRIES:
+                    del _cache[next(iter(_cache))]
+                _cache[key] = rows
+            else:
+                _stats['hits'] += 1
+            return _to_markup(rows)
+
+        wrapper.uncached = func
+        return wrapper
+
+    if builder is not None:
+        return decorate(builder)
+    return decorate
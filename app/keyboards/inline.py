@@ -1,5 +1,7 @@
 import logging
+from collections.abc import Mapping
 from datetime import UTC, datetime
+from typing import TYPE_CHECKING
 
 from aiogram import types
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
@@ -7,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import PERIOD_PRICES, settings
 from app.database.models import User
+from app.keyboards.cache import cached_keyboard
 from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts
 from app.utils.miniapp_buttons import build_miniapp_or_callback_button
@@ -21,6 +24,10 @@ from app.utils.subscription_utils import (
 )
 
 
+if TYPE_CHECKING:
+    from app.services.pricing_catalog import PriceQuote
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -250,6 +257,7 @@ _LANGUAGE_DISPLAY_NAMES = {
 }
 
 
+@cached_keyboard
 def get_rules_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -262,6 +270,7 @@ def get_rules_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup
     )
 
 
+@cached_keyboard
 def get_privacy_policy_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -304,6 +313,7 @@ def get_channel_sub_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@cached_keyboard
 def get_post_registration_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -319,6 +329,7 @@ def get_post_registration_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKe
     )
 
 
+@cached_keyboard(depends_on=lambda: tuple(settings.get_available_languages()))
 def get_language_selection_keyboard(
     current_language: str | None = None,
     *,
@@ -859,6 +870,7 @@ def get_happ_cryptolink_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@cached_keyboard
 def get_happ_download_platform_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     buttons = [
@@ -882,6 +894,7 @@ def get_happ_download_link_keyboard(language: str, link: str) -> InlineKeyboardM
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@cached_keyboard
 def get_back_keyboard(language: str = DEFAULT_LANGUAGE, callback_data: str = 'back_to_menu') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text=texts.BACK, callback_data=callback_data)]])
@@ -1131,6 +1144,7 @@ def get_payment_methods_keyboard_with_cart(
     return keyboard
 
 
+@cached_keyboard
 def get_subscription_confirm_keyboard_with_cart(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -1176,6 +1190,7 @@ def get_insufficient_balance_keyboard_with_cart(
     return keyboard
 
 
+@cached_keyboard
 def get_trial_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -1189,7 +1204,9 @@ def get_trial_keyboard(language: str = 'ru') -> InlineKeyboardMarkup:
 
 
 def get_subscription_period_keyboard(
-    language: str = DEFAULT_LANGUAGE, user: User | None = None
+    language: str = DEFAULT_LANGUAGE,
+    user: User | None = None,
+    quotes: Mapping[int, 'PriceQuote'] | None = None,
 ) -> InlineKeyboardMarkup:
     """
     Generate subscription period selection keyboard with personalized pricing.
@@ -1197,6 +1214,7 @@ def get_subscription_period_keyboard(
     Args:
         language: User's language code
         user: User object for personalized discounts (None = default discounts)
+        quotes: Batch-priced quotes by period (see ``get_period_quotes``); priced per button when omitted
 
     Returns:
         InlineKeyboardMarkup with period buttons showing personalized prices
@@ -1206,14 +1224,19 @@ def get_subscription_period_keyboard(
     texts = get_texts(language)
     keyboard = []
 
-    available_periods = settings.get_available_subscription_periods()
+    available_periods = list(quotes) if quotes else settings.get_available_subscription_periods()
 
     for days in available_periods:
-        # Get base price for this period
-        base_price = PERIOD_PRICES.get(days, 0)
-
-        # Calculate personalized price with user's discounts
-        price_info = calculate_user_price(user, base_price, days, 'period')
+        if quotes:
+            quote = quotes[days]
+            price_info = PriceInfo(
+                base_price=quote.base_price_original,
+                final_price=quote.base_price,
+                discount_percent=quote.base_discount_percent if quote.base_price_original > 0 else 0,
+            )
+        else:
+            # Calculate personalized price with user's discounts
+            price_info = calculate_user_price(user, PERIOD_PRICES.get(days, 0), days, 'period')
 
         # Format period description
         period_display = format_period_description(days, language)
@@ -1236,7 +1259,10 @@ def get_subscription_period_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_traffic_packages_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+def get_traffic_packages_keyboard(
+    language: str = DEFAULT_LANGUAGE,
+    quotes: Mapping[int, 'PriceQuote'] | None = None,
+) -> InlineKeyboardMarkup:
     import logging
 
     logger = logging.getLogger(__name__)
@@ -1273,10 +1299,12 @@ def get_traffic_packages_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKey
         if not enabled:
             continue
 
+        # С котировками показываем месячную цену пакета со скидкой промогруппы
+        price = quotes[gb].traffic_price_per_month if quotes and gb in quotes else package['price']
         if gb == 0:
-            text = f'♾️ Безлимит - {settings.format_price(package["price"])}'
+            text = f'♾️ Безлимит - {settings.format_price(price)}'
         else:
-            text = f'📊 {gb} ГБ - {settings.format_price(package["price"])}'
+            text = f'📊 {gb} ГБ - {settings.format_price(price)}'
 
         keyboard.append([InlineKeyboardButton(text=text, callback_data=f'traffic_{gb}')])
 
@@ -1333,18 +1361,28 @@ def get_countries_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
-def get_devices_keyboard(current: int, language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+def get_devices_keyboard(
+    current: int,
+    language: str = DEFAULT_LANGUAGE,
+    quotes: Mapping[int, 'PriceQuote'] | None = None,
+) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     keyboard = []
 
-    start_devices = settings.DEFAULT_DEVICE_LIMIT
-    max_devices = settings.MAX_DEVICES_LIMIT if settings.MAX_DEVICES_LIMIT > 0 else 50
-    end_devices = min(max_devices + 1, start_devices + 10)
+    if quotes:
+        device_options = list(quotes)
+    else:
+        start_devices = settings.DEFAULT_DEVICE_LIMIT
+        max_devices = settings.MAX_DEVICES_LIMIT if settings.MAX_DEVICES_LIMIT > 0 else 50
+        device_options = range(start_devices, min(max_devices + 1, start_devices + 10))
 
     buttons = []
 
-    for devices in range(start_devices, end_devices):
-        price = max(0, devices - settings.DEFAULT_DEVICE_LIMIT) * settings.PRICE_PER_DEVICE
+    for devices in device_options:
+        if quotes:
+            price = quotes[devices].devices_price_per_month
+        else:
+            price = max(0, devices - settings.DEFAULT_DEVICE_LIMIT) * settings.PRICE_PER_DEVICE
         price_text = f' (+{texts.format_price(price)})' if price > 0 else ' (вкл.)'
         emoji = '✅' if devices == current else '⚪'
 
@@ -1376,6 +1414,7 @@ def _get_device_declension(count: int) -> str:
     return 'устройств'
 
 
+@cached_keyboard
 def get_subscription_confirm_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -1388,6 +1427,7 @@ def get_subscription_confirm_keyboard(language: str = DEFAULT_LANGUAGE) -> Inlin
     )
 
 
+@cached_keyboard
 def get_balance_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1635,6 +1675,7 @@ def get_subscription_expiring_keyboard(subscription_id: int, language: str = DEF
     )
 
 
+@cached_keyboard(depends_on=settings.is_referral_withdrawal_enabled)
 def get_referral_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -1661,6 +1702,17 @@ def get_referral_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMar
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+def _support_keyboard_state() -> tuple:
+    try:
+        from app.services.support_settings_service import SupportSettingsService
+
+        mode = SupportSettingsService.get_system_mode()
+    except Exception:
+        mode = None
+    return mode, settings.get_support_contact_url()
+
+
+@cached_keyboard(depends_on=_support_keyboard_state)
 def get_support_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     try:
@@ -1720,6 +1772,7 @@ def get_pagination_keyboard(
     return keyboard
 
 
+@cached_keyboard
 def get_confirmation_keyboard(
     confirm_data: str, cancel_data: str = 'cancel', language: str = DEFAULT_LANGUAGE
 ) -> InlineKeyboardMarkup:
@@ -1734,6 +1787,7 @@ def get_confirmation_keyboard(
     )
 
 
+@cached_keyboard
 def get_autopay_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -1748,6 +1802,7 @@ def get_autopay_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMark
     )
 
 
+@cached_keyboard
 def get_autopay_days_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     keyboard = []
@@ -2165,6 +2220,7 @@ def get_manage_countries_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@cached_keyboard(depends_on=lambda: settings.CONNECT_BUTTON_MODE)
 def get_device_selection_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     from app.config import settings
 
@@ -2624,6 +2680,7 @@ def get_device_reset_confirm_keyboard(
     )
 
 
+@cached_keyboard
 def get_device_management_help_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
 
@@ -2649,6 +2706,7 @@ def get_device_management_help_keyboard(language: str = DEFAULT_LANGUAGE) -> Inl
 # ==================== TICKET KEYBOARDS ====================
 
 
+@cached_keyboard
 def get_ticket_cancel_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -2725,6 +2783,7 @@ def get_ticket_view_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_ticket_reply_cancel_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -2864,6 +2923,7 @@ def get_admin_ticket_view_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
 
+@cached_keyboard
 def get_admin_ticket_reply_cancel_keyboard(language: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
     texts = get_texts(language)
     return InlineKeyboardMarkup(
@@ -10,6 +10,7 @@ from pathlib import Path
 from typing import Any
 
 from app.config import settings
+from app.keyboards.cache import invalidate_keyboard_cache
 
 
 _logger = logging.getLogger(__name__)
@@ -311,3 +312,4 @@ def load_locale(language: str) -> dict[str, Any]:
 
 def clear_locale_cache() -> None:
     load_locale.cache_clear()
+    invalidate_keyboard_cache('locales')
@@ -5,15 +5,17 @@ from datetime import datetime
 from typing import Any
 
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message, TelegramObject, User as TgUser
 from sqlalchemy.exc import InterfaceError, OperationalError
 
 from app.config import settings
-from app.database.crud.user import get_user_by_telegram_id
+from app.database.crud.user import get_user_by_telegram_id, get_user_identity_by_telegram_id
 from app.database.database import AsyncSessionLocal
 from app.services.remnawave_service import RemnaWaveService
+from app.services.user_identity_cache import user_identity_cache
 from app.states import RegistrationStates
 from app.utils.check_reg_process import is_registration_process
 from app.utils.validators import sanitize_telegram_name
@@ -32,7 +34,27 @@ async def _refresh_remnawave_description(remnawave_uuid: str, description: str,
         logger.error(f'❌ [Middleware] Ошибка обновления RemnaWave для {telegram_id}: {remnawave_error}')
 
 
+async def _reject_blocked(event: TelegramObject, telegram_id: int) -> None:
+    if isinstance(event, Message):
+        await event.answer('🚫 Ваш аккаунт заблокирован администратором.')
+    elif isinstance(event, CallbackQuery):
+        await event.answer('🚫 Ваш аккаунт заблокирован администратором.', show_alert=True)
+    logger.info(f'🚫 Заблокированный пользователь {telegram_id} попытался использовать бота')
+
+
+def _is_activity_stale(last_activity: datetime | None, now: datetime) -> bool:
+    if last_activity is None:
+        return True
+    return (now - last_activity).total_seconds() >= settings.AUTH_LAST_ACTIVITY_UPDATE_INTERVAL
+
+
 class AuthMiddleware(BaseMiddleware):
+    """Загружает пользователя для хендлера и отсекает незарегистрированных, заблокированных и удалённых.
+
+    Хендлер, которому хватает языка и подписки, помечается ``flags={'light_user': True}`` —
+    для него пользователь грузится одним запросом, без промогрупп и реферера.
+    """
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
@@ -54,11 +76,27 @@ class AuthMiddleware(BaseMiddleware):
         if user.is_bot:
             return await handler(event, data)
 
+        # Сессия не берёт соединение из пула до первого запроса
         async with AsyncSessionLocal() as db:
             try:
-                db_user = await get_user_by_telegram_id(db, user.id)
+                identity = user_identity_cache.get(user.id)
+                if identity is not None and identity.is_blocked:
+                    await _reject_blocked(event, user.id)
+                    return None
 
-                if not db_user:
+                if identity is not None and identity.is_deleted:
+                    # Удалённому пользователю в хендлер всё равно уходит db_user=None — строка не нужна
+                    db_user = None
+                else:
+                    load_user = (
+                        get_user_identity_by_telegram_id if get_flag(data, 'light_user') else get_user_by_telegram_id
+                    )
+                    db_user = await load_user(db, user.id)
+                    identity = user_identity_cache.store(db_user) if db_user else None
+
+                data['user_identity'] = identity
+
+                if identity is None:
                     state: FSMContext = data.get('state')
                     current_state = None
 
@@ -92,17 +130,11 @@ class AuthMiddleware(BaseMiddleware):
                         await event.answer('▶️ Необходимо начать с команды /start', show_alert=True)
                     logger.info(f'🚫 Заблокирован незарегистрированный пользователь {user.id}')
                     return None
-                from app.database.models import UserStatus
-
-                if db_user.status == UserStatus.BLOCKED.value:
-                    if isinstance(event, Message):
-                        await event.answer('🚫 Ваш аккаунт заблокирован администратором.')
-                    elif isinstance(event, CallbackQuery):
-                        await event.answer('🚫 Ваш аккаунт заблокирован администратором.', show_alert=True)
-                    logger.info(f'🚫 Заблокированный пользователь {user.id} попытался использовать бота')
+                if identity.is_blocked:
+                    await _reject_blocked(event, user.id)
                     return None
 
-                if db_user.status == UserStatus.DELETED.value:
+                if identity.is_deleted:
                     state: FSMContext = data.get('state')
                     current_state = None
 
@@ -183,10 +215,12 @@ class AuthMiddleware(BaseMiddleware):
                     )
                     profile_updated = True
 
-                db_user.last_activity = datetime.utcnow()
+                now = datetime.utcnow()
+                if _is_activity_stale(db_user.last_activity, now):
+                    db_user.last_activity = now
 
                 if profile_updated:
-                    db_user.updated_at = datetime.utcnow()
+                    db_user.updated_at = now
                     logger.info(f'💾 [Middleware] Профиль пользователя {user.id} обновлен в middleware')
 
                     if db_user.remnawave_uuid:
@@ -20,6 +20,7 @@ from app.keyboards.inline import get_channel_sub_keyboard
 from app.localization.loader import DEFAULT_LANGUAGE
 from app.localization.texts import get_texts
 from app.services.admin_notification_service import AdminNotificationService
+from app.services.referral_diagnostics_service import track_referral_click
 from app.services.subscription_service import SubscriptionService
 from app.utils.check_reg_process import is_registration_process
 
@@ -262,6 +263,8 @@ class ChannelCheckerMiddleware(BaseMiddleware):
                     payload,
                     telegram_id,
                 )
+                if payload.startswith('ref'):
+                    track_referral_click(telegram_id, payload, 'payload')
         else:
             logger.warning(
                 '⚠️ _capture_start_payload: state=None для пользователя %s',
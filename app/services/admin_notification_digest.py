@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Фоновая доставка: размер очереди исходящих сообщений и число попыток при flood control
+DIGEST_QUEUE_MAX_SIZE = 1000
+DIGEST_MAX_SEND_ATTEMPTS = 3
+# Сколько строк-примеров выводить в сводке для каждого типа события
+DIGEST_MAX_ITEMS_PER_TYPE = 10
+# Запас до лимита Telegram в 4096 символов на сообщение
+DIGEST_MAX_MESSAGE_LENGTH = 4000
+
+DIGEST_EVENT_TITLES = {
+    'trial': '🎯 Активации триала',
+    'purchase': '💎 Покупки подписок',
+    'balance_topup': '💰 Пополнения баланса',
+    'renewal': '⏰ Продления подписок',
+    'promocode_activation': '🎫 Активации промокодов',
+    'campaign_visit': '📣 Переходы по кампаниям',
+    'promo_group_change': '👥 Смены промогрупп',
+}
+
+
+@dataclass
+class DigestEvent:
+    """Событие, которое можно объединить в сводку."""
+
+    event_type: str
+    summary: str
+    amount_kopeks: int = 0
+
+
+@dataclass
+class DigestBucket:
+    """Накопленные за окно события одного типа в одном чате/топике."""
+
+    count: int = 0
+    total_kopeks: int = 0
+    summaries: list[str] = field(default_factory=list)
+    first_text: str = ''
+
+    def add(self, event: DigestEvent, text: str) -> None:
+        if not self.count:
+            self.first_text = text
+        self.count += 1
+        self.total_kopeks += event.amount_kopeks or 0
+        if len(self.summaries) < DIGEST_MAX_ITEMS_PER_TYPE:
+            self.summaries.append(event.summary)
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение, ожидающее фоновой отправки в админ-чат."""
+
+    bot: Bot
+    kwargs: dict[str, Any]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdminNotificationDigest:
+    """
+    Буфер админ-уведомлений.
+
+    События одного типа за окно ``ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS``
+    объединяются в одно сообщение-сводку на чат/топик с количеством и суммой.
+    Срочные события (сумма не меньше ``ADMIN_NOTIFICATIONS_DIGEST_URGENT_AMOUNT_KOPEKS``)
+    отправляются сразу. Отправка всегда идёт из фонового воркера, поэтому
+    обработчики покупок не ждут Telegram.
+    """
+
+    def __init__(self) -> None:
+        self._buckets: dict[tuple[str, int | None], dict[str, DigestBucket]] = {}
+        self._bots: dict[tuple[str, int | None], Bot] = {}
+        self._queue: asyncio.Queue[OutgoingMessage] | None = None
+        self._worker_task: asyncio.Task | None = None
+        self._flush_task: asyncio.Task | None = None
+        self._stats = {
+            'events_buffered': 0,
+            'events_urgent': 0,
+            'digests_sent': 0,
+            'messages_sent': 0,
+            'messages_failed': 0,
+            'messages_dropped': 0,
+            'max_lag_seconds': 0.0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_ENABLED', False))
+
+    @property
+    def window_seconds(self) -> int:
+        return max(1, int(getattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS', 60) or 60))
+
+    def is_urgent(self, event: DigestEvent) -> bool:
+        threshold = getattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_URGENT_AMOUNT_KOPEKS', 0) or 0
+        return threshold > 0 and (event.amount_kopeks or 0) >= threshold
+
+    def add(self, bot: Bot, message_kwargs: dict[str, Any], event: DigestEvent) -> bool:
+        """Добавить событие в сводку или, если оно срочное, поставить в очередь на немедленную отправку."""
+        if self.is_urgent(event):
+            self._stats['events_urgent'] += 1
+            return self.enqueue(bot, message_kwargs)
+
+        key = (str(message_kwargs['chat_id']), message_kwargs.get('message_thread_id'))
+        bucket = self._buckets.setdefault(key, {}).setdefault(event.event_type, DigestBucket())
+        bucket.add(event, message_kwargs['text'])
+        self._bots[key] = bot
+        self._stats['events_buffered'] += 1
+
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later(), name='admin-notification-digest-flush')
+        return True
+
+    def enqueue(self, bot: Bot, message_kwargs: dict[str, Any]) -> bool:
+        """Поставить сообщение в очередь фоновой отправки."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=DIGEST_QUEUE_MAX_SIZE)
+
+        try:
+            self._queue.put_nowait(OutgoingMessage(bot=bot, kwargs=message_kwargs))
+        except asyncio.QueueFull:
+            self._stats['messages_dropped'] += 1
+            logger.warning('Очередь админ-уведомлений переполнена, сообщение отброшено')
+            return False
+
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(
+                self._worker_loop(self._queue), name='admin-notification-digest-worker'
+            )
+        return True
+
+    def flush(self) -> int:
+        """Сформировать сводки из накопленных событий и поставить их в очередь. Возвращает число сообщений."""
+        buckets, self._buckets = self._buckets, {}
+        bots, self._bots = self._bots, {}
+
+        queued = 0
+        for (chat_id, thread_id), by_type in buckets.items():
+            base_kwargs: dict[str, Any] = {
+                'chat_id': chat_id,
+                'parse_mode': 'HTML',
+                'disable_web_page_preview': True,
+            }
+            if thread_id:
+                base_kwargs['message_thread_id'] = thread_id
+
+            texts = self.build_digest_texts(by_type)
+            for text in texts:
+                if self.enqueue(bots[(chat_id, thread_id)], {**base_kwargs, 'text': text}):
+                    queued += 1
+            if len(texts) > 1 or sum(bucket.count for bucket in by_type.values()) > 1:
+                self._stats['digests_sent'] += 1
+        return queued
+
+    def build_digest_texts(self, by_type: dict[str, DigestBucket]) -> list[str]:
+        """Текст сводки для одного чата/топика; одиночное событие отправляется в исходном виде."""
+        if sum(bucket.count for bucket in by_type.values()) == 1:
+            return [next(iter(by_type.values())).first_text]
+
+        lines = [f'📬 <b>Сводка уведомлений за {self.window_seconds} сек.</b>']
+        for event_type, bucket in by_type.items():
+            header = f'{DIGEST_EVENT_TITLES.get(event_type, event_type)}: <b>{bucket.count}</b>'
+            if bucket.total_kopeks:
+                header += f' • {settings.format_price(bucket.total_kopeks)}'
+            lines.extend(['', header])
+            lines.extend(f'• {summary}' for summary in bucket.summaries)
+            if bucket.count > len(bucket.summaries):
+                lines.append(f'… и ещё {bucket.count - len(bucket.summaries)}')
+
+        texts: list[str] = []
+        current = ''
+        for line in lines:
+            candidate = f'{current}\n{line}' if current else line
+            if len(candidate) > DIGEST_MAX_MESSAGE_LENGTH and current:
+                texts.append(current)
+                candidate = line
+            current = candidate
+        if current:
+            texts.append(current)
+        return texts
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Отправить накопленные сводки, дождаться очереди (с таймаутом) и остановить фоновые задачи."""
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        self._flush_task = None
+        self.flush()
+
+        if self._queue is not None and self._worker_task and not self._worker_task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+            except TimeoutError:
+                logger.warning('Очередь админ-уведомлений не отправлена при остановке: %d', self._queue.qsize())
+
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+        self._worker_task = None
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'window_seconds': self.window_seconds,
+            'buffered_events': sum(bucket.count for by_type in self._buckets.values() for bucket in by_type.values()),
+            'queue_size': self._queue.qsize() if self._queue is not None else 0,
+            'worker_running': bool(self._worker_task and not self._worker_task.done()),
+            **{name: round(value, 3) if isinstance(value, float) else value for name, value in self._stats.items()},
+        }
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window_seconds)
+        self.flush()
+
+    async def _worker_loop(self, queue: asyncio.Queue[OutgoingMessage]) -> None:
+        """Отправляет сообщения по одному, чтобы не упираться в лимиты Telegram на чат."""
+        while True:
+            message = await queue.get()
+            try:
+                await self._deliver(message)
+            except Exception as error:
+                self._stats['messages_failed'] += 1
+                logger.error('Ошибка отправки админ-уведомления: %s', error)
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, message: OutgoingMessage) -> None:
+        for attempt in range(1, DIGEST_MAX_SEND_ATTEMPTS + 1):
+            try:
+                await message.bot.send_message(**message.kwargs)
+                break
+            except TelegramRetryAfter as error:
+                if attempt == DIGEST_MAX_SEND_ATTEMPTS:
+                    raise
+                logger.warning('Flood control при отправке админ-уведомления, ждём %s сек.', error.retry_after)
+                await asyncio.sleep(error.retry_after)
+
+        self._stats['messages_sent'] += 1
+        lag = time.monotonic() - message.enqueued_at
+        self._stats['max_lag_seconds'] = max(self._stats['max_lag_seconds'], lag)
+
+
+# Глобальный экземпляр буфера
+admin_notification_digest = AdminNotificationDigest()
@@ -20,6 +20,7 @@ from app.database.models import (
     Transaction,
     User,
 )
+from app.services.admin_notification_digest import DigestEvent, admin_notification_digest
 from app.utils.timezone import format_local_datetime
 
 
@@ -358,7 +359,12 @@ class AdminNotificationService:
             message_lines.append('')
             message_lines.append(f'⏰ <i>{format_local_datetime(datetime.utcnow(), "%d.%m.%Y %H:%M:%S")}</i>')
 
-            return await self._send_message('\n'.join(message_lines))
+            digest = DigestEvent(
+                event_type='trial',
+                summary=f'{user_display} ({user_id_display})',
+                amount_kopeks=charged_amount_kopeks or 0,
+            )
+            return await self._send_message('\n'.join(message_lines), digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления о триале: {e}')
@@ -486,7 +492,12 @@ class AdminNotificationService:
                 ]
             )
 
-            return await self._send_message('\n'.join(message_lines))
+            digest = DigestEvent(
+                event_type='purchase',
+                summary=f'{user_display} • {settings.format_price(total_amount)} • {period_days} дн. • {payment_method}',
+                amount_kopeks=total_amount or 0,
+            )
+            return await self._send_message('\n'.join(message_lines), digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления о покупке: {e}')
@@ -811,7 +822,15 @@ class AdminNotificationService:
                 return False
 
         try:
-            return await self._send_message(message)
+            digest = DigestEvent(
+                event_type='balance_topup',
+                summary=(
+                    f'{self._get_user_display(user)} • {settings.format_price(transaction.amount_kopeks)} • '
+                    f'{self._get_payment_method_display(transaction.payment_method)}'
+                ),
+                amount_kopeks=transaction.amount_kopeks or 0,
+            )
+            return await self._send_message(message, digest=digest)
         except Exception as e:
             logger.error(
                 f'Ошибка отправки уведомления о пополнении: {e}',
@@ -891,7 +910,12 @@ class AdminNotificationService:
 
 ⏰ <i>{format_local_datetime(datetime.utcnow(), '%d.%m.%Y %H:%M:%S')}</i>"""
 
-            return await self._send_message(message)
+            digest = DigestEvent(
+                event_type='renewal',
+                summary=f'{user_display} • {settings.format_price(transaction.amount_kopeks)} • +{extended_days} дн.',
+                amount_kopeks=transaction.amount_kopeks or 0,
+            )
+            return await self._send_message(message, digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления о продлении: {e}')
@@ -998,7 +1022,12 @@ class AdminNotificationService:
                 ]
             )
 
-            return await self._send_message('\n'.join(message_lines))
+            digest = DigestEvent(
+                event_type='promocode_activation',
+                summary=f'{user_display} • <code>{promocode_data.get("code")}</code>',
+                amount_kopeks=balance_bonus or 0,
+            )
+            return await self._send_message('\n'.join(message_lines), digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления об активации промокода: {e}')
@@ -1077,7 +1106,8 @@ class AdminNotificationService:
                 ]
             )
 
-            return await self._send_message('\n'.join(message_lines))
+            digest = DigestEvent(event_type='campaign_visit', summary=f'{campaign.name}: {full_name} ({username})')
+            return await self._send_message('\n'.join(message_lines), digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления о переходе по кампании: {e}')
@@ -1167,14 +1197,20 @@ class AdminNotificationService:
                 ]
             )
 
-            return await self._send_message('\n'.join(message_lines))
+            digest = DigestEvent(event_type='promo_group_change', summary=f'{user_display} → {new_group.name}')
+            return await self._send_message('\n'.join(message_lines), digest=digest)
 
         except Exception as e:
             logger.error(f'Ошибка отправки уведомления о смене промогруппы: {e}')
             return False
 
     async def _send_message(
-        self, text: str, reply_markup: types.InlineKeyboardMarkup | None = None, *, ticket_event: bool = False
+        self,
+        text: str,
+        reply_markup: types.InlineKeyboardMarkup | None = None,
+        *,
+        ticket_event: bool = False,
+        digest: DigestEvent | None = None,
     ) -> bool:
         if not self.chat_id:
             logger.warning('ADMIN_NOTIFICATIONS_CHAT_ID не настроен')
@@ -1199,6 +1235,10 @@ class AdminNotificationService:
             if reply_markup is not None:
                 message_kwargs['reply_markup'] = reply_markup
 
+            # Массовые события уходят в сводку и отправляются фоновым воркером
+            if digest is not None and admin_notification_digest.enabled:
+                return admin_notification_digest.add(self.bot, message_kwargs, digest)
+
             await self.bot.send_message(**message_kwargs)
             logger.info(f'Уведомление отправлено в чат {self.chat_id}')
             return True
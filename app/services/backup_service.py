@@ -7,19 +7,20 @@ import os
 import shutil
 import tarfile
 import tempfile
+import time
 from dataclasses import asdict, dataclass
 from datetime import date as dt_date, datetime, time as dt_time, timedelta
 from decimal import Decimal
+from itertools import batched, islice
 from pathlib import Path
-from typing import Any
+from typing import Any, TextIO
 
 import aiofiles
 import pyzipper
 from aiogram.types import FSInputFile
-from sqlalchemy import inspect, select, text
+from sqlalchemy import insert, inspect, select, text, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from app.config import settings
 from app.database.database import AsyncSessionLocal, engine
@@ -97,10 +98,18 @@ from app.database.models import (
     server_squad_promo_groups,
     tariff_promo_groups,
 )
+from app.database.referrer_ledger import rebuild_referrer_ledger
+from app.utils.loop_monitor import EventLoopBlockMonitor
 
 
 logger = logging.getLogger(__name__)
 
+# Размер пачки строк при потоковом экспорте и восстановлении ORM-дампа
+BACKUP_CHUNK_SIZE = 1000
+# Потоковый ORM-дамп: по файлу JSON Lines на таблицу в каталоге database/ архива
+ORM_DUMP_FORMAT_VERSION = 'orm-2.0'
+ORM_DUMP_DIRECTORY = 'database'
+
 
 @dataclass
 class BackupMetadata:
@@ -122,6 +131,8 @@ class BackupSettings:
     backup_time: str = '03:00'
     max_backups_keep: int = 7
     compression_enabled: bool = True
+    compression_level: int = 6
+    export_concurrency: int = 4
     include_logs: bool = False
     backup_location: str = '/app/data/backups'
 
@@ -233,6 +244,8 @@ class BackupService:
             backup_time=os.getenv('BACKUP_TIME', '03:00'),
             max_backups_keep=int(os.getenv('BACKUP_MAX_KEEP', '7')),
             compression_enabled=os.getenv('BACKUP_COMPRESSION', 'true').lower() == 'true',
+            compression_level=min(max(int(os.getenv('BACKUP_COMPRESSION_LEVEL', '6')), 1), 9),
+            export_concurrency=max(int(os.getenv('BACKUP_EXPORT_CONCURRENCY', '4')), 1),
             include_logs=os.getenv('BACKUP_INCLUDE_LOGS', 'false').lower() == 'true',
             backup_location=os.getenv('BACKUP_LOCATION', '/app/data/backups'),
         )
@@ -321,49 +334,56 @@ class BackupService:
             if include_logs is None:
                 include_logs = self._settings.include_logs
 
-            overview = await self._collect_database_overview()
-
             timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
             archive_suffix = '.tar.gz' if compress else '.tar'
             filename = f'backup_{timestamp}{archive_suffix}'
             backup_path = self.backup_dir / filename
+            started_at = time.monotonic()
+
+            async with EventLoopBlockMonitor() as loop_monitor:
+                overview = await self._collect_database_overview()
+
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    temp_path = Path(temp_dir)
+                    staging_dir = temp_path / 'backup'
+                    staging_dir.mkdir(parents=True, exist_ok=True)
+
+                    database_info = await self._dump_database(staging_dir, include_logs=include_logs)
+                    database_info.setdefault('tables_count', overview.get('tables_count', 0))
+                    database_info.setdefault('total_records', overview.get('total_records', 0))
+                    files_info = await self._collect_files(staging_dir, include_logs=include_logs)
+                    data_snapshot_info = await self._collect_data_snapshot(staging_dir)
+
+                    metadata = {
+                        'format_version': self.archive_format_version,
+                        'timestamp': datetime.utcnow().isoformat(),
+                        'database_type': 'postgresql' if settings.is_postgresql() else 'sqlite',
+                        'backup_type': 'full',
+                        'tables_count': overview.get('tables_count', 0),
+                        'total_records': overview.get('total_records', 0),
+                        'compressed': True,
+                        'created_by': created_by,
+                        'database': database_info,
+                        'files': files_info,
+                        'data_snapshot': data_snapshot_info,
+                        'settings': asdict(self._settings),
+                    }
 
-            with tempfile.TemporaryDirectory() as temp_dir:
-                temp_path = Path(temp_dir)
-                staging_dir = temp_path / 'backup'
-                staging_dir.mkdir(parents=True, exist_ok=True)
-
-                database_info = await self._dump_database(staging_dir, include_logs=include_logs)
-                database_info.setdefault('tables_count', overview.get('tables_count', 0))
-                database_info.setdefault('total_records', overview.get('total_records', 0))
-                files_info = await self._collect_files(staging_dir, include_logs=include_logs)
-                data_snapshot_info = await self._collect_data_snapshot(staging_dir)
-
-                metadata = {
-                    'format_version': self.archive_format_version,
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'database_type': 'postgresql' if settings.is_postgresql() else 'sqlite',
-                    'backup_type': 'full',
-                    'tables_count': overview.get('tables_count', 0),
-                    'total_records': overview.get('total_records', 0),
-                    'compressed': True,
-                    'created_by': created_by,
-                    'database': database_info,
-                    'files': files_info,
-                    'data_snapshot': data_snapshot_info,
-                    'settings': asdict(self._settings),
-                }
+                    metadata_path = staging_dir / 'metadata.json'
+                    async with aiofiles.open(metadata_path, 'w', encoding='utf-8') as meta_file:
+                        await meta_file.write(json_lib.dumps(metadata, ensure_ascii=False, indent=2))
 
-                metadata_path = staging_dir / 'metadata.json'
-                async with aiofiles.open(metadata_path, 'w', encoding='utf-8') as meta_file:
-                    await meta_file.write(json_lib.dumps(metadata, ensure_ascii=False, indent=2))
-
-                mode = 'w:gz' if compress else 'w'
-                with tarfile.open(backup_path, mode) as tar:
-                    for item in staging_dir.iterdir():
-                        tar.add(item, arcname=item.name)
+                    await asyncio.to_thread(self._write_archive, staging_dir, backup_path, compress)
 
             file_size = backup_path.stat().st_size
+            loop_stats = loop_monitor.as_dict()
+            logger.info(
+                '⏱️ Бекап собран за %.1f с; блокировка event loop: макс. %s мс, всего %s мс (%s задержек)',
+                time.monotonic() - started_at,
+                loop_stats['max_lag_ms'],
+                loop_stats['blocked_ms'],
+                loop_stats['stalls'],
+            )
 
             await self._cleanup_old_backups()
 
@@ -373,7 +393,8 @@ class BackupService:
                 f'📁 Файл: {filename}\n'
                 f'📊 Таблиц: {overview.get("tables_count", 0)}\n'
                 f'📈 Записей: {overview.get("total_records", 0):,}\n'
-                f'💾 Размер: {size_mb:.2f} MB'
+                f'💾 Размер: {size_mb:.2f} MB\n'
+                f'⏱️ Блокировка event loop: до {loop_stats["max_lag_ms"]} мс'
             )
 
             logger.info(message)
@@ -394,6 +415,13 @@ class BackupService:
 
             return False, error_msg, None
 
+    def _write_archive(self, staging_dir: Path, backup_path: Path, compress: bool) -> None:
+        """Упаковать каталог в tar (gzip с уровнем BACKUP_COMPRESSION_LEVEL). Вызывается в рабочем потоке."""
+        options = {'compresslevel': self._settings.compression_level} if compress else {}
+        with tarfile.open(backup_path, 'w:gz' if compress else 'w', **options) as tar:
+            for item in staging_dir.iterdir():
+                tar.add(item, arcname=item.name)
+
     async def restore_backup(self, backup_file_path: str, clear_existing: bool = False) -> tuple[bool, str]:
         try:
             logger.info(f'📄 Начинаем восстановление из {backup_file_path}')
@@ -519,44 +547,25 @@ class BackupService:
 
     async def _dump_postgres_json(self, staging_dir: Path, include_logs: bool) -> dict[str, Any]:
         models_to_backup = self._get_models_for_backup(include_logs)
-        (
-            backup_data,
-            association_data,
-            total_records,
-            tables_count,
-        ) = await self._export_database_via_orm(models_to_backup)
-
-        dump_path = staging_dir / 'database.json'
-        dump_structure = {
-            'metadata': {
-                'timestamp': datetime.utcnow().isoformat(),
-                'version': 'orm-1.0',
-                'database_type': 'postgresql',
-                'tables_count': tables_count,
-                'total_records': total_records,
-            },
-            'data': backup_data,
-            'associations': association_data,
-        }
+        dump_dir = staging_dir / ORM_DUMP_DIRECTORY
+        tables, total_records = await self._export_database_via_orm(models_to_backup, dump_dir)
 
-        async with aiofiles.open(dump_path, 'w', encoding='utf-8') as dump_file:
-            await dump_file.write(json_lib.dumps(dump_structure, ensure_ascii=False, indent=2))
-
-        size = dump_path.stat().st_size if dump_path.exists() else 0
+        size = await asyncio.to_thread(lambda: sum(path.stat().st_size for path in dump_dir.iterdir()))
 
         logger.info(
-            '✅ PostgreSQL экспортирован через ORM в JSON (%s)',
-            dump_path,
+            '✅ PostgreSQL экспортирован через ORM в JSON Lines (%s)',
+            dump_dir,
         )
 
         return {
             'type': 'postgresql',
-            'path': dump_path.name,
+            'path': dump_dir.name,
             'size_bytes': size,
-            'format': 'json',
+            'format': 'jsonl',
             'tool': 'orm',
-            'format_version': 'orm-1.0',
-            'tables_count': tables_count,
+            'format_version': ORM_DUMP_FORMAT_VERSION,
+            'tables': tables,
+            'tables_count': len(tables),
             'total_records': total_records,
         }
 
@@ -572,85 +581,114 @@ class BackupService:
     async def _export_database_via_orm(
         self,
         models_to_backup: list[Any],
-    ) -> tuple[dict[str, list[dict[str, Any]]], dict[str, list[dict[str, Any]]], int, int]:
-        backup_data: dict[str, list[dict[str, Any]]] = {}
-        total_records = 0
-
-        async with AsyncSessionLocal() as db:
+        dump_dir: Path,
+    ) -> tuple[list[dict[str, Any]], int]:
+        """
+        Потоковый экспорт: строки читаются пачками без ORM-объектов и сразу дописываются в файлы таблиц.
+
+        Таблицы выгружаются параллельно (до BACKUP_EXPORT_CONCURRENCY), каждая в своей read-only сессии.
+        """
+        await asyncio.to_thread(dump_dir.mkdir, parents=True, exist_ok=True)
+        semaphore = asyncio.Semaphore(self._settings.export_concurrency)
+        started_at = time.monotonic()
+
+        async def _export(table, association: bool = False) -> dict[str, Any]:
+            async with semaphore, AsyncSessionLocal() as db:
+                if db.get_bind().dialect.name == 'postgresql':
+                    await db.execute(text('SET TRANSACTION READ ONLY'))
+                return await self._export_table(db, table, dump_dir, association=association)
+
+        async def _export_association(table_name: str, table_obj) -> dict[str, Any] | None:
             try:
-                for model in models_to_backup:
-                    table_name = model.__tablename__
-                    logger.info('📊 Экспортируем таблицу: %s', table_name)
-
-                    query = select(model)
-
-                    if model == User:
-                        query = query.options(selectinload(User.subscription))
-                    elif model == Subscription:
-                        query = query.options(selectinload(Subscription.user))
-                    elif model == Transaction:
-                        query = query.options(selectinload(Transaction.user))
-
-                    result = await db.execute(query)
-                    records = result.scalars().all()
-
-                    table_data: list[dict[str, Any]] = []
-                    for record in records:
-                        record_dict: dict[str, Any] = {}
-                        for column in model.__table__.columns:
-                            value = getattr(record, column.name)
-
-                            if value is None:
-                                record_dict[column.name] = None
-                            elif isinstance(value, (datetime, dt_date, dt_time)):
-                                record_dict[column.name] = value.isoformat()
-                            elif isinstance(value, Decimal):
-                                record_dict[column.name] = float(value)
-                            elif isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
-                                record_dict[column.name] = 0.0
-                            elif isinstance(value, (list, dict)):
-                                try:
-                                    record_dict[column.name] = json_lib.dumps(value) if value else None
-                                except TypeError:
-                                    record_dict[column.name] = str(value)
-                            elif hasattr(value, '__dict__'):
-                                record_dict[column.name] = str(value)
-                            else:
-                                record_dict[column.name] = value
-
-                        table_data.append(record_dict)
-
-                    backup_data[table_name] = table_data
-                    total_records += len(table_data)
-
-                    logger.info(
-                        '✅ Экспортировано %s записей из %s',
-                        len(table_data),
-                        table_name,
-                    )
+                return await _export(table_obj, association=True)
+            except Exception as e:
+                logger.error(f'Ошибка экспорта таблицы связей {table_name}: {e}')
+                return None
 
-                association_data = await self._export_association_tables(db)
-                for records in association_data.values():
-                    total_records += len(records)
+        try:
+            tables = list(await asyncio.gather(*(_export(model.__table__) for model in models_to_backup)))
+        except Exception as exc:
+            logger.error('Ошибка при экспорте данных: %s', exc)
+            raise
 
-                tables_count = len(models_to_backup) + len(association_data)
-                return backup_data, association_data, total_records, tables_count
+        association_tables = await asyncio.gather(
+            *(_export_association(name, table_obj) for name, table_obj in self.association_tables.items())
+        )
+        tables.extend(table for table in association_tables if table is not None)
 
-            except Exception as exc:
-                logger.error('Ошибка при экспорте данных: %s', exc)
-                raise
+        total_records = sum(table['rows'] for table in tables)
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        logger.info(
+            '📦 Экспорт завершён: %s записей из %s таблиц за %.1f с (%.0f строк/с)',
+            total_records,
+            len(tables),
+            elapsed,
+            total_records / elapsed,
+        )
+        return tables, total_records
+
+    async def _export_table(self, db: AsyncSession, table, dump_dir: Path, association: bool = False) -> dict[str, Any]:
+        logger.info('📊 Экспортируем таблицу: %s', table.name)
+
+        file_name = f'{table.name}.jsonl'
+        column_names = [column.name for column in table.columns]
+        rows = 0
+        started_at = time.monotonic()
+
+        query = select(*table.columns).execution_options(yield_per=BACKUP_CHUNK_SIZE)
+        async with aiofiles.open(dump_dir / file_name, 'w', encoding='utf-8') as dump_file:
+            result = await db.stream(query)
+            async for partition in result.partitions():
+                lines = [
+                    json_lib.dumps(
+                        {name: self._serialize_value(value) for name, value in zip(column_names, row, strict=True)},
+                        ensure_ascii=False,
+                    )
+                    for row in partition
+                ]
+                await dump_file.write('\n'.join(lines) + '\n')
+                rows += len(lines)
+
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        logger.info('✅ Экспортировано %s записей из %s (%.0f строк/с)', rows, table.name, rows / elapsed)
+        return {'name': table.name, 'path': file_name, 'rows': rows, 'association': association}
+
+    @staticmethod
+    def _serialize_value(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, (datetime, dt_date, dt_time)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+            return 0.0
+        if isinstance(value, (list, dict)):
+            try:
+                return json_lib.dumps(value) if value else None
+            except TypeError:
+                return str(value)
+        if hasattr(value, '__dict__'):
+            return str(value)
+        return value
 
     async def _collect_files(self, staging_dir: Path, include_logs: bool) -> list[dict[str, Any]]:
-        files_info: list[dict[str, Any]] = []
-        files_dir = staging_dir / 'files'
-        files_dir.mkdir(parents=True, exist_ok=True)
-
+        sources = []
         app_config_path = settings.get_app_config_path()
         if app_config_path:
-            src = Path(app_config_path)
-            if src.exists():
-                dest = files_dir / src.name
-                await asyncio.to_thread(shutil.copy2, src, dest)
+            sources.append(Path(app_config_path))
+        if include_logs and settings.LOG_FILE:
+            sources.append(Path(settings.LOG_FILE))
+
+        def _copy_files() -> list[dict[str, Any]]:
+            files_info: list[dict[str, Any]] = []
+            files_dir = staging_dir / 'files'
+            files_dir.mkdir(parents=True, exist_ok=True)
+
+            for src in sources:
+                if not src.exists():
+                    continue
+                shutil.copy2(src, files_dir / src.name)
                 files_info.append(
                     {
                         'path': str(src),
@@ -658,22 +696,11 @@ class BackupService:
                     }
                 )
 
-        if include_logs and settings.LOG_FILE:
-            log_path = Path(settings.LOG_FILE)
-            if log_path.exists():
-                dest = files_dir / log_path.name
-                await asyncio.to_thread(shutil.copy2, log_path, dest)
-                files_info.append(
-                    {
-                        'path': str(log_path),
-                        'relative_path': f'files/{log_path.name}',
-                    }
-                )
-
-        if not files_info and files_dir.exists():
-            files_dir.rmdir()
+            if not files_info and files_dir.exists():
+                files_dir.rmdir()
+            return files_info
 
-        return files_info
+        return await asyncio.to_thread(_copy_files)
 
     async def _collect_data_snapshot(self, staging_dir: Path) -> dict[str, Any]:
         data_dir = staging_dir / 'data'
@@ -722,8 +749,12 @@ class BackupService:
             temp_path = Path(temp_dir)
 
             mode = 'r:gz' if backup_path.suffixes and backup_path.suffixes[-1] == '.gz' else 'r'
-            with tarfile.open(backup_path, mode) as tar:
-                tar.extractall(temp_path, filter='data')
+
+            def _extract() -> None:
+                with tarfile.open(backup_path, mode) as tar:
+                    tar.extractall(temp_path, filter='data')
+
+            await asyncio.to_thread(_extract)
 
             metadata_path = temp_path / 'metadata.json'
             if not metadata_path.exists():
@@ -743,7 +774,9 @@ class BackupService:
                 default_name = 'database.json' if db_format == 'json' else 'database.sql'
                 dump_file = temp_path / database_info.get('path', default_name)
 
-                if db_format == 'json':
+                if db_format == 'jsonl':
+                    await self._restore_postgres_jsonl(dump_file, database_info, clear_existing)
+                elif db_format == 'json':
                     await self._restore_postgres_json(dump_file, clear_existing)
                 else:
                     await self._restore_postgres(dump_file, clear_existing)
@@ -846,6 +879,129 @@ class BackupService:
 
         logger.info('✅ PostgreSQL восстановлен из ORM JSON (%s)', dump_path)
 
+    async def _restore_postgres_jsonl(self, dump_dir: Path, database_info: dict[str, Any], clear_existing: bool):
+        """Потоковое восстановление: файлы таблиц читаются пачками по BACKUP_CHUNK_SIZE строк."""
+        if not dump_dir.is_dir():
+            raise FileNotFoundError(f'Каталог ORM дампа не найден: {dump_dir}')
+
+        tables = {table['name']: table for table in database_info.get('tables', []) if table.get('rows')}
+        if not tables:
+            raise ValueError('❌ Файл бекапа не содержит данных')
+
+        total_expected = sum(table['rows'] for table in tables.values())
+        logger.info('📈 Содержит %s записей', total_expected)
+
+        models_by_table = {model.__tablename__: model for model in self._get_models_for_backup(True)}
+        referrals: list[tuple[int, int]] = []
+        restored_records = 0
+        started_at = time.monotonic()
+
+        async with AsyncSessionLocal() as db:
+            try:
+                if clear_existing:
+                    logger.warning('🗑️ Очищаем существующие данные...')
+                    await self._clear_database_tables(db, {name: table['rows'] for name, table in tables.items()})
+
+                for table_name in self._get_restore_order(models_by_table):
+                    table = tables.get(table_name)
+                    if not table:
+                        continue
+
+                    model = models_by_table[table_name]
+                    logger.info('🔥 Восстанавливаем таблицу %s (%s записей)', table_name, table['rows'])
+                    existing_tariff_ids = (
+                        await self._get_existing_tariff_ids(db) if table_name == 'subscriptions' else None
+                    )
+
+                    restored = 0
+                    chunks = 0
+                    async for records in self._read_dump_chunks(dump_dir, table['path']):
+                        restored += await self._restore_records_chunk(
+                            db,
+                            model,
+                            table_name,
+                            records,
+                            clear_existing,
+                            existing_tariff_ids=existing_tariff_ids,
+                            referrals=referrals if table_name == 'users' else None,
+                        )
+                        restored_records += len(records)
+                        chunks += 1
+                        if chunks % 10 == 0:
+                            self._log_restore_progress(restored_records, total_expected, started_at)
+
+                    if restored:
+                        logger.info('✅ Таблица %s восстановлена', table_name)
+                    self._log_restore_progress(restored_records, total_expected, started_at)
+
+                await self._restore_user_referral_pairs(db, referrals)
+
+                for table_name, table_obj in self.association_tables.items():
+                    table = tables.get(table_name)
+                    if not table:
+                        continue
+
+                    col_names = [col.name for col in table_obj.columns]
+                    async for records in self._read_dump_chunks(dump_dir, table['path']):
+                        await self._restore_association_table(db, table_obj, table_name, records, False, col_names)
+                        restored_records += len(records)
+
+                await rebuild_referrer_ledger(db)
+                await db.commit()
+
+            except Exception as exc:
+                await db.rollback()
+                logger.error('Ошибка при восстановлении: %s', exc)
+                raise
+
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        logger.info(
+            '✅ PostgreSQL восстановлен из ORM JSON Lines: %s записей за %.1f с (%.0f строк/с)',
+            restored_records,
+            elapsed,
+            restored_records / elapsed,
+        )
+
+    def _get_restore_order(self, models_by_table: dict[str, Any]) -> list[str]:
+        pre_restore_tables = ['promo_groups', 'tariffs', 'users']
+        return [name for name in pre_restore_tables if name in models_by_table] + [
+            name for name in models_by_table if name not in pre_restore_tables
+        ]
+
+    @staticmethod
+    def _open_table_dump(dump_dir: Path, file_name: str) -> TextIO | None:
+        dump_path = (dump_dir / file_name).resolve()
+        if not str(dump_path).startswith(str(dump_dir.resolve()) + os.sep):
+            logger.warning('Path traversal в пути таблицы дампа: %s', file_name)
+            return None
+        if not dump_path.exists():
+            logger.warning('Файл %s отсутствует в архиве', file_name)
+            return None
+        return dump_path.open(encoding='utf-8')
+
+    async def _read_dump_chunks(self, dump_dir: Path, file_name: str):
+        """Читает файл таблицы JSON Lines пачками, не загружая его целиком."""
+        dump_file = await asyncio.to_thread(self._open_table_dump, dump_dir, file_name)
+        if dump_file is None:
+            return
+
+        with dump_file:
+            while True:
+                lines = await asyncio.to_thread(lambda: list(islice(dump_file, BACKUP_CHUNK_SIZE)))
+                if not lines:
+                    break
+                records = [json_lib.loads(line) for line in lines if line.strip()]
+                if records:
+                    yield records
+
+    @staticmethod
+    def _log_restore_progress(restored: int, total: int, started_at: float) -> None:
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        percent = restored * 100 / total if total else 100
+        logger.info(
+            '⏳ Восстановлено %s/%s записей (%.0f%%, %.0f строк/с)', restored, total, percent, restored / elapsed
+        )
+
     async def _restore_sqlite(self, dump_path: Path, clear_existing: bool):
         if not dump_path.exists():
             raise FileNotFoundError(f'SQLite файл не найден: {dump_path}')
@@ -1020,6 +1176,7 @@ class BackupService:
                 restored_tables += assoc_tables
                 restored_records += assoc_records
 
+                await rebuild_referrer_ledger(db)
                 await db.commit()
 
             except Exception as exc:
@@ -1325,6 +1482,126 @@ class BackupService:
 
     async def _restore_table_records(
         self, db: AsyncSession, model, table_name: str, records: list[dict[str, Any]], clear_existing: bool
+    ) -> int:
+        existing_tariff_ids = await self._get_existing_tariff_ids(db) if table_name == 'subscriptions' else None
+
+        restored_count = 0
+        for chunk in batched(records, BACKUP_CHUNK_SIZE, strict=False):
+            restored_count += await self._restore_records_chunk(
+                db, model, table_name, list(chunk), clear_existing, existing_tariff_ids=existing_tariff_ids
+            )
+        return restored_count
+
+    async def _get_existing_tariff_ids(self, db: AsyncSession) -> set[int]:
+        # Кешируем существующие tariff_id для проверки FK
+        try:
+            result = await db.execute(select(Tariff.id))
+            existing_tariff_ids = {row[0] for row in result.fetchall()}
+            logger.info(f'📋 Найдено {len(existing_tariff_ids)} существующих тарифов для валидации FK')
+            return existing_tariff_ids
+        except Exception as e:
+            logger.warning(f'⚠️ Не удалось получить список тарифов: {e}')
+            return set()
+
+    async def _restore_records_chunk(
+        self,
+        db: AsyncSession,
+        model,
+        table_name: str,
+        records: list[dict[str, Any]],
+        clear_existing: bool,
+        *,
+        existing_tariff_ids: set[int] | None = None,
+        referrals: list[tuple[int, int]] | None = None,
+    ) -> int:
+        """
+        Восстановить пачку записей одним INSERT.
+
+        Существующие по первичному ключу записи обновляются построчно, как раньше;
+        при конфликте уникальных ключей пачка восстанавливается по одной записи.
+        Для users реферальные связи сбрасываются и собираются в ``referrals``.
+        """
+        processed: list[dict[str, Any]] = []
+        for record_data in records:
+            processed_data = self._process_record_data(record_data, model, table_name)
+
+            # Валидация FK для subscriptions.tariff_id
+            if existing_tariff_ids is not None and processed_data.get('tariff_id') is not None:
+                if processed_data['tariff_id'] not in existing_tariff_ids:
+                    logger.warning(
+                        f'⚠️ Тариф {processed_data["tariff_id"]} не найден, устанавливаем tariff_id=NULL для подписки'
+                    )
+                    processed_data['tariff_id'] = None
+
+            if referrals is not None:
+                if processed_data.get('id') and processed_data.get('referred_by_id'):
+                    referrals.append((processed_data['id'], processed_data['referred_by_id']))
+                processed_data['referred_by_id'] = None
+
+            processed.append(processed_data)
+
+        pk_cols = self._get_primary_key_columns(model)
+        existing_keys: set[Any] = set()
+        if len(pk_cols) == 1 and not clear_existing:
+            pk_column = getattr(model, pk_cols[0])
+            keys = [data[pk_cols[0]] for data in processed if data.get(pk_cols[0]) is not None]
+            if keys:
+                result = await db.execute(select(pk_column).where(pk_column.in_(keys)))
+                existing_keys = {row[0] for row in result}
+
+        if len(pk_cols) == 1:
+            updates = [data for data in processed if data.get(pk_cols[0]) in existing_keys]
+            new_records = [data for data in processed if data.get(pk_cols[0]) not in existing_keys]
+        else:
+            updates, new_records = [], processed
+
+        restored_count = 0
+        if updates:
+            restored_count += await self._restore_records_one_by_one(db, model, table_name, updates, clear_existing)
+
+        # executemany требует одинакового набора колонок в строках пачки
+        groups: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for data in new_records:
+            groups.setdefault(tuple(sorted(data)), []).append(data)
+
+        for rows in groups.values():
+            try:
+                async with db.begin_nested():
+                    await db.execute(insert(model.__table__), rows)
+                restored_count += len(rows)
+            except IntegrityError:
+                logger.warning('Пачка %s содержит конфликтующие записи, восстанавливаем по одной', table_name)
+                restored_count += await self._restore_records_one_by_one(db, model, table_name, rows, clear_existing)
+
+        return restored_count
+
+    async def _restore_user_referral_pairs(self, db: AsyncSession, referrals: list[tuple[int, int]]):
+        if not referrals:
+            return
+
+        logger.info('🔗 Обновляем реферальные связи пользователей')
+
+        restored = 0
+        for chunk in batched(referrals, BACKUP_CHUNK_SIZE, strict=False):
+            referrer_ids = {referrer_id for _, referrer_id in chunk}
+            result = await db.execute(select(User.id).where(User.id.in_(referrer_ids)))
+            known_referrers = {row[0] for row in result}
+
+            rows = []
+            for user_id, referrer_id in chunk:
+                if referrer_id not in known_referrers:
+                    logger.warning(f'Реферер {referrer_id} не найден для пользователя {user_id}')
+                    continue
+                rows.append({'id': user_id, 'referred_by_id': referrer_id})
+
+            if rows:
+                await db.execute(update(User), rows)
+                restored += len(rows)
+
+        logger.info('✅ Реферальные связи обновлены: %s', restored)
+
+    async def _restore_records_one_by_one(
+        self, db: AsyncSession, model, table_name: str, records: list[dict[str, Any]], clear_existing: bool
     ) -> int:
         restored_count = 0
 
@@ -1811,9 +2088,17 @@ class BackupService:
             zip_filename = source_path.stem + '.zip'
             zip_path = source_path.parent / zip_filename
 
+            # tar.gz уже сжат — повторное сжатие только тратит CPU, поэтому такой архив только шифруем
+            already_compressed = source_path.suffix in {'.gz', '.zip'}
+            compression = pyzipper.ZIP_STORED if already_compressed else pyzipper.ZIP_DEFLATED
+
             def create_zip():
                 with pyzipper.AESZipFile(
-                    zip_path, 'w', compression=pyzipper.ZIP_DEFLATED, encryption=pyzipper.WZ_AES
+                    zip_path,
+                    'w',
+                    compression=compression,
+                    compresslevel=None if already_compressed else self._settings.compression_level,
+                    encryption=pyzipper.WZ_AES,
                 ) as zf:
                     zf.setpassword(password.encode('utf-8'))
                     zf.write(source_path, arcname=source_path.name)
@@ -13,6 +13,7 @@ from urllib.parse import unquote_plus
 import httpx
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -72,21 +73,21 @@ class CloudPaymentsService:
         url = f'{self.api_url}/{path.lstrip("/")}'
 
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.request(
-                    method,
-                    url,
-                    json=json,
-                    headers=self._build_headers(),
-                )
+            response = await http_clients.send(
+                'cloudpayments',
+                method,
+                url,
+                json=json,
+                headers=self._build_headers(),
+            )
 
-                data = response.json()
+            data = response.json()
 
-                if response.status_code >= 400:
-                    logger.error('CloudPayments API error %s: %s', response.status_code, data)
-                    raise CloudPaymentsAPIError(f'CloudPayments API returned status {response.status_code}')
+            if response.status_code >= 400:
+                logger.error('CloudPayments API error %s: %s', response.status_code, data)
+                raise CloudPaymentsAPIError(f'CloudPayments API returned status {response.status_code}')
 
-                return data
+            return data
 
         except httpx.RequestError as error:
             logger.error('Error communicating with CloudPayments API: %s', error)
@@ -1,16 +1,125 @@
 from __future__ import annotations
 
-from decimal import Decimal
+import asyncio
+import inspect
+import logging
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from types import MappingProxyType
+from typing import ClassVar
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import settings
+from app.database.database import AsyncSessionLocal
 from app.database.models import CurrencyRate
-from app.utils.money import convert_minor_with_rate, normalize_currency
+from app.utils.currency_converter import currency_converter
+from app.utils.money import convert_minor_with_rate, get_currency_meta, normalize_currency
+
+
+logger = logging.getLogger(__name__)
+
+CurrencyPair = tuple[str, str]
+RateTableListener = Callable[['CurrencyRateTable', 'CurrencyRateTable | None'], Awaitable[None] | None]
+
+# TMN is display alias over IRR.
+_FIXED_RATES: dict[CurrencyPair, Decimal] = {
+    ('IRR', 'TMN'): Decimal('0.1'),
+    ('TMN', 'IRR'): Decimal(10),
+}
+# Cross rates are derived through these currencies first.
+_PIVOT_PRIORITY = ('RUB', 'USD', 'EUR', 'IRR')
+
+
+@dataclass(frozen=True, slots=True)
+class CurrencyRateTable:
+    """Immutable snapshot of every known rate, with derived inverse and cross rates.
+
+    Priority: fixed rates, then admin-configured pairs, then their inverses, then
+    market rates fetched from external APIs (and their inverses), then cross
+    rates through a pivot currency.
+    """
+
+    rates: Mapping[CurrencyPair, Decimal]
+    sources: Mapping[CurrencyPair, Decimal]  # Admin and market rates the table was built from
+    market: Mapping[CurrencyPair, Decimal]
+    version: int
+    built_at: datetime
+
+    @classmethod
+    def build(
+        cls,
+        admin_rates: Mapping[CurrencyPair, Decimal],
+        market_rates: Mapping[CurrencyPair, Decimal],
+        *,
+        version: int = 1,
+    ) -> CurrencyRateTable:
+        rates: dict[CurrencyPair, Decimal] = dict(_FIXED_RATES)
+
+        def put(pair: CurrencyPair, rate: Decimal) -> None:
+            if pair[0] != pair[1] and rate > 0 and pair not in rates:
+                rates[pair] = rate
+
+        for pair, rate in admin_rates.items():
+            put(pair, rate)
+        for (source, target), rate in admin_rates.items():
+            if rate > 0:
+                put((target, source), Decimal(1) / rate)
+        for (source, target), rate in market_rates.items():
+            if rate > 0:
+                put((source, target), rate)
+                put((target, source), Decimal(1) / rate)
+
+        # Замыкание по промежуточной валюте: на каждом проходе пути удлиняются на одно звено
+        currencies = sorted(
+            {code for pair in rates for code in pair},
+            key=lambda code: (_PIVOT_PRIORITY.index(code) if code in _PIVOT_PRIORITY else len(_PIVOT_PRIORITY), code),
+        )
+        while True:
+            known = dict(rates)
+            for source in currencies:
+                for target in currencies:
+                    if source == target or (source, target) in known:
+                        continue
+                    for pivot in currencies:
+                        first = known.get((source, pivot))
+                        second = known.get((pivot, target))
+                        if first is not None and second is not None:
+                            rates[source, target] = first * second
+                            break
+            if len(rates) == len(known):
+                break
+
+        return cls(
+            rates=MappingProxyType(rates),
+            sources=MappingProxyType({**market_rates, **admin_rates}),
+            market=MappingProxyType(dict(market_rates)),
+            version=version,
+            built_at=datetime.now(UTC),
+        )
+
+    def lookup(self, from_currency: str, to_currency: str) -> Decimal | None:
+        if from_currency == to_currency:
+            return Decimal(1)
+        return self.rates.get((from_currency, to_currency))
 
 
 class CurrencyRateService:
-    """Admin-managed FX rates and minor-unit conversion helpers."""
+    """Admin-managed FX rates and minor-unit conversion helpers.
+
+    Rates are served from an in-memory ``CurrencyRateTable`` that is rebuilt
+    on admin edits (``reload``) and periodically in the background together
+    with market rates from ``currency_converter``.
+    """
+
+    _table: ClassVar[CurrencyRateTable | None] = None
+    _admin_rates: ClassVar[dict[CurrencyPair, Decimal]] = {}
+    _reload_lock: ClassVar[asyncio.Lock | None] = None
+    _listeners: ClassVar[list[RateTableListener]] = []
+    _task: ClassVar[asyncio.Task | None] = None
 
     @staticmethod
     def _normalize_pair(from_currency: str | None, to_currency: str | None) -> tuple[str, str]:
@@ -20,14 +129,118 @@ class CurrencyRateService:
 
     @classmethod
     def _fixed_rate(cls, from_currency: str, to_currency: str) -> Decimal | None:
-        # TMN is display alias over IRR.
         if from_currency == to_currency:
-            return Decimal('1')
-        if from_currency == 'IRR' and to_currency == 'TMN':
-            return Decimal('0.1')
-        if from_currency == 'TMN' and to_currency == 'IRR':
-            return Decimal('10')
-        return None
+            return Decimal(1)
+        return _FIXED_RATES.get((from_currency, to_currency))
+
+    @classmethod
+    def current_table(cls) -> CurrencyRateTable | None:
+        return cls._table
+
+    @classmethod
+    def subscribe(cls, listener: RateTableListener) -> None:
+        """Call ``listener(new_table, old_table)`` whenever the rates change."""
+        cls._listeners.append(listener)
+
+    @classmethod
+    def unsubscribe(cls, listener: RateTableListener) -> None:
+        if listener in cls._listeners:
+            cls._listeners.remove(listener)
+
+    @classmethod
+    async def get_table(cls, db: AsyncSession | None = None) -> CurrencyRateTable:
+        table = cls._table
+        if table is None:
+            table = await cls.reload(db)
+        return table
+
+    @classmethod
+    async def reload(cls, db: AsyncSession | None = None) -> CurrencyRateTable:
+        """Re-read active admin rates (one query) and rebuild the table."""
+        if cls._reload_lock is None:
+            cls._reload_lock = asyncio.Lock()
+        async with cls._reload_lock:
+            if db is None:
+                async with AsyncSessionLocal() as session:
+                    admin_rates = await cls._load_admin_rates(session)
+            else:
+                admin_rates = await cls._load_admin_rates(db)
+            cls._admin_rates = admin_rates
+            return await cls._rebuild()
+
+    @staticmethod
+    async def _load_admin_rates(db: AsyncSession) -> dict[CurrencyPair, Decimal]:
+        result = await db.execute(
+            select(CurrencyRate.from_currency, CurrencyRate.to_currency, CurrencyRate.rate).where(
+                CurrencyRate.is_active.is_(True),
+                CurrencyRate.rate > 0,
+            )
+        )
+        return {
+            (normalize_currency(source), normalize_currency(target)): Decimal(str(rate))
+            for source, target, rate in result.all()
+        }
+
+    @classmethod
+    async def _rebuild(cls) -> CurrencyRateTable:
+        market_rates: dict[CurrencyPair, Decimal] = {}
+        usd_rub = currency_converter.get_cached_usd_to_rub_rate()
+        if usd_rub:
+            market_rates['USD', 'RUB'] = Decimal(str(usd_rub))
+
+        previous = cls._table
+        if (
+            previous is not None
+            and previous.market == market_rates
+            and previous.sources == {**market_rates, **cls._admin_rates}
+        ):
+            return previous
+
+        table = CurrencyRateTable.build(
+            cls._admin_rates,
+            market_rates,
+            version=previous.version + 1 if previous else 1,
+        )
+        cls._table = table
+        await cls._notify(table, previous)
+        return table
+
+    @classmethod
+    async def _notify(cls, table: CurrencyRateTable, previous: CurrencyRateTable | None) -> None:
+        changed = sorted(
+            pair
+            for pair in set(table.sources) | set(previous.sources if previous else ())
+            if table.sources.get(pair) != (previous.sources.get(pair) if previous else None)
+        )
+        logger.info('💱 Таблица курсов обновлена (версия %s, изменено пар: %s)', table.version, len(changed))
+
+        for listener in list(cls._listeners):
+            try:
+                result = listener(table, previous)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as error:
+                logger.error('Ошибка обработчика обновления курсов: %s', error)
+
+        try:
+            from app.services.event_emitter import event_emitter
+
+            await event_emitter.emit(
+                'currency.rates_updated',
+                {
+                    'version': table.version,
+                    'changed': [
+                        {
+                            'from_currency': source,
+                            'to_currency': target,
+                            'rate': str(table.sources[source, target]) if (source, target) in table.sources else None,
+                        }
+                        for source, target in changed
+                    ],
+                },
+            )
+        except Exception as error:
+            logger.error('Ошибка отправки события обновления курсов: %s', error)
 
     @classmethod
     async def get_rate(
@@ -43,29 +256,11 @@ class CurrencyRateService:
         if fixed is not None:
             return fixed
 
-        direct = await db.execute(
-            select(CurrencyRate).where(
-                CurrencyRate.from_currency == source,
-                CurrencyRate.to_currency == target,
-                CurrencyRate.is_active.is_(True),
-            )
-        )
-        row = direct.scalar_one_or_none()
-        if row and row.rate > 0:
-            return Decimal(str(row.rate))
-
-        reverse = await db.execute(
-            select(CurrencyRate).where(
-                CurrencyRate.from_currency == target,
-                CurrencyRate.to_currency == source,
-                CurrencyRate.is_active.is_(True),
-            )
-        )
-        reverse_row = reverse.scalar_one_or_none()
-        if reverse_row and reverse_row.rate > 0:
-            return Decimal('1') / Decimal(str(reverse_row.rate))
-
-        raise ValueError(f'Currency rate not configured: {source} -> {target}')
+        table = await cls.get_table(db)
+        rate = table.lookup(source, target)
+        if rate is None:
+            raise ValueError(f'Currency rate not configured: {source} -> {target}')
+        return rate
 
     @classmethod
     async def convert_minor(
@@ -87,5 +282,71 @@ class CurrencyRateService:
             rate=rate,
         )
 
+    @classmethod
+    async def convert_many(
+        cls,
+        db: AsyncSession | None,
+        amounts: Iterable[tuple[int, str | None]],
+        *,
+        to_currency: str | None,
+    ) -> list[int]:
+        """Convert ``(amount_minor, currency)`` pairs into ``to_currency`` against one table snapshot.
+
+        Same rounding as ``convert_minor``; raises ``ValueError`` if a rate is missing.
+        """
+        table = await cls.get_table(db)
+        target = normalize_currency(to_currency)
+        target_exponent = get_currency_meta(target).exponent
+        factors: dict[str | None, Decimal | None] = {}
+        converted: list[int] = []
+
+        for amount_minor, currency in amounts:
+            if currency not in factors:
+                source = normalize_currency(currency)
+                if source == target:
+                    factors[currency] = None
+                else:
+                    rate = table.lookup(source, target)
+                    if rate is None:
+                        raise ValueError(f'Currency rate not configured: {source} -> {target}')
+                    # minor -> major -> rate -> minor одним множителем (степень десяти точна в Decimal)
+                    factors[currency] = rate.scaleb(target_exponent - get_currency_meta(source).exponent)
+            factor = factors[currency]
+            if factor is None:
+                converted.append(amount_minor)
+            else:
+                converted.append(int((Decimal(amount_minor) * factor).to_integral_value(rounding=ROUND_HALF_UP)))
+        return converted
+
+    @classmethod
+    def is_running(cls) -> bool:
+        return cls._task is not None and not cls._task.done()
+
+    @classmethod
+    async def start(cls) -> None:
+        if cls.is_running():
+            return
+        cls._task = asyncio.create_task(cls._refresh_loop(), name='currency-rates-refresh')
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task and not cls._task.done():
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+        cls._task = None
+
+    @classmethod
+    async def _refresh_loop(cls) -> None:
+        while True:
+            try:
+                await currency_converter.refresh_usd_to_rub_rate()
+                await cls.reload()
+            except Exception as error:
+                logger.error('❌ Ошибка обновления таблицы курсов: %s', error)
+            await asyncio.sleep(max(1, settings.CURRENCY_RATES_REFRESH_INTERVAL_MINUTES) * 60)
+
 
 currency_rate_service = CurrencyRateService()
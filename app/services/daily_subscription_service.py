@@ -6,6 +6,8 @@
 
 import asyncio
 import logging
+import time
+from dataclasses import dataclass
 from datetime import datetime
 
 from aiogram import Bot
@@ -14,14 +16,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.subscription import (
-    get_daily_subscriptions_for_charge,
-    suspend_daily_subscription_insufficient_balance,
-    update_daily_charge_time,
+    extend_daily_subscriptions,
+    get_daily_subscription_ids_for_charge,
+    get_subscription_by_id,
+    lock_daily_subscriptions_for_charge,
+    suspend_daily_subscriptions,
 )
-from app.database.crud.transaction import create_transaction
-from app.database.crud.user import get_user_by_id, subtract_user_balance
+from app.database.crud.transaction import TransactionEntry, add_transactions_batch, run_transaction_hooks
+from app.database.crud.user import debit_user_balances, get_user_balances
 from app.database.database import AsyncSessionLocal
-from app.database.models import PaymentMethod, Subscription, TransactionType, User
+from app.database.models import (
+    PaymentMethod,
+    Subscription,
+    TransactionType,
+    User,
+)
 from app.localization.texts import get_texts
 from app.services.notification_delivery_service import (
     NotificationType,
@@ -31,6 +40,56 @@ from app.services.notification_delivery_service import (
 
 logger = logging.getLogger(__name__)
 
+# Подписок на одну транзакцию списания
+DAILY_CHARGE_BATCH_SIZE = 200
+# Параллельных запросов к панели при синхронизации продлённых подписок
+PANEL_SYNC_CONCURRENCY = 10
+# Лимит Telegram — около 30 сообщений в секунду, оставляем запас
+NOTIFICATION_RATE_PER_SECOND = 20
+
+
+@dataclass(frozen=True, slots=True)
+class DailyChargeOutcome:
+    """
+    Результат обработки подписки на стадии списания.
+
+    Хранит только значения, а не ORM-объекты: стадии синхронизации и уведомлений
+    выполняются после закрытия сессии пачки.
+    """
+
+    subscription_id: int
+    user_id: int
+    telegram_id: int | None
+    email: str | None
+    email_verified: bool
+    language: str | None
+    balance_kopeks: int
+    amount_kopeks: int
+
+    @classmethod
+    def from_row(cls, subscription_id: int, user_row, amount_kopeks: int) -> 'DailyChargeOutcome':
+        return cls(
+            subscription_id=subscription_id,
+            user_id=user_row.id,
+            telegram_id=user_row.telegram_id,
+            email=user_row.email,
+            email_verified=bool(user_row.email_verified),
+            language=user_row.language,
+            balance_kopeks=user_row.balance_kopeks,
+            amount_kopeks=amount_kopeks,
+        )
+
+    def recipient(self) -> User:
+        """Несвязанный с сессией пользователь для сервиса уведомлений."""
+        return User(
+            id=self.user_id,
+            telegram_id=self.telegram_id,
+            email=self.email,
+            email_verified=self.email_verified,
+            language=self.language or 'ru',
+            balance_kopeks=self.balance_kopeks,
+        )
+
 
 class DailySubscriptionService:
     """
@@ -58,143 +117,202 @@ class DailySubscriptionService:
         """
         Обрабатывает суточные списания.
 
+        Конвейер из трёх стадий:
+        1. списание в БД пачками: каждая пачка — в своей сессии и транзакции,
+           подписки блокируются и перепроверяются, балансы списываются UPDATE-запросами;
+        2. параллельная синхронизация продлённых подписок с панелью;
+        3. уведомления пользователей с ограничением скорости отправки.
+
         Returns:
-            dict: Статистика обработки
+            dict: Статистика обработки (включая время каждой стадии в секундах)
         """
         stats = {
             'checked': 0,
             'charged': 0,
             'suspended': 0,
             'errors': 0,
+            'timings': {},
         }
 
+        charged: list[DailyChargeOutcome] = []
+        suspended: list[DailyChargeOutcome] = []
+
+        started = time.monotonic()
+        subscription_ids: list[int] = []
         try:
             async with AsyncSessionLocal() as db:
-                try:
-                    subscriptions = await get_daily_subscriptions_for_charge(db)
-                    stats['checked'] = len(subscriptions)
-
-                    for subscription in subscriptions:
-                        try:
-                            result = await self._process_single_charge(db, subscription)
-                            if result == 'charged':
-                                stats['charged'] += 1
-                            elif result == 'suspended':
-                                stats['suspended'] += 1
-                            elif result == 'error':
-                                stats['errors'] += 1
-                        except Exception as e:
-                            logger.error(f'Ошибка обработки суточной подписки {subscription.id}: {e}', exc_info=True)
-                            stats['errors'] += 1
-                    await db.commit()
-                except Exception as e:
-                    logger.error(f'Ошибка при обработке подписок: {e}', exc_info=True)
-                    await db.rollback()
-
+                subscription_ids = await get_daily_subscription_ids_for_charge(db)
         except Exception as e:
             logger.error(f'Ошибка при получении подписок для списания: {e}', exc_info=True)
+        stats['checked'] = len(subscription_ids)
+        stats['timings']['select'] = time.monotonic() - started
 
-        return stats
+        for offset in range(0, len(subscription_ids), DAILY_CHARGE_BATCH_SIZE):
+            batch = subscription_ids[offset : offset + DAILY_CHARGE_BATCH_SIZE]
+            # Сессия на пачку: откат неудачной пачки не затрагивает остальные
+            try:
+                async with AsyncSessionLocal() as db:
+                    batch_charged, batch_suspended, batch_errors = await self._charge_batch(db, batch)
+            except Exception as e:
+                logger.error(f'Ошибка пакетного списания суточных подписок: {e}', exc_info=True)
+                stats['errors'] += len(batch)
+                continue
 
-    async def _process_single_charge(self, db, subscription) -> str:
-        """
-        Обрабатывает списание для одной подписки.
+            charged.extend(batch_charged)
+            suspended.extend(batch_suspended)
+            stats['errors'] += batch_errors
 
-        Returns:
-            str: "charged", "suspended", "error", "skipped"
-        """
-        user = subscription.user
-        if not user:
-            user = await get_user_by_id(db, subscription.user_id)
+        stats['charged'] = len(charged)
+        stats['suspended'] = len(suspended)
+        stats['timings']['charge'] = time.monotonic() - started - stats['timings']['select']
 
-        if not user:
-            logger.warning(f'Пользователь не найден для подписки {subscription.id}')
-            return 'error'
+        stage_started = time.monotonic()
+        await self._sync_panel(charged)
+        stats['timings']['panel_sync'] = time.monotonic() - stage_started
 
-        tariff = subscription.tariff
-        if not tariff:
-            logger.warning(f'Тариф не найден для подписки {subscription.id}')
-            return 'error'
+        stage_started = time.monotonic()
+        if self._bot:
+            await self._send_notifications(charged, suspended)
+        stats['timings']['notify'] = time.monotonic() - stage_started
 
-        daily_price = tariff.daily_price_kopeks
-        if daily_price <= 0:
-            logger.warning(f'Некорректная суточная цена для тарифа {tariff.id}')
-            return 'error'
+        if stats['checked']:
+            timings = ', '.join(f'{stage}={seconds:.2f}с' for stage, seconds in stats['timings'].items())
+            logger.info(f'⏱️ Суточные списания по стадиям: {timings}')
 
-        # Проверяем баланс
-        if user.balance_kopeks < daily_price:
-            # Недостаточно средств - приостанавливаем подписку
-            await suspend_daily_subscription_insufficient_balance(db, subscription)
+        return stats
 
-            # Уведомляем пользователя
-            if self._bot:
-                await self._notify_insufficient_balance(user, subscription, daily_price)
+    async def _charge_batch(
+        self, db: AsyncSession, subscription_ids: list[int]
+    ) -> tuple[list['DailyChargeOutcome'], list['DailyChargeOutcome'], int]:
+        """
+        Списывает плату за пачку подписок одной транзакцией.
 
-            logger.info(
-                f'Подписка {subscription.id} приостановлена: недостаточно средств '
-                f'(баланс: {user.balance_kopeks}, требуется: {daily_price})'
-            )
-            return 'suspended'
+        Подписки блокируются с повторной проверкой всех условий списания,
+        балансы списываются UPDATE ... WHERE balance_kopeks >= цена, продление
+        и приостановка — по одному UPDATE на пачку.
 
-        # Списываем средства
-        description = f'Суточная оплата тарифа «{tariff.name}»'
+        Returns:
+            tuple: (списанные, приостановленные, количество ошибок)
+        """
+        errors = 0
+        now = datetime.utcnow()
+        currency = settings.DEFAULT_BALANCE_CURRENCY
+
+        plans = {}
+        for plan in await lock_daily_subscriptions_for_charge(db, subscription_ids, now):
+            if plan.daily_price_kopeks <= 0:
+                logger.warning(f'Некорректная суточная цена для подписки {plan.id} (тариф «{plan.tariff_name}»)')
+                errors += 1
+                continue
+            plans[plan.user_id] = plan
+
+        debited = await debit_user_balances(
+            db, {user_id: plan.daily_price_kopeks for user_id, plan in plans.items()}, currency, now
+        )
+        not_debited = await get_user_balances(db, [user_id for user_id in plans if user_id not in debited])
+
+        charged: list[DailyChargeOutcome] = []
+        suspended: list[DailyChargeOutcome] = []
+        entries: list[TransactionEntry] = []
+
+        for user_id, plan in plans.items():
+            daily_price = plan.daily_price_kopeks
+            user_row = debited.get(user_id)
+            if user_row is not None:
+                entries.append(
+                    TransactionEntry(
+                        user_id=user_id,
+                        type=TransactionType.SUBSCRIPTION_PAYMENT,
+                        amount_kopeks=daily_price,
+                        description=f'Суточная оплата тарифа «{plan.tariff_name}»',
+                        payment_method=PaymentMethod.MANUAL,
+                        currency=currency,
+                    )
+                )
+                charged.append(DailyChargeOutcome.from_row(plan.id, user_row, daily_price))
+                user_id_display = user_row.telegram_id or user_row.email or f'#{user_id}'
+                logger.info(
+                    f'✅ Суточное списание: подписка {plan.id}, сумма {daily_price} коп., пользователь {user_id_display}'
+                )
+                continue
+
+            user_row = not_debited.get(user_id)
+            if user_row is None:
+                logger.warning(f'Пользователь не найден для подписки {plan.id}')
+                errors += 1
+                continue
+
+            if (user_row.balance_currency or '').upper() != currency.upper():
+                logger.error(
+                    f'❌ Валюта не совпадает для подписки {plan.id}: '
+                    f'баланс в {user_row.balance_currency}, тариф в {currency}'
+                )
+                errors += 1
+                continue
 
-        try:
-            deducted = await subtract_user_balance(
-                db,
-                user,
-                daily_price,
-                description,
+            # Недостаточно средств - приостанавливаем подписку
+            suspended.append(DailyChargeOutcome.from_row(plan.id, user_row, daily_price))
+            logger.info(
+                f'Подписка {plan.id} приостановлена: недостаточно средств '
+                f'(баланс: {user_row.balance_kopeks}, требуется: {daily_price})'
             )
 
-            if not deducted:
-                logger.warning(f'Не удалось списать средства для подписки {subscription.id}')
-                return 'error'
-
-            # Создаём транзакцию
-            await create_transaction(
-                db=db,
-                user_id=user.id,
-                type=TransactionType.SUBSCRIPTION_PAYMENT,
-                amount_kopeks=daily_price,
-                description=description,
-                payment_method=PaymentMethod.MANUAL,
-            )
+        await extend_daily_subscriptions(db, [outcome.subscription_id for outcome in charged], now)
+        await suspend_daily_subscriptions(db, [outcome.subscription_id for outcome in suspended])
 
-            # Обновляем время последнего списания и продлеваем подписку
-            subscription = await update_daily_charge_time(db, subscription)
+        # Все обновления балансов, подписок и транзакции пачки — одним коммитом
+        transactions = await add_transactions_batch(db, entries)
+        await db.commit()
 
-            user_id_display = user.telegram_id or user.email or f'#{user.id}'
-            logger.info(
-                f'✅ Суточное списание: подписка {subscription.id}, '
-                f'сумма {daily_price} коп., пользователь {user_id_display}'
-            )
+        for transaction in transactions:
+            await run_transaction_hooks(db, transaction)
 
-            # Синхронизируем с Remnawave (обновляем срок подписки)
-            try:
-                from app.services.subscription_service import SubscriptionService
-
-                subscription_service = SubscriptionService()
-                await subscription_service.create_remnawave_user(
-                    db,
-                    subscription,
-                    reset_traffic=False,
-                    reset_reason=None,
-                )
-            except Exception as e:
-                logger.warning(f'Не удалось обновить Remnawave: {e}')
+        return charged, suspended, errors
 
-            # Уведомляем пользователя
-            if self._bot:
-                await self._notify_daily_charge(user, subscription, daily_price)
+    async def _sync_panel(self, charged: list['DailyChargeOutcome']) -> None:
+        """Синхронизирует продлённые подписки с Remnawave параллельно, каждая — в своей сессии."""
+        if not charged:
+            return
 
-            return 'charged'
+        from app.services.subscription_service import SubscriptionService
 
-        except Exception as e:
-            logger.error(f'Ошибка при списании средств для подписки {subscription.id}: {e}', exc_info=True)
-            return 'error'
+        subscription_service = SubscriptionService()
+        semaphore = asyncio.Semaphore(PANEL_SYNC_CONCURRENCY)
 
-    async def _notify_daily_charge(self, user, subscription, amount_kopeks: int):
+        async def sync(subscription_id: int) -> None:
+            async with semaphore:
+                try:
+                    async with AsyncSessionLocal() as db:
+                        subscription = await get_subscription_by_id(db, subscription_id)
+                        if not subscription:
+                            return
+                        await subscription_service.create_remnawave_user(
+                            db,
+                            subscription,
+                            reset_traffic=False,
+                            reset_reason=None,
+                        )
+                except Exception as e:
+                    logger.warning(f'Не удалось обновить Remnawave для подписки {subscription_id}: {e}')
+
+        await asyncio.gather(*(sync(outcome.subscription_id) for outcome in charged))
+
+    async def _send_notifications(
+        self,
+        charged: list['DailyChargeOutcome'],
+        suspended: list['DailyChargeOutcome'],
+    ) -> None:
+        """Отправляет уведомления не чаще NOTIFICATION_RATE_PER_SECOND в секунду."""
+        interval = 1 / NOTIFICATION_RATE_PER_SECOND
+        jobs = [(self._notify_daily_charge, outcome) for outcome in charged]
+        jobs.extend((self._notify_insufficient_balance, outcome) for outcome in suspended)
+
+        for index, (notify, outcome) in enumerate(jobs):
+            if index:
+                await asyncio.sleep(interval)
+            await notify(outcome.recipient(), outcome.subscription_id, outcome.amount_kopeks)
+
+    async def _notify_daily_charge(self, user, subscription_id: int, amount_kopeks: int):
         """Уведомляет пользователя о суточном списании."""
         get_texts(getattr(user, 'language', 'ru'))
         amount_rubles = amount_kopeks / 100
@@ -219,7 +337,7 @@ class DailySubscriptionService:
         except Exception as e:
             logger.warning(f'Не удалось отправить уведомление о списании: {e}')
 
-    async def _notify_insufficient_balance(self, user, subscription, required_amount: int):
+    async def _notify_insufficient_balance(self, user, subscription_id: int, required_amount: int):
         """Уведомляет пользователя о недостатке средств."""
         from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
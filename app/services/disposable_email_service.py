@@ -4,9 +4,8 @@ import asyncio
 import logging
 from datetime import UTC, datetime
 
-import aiohttp
-
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -50,7 +49,7 @@ class DisposableEmailService:
     async def _update_domains(self) -> None:
         """Fetch domains.txt from GitHub and swap the in-memory set."""
         try:
-            async with aiohttp.ClientSession() as session, session.get(self.DOMAINS_URL) as resp:
+            async with http_clients.request('github', 'GET', self.DOMAINS_URL) as resp:
                 if resp.status != 200:
                     logger.error(
                         'Failed to fetch disposable domains: HTTP %d',
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import time
 from collections.abc import Callable
 from datetime import datetime
 from typing import Any
@@ -14,13 +15,72 @@ from app.services.webhook_service import webhook_service
 
 logger = logging.getLogger(__name__)
 
+# Ограничения fan-out: очередь на подписчика и таймауты отправки/слушателей
+WEBSOCKET_QUEUE_MAX_SIZE = 100
+WEBSOCKET_SEND_TIMEOUT = 5.0
+LISTENER_TIMEOUT = 5.0
+
+# Ссылки на фоновые закрытия медленных клиентов, чтобы задачи не собрал сборщик мусора
+_close_tasks: set[asyncio.Task] = set()
+
+
+class WebSocketSubscriber:
+    """WebSocket подписчик с собственной ограниченной очередью и задачей отправки."""
+
+    def __init__(self, websocket: Any, on_failure: Callable[[Any], None]) -> None:
+        self.websocket = websocket
+        self.queue: asyncio.Queue[tuple[str, float]] = asyncio.Queue(maxsize=WEBSOCKET_QUEUE_MAX_SIZE)
+        self.sent = 0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._on_failure = on_failure
+        self._task = asyncio.create_task(self._sender_loop(), name='websocket-event-sender')
+
+    def offer(self, message: str) -> bool:
+        """Положить сообщение в очередь; False — подписчик не успевает читать."""
+        try:
+            self.queue.put_nowait((message, time.monotonic()))
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def cancel(self) -> None:
+        if not self._task.done():
+            self._task.cancel()
+
+    async def _sender_loop(self) -> None:
+        while True:
+            message, enqueued_at = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message), timeout=WEBSOCKET_SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning('Failed to send WebSocket message: %s', error or type(error).__name__)
+                self._on_failure(self.websocket)
+                return
+
+            self.sent += 1
+            self.last_lag_seconds = time.monotonic() - enqueued_at
+            self.max_lag_seconds = max(self.max_lag_seconds, self.last_lag_seconds)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'queue_size': self.queue.qsize(),
+            'sent': self.sent,
+            'last_lag_seconds': round(self.last_lag_seconds, 3),
+            'max_lag_seconds': round(self.max_lag_seconds, 3),
+        }
+
 
 class EventEmitter:
     """Event emitter для отслеживания и распространения событий системы."""
 
     def __init__(self) -> None:
         self._listeners: dict[str, list[Callable]] = {}
-        self._websocket_connections: set[Any] = set()
+        self._websocket_subscribers: dict[Any, WebSocketSubscriber] = {}
+        self._slow_consumers_disconnected = 0
+        self._listener_timeouts = 0
 
     def on(self, event_type: str, callback: Callable) -> None:
         """Подписаться на событие."""
@@ -38,13 +98,26 @@ class EventEmitter:
 
     def register_websocket(self, websocket: Any) -> None:
         """Зарегистрировать WebSocket подключение."""
-        self._websocket_connections.add(websocket)
-        logger.debug('WebSocket connection registered. Total: %d', len(self._websocket_connections))
+        if websocket not in self._websocket_subscribers:
+            self._websocket_subscribers[websocket] = WebSocketSubscriber(websocket, self.unregister_websocket)
+        logger.debug('WebSocket connection registered. Total: %d', len(self._websocket_subscribers))
 
     def unregister_websocket(self, websocket: Any) -> None:
         """Отменить регистрацию WebSocket подключения."""
-        self._websocket_connections.discard(websocket)
-        logger.debug('WebSocket connection unregistered. Total: %d', len(self._websocket_connections))
+        subscriber = self._websocket_subscribers.pop(websocket, None)
+        if subscriber:
+            subscriber.cancel()
+        logger.debug('WebSocket connection unregistered. Total: %d', len(self._websocket_subscribers))
+
+    def get_stats(self) -> dict[str, Any]:
+        """Метрики fan-out: очереди и лаг WebSocket подписчиков, состояние очереди webhooks."""
+        return {
+            'listeners': {event_type: len(callbacks) for event_type, callbacks in self._listeners.items()},
+            'listener_timeouts': self._listener_timeouts,
+            'websocket_subscribers': [subscriber.to_dict() for subscriber in self._websocket_subscribers.values()],
+            'slow_consumers_disconnected': self._slow_consumers_disconnected,
+            'webhooks': webhook_service.get_stats(),
+        }
 
     async def emit(
         self,
@@ -59,42 +132,59 @@ class EventEmitter:
             'timestamp': str(datetime.utcnow()),
         }
 
-        # Вызываем локальные слушатели
-        if event_type in self._listeners:
-            for callback in self._listeners[event_type]:
-                try:
-                    if asyncio.iscoroutinefunction(callback):
-                        await callback(event_data)
-                    else:
-                        callback(event_data)
-                except Exception as error:
-                    logger.exception('Error in event listener for %s: %s', event_type, error)
-
-        # Отправляем через WebSocket
-        await self._broadcast_to_websockets(event_data)
-
-        # Отправляем webhooks
-        if db:
-            await webhook_service.send_webhook(db, event_type, payload)
+        # Вызываем локальные слушатели параллельно, с таймаутом
+        callbacks = self._listeners.get(event_type)
+        if callbacks:
+            await asyncio.gather(*(self._call_listener(event_type, callback, event_data) for callback in callbacks))
+
+        # WebSocket клиентам — через их очереди, не дожидаясь отправки
+        self._broadcast_to_websockets(event_data)
 
-    async def _broadcast_to_websockets(self, event_data: dict[str, Any]) -> None:
-        """Отправить событие всем подключенным WebSocket клиентам."""
-        if not self._websocket_connections:
+        # Webhooks доставляются фоновым воркером пачками, с повторами
+        if db:
+            webhook_service.enqueue(event_type, payload)
+
+    async def _call_listener(self, event_type: str, callback: Callable, event_data: dict[str, Any]) -> None:
+        try:
+            if asyncio.iscoroutinefunction(callback):
+                await asyncio.wait_for(callback(event_data), timeout=LISTENER_TIMEOUT)
+            else:
+                callback(event_data)
+        except TimeoutError:
+            self._listener_timeouts += 1
+            logger.warning('Event listener for %s timed out after %.1fs', event_type, LISTENER_TIMEOUT)
+        except Exception as error:
+            logger.exception('Error in event listener for %s: %s', event_type, error)
+
+    def _broadcast_to_websockets(self, event_data: dict[str, Any]) -> None:
+        """Поставить событие в очереди всех WebSocket клиентов; медленных отключаем."""
+        if not self._websocket_subscribers:
             return
 
-        disconnected = set()
+        # Сериализуем один раз для всех подписчиков
         message = json.dumps(event_data, default=str, ensure_ascii=False)
 
-        for ws in self._websocket_connections:
-            try:
-                await ws.send_text(message)
-            except Exception as error:
-                logger.warning('Failed to send WebSocket message: %s', error)
-                disconnected.add(ws)
-
-        # Удаляем отключенные соединения
-        for ws in disconnected:
-            self.unregister_websocket(ws)
+        slow_consumers = [
+            websocket for websocket, subscriber in self._websocket_subscribers.items() if not subscriber.offer(message)
+        ]
+
+        for websocket in slow_consumers:
+            self._slow_consumers_disconnected += 1
+            logger.warning('WebSocket client is too slow (queue full), disconnecting')
+            self.unregister_websocket(websocket)
+            task = asyncio.create_task(self._close_slow_consumer(websocket))
+            _close_tasks.add(task)
+            task.add_done_callback(_close_tasks.discard)
+
+    @staticmethod
+    async def _close_slow_consumer(websocket: Any) -> None:
+        try:
+            await asyncio.wait_for(
+                websocket.close(code=1013, reason='Slow consumer'),
+                timeout=WEBSOCKET_SEND_TIMEOUT,
+            )
+        except Exception as error:
+            logger.debug('Failed to close slow WebSocket client: %s', error)
 
 
 # Глобальный экземпляр event emitter
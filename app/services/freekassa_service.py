@@ -12,6 +12,7 @@ from typing import Any
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -62,20 +63,19 @@ async def get_public_ip() -> str:
             return _cached_public_ip
 
         # Пробуем получить IP от внешних сервисов
-        async with aiohttp.ClientSession() as session:
-            for service_url in IP_SERVICES:
-                try:
-                    async with session.get(service_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                        if response.status == 200:
-                            ip = (await response.text()).strip()
-                            # Простая валидация IPv4
-                            if ip and len(ip.split('.')) == 4:
-                                _cached_public_ip = ip
-                                logger.info(f'Определён публичный IP сервера: {ip}')
-                                return ip
-                except Exception as e:
-                    logger.debug(f'Не удалось получить IP от {service_url}: {e}')
-                    continue
+        for service_url in IP_SERVICES:
+            try:
+                async with http_clients.request('public_ip', 'GET', service_url) as response:
+                    if response.status == 200:
+                        ip = (await response.text()).strip()
+                        # Простая валидация IPv4
+                        if ip and len(ip.split('.')) == 4:
+                            _cached_public_ip = ip
+                            logger.info(f'Определён публичный IP сервера: {ip}')
+                            return ip
+            except Exception as e:
+                logger.debug(f'Не удалось получить IP от {service_url}: {e}')
+                continue
 
         # Fallback на известный рабочий IP если ничего не получилось
         fallback_ip = '185.92.183.173'
@@ -300,15 +300,14 @@ class FreekassaService:
         logger.info(f'Freekassa API create_order params: {params}')
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders/create',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'freekassa',
+                'POST',
+                f'{API_BASE_URL}/orders/create',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 text = await response.text()
                 logger.info(f'Freekassa API response: {text}')
 
@@ -366,15 +365,14 @@ class FreekassaService:
         logger.debug(f'Freekassa get_order_status params: {params}')
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'freekassa',
+                'POST',
+                f'{API_BASE_URL}/orders',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 text = await response.text()
                 logger.debug(f'Freekassa get_order_status response: {text}')
                 return await response.json()
@@ -391,15 +389,14 @@ class FreekassaService:
         params['signature'] = self._generate_api_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/balance',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'freekassa',
+                'POST',
+                f'{API_BASE_URL}/balance',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception(f'Freekassa API connection error: {e}')
@@ -414,15 +411,14 @@ class FreekassaService:
         params['signature'] = self._generate_api_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/currencies',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'freekassa',
+                'POST',
+                f'{API_BASE_URL}/currencies',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception(f'Freekassa API connection error: {e}')
@@ -10,6 +10,7 @@ from typing import Any
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -48,19 +49,18 @@ async def get_public_ip() -> str:
         if _cached_public_ip:
             return _cached_public_ip
 
-        async with aiohttp.ClientSession() as session:
-            for service_url in IP_SERVICES:
-                try:
-                    async with session.get(service_url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                        if response.status == 200:
-                            ip = (await response.text()).strip()
-                            if ip and len(ip.split('.')) == 4:
-                                _cached_public_ip = ip
-                                logger.info(f'KassaAI: определён публичный IP сервера: {ip}')
-                                return ip
-                except Exception as e:
-                    logger.debug(f'KassaAI: не удалось получить IP от {service_url}: {e}')
-                    continue
+        for service_url in IP_SERVICES:
+            try:
+                async with http_clients.request('public_ip', 'GET', service_url) as response:
+                    if response.status == 200:
+                        ip = (await response.text()).strip()
+                        if ip and len(ip.split('.')) == 4:
+                            _cached_public_ip = ip
+                            logger.info(f'KassaAI: определён публичный IP сервера: {ip}')
+                            return ip
+            except Exception as e:
+                logger.debug(f'KassaAI: не удалось получить IP от {service_url}: {e}')
+                continue
 
         fallback_ip = '127.0.0.1'
         logger.warning(f'KassaAI: не удалось определить публичный IP, используем fallback: {fallback_ip}')
@@ -174,15 +174,14 @@ class KassaAiService:
         )
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders/create',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'kassa_ai',
+                'POST',
+                f'{API_BASE_URL}/orders/create',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 text = await response.text()
                 logger.info(f'KassaAI API response: {text}')
 
@@ -249,15 +248,14 @@ class KassaAiService:
         logger.info(f'KassaAI get_order_status: order_id={order_id}')
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/orders',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'kassa_ai',
+                'POST',
+                f'{API_BASE_URL}/orders',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 text = await response.text()
                 logger.info(f'KassaAI get_order_status response: {text}')
                 return await response.json()
@@ -274,15 +272,14 @@ class KassaAiService:
         params['signature'] = self._generate_hmac_signature(params)
 
         try:
-            async with (
-                aiohttp.ClientSession() as session,
-                session.post(
-                    f'{API_BASE_URL}/balance',
-                    json=params,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=aiohttp.ClientTimeout(total=30),
-                ) as response,
-            ):
+            async with http_clients.request(
+                'kassa_ai',
+                'POST',
+                f'{API_BASE_URL}/balance',
+                json=params,
+                headers={'Content-Type': 'application/json'},
+                timeout=aiohttp.ClientTimeout(total=30),
+            ) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.exception(f'KassaAI API connection error: {e}')
@@ -5,6 +5,7 @@
 - constants.py - константы и дефолтная конфигурация
 - context.py - MenuContext для построения меню
 - history_service.py - сервис истории изменений
+- plan.py - скомпилированный план построения меню
 - stats_service.py - сервис статистики кликов
 - service.py - основной MenuLayoutService
 """
@@ -18,6 +19,7 @@ from .constants import (
 )
 from .context import MenuContext
 from .history_service import MenuLayoutHistoryService
+from .plan import MenuLayoutPlan
 from .service import MenuLayoutService
 from .stats_service import MenuLayoutStatsService
 
@@ -32,6 +34,7 @@ __all__ = [
     # Классы
     'MenuContext',
     'MenuLayoutHistoryService',
+    'MenuLayoutPlan',
     'MenuLayoutService',
     'MenuLayoutStatsService',
 ]
@@ -0,0 +1,263 @@
+"""Скомпилированный план меню.
+
+Конфигурация меню меняется редко, а главное меню строится на каждый показ.
+План компилируется из конфигурации один раз (и заново после ``save_config``):
+
+- условия строк и кнопок превращаются в список замыканий над ``MenuContext``;
+  флаги из ``settings`` читаются в момент показа, так как их меняют из админки;
+- кнопки без плейсхолдеров собираются один раз на каждый язык и переиспользуются;
+- тексты с плейсхолдерами заранее разбиты на литералы и подстановки;
+- кнопка ``connect`` с ``open_mode=direct`` зависит от подписки и по-прежнему
+  строится ``_build_button`` на каждый показ.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from app.config import settings
+from app.localization.texts import Texts, get_texts
+
+from .context import MenuContext
+
+
+Predicate = Callable[[MenuContext], bool]
+ButtonBuilder = Callable[..., InlineKeyboardButton | None]
+
+
+def _support_enabled() -> bool:
+    try:
+        from app.services.support_settings_service import SupportSettingsService
+
+        return SupportSettingsService.is_support_menu_enabled()
+    except Exception:
+        return settings.SUPPORT_MENU_ENABLED
+
+
+def _has_traffic_limit(context: MenuContext) -> bool:
+    if not context.subscription:
+        return False
+    traffic_limit = getattr(context.subscription, 'traffic_limit_gb', 0)
+    is_trial = getattr(context.subscription, 'is_trial', False)
+    return not (is_trial or traffic_limit <= 0)
+
+
+def _is_trial_user(context: MenuContext) -> bool:
+    return bool(context.subscription) and bool(getattr(context.subscription, 'is_trial', False))
+
+
+# Флаговые условия (значение ``True`` в конфигурации) в порядке ``_evaluate_conditions``
+_FLAG_CONDITIONS: dict[str, Predicate] = {
+    'has_active_subscription': lambda context: context.has_active_subscription,
+    'subscription_is_active': lambda context: context.subscription_is_active,
+    'has_traffic_limit': _has_traffic_limit,
+    'traffic_topup_enabled': lambda context: settings.is_traffic_topup_enabled() and not settings.is_tariffs_mode(),
+    'is_admin': lambda context: context.is_admin,
+    'is_moderator': lambda context: context.is_moderator and not context.is_admin,
+    'referral_enabled': lambda context: settings.is_referral_program_enabled(),
+    'contests_visible': lambda context: bool(settings.CONTESTS_BUTTON_VISIBLE),
+    'support_enabled': lambda context: _support_enabled(),
+    'language_selection_enabled': lambda context: settings.is_language_selection_enabled(),
+    'happ_enabled': lambda context: settings.is_happ_download_button_enabled(),
+    'simple_subscription_enabled': lambda context: bool(settings.SIMPLE_SUBSCRIPTION_ENABLED),
+    'show_trial': lambda context: not (context.has_had_paid_subscription or context.has_active_subscription),
+    'show_buy': lambda context: not (context.has_active_subscription and context.subscription_is_active),
+    'has_saved_cart': lambda context: context.has_saved_cart or context.show_resume_checkout,
+    'has_referrals': lambda context: context.referral_count > 0,
+    'is_trial_user': _is_trial_user,
+    'has_autopay': lambda context: context.has_autopay,
+}
+
+# Пороговые условия: (поле контекста, True для минимума / False для максимума)
+_BOUND_CONDITIONS: dict[str, tuple[str, bool]] = {
+    'min_balance_kopeks': ('balance_kopeks', True),
+    'max_balance_kopeks': ('balance_kopeks', False),
+    'min_registration_days': ('registration_days', True),
+    'max_registration_days': ('registration_days', False),
+    'min_referrals': ('referral_count', True),
+    'has_subscription_days_left': ('subscription_days', True),
+    'max_subscription_days_left': ('subscription_days', False),
+}
+
+_VISIBILITY: dict[str, Predicate] = {
+    'admins': lambda context: context.is_admin,
+    'moderators': lambda context: context.is_moderator and not context.is_admin,
+    'subscribers': lambda context: context.has_active_subscription and context.subscription_is_active,
+}
+
+
+def _bound_predicate(attribute: str, limit: Any, is_minimum: bool) -> Predicate:
+    if is_minimum:
+        return lambda context: getattr(context, attribute) >= limit
+    return lambda context: getattr(context, attribute) <= limit
+
+
+def compile_conditions(conditions: dict[str, Any] | None, visibility: str = 'all') -> tuple[Predicate, ...]:
+    """Предикаты, эквивалентные ``_check_visibility`` и ``_evaluate_conditions``."""
+    predicates: list[Predicate] = []
+    if visibility in _VISIBILITY:
+        predicates.append(_VISIBILITY[visibility])
+    if not conditions:
+        return tuple(predicates)
+
+    for name, predicate in _FLAG_CONDITIONS.items():
+        if conditions.get(name) is True:
+            predicates.append(predicate)
+
+    for name, (attribute, is_minimum) in _BOUND_CONDITIONS.items():
+        limit = conditions.get(name)
+        if limit is not None:
+            predicates.append(_bound_predicate(attribute, limit, is_minimum))
+
+    promo_groups = conditions.get('promo_group_ids')
+    if promo_groups and isinstance(promo_groups, list):
+        allowed = list(promo_groups)
+        predicates.append(lambda context: context.promo_group_id in allowed)
+
+    exclude_groups = conditions.get('exclude_promo_group_ids')
+    if exclude_groups and isinstance(exclude_groups, list):
+        excluded = list(exclude_groups)
+        predicates.append(lambda context: context.promo_group_id not in excluded)
+
+    return tuple(predicates)
+
+
+def _matches(predicates: tuple[Predicate, ...], context: MenuContext) -> bool:
+    return all(predicate(context) for predicate in predicates)
+
+
+# Плейсхолдер -> значение; суммы форматируются так же, как ``Texts.format_price``,
+# без создания объекта локализации на каждый показ
+_PLACEHOLDER_VALUES: dict[str, Callable[[MenuContext], str]] = {
+    'balance': lambda context: Texts.format_price(context.balance_kopeks),
+    'username': lambda context: context.username or 'User',
+    'subscription_days': lambda context: str(context.subscription_days),
+    'traffic_used': lambda context: f'{context.traffic_used_gb:.1f} GB',
+    'traffic_left': lambda context: f'{context.traffic_left_gb:.1f} GB',
+    'referral_count': lambda context: str(context.referral_count),
+    'referral_earnings': lambda context: Texts.format_price(context.referral_earnings_kopeks),
+}
+_PLACEHOLDER_PATTERN = re.compile(r'\{(' + '|'.join(_PLACEHOLDER_VALUES) + r')\}')
+
+
+def tokenize_placeholders(text: str) -> tuple[str | Callable[[MenuContext], str], ...]:
+    """Разбить текст на литералы и функции подстановки; пустой кортеж — плейсхолдеров нет."""
+    parts = _PLACEHOLDER_PATTERN.split(text)
+    if len(parts) == 1:
+        return ()
+    # После split нечётные элементы — имена плейсхолдеров
+    return tuple(_PLACEHOLDER_VALUES[part] if index % 2 else part for index, part in enumerate(parts) if part)
+
+
+@dataclass(slots=True)
+class CompiledButton:
+    button_id: str
+    config: dict[str, Any]
+    predicates: tuple[Predicate, ...]
+    per_render: bool
+    _by_language: dict[str, tuple[InlineKeyboardButton | None, tuple]] = field(default_factory=dict)
+
+    def render(
+        self,
+        context: MenuContext,
+        build_button: ButtonBuilder,
+        resolve_texts: Callable[[], Any],
+    ) -> InlineKeyboardButton | None:
+        if self.per_render:
+            return build_button(self.config, context, resolve_texts(), button_id=self.button_id)
+
+        compiled = self._by_language.get(context.language)
+        if compiled is None:
+            # Кнопка строится с пустым контекстом языка; плейсхолдеры остаются в тексте шаблоном
+            static_config = {**self.config, 'dynamic_text': False}
+            button = build_button(static_config, MenuContext(language=context.language), None, button_id=self.button_id)
+            tokens = tokenize_placeholders(button.text) if button and self.config.get('dynamic_text') else ()
+            compiled = self._by_language[context.language] = (button, tokens)
+
+        button, tokens = compiled
+        if button is None or not tokens:
+            return button
+        text = ''.join(token if isinstance(token, str) else token(context) for token in tokens)
+        return button.model_copy(update={'text': text})
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledRow:
+    predicates: tuple[Predicate, ...]
+    buttons: tuple[CompiledButton, ...]
+    max_per_row: int
+
+
+@dataclass(frozen=True, slots=True)
+class MenuLayoutPlan:
+    config: dict[str, Any]
+    rows: tuple[CompiledRow, ...]
+    build_button: ButtonBuilder
+
+    @classmethod
+    def compile(cls, config: dict[str, Any], build_button: ButtonBuilder) -> MenuLayoutPlan:
+        buttons_config = config.get('buttons', {})
+        rows: list[CompiledRow] = []
+
+        for row_config in config.get('rows', []):
+            buttons: list[CompiledButton] = []
+            for button_id in row_config.get('buttons', []):
+                button_cfg = buttons_config.get(button_id)
+                if button_cfg is None or not button_cfg.get('enabled', True):
+                    continue
+                buttons.append(
+                    CompiledButton(
+                        button_id=button_id,
+                        config=button_cfg,
+                        predicates=compile_conditions(
+                            button_cfg.get('conditions'), button_cfg.get('visibility', 'all')
+                        ),
+                        # Прямое открытие builtin-кнопки берёт URL из подписки пользователя
+                        per_render=button_cfg.get('type', 'builtin') == 'builtin'
+                        and button_cfg.get('open_mode', 'callback') == 'direct',
+                    )
+                )
+            if buttons:
+                rows.append(
+                    CompiledRow(
+                        predicates=compile_conditions(row_config.get('conditions')),
+                        buttons=tuple(buttons),
+                        max_per_row=row_config.get('max_per_row', 2),
+                    )
+                )
+
+        return cls(config=config, rows=tuple(rows), build_button=build_button)
+
+    def build(self, context: MenuContext) -> InlineKeyboardMarkup:
+        # Объект локализации дорог в создании и нужен только кнопкам, строящимся на каждый показ
+        texts: Any = None
+
+        def resolve_texts() -> Any:
+            nonlocal texts
+            if texts is None:
+                texts = get_texts(context.language)
+            return texts
+
+        keyboard_rows: list[list[InlineKeyboardButton]] = []
+
+        for row in self.rows:
+            if not _matches(row.predicates, context):
+                continue
+
+            row_buttons: list[InlineKeyboardButton] = []
+            for compiled in row.buttons:
+                if not _matches(compiled.predicates, context):
+                    continue
+                button = compiled.render(context, self.build_button, resolve_texts)
+                if button:
+                    row_buttons.append(button)
+
+            for i in range(0, len(row_buttons), row.max_per_row):
+                keyboard_rows.append(row_buttons[i : i + row.max_per_row])
+
+        return InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
@@ -28,6 +28,7 @@ from .constants import (
 )
 from .context import MenuContext
 from .history_service import MenuLayoutHistoryService
+from .plan import MenuLayoutPlan
 from .stats_service import MenuLayoutStatsService
 
 
@@ -39,6 +40,7 @@ class MenuLayoutService:
 
     _cache: dict[str, Any] | None = None
     _cache_updated_at: datetime | None = None
+    _plan: MenuLayoutPlan | None = None
     _lock: asyncio.Lock = asyncio.Lock()
 
     # --- Управление кешем ---
@@ -48,6 +50,7 @@ class MenuLayoutService:
         """Инвалидировать кеш конфигурации."""
         cls._cache = None
         cls._cache_updated_at = None
+        cls._plan = None
 
     # --- Получение констант и информации ---
 
@@ -240,6 +243,15 @@ class MenuLayoutService:
 
             return cls._cache
 
+    @classmethod
+    async def get_plan(cls, db: AsyncSession) -> MenuLayoutPlan:
+        """Получить скомпилированный план меню для текущей конфигурации."""
+        config = await cls.get_config(db)
+        plan = cls._plan
+        if plan is None or plan.config is not config:
+            plan = cls._plan = MenuLayoutPlan.compile(config, cls._build_button)
+        return plan
+
     @classmethod
     async def get_config_updated_at(cls, db: AsyncSession) -> datetime | None:
         """Получить время последнего обновления конфигурации."""
@@ -1084,54 +1096,9 @@ class MenuLayoutService:
         db: AsyncSession,
         context: MenuContext,
     ) -> InlineKeyboardMarkup:
-        """Построить клавиатуру меню на основе конфигурации."""
-        config = await cls.get_config(db)
-        texts = get_texts(context.language)
-
-        keyboard_rows: list[list[InlineKeyboardButton]] = []
-        rows_config = config.get('rows', [])
-        buttons_config = config.get('buttons', {})
-
-        for row_config in rows_config:
-            # Проверяем условия строки
-            row_conditions = row_config.get('conditions')
-            if not cls._evaluate_conditions(row_conditions, context):
-                continue
-
-            row_buttons: list[InlineKeyboardButton] = []
-            max_per_row = row_config.get('max_per_row', 2)
-
-            for button_id in row_config.get('buttons', []):
-                if button_id not in buttons_config:
-                    continue
-
-                button_cfg = buttons_config[button_id]
-
-                # Проверяем включена ли кнопка
-                if not button_cfg.get('enabled', True):
-                    continue
-
-                # Проверяем видимость
-                visibility = button_cfg.get('visibility', 'all')
-                if not cls._check_visibility(visibility, context):
-                    continue
-
-                # Проверяем условия кнопки
-                button_conditions = button_cfg.get('conditions')
-                if not cls._evaluate_conditions(button_conditions, context):
-                    continue
-
-                # Строим кнопку (передаём button_id для кастомных кнопок)
-                button = cls._build_button(button_cfg, context, texts, button_id=button_id)
-                if button:
-                    row_buttons.append(button)
-
-            # Добавляем кнопки с учетом max_per_row
-            if row_buttons:
-                for i in range(0, len(row_buttons), max_per_row):
-                    keyboard_rows.append(row_buttons[i : i + max_per_row])
-
-        return InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
+        """Построить клавиатуру меню по скомпилированному плану конфигурации."""
+        plan = await cls.get_plan(db)
+        return plan.build(context)
 
     @classmethod
     async def preview_keyboard(
@@ -46,6 +46,7 @@ from app.database.models import (
     User,
     UserPromoGroup,
 )
+from app.database.referrer_ledger import reconcile_referrer_ledger
 from app.external.remnawave_api import (
     RemnaWaveAPIError,
     RemnaWaveUser,
@@ -199,6 +200,8 @@ class MonitoringService:
             pass
 
     async def _monitoring_cycle(self):
+        await self._reconcile_referrer_ledger()
+
         async with AsyncSessionLocal() as db:
             try:
                 await self._cleanup_notification_cache()
@@ -251,6 +254,18 @@ class MonitoringService:
                     pass
                 await db.rollback()
 
+    async def _reconcile_referrer_ledger(self):
+        # Отдельная сессия: ошибка пересчёта не должна откатывать цикл уведомлений
+        async with AsyncSessionLocal() as db:
+            try:
+                reconciled = await reconcile_referrer_ledger(db)
+                await db.commit()
+                if reconciled:
+                    logger.info('🧮 referrer_ledger пересчитана для %s рефереров', reconciled)
+            except Exception as e:
+                logger.error(f'Ошибка пересчёта referrer_ledger: {e}')
+                await db.rollback()
+
     async def _cleanup_notification_cache(self):
         current_time = datetime.utcnow()
 
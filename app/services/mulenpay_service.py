@@ -7,6 +7,7 @@ from typing import Any
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -51,16 +52,15 @@ class MulenPayService:
 
         for attempt in range(1, self._max_retries + 1):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=self._timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        headers=headers,
-                        json=json_data,
-                        params=params,
-                    ) as response,
-                ):
+                async with http_clients.request(
+                    'mulenpay',
+                    method,
+                    url,
+                    headers=headers,
+                    json=json_data,
+                    params=params,
+                    timeout=self._timeout,
+                ) as response:
                     data, raw_text = await self._deserialize_response(response)
 
                     if response.status >= 400:
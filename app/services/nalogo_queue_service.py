@@ -2,11 +2,20 @@
 
 При временной недоступности сервиса nalog.ru (503), чеки сохраняются в Redis
 и отправляются позже этим сервисом.
+
+Чек берётся в обработку атомарно (переносится в список обработки с арендой),
+поэтому падение процесса между извлечением и отправкой не теряет его: по
+истечении visibility timeout чек возвращается в очередь. Очередь разгружается
+несколькими параллельными отправками; параллелизм и темп растут при успехах и
+сбрасываются при ошибках (AIMD).
 """
 
 import asyncio
 import logging
+import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from typing import Any
 
 from aiogram import Bot
 from dateutil.parser import isoparse
@@ -18,6 +27,61 @@ from app.utils.cache import cache
 
 logger = logging.getLogger(__name__)
 
+_MIN_DELAY_RATIO = 0.1  # Минимальная пауза между отправками — доля NALOGO_QUEUE_RECEIPT_DELAY
+_MAX_DELAY_RATIO = 8.0  # Максимальная пауза при отступлении после ошибок
+_MAX_CONSECUTIVE_FAILURES = 3  # Столько ошибок подряд — сервис недоступен, ждём следующего цикла
+
+
+@dataclass(slots=True)
+class _AdaptiveLimiter:
+    """Параллелизм и пауза между отправками: растут при успехах, сбрасываются при ошибках."""
+
+    max_concurrency: int
+    base_delay: float
+    concurrency: float = 1.0
+    delay: float = field(init=False)
+    consecutive_failures: int = 0
+    peak_limit: int = 1
+
+    def __post_init__(self) -> None:
+        self.delay = self.base_delay
+
+    @property
+    def limit(self) -> int:
+        return max(1, int(self.concurrency))
+
+    @property
+    def exhausted(self) -> bool:
+        return self.consecutive_failures >= _MAX_CONSECUTIVE_FAILURES
+
+    def on_success(self) -> None:
+        self.consecutive_failures = 0
+        # +1 к параллелизму за каждые limit успешных отправок
+        self.concurrency = min(float(self.max_concurrency), self.concurrency + 1 / self.limit)
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self.delay = max(self.base_delay * _MIN_DELAY_RATIO, self.delay * 0.75)
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.concurrency = max(1.0, self.concurrency / 2)
+        self.delay = min(self.base_delay * _MAX_DELAY_RATIO, max(self.delay, self.base_delay) * 2)
+
+
+@dataclass(slots=True)
+class _DrainStats:
+    started_at: float = field(default_factory=time.monotonic)
+    processed: int = 0
+    failed: int = 0
+    processed_amount: float = 0.0
+
+    @property
+    def rate(self) -> float | None:
+        """Скорость разгрузки, чеков в секунду."""
+        elapsed = time.monotonic() - self.started_at
+        if not self.processed or elapsed <= 0:
+            return None
+        return self.processed / elapsed
+
 
 class NalogoQueueService:
     """Сервис фоновой обработки очереди чеков NaloGO."""
@@ -30,6 +94,10 @@ class NalogoQueueService:
         self._last_notification_time: datetime | None = None
         self._notification_cooldown = timedelta(hours=1)  # Не чаще раза в час
         self._had_pending_receipts = False  # Флаг для отслеживания успешной разгрузки
+        self._limiter: _AdaptiveLimiter | None = None  # Текущая разгрузка
+        self._drain: _DrainStats | None = None
+        self._drain_rate: float | None = None  # Сглаженная скорость прошлых разгрузок, чеков/с
+        self._last_drain: dict[str, Any] | None = None
 
     def set_nalogo_service(self, service: NaloGoService) -> None:
         """Установить сервис NaloGO."""
@@ -53,6 +121,16 @@ class NalogoQueueService:
         """Задержка между отправкой чеков в секундах."""
         return getattr(settings, 'NALOGO_QUEUE_RECEIPT_DELAY', 3)
 
+    @property
+    def _max_concurrency(self) -> int:
+        """Максимум одновременных отправок при разгрузке очереди."""
+        return max(1, getattr(settings, 'NALOGO_QUEUE_MAX_CONCURRENCY', 4))
+
+    @property
+    def _visibility_timeout(self) -> int:
+        """Через сколько секунд неподтверждённый чек возвращается в очередь."""
+        return getattr(settings, 'NALOGO_QUEUE_VISIBILITY_TIMEOUT', 300)
+
     @property
     def _max_attempts(self) -> int:
         """Максимальное количество попыток отправки чека."""
@@ -72,7 +150,8 @@ class NalogoQueueService:
         self._task = asyncio.create_task(self._process_queue_loop())
         logger.info(
             f'Сервис очереди чеков NaloGO запущен '
-            f'(интервал: {self._check_interval}с, задержка между чеками: {self._receipt_delay}с)'
+            f'(интервал: {self._check_interval}с, задержка между чеками: {self._receipt_delay}с, '
+            f'параллельно до {self._max_concurrency})'
         )
 
     async def stop(self) -> None:
@@ -133,6 +212,10 @@ class NalogoQueueService:
         if not self._nalogo_service:
             return
 
+        recovered = await self._nalogo_service.recover_expired_receipts()
+        if recovered:
+            logger.warning(f'Возвращено в очередь зависших в обработке чеков: {recovered}')
+
         queue_length = await self._nalogo_service.get_queue_length()
         if queue_length == 0:
             return
@@ -140,104 +223,60 @@ class NalogoQueueService:
         logger.info(f'Начинаем обработку очереди чеков: {queue_length} шт.')
         self._had_pending_receipts = True
 
-        processed = 0
-        failed = 0
-        skipped = 0
-        total_processed_amount = 0.0
-        service_unavailable = False
-
-        while True:
-            receipt_data = await self._nalogo_service.pop_receipt_from_queue()
-            if not receipt_data:
-                break
-
-            attempts = receipt_data.get('attempts', 0)
-            payment_id = receipt_data.get('payment_id', 'unknown')
-            amount = receipt_data.get('amount', 0)
-
-            # Логируем количество попыток (чек никогда не удаляется из очереди)
-            if attempts >= 10:
-                logger.warning(f'Чек {payment_id} уже {attempts} попыток, продолжаем пытаться...')
-
-            # Пытаемся отправить чек
-            try:
-                # Восстанавливаем описание из сохранённых данных
-                telegram_user_id = receipt_data.get('telegram_user_id')
-                amount_kopeks = receipt_data.get('amount_kopeks')
-
-                # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
-                operation_time = None
-                created_at_str = receipt_data.get('created_at')
-                if created_at_str:
-                    try:
-                        operation_time = isoparse(created_at_str)
-                    except (ValueError, TypeError) as parse_error:
-                        logger.warning(f"Не удалось распарсить created_at '{created_at_str}': {parse_error}")
-
-                # Формируем описание заново из настроек (если есть данные)
-                if amount_kopeks is not None:
-                    receipt_name = settings.get_balance_payment_description(amount_kopeks, telegram_user_id)
-                else:
-                    # Fallback на сохранённое имя
-                    receipt_name = receipt_data.get(
-                        'name', settings.get_balance_payment_description(int(amount * 100), telegram_user_id)
-                    )
-
-                receipt_uuid = await self._nalogo_service.create_receipt(
-                    name=receipt_name,
-                    amount=amount,
-                    quantity=receipt_data.get('quantity', 1),
-                    client_info=receipt_data.get('client_info'),
-                    payment_id=payment_id,
-                    queue_on_failure=False,  # Не добавлять в очередь повторно автоматически
-                    telegram_user_id=telegram_user_id,
-                    amount_kopeks=amount_kopeks,
-                    operation_time=operation_time,  # Время оплаты, а не отправки
-                )
-
-                if receipt_uuid:
-                    processed += 1
-                    total_processed_amount += amount
-
-                    # Удаляем метку "в очереди" (чек создан успешно)
-                    if payment_id:
-                        queued_key = f'nalogo:queued:{payment_id}'
-                        await cache.delete(queued_key)
-
-                    logger.info(
-                        f'Чек из очереди успешно создан: {receipt_uuid} '
-                        f'(payment_id={payment_id}, попытка {attempts + 1})'
-                    )
-                else:
-                    # Вернуть в очередь с увеличенным счетчиком попыток
-                    await self._nalogo_service.requeue_receipt(receipt_data)
-                    failed += 1
-                    service_unavailable = True
-                    logger.warning(
-                        f'Не удалось создать чек из очереди (payment_id={payment_id}), '
-                        f'возвращен в очередь (попытка {attempts + 1}/{self._max_attempts})'
-                    )
-                    # Если сервис недоступен, прекращаем попытки до следующего цикла
+        limiter = _AdaptiveLimiter(self._max_concurrency, float(self._receipt_delay))
+        stats = _DrainStats()
+        self._limiter, self._drain = limiter, stats
+        in_flight: set[asyncio.Task] = set()
+        try:
+            while not limiter.exhausted:
+                while len(in_flight) >= limiter.limit:
+                    _, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                if limiter.exhausted:
                     break
 
-            except Exception as error:
-                await self._nalogo_service.requeue_receipt(receipt_data)
-                failed += 1
-                logger.error(f'Ошибка при создании чека из очереди (payment_id={payment_id}): {error}')
-                # Прекращаем попытки при ошибке
-                break
-
-            # Задержка между чеками чтобы не долбить API
-            await asyncio.sleep(self._receipt_delay)
+                claimed = await self._nalogo_service.claim_receipt(self._visibility_timeout)
+                if not claimed:
+                    break
+                token, receipt_data = claimed
+                in_flight.add(asyncio.create_task(self._send_queued_receipt(token, receipt_data, limiter, stats)))
+
+                # Пауза между отправками чтобы не долбить API
+                await asyncio.sleep(limiter.delay)
+
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        finally:
+            # При остановке сервиса незавершённые чеки останутся в обработке
+            # и вернутся в очередь по visibility timeout
+            for task in in_flight:
+                task.cancel()
+            self._limiter = self._drain = None
+
+        processed, failed = stats.processed, stats.failed
+        total_processed_amount = stats.processed_amount
+
+        rate = stats.rate
+        if rate is not None:
+            self._drain_rate = rate if self._drain_rate is None else (self._drain_rate + rate) / 2
+        self._last_drain = {
+            'finished_at': datetime.now().isoformat(),
+            'processed': processed,
+            'failed': failed,
+            'duration_seconds': round(time.monotonic() - stats.started_at, 1),
+            'peak_concurrency': limiter.peak_limit,
+        }
 
-        if processed > 0 or failed > 0 or skipped > 0:
-            logger.info(f'Обработка очереди завершена: успешно={processed}, неудачно={failed}, пропущено={skipped}')
+        if processed > 0 or failed > 0:
+            logger.info(
+                f'Обработка очереди завершена: успешно={processed}, неудачно={failed}, '
+                f'параллельно до {limiter.peak_limit}, {self._last_drain["duration_seconds"]}с'
+            )
 
         # Проверяем остаток в очереди
         remaining = await self._nalogo_service.get_queue_length()
 
         # Отправляем уведомление если есть проблемы
-        if service_unavailable or failed > 0:
+        if failed > 0:
             if remaining > 0:
                 queued = await self._nalogo_service.get_queued_receipts()
                 total_queued_amount = sum(r.get('amount', 0) for r in queued)
@@ -262,6 +301,88 @@ class NalogoQueueService:
             )
             await self._send_admin_notification(message, skip_cooldown=True)
 
+    async def _send_queued_receipt(
+        self,
+        token: str,
+        receipt_data: dict[str, Any],
+        limiter: _AdaptiveLimiter,
+        stats: _DrainStats,
+    ) -> None:
+        """Отправить один чек, взятый из очереди, и подтвердить или вернуть его."""
+        attempts = receipt_data.get('attempts', 0)
+        payment_id = receipt_data.get('payment_id', 'unknown')
+        amount = receipt_data.get('amount', 0)
+
+        # Логируем количество попыток (чек никогда не удаляется из очереди)
+        if attempts >= 10:
+            logger.warning(f'Чек {payment_id} уже {attempts} попыток, продолжаем пытаться...')
+
+        try:
+            # Восстанавливаем описание из сохранённых данных
+            telegram_user_id = receipt_data.get('telegram_user_id')
+            amount_kopeks = receipt_data.get('amount_kopeks')
+
+            # Извлекаем время оплаты из очереди (чтобы чек был с правильным временем)
+            operation_time = None
+            created_at_str = receipt_data.get('created_at')
+            if created_at_str:
+                try:
+                    operation_time = isoparse(created_at_str)
+                except (ValueError, TypeError) as parse_error:
+                    logger.warning(f"Не удалось распарсить created_at '{created_at_str}': {parse_error}")
+
+            # Формируем описание заново из настроек (если есть данные)
+            if amount_kopeks is not None:
+                receipt_name = settings.get_balance_payment_description(amount_kopeks, telegram_user_id)
+            else:
+                # Fallback на сохранённое имя
+                receipt_name = receipt_data.get(
+                    'name', settings.get_balance_payment_description(int(amount * 100), telegram_user_id)
+                )
+
+            receipt_uuid = await self._nalogo_service.create_receipt(
+                name=receipt_name,
+                amount=amount,
+                quantity=receipt_data.get('quantity', 1),
+                client_info=receipt_data.get('client_info'),
+                payment_id=payment_id,
+                queue_on_failure=False,  # Не добавлять в очередь повторно автоматически
+                telegram_user_id=telegram_user_id,
+                amount_kopeks=amount_kopeks,
+                operation_time=operation_time,  # Время оплаты, а не отправки
+            )
+        except Exception as error:
+            await self._nalogo_service.requeue_receipt(receipt_data, token)
+            stats.failed += 1
+            limiter.on_failure()
+            logger.error(f'Ошибка при создании чека из очереди (payment_id={payment_id}): {error}')
+            return
+
+        if not receipt_uuid:
+            # Вернуть в очередь с увеличенным счетчиком попыток
+            await self._nalogo_service.requeue_receipt(receipt_data, token)
+            stats.failed += 1
+            limiter.on_failure()
+            logger.warning(
+                f'Не удалось создать чек из очереди (payment_id={payment_id}), '
+                f'возвращен в очередь (попытка {attempts + 1}/{self._max_attempts})'
+            )
+            return
+
+        # Если аренда истекла и чек уже вернулся в очередь, повторная отправка
+        # отсечётся по метке nalogo:created:{payment_id}
+        await self._nalogo_service.ack_receipt(token)
+        stats.processed += 1
+        stats.processed_amount += amount
+        limiter.on_success()
+
+        # Удаляем метку "в очереди" (чек создан успешно)
+        if payment_id:
+            queued_key = f'nalogo:queued:{payment_id}'
+            await cache.delete(queued_key)
+
+        logger.info(f'Чек из очереди успешно создан: {receipt_uuid} (payment_id={payment_id}, попытка {attempts + 1})')
+
     async def force_process(self) -> dict:
         """Принудительно обработать очередь (для ручного запуска)."""
         if not self._nalogo_service:
@@ -284,6 +405,7 @@ class NalogoQueueService:
     async def get_status(self) -> dict:
         """Получить статус сервиса и очереди."""
         queue_length = 0
+        processing_count = 0
         total_amount = 0.0
         queued_receipts = []
         pending_verification_count = 0
@@ -295,6 +417,7 @@ class NalogoQueueService:
             if queue_length > 0:
                 queued_receipts = await self._nalogo_service.get_queued_receipts()
                 total_amount = sum(r.get('amount', 0) for r in queued_receipts)
+            processing_count = await self._nalogo_service.get_processing_length()
 
             # Чеки ожидающие ручной проверки
             pending_verification_count = await self._nalogo_service.get_pending_verification_count()
@@ -302,11 +425,26 @@ class NalogoQueueService:
                 pending_verification_receipts = await self._nalogo_service.get_pending_verification_receipts()
                 pending_verification_amount = sum(r.get('amount', 0) for r in pending_verification_receipts)
 
+        # Во время разгрузки — текущая скорость, иначе сглаженная по прошлым разгрузкам
+        drain_rate = self._drain.rate if self._drain else None
+        if drain_rate is None:
+            drain_rate = self._drain_rate
+        eta_seconds = round((queue_length + processing_count) / drain_rate) if drain_rate and queue_length else None
+
         return {
             'running': self.is_running(),
             'check_interval_seconds': self._check_interval,
             'receipt_delay_seconds': self._receipt_delay,
+            'max_concurrency': self._max_concurrency,
+            'visibility_timeout_seconds': self._visibility_timeout,
+            'draining': self._limiter is not None,
+            'current_concurrency': self._limiter.limit if self._limiter else 0,
+            'current_delay_seconds': round(self._limiter.delay, 2) if self._limiter else None,
+            'drain_rate_per_minute': round(drain_rate * 60, 1) if drain_rate else None,
+            'eta_seconds': eta_seconds,
+            'last_drain': self._last_drain,
             'queue_length': queue_length,
+            'processing_count': processing_count,
             'total_amount': total_amount,
             'max_attempts': self._max_attempts,
             'queued_receipts': queued_receipts[:10],
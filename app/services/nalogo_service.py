@@ -14,6 +14,8 @@ from app.utils.cache import cache
 logger = logging.getLogger(__name__)
 
 NALOGO_QUEUE_KEY = 'nalogo:receipt_queue'
+NALOGO_PROCESSING_KEY = 'nalogo:receipt_processing'
+NALOGO_LEASES_KEY = 'nalogo:receipt_leases'
 NALOGO_PENDING_VERIFICATION_KEY = 'nalogo:pending_verification'
 
 
@@ -417,14 +419,36 @@ class NaloGoService:
         """Получить список чеков в очереди (без удаления)."""
         return await cache.lrange(NALOGO_QUEUE_KEY)
 
-    async def pop_receipt_from_queue(self) -> dict[str, Any] | None:
-        """Извлечь следующий чек из очереди."""
-        return await cache.rpop(NALOGO_QUEUE_KEY)
+    async def get_processing_length(self) -> int:
+        """Получить количество чеков, взятых в обработку."""
+        return await cache.llen(NALOGO_PROCESSING_KEY)
 
-    async def requeue_receipt(self, receipt_data: dict[str, Any]) -> bool:
+    async def claim_receipt(self, visibility_timeout: int) -> tuple[str, dict[str, Any]] | None:
+        """Взять следующий чек в обработку.
+
+        Чек остаётся в Redis (список обработки) до ``ack_receipt``/``requeue_receipt``;
+        если процесс упадёт, чек вернётся в очередь через ``visibility_timeout`` секунд.
+        """
+        return await cache.reliable_claim(
+            NALOGO_QUEUE_KEY, NALOGO_PROCESSING_KEY, NALOGO_LEASES_KEY, visibility_timeout
+        )
+
+    async def ack_receipt(self, token: str) -> bool:
+        """Подтвердить отправку чека, взятого через ``claim_receipt``."""
+        return await cache.reliable_release(NALOGO_QUEUE_KEY, NALOGO_PROCESSING_KEY, NALOGO_LEASES_KEY, token)
+
+    async def requeue_receipt(self, receipt_data: dict[str, Any], token: str | None = None) -> bool:
         """Вернуть чек обратно в очередь (при неудачной отправке)."""
         receipt_data['attempts'] = receipt_data.get('attempts', 0) + 1
-        return await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        if token is None:
+            return await cache.lpush(NALOGO_QUEUE_KEY, receipt_data)
+        return await cache.reliable_release(
+            NALOGO_QUEUE_KEY, NALOGO_PROCESSING_KEY, NALOGO_LEASES_KEY, token, requeue_value=receipt_data
+        )
+
+    async def recover_expired_receipts(self) -> int:
+        """Вернуть в очередь чеки, зависшие в обработке дольше visibility timeout."""
+        return await cache.reliable_recover(NALOGO_QUEUE_KEY, NALOGO_PROCESSING_KEY, NALOGO_LEASES_KEY)
 
     async def find_duplicate_receipt(
         self,
@@ -6,11 +6,12 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any
 
-from sqlalchemy import and_, case, desc, func, select
+from sqlalchemy import and_, case, desc, func, literal, or_, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.models import (
     ReferralEarning,
+    ReferrerLedger,
     Subscription,
     SubscriptionStatus,
     User,
@@ -501,51 +502,54 @@ class PartnerStatsService:
         days: int | None = None,
     ) -> list[dict[str, Any]]:
         """Получить топ рефереров."""
-        now = datetime.utcnow()
-        start_date = now - timedelta(days=days) if days else None
-
-        # Подсчёт рефералов и заработков
-        earnings_query = select(
-            ReferralEarning.user_id,
-            func.sum(ReferralEarning.amount_kopeks).label('total_earnings'),
-        ).group_by(ReferralEarning.user_id)
-        if start_date:
-            earnings_query = earnings_query.where(ReferralEarning.created_at >= start_date)
-
-        earnings_result = await db.execute(earnings_query)
-        earnings_dict = {row.user_id: int(row.total_earnings or 0) for row in earnings_result.all()}
-
-        # Подсчёт рефералов
-        referrals_query = (
-            select(
-                User.referred_by_id,
-                func.count(User.id).label('referrals_count'),
+        if days:
+            # За период: рефералы и заработки одним сгруппированным запросом, сортировка и LIMIT в SQL
+            start_date = datetime.utcnow() - timedelta(days=days)
+            source = union_all(
+                select(
+                    ReferralEarning.user_id.label('referrer_id'),
+                    literal(0).label('referrals_count'),
+                    ReferralEarning.amount_kopeks.label('earnings'),
+                ).where(ReferralEarning.created_at >= start_date),
+                select(
+                    User.referred_by_id.label('referrer_id'),
+                    literal(1).label('referrals_count'),
+                    literal(0).label('earnings'),
+                ).where(User.referred_by_id.isnot(None), User.created_at >= start_date),
+            ).subquery()
+            total_earnings = func.coalesce(func.sum(source.c.earnings), 0)
+            top_query = (
+                select(
+                    source.c.referrer_id.label('user_id'),
+                    func.sum(source.c.referrals_count).label('referrals_count'),
+                    total_earnings.label('total_earnings'),
+                )
+                .group_by(source.c.referrer_id)
+                .order_by(total_earnings.desc())
+                .limit(limit)
             )
-            .where(User.referred_by_id.isnot(None))
-            .group_by(User.referred_by_id)
-        )
-        if start_date:
-            referrals_query = referrals_query.where(User.created_at >= start_date)
-
-        referrals_result = await db.execute(referrals_query)
-        referrals_dict = {row.referred_by_id: row.referrals_count for row in referrals_result.all()}
-
-        # Объединяем данные
-        all_referrer_ids = set(earnings_dict.keys()) | set(referrals_dict.keys())
-        referrers_data = []
-
-        for referrer_id in all_referrer_ids:
-            referrers_data.append(
-                {
-                    'user_id': referrer_id,
-                    'referrals_count': referrals_dict.get(referrer_id, 0),
-                    'total_earnings': earnings_dict.get(referrer_id, 0),
-                }
+        else:
+            # За всё время: готовые счётчики из referrer_ledger
+            top_query = (
+                select(
+                    ReferrerLedger.referrer_id.label('user_id'),
+                    ReferrerLedger.referrals_count,
+                    ReferrerLedger.earnings_kopeks.label('total_earnings'),
+                )
+                .where(or_(ReferrerLedger.earnings_kopeks != 0, ReferrerLedger.referrals_count > 0))
+                .order_by(ReferrerLedger.earnings_kopeks.desc())
+                .limit(limit)
             )
 
-        # Сортируем по заработку
-        referrers_data.sort(key=lambda x: x['total_earnings'], reverse=True)
-        top_referrers = referrers_data[:limit]
+        top_result = await db.execute(top_query)
+        top_referrers = [
+            {
+                'user_id': row.user_id,
+                'referrals_count': int(row.referrals_count or 0),
+                'total_earnings': int(row.total_earnings or 0),
+            }
+            for row in top_result.all()
+        ]
 
         if not top_referrers:
             return []
@@ -33,6 +33,10 @@ from app.utils.user_utils import format_referrer_info
 renewal_service = SubscriptionRenewalService()
 
 
+# getInvoices принимает до 1000 id, держим пачки поменьше
+CRYPTOBOT_INVOICES_BATCH_SIZE = 100
+
+
 @dataclass(slots=True)
 class _AdminNotificationContext:
     user_id: int
@@ -720,6 +724,83 @@ class CryptoBotPaymentMixin:
                     remote_invoice = item
                     break
 
+        return await self._sync_cryptobot_invoice(db, payment, remote_invoice)
+
+    async def get_cryptobot_payment_statuses(
+        self,
+        db: AsyncSession,
+        local_payment_ids: list[int],
+    ) -> dict[int, dict[str, Any]]:
+        """Синхронизирует несколько CryptoBot invoice одним запросом getInvoices на пачку."""
+
+        cryptobot_crud = import_module('app.database.crud.cryptobot')
+        payments = []
+        for local_payment_id in local_payment_ids:
+            payment = await cryptobot_crud.get_cryptobot_payment_by_id(db, local_payment_id)
+            if payment:
+                payments.append(payment)
+            else:
+                logger.warning('CryptoBot платеж %s не найден', local_payment_id)
+
+        if not payments:
+            return {}
+
+        if not self.cryptobot_service:
+            logger.warning('CryptoBot сервис не инициализирован для проверки статусов')
+            return {payment.id: {'payment': payment} for payment in payments}
+
+        # Идентификаторы читаем заранее: откат после ошибки истекает загруженные объекты
+        entries = [(payment.id, payment.invoice_id, payment) for payment in payments]
+        results: dict[int, dict[str, Any]] = {}
+        rolled_back = False
+        for offset in range(0, len(entries), CRYPTOBOT_INVOICES_BATCH_SIZE):
+            chunk = entries[offset : offset + CRYPTOBOT_INVOICES_BATCH_SIZE]
+            invoice_ids = [invoice_id for _, invoice_id, _ in chunk]
+            try:
+                invoices = await self.cryptobot_service.get_invoices(invoice_ids=invoice_ids, count=len(invoice_ids))
+            except Exception as error:  # pragma: no cover - network errors
+                logger.error('Ошибка пакетного запроса статусов CryptoBot (%s шт.): %s', len(chunk), error)
+                for local_payment_id, _, payment in chunk:
+                    results[local_payment_id] = {'payment': payment}
+                continue
+
+            remote_by_id = {str(item.get('invoice_id')): item for item in invoices or []}
+            for local_payment_id, invoice_id, payment in chunk:
+                try:
+                    if rolled_back:
+                        await db.refresh(payment)
+                    results[local_payment_id] = await self._sync_cryptobot_invoice(
+                        db,
+                        payment,
+                        remote_by_id.get(str(invoice_id)),
+                    )
+                except Exception as error:
+                    logger.error(
+                        'Ошибка синхронизации CryptoBot invoice %s: %s',
+                        invoice_id,
+                        error,
+                        exc_info=True,
+                    )
+                    # Общая сессия должна пережить сбой одного инвойса, иначе упадут все следующие
+                    if db.in_transaction():
+                        await db.rollback()
+                        rolled_back = True
+                    results[local_payment_id] = {'payment': None, 'error': error}
+
+        return results
+
+    async def _sync_cryptobot_invoice(
+        self,
+        db: AsyncSession,
+        payment: Any,
+        remote_invoice: dict[str, Any] | None,
+    ) -> dict[str, Any]:
+        """Применяет статус invoice из API к локальному платежу."""
+
+        cryptobot_crud = import_module('app.database.crud.cryptobot')
+        local_payment_id = payment.id
+        invoice_id = payment.invoice_id
+
         if not remote_invoice:
             logger.info(
                 'CryptoBot invoice %s не найден через API при ручной проверке',
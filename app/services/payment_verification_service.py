@@ -5,7 +5,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
-from collections import Counter
+import time
 from collections.abc import Iterable
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -40,6 +40,12 @@ logger = logging.getLogger(__name__)
 
 PENDING_MAX_AGE = timedelta(hours=24)
 
+# Параллельных проверок внутри одного провайдера
+AUTO_CHECK_LANE_CONCURRENCY = 3
+# Свежие инвойсы проверяем чаще базового интервала, но не чаще раза в минуту
+MIN_AUTO_CHECK_SLEEP_SECONDS = 60
+FRESH_PAYMENT_AGE = timedelta(minutes=15)
+
 
 @dataclass(slots=True)
 class PendingPayment:
@@ -93,6 +99,44 @@ SUPPORTED_AUTO_CHECK_METHODS: frozenset[PaymentMethod] = frozenset(
 )
 
 
+# Провайдеры, у которых статус запрашивается одним вызовом на пачку инвойсов
+BATCH_STATUS_METHODS: frozenset[PaymentMethod] = frozenset({PaymentMethod.CRYPTOBOT})
+
+
+@dataclass(slots=True)
+class ProviderCycleStats:
+    """Metrics of the last auto-check cycle for a single provider."""
+
+    checked: int = 0
+    updated: int = 0
+    paid: int = 0
+    errors: int = 0
+    last_cycle_seconds: float = 0.0
+    last_run_at: datetime | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'checked': self.checked,
+            'updated': self.updated,
+            'paid': self.paid,
+            'errors': self.errors,
+            'last_cycle_seconds': round(self.last_cycle_seconds, 3),
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+def get_polling_interval(age: timedelta, base_interval: timedelta) -> timedelta:
+    """Polling interval by payment age: fresh invoices often, stale ones rarely."""
+
+    if age < FRESH_PAYMENT_AGE:
+        return min(base_interval, timedelta(seconds=MIN_AUTO_CHECK_SLEEP_SECONDS))
+    if age < timedelta(hours=2):
+        return base_interval
+    if age < timedelta(hours=6):
+        return base_interval * 3
+    return base_interval * 6
+
+
 def method_display_name(method: PaymentMethod) -> str:
     if method == PaymentMethod.MULENPAY:
         return settings.get_mulenpay_display_name()
@@ -153,6 +197,9 @@ class AutoPaymentVerificationService:
     def __init__(self) -> None:
         self._task: asyncio.Task[None] | None = None
         self._payment_service: PaymentService | None = None
+        self._last_checked: dict[tuple[PaymentMethod, int], datetime] = {}
+        self._lane_stats: dict[PaymentMethod, ProviderCycleStats] = {}
+        self._next_sleep: float | None = None
 
     def set_payment_service(self, payment_service: PaymentService) -> None:
         self._payment_service = payment_service
@@ -217,7 +264,10 @@ class AutoPaymentVerificationService:
                         exc_info=True,
                     )
 
-                await asyncio.sleep(max(1, interval_minutes) * 60)
+                sleep_seconds = max(1, interval_minutes) * 60
+                if self._next_sleep is not None:
+                    sleep_seconds = min(sleep_seconds, self._next_sleep)
+                await asyncio.sleep(sleep_seconds)
         except asyncio.CancelledError:
             logger.info('Автопроверка пополнений остановлена')
             raise
@@ -227,69 +277,206 @@ class AutoPaymentVerificationService:
             return
 
         async with AsyncSessionLocal() as session:
-            try:
-                pending = await list_recent_pending_payments(session)
-                candidates = [record for record in pending if record.method in methods and not record.is_paid]
+            pending = await list_recent_pending_payments(session)
 
-                if not candidates:
-                    logger.debug('Автопроверка пополнений: подходящих ожидающих платежей нет')
-                    return
+        now = datetime.utcnow()
+        base_interval = timedelta(minutes=max(1, settings.get_payment_verification_auto_check_interval()))
+        candidates = [record for record in pending if record.method in methods and not record.is_paid]
 
-                counts = Counter(record.method for record in candidates)
-                summary = ', '.join(
-                    f'{method_display_name(method)}: {count}'
-                    for method, count in sorted(counts.items(), key=lambda item: method_display_name(item[0]))
-                )
-                logger.info(
-                    '🔄 Автопроверка пополнений: найдено %s инвойсов (%s)',
-                    len(candidates),
-                    summary,
-                )
+        # Забываем платежи, которые уже оплачены или вышли из окна проверки
+        candidate_keys = {(record.method, record.local_id) for record in candidates}
+        self._last_checked = {key: value for key, value in self._last_checked.items() if key in candidate_keys}
+        self._next_sleep = self._compute_next_sleep(candidates, now, base_interval)
 
-                for record in candidates:
-                    refreshed = await run_manual_check(
-                        session,
-                        record.method,
-                        record.local_id,
-                        self._payment_service,
-                    )
+        due = [record for record in candidates if self._is_due(record, now, base_interval)]
+        if not due:
+            logger.debug('Автопроверка пополнений: подходящих ожидающих платежей нет')
+            return
 
-                    if not refreshed:
-                        logger.debug(
-                            'Автопроверка пополнений: не удалось обновить %s %s',
-                            method_display_name(record.method),
-                            record.identifier,
-                        )
-                        continue
+        lanes: dict[PaymentMethod, list[PendingPayment]] = {}
+        for record in due:
+            lanes.setdefault(record.method, []).append(record)
 
-                    if refreshed.is_paid and not record.is_paid:
-                        logger.info(
-                            '✅ %s %s отмечен как оплаченный после автопроверки',
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                        )
-                    elif refreshed.status != record.status:
-                        logger.info(
-                            'ℹ️ %s %s обновлён: %s → %s',
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                            record.status or '—',
-                            refreshed.status or '—',
-                        )
-                    else:
-                        logger.debug(
-                            'Автопроверка пополнений: %s %s без изменений (%s)',
-                            method_display_name(refreshed.method),
-                            refreshed.identifier,
-                            refreshed.status or '—',
-                        )
+        summary = ', '.join(
+            f'{method_display_name(method)}: {len(records)}'
+            for method, records in sorted(lanes.items(), key=lambda item: method_display_name(item[0]))
+        )
+        logger.info(
+            '🔄 Автопроверка пополнений: к проверке %s из %s инвойсов (%s)',
+            len(due),
+            len(candidates),
+            summary,
+        )
+
+        # Провайдеры проверяются параллельно: медленный API не задерживает остальных
+        await asyncio.gather(*(self._run_lane(method, records) for method, records in lanes.items()))
+
+        self._next_sleep = self._compute_next_sleep(candidates, datetime.utcnow(), base_interval)
 
+    async def _run_lane(self, method: PaymentMethod, records: list[PendingPayment]) -> None:
+        started = time.monotonic()
+        stats = self._lane_stats.setdefault(method, ProviderCycleStats())
+        stats.checked = len(records)
+        stats.updated = 0
+        stats.paid = 0
+        stats.errors = 0
+
+        try:
+            if method in BATCH_STATUS_METHODS:
+                await self._run_batch_lane(method, records, stats)
+            else:
+                semaphore = asyncio.Semaphore(AUTO_CHECK_LANE_CONCURRENCY)
+
+                async def check(record: PendingPayment) -> None:
+                    async with semaphore:
+                        await self._check_single(record, stats)
+
+                await asyncio.gather(*(check(record) for record in records))
+        except Exception as error:
+            stats.errors += 1
+            logger.error(
+                'Ошибка автопроверки пополнений %s: %s',
+                method_display_name(method),
+                error,
+                exc_info=True,
+            )
+        finally:
+            stats.last_cycle_seconds = time.monotonic() - started
+            stats.last_run_at = datetime.utcnow()
+            logger.debug(
+                'Автопроверка пополнений %s: %s инвойсов за %.2f с',
+                method_display_name(method),
+                len(records),
+                stats.last_cycle_seconds,
+            )
+
+    async def _check_single(self, record: PendingPayment, stats: ProviderCycleStats) -> None:
+        # У каждой проверки своя сессия — сессии нельзя делить между параллельными задачами
+        async with AsyncSessionLocal() as session:
+            try:
+                refreshed = await run_manual_check(
+                    session,
+                    record.method,
+                    record.local_id,
+                    self._payment_service,
+                )
+                if session.in_transaction():
+                    await session.commit()
+            except Exception as error:
+                stats.errors += 1
+                if session.in_transaction():
+                    await session.rollback()
+                logger.error(
+                    'Автопроверка пополнений: ошибка проверки %s %s: %s',
+                    method_display_name(record.method),
+                    record.identifier,
+                    error,
+                    exc_info=True,
+                )
+                return
+            finally:
+                self._last_checked[(record.method, record.local_id)] = datetime.utcnow()
+
+        self._log_refresh(record, refreshed, stats)
+
+    async def _run_batch_lane(
+        self,
+        method: PaymentMethod,
+        records: list[PendingPayment],
+        stats: ProviderCycleStats,
+    ) -> None:
+        """Один запрос статусов на пачку инвойсов (CryptoBot getInvoices)."""
+        async with AsyncSessionLocal() as session:
+            try:
+                results = await self._payment_service.get_cryptobot_payment_statuses(
+                    session,
+                    [record.local_id for record in records],
+                )
+                refreshed_records = {}
+                for record in records:
+                    result = results.get(record.local_id)
+                    if result is None:
+                        continue
+                    if result.get('error') is not None:
+                        stats.errors += 1
+                        continue
+                    refreshed_records[record.local_id] = await get_payment_record(session, method, record.local_id)
                 if session.in_transaction():
                     await session.commit()
             except Exception:
                 if session.in_transaction():
                     await session.rollback()
                 raise
+            finally:
+                checked_at = datetime.utcnow()
+                for record in records:
+                    self._last_checked[(record.method, record.local_id)] = checked_at
+
+        for record in records:
+            self._log_refresh(record, refreshed_records.get(record.local_id), stats)
+
+    @staticmethod
+    def _log_refresh(
+        record: PendingPayment,
+        refreshed: PendingPayment | None,
+        stats: ProviderCycleStats,
+    ) -> None:
+        if not refreshed:
+            logger.debug(
+                'Автопроверка пополнений: не удалось обновить %s %s',
+                method_display_name(record.method),
+                record.identifier,
+            )
+            return
+
+        if refreshed.is_paid and not record.is_paid:
+            stats.paid += 1
+            logger.info(
+                '✅ %s %s отмечен как оплаченный после автопроверки',
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+            )
+        elif refreshed.status != record.status:
+            stats.updated += 1
+            logger.info(
+                'ℹ️ %s %s обновлён: %s → %s',
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+                record.status or '—',
+                refreshed.status or '—',
+            )
+        else:
+            logger.debug(
+                'Автопроверка пополнений: %s %s без изменений (%s)',
+                method_display_name(refreshed.method),
+                refreshed.identifier,
+                refreshed.status or '—',
+            )
+
+    def _is_due(self, record: PendingPayment, now: datetime, base_interval: timedelta) -> bool:
+        last_checked = self._last_checked.get((record.method, record.local_id))
+        if last_checked is None:
+            return True
+        return now - last_checked >= get_polling_interval(now - record.created_at, base_interval)
+
+    def _compute_next_sleep(
+        self,
+        candidates: list[PendingPayment],
+        now: datetime,
+        base_interval: timedelta,
+    ) -> float:
+        """Пауза до следующего цикла: не дольше базового интервала, раньше — если есть свежие инвойсы."""
+        next_sleep = base_interval.total_seconds()
+        for record in candidates:
+            interval = get_polling_interval(now - record.created_at, base_interval)
+            last_checked = self._last_checked.get((record.method, record.local_id))
+            wait = interval.total_seconds() if last_checked is None else (last_checked + interval - now).total_seconds()
+            next_sleep = min(next_sleep, wait)
+        return max(MIN_AUTO_CHECK_SLEEP_SECONDS, next_sleep)
+
+    def get_stats(self) -> dict[str, dict[str, Any]]:
+        """Метрики последнего цикла по каждому провайдеру."""
+        return {method.value: stats.to_dict() for method, stats in self._lane_stats.items()}
 
 
 auto_payment_verification_service = AutoPaymentVerificationService()
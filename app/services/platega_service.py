@@ -11,6 +11,7 @@ from typing import Any
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -91,16 +92,15 @@ class PlategaService:
 
         for attempt in range(1, self._max_retries + 1):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=self._timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        json=json_data,
-                        params=params,
-                        headers=headers,
-                    ) as response,
-                ):
+                async with http_clients.request(
+                    'platega',
+                    method,
+                    url,
+                    json=json_data,
+                    params=params,
+                    headers=headers,
+                    timeout=self._timeout,
+                ) as response:
                     data, raw_text = await self._deserialize_response(response)
 
                     if response.status >= 400:
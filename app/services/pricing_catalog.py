@@ -0,0 +1,524 @@
+"""Versioned in-memory pricing catalog and batch price engine.
+
+The catalog is an immutable snapshot of everything the classic purchase flow
+needs to price a subscription: server squads with their promo-group
+restrictions, promo-group discounts, ``PERIOD_PRICES`` and the enabled traffic
+packages. It is built with a couple of queries and then reused by every
+keyboard render and price preview until an admin change invalidates it.
+
+Pricing itself is pure Python: :func:`calculate_total_cost` mirrors
+``calculate_subscription_total_cost`` for a single selection and
+:func:`calculate_price_matrix` prices every period × traffic × devices
+combination for a user in one pass. The period, traffic and devices keyboards
+are rendered from the quotes returned by :func:`get_period_quotes`,
+:func:`get_traffic_quotes` and :func:`get_device_quotes`.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from types import MappingProxyType
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PERIOD_PRICES, settings
+from app.database.crud.subscription import _get_discount_percent
+from app.database.models import PromoGroup, ServerSquad, User
+from app.utils.pricing_utils import calculate_months_from_days
+
+
+logger = logging.getLogger(__name__)
+
+# Safety net for writes that bypass the CRUD helpers calling invalidate_pricing_catalog().
+CATALOG_MAX_AGE_SECONDS = 300
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogServer:
+    id: int
+    squad_uuid: str
+    display_name: str
+    price_kopeks: int
+    is_available: bool
+    allowed_promo_group_ids: frozenset[int]
+
+    def is_allowed_for(self, promo_group_id: int | None) -> bool:
+        if promo_group_id is None or not self.allowed_promo_group_ids:
+            return True
+        return promo_group_id in self.allowed_promo_group_ids
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogPromoGroup:
+    id: int
+    server_discount_percent: int
+    traffic_discount_percent: int
+    device_discount_percent: int
+    period_discounts: Mapping[int, int]
+    is_default: bool
+
+    def get_discount_percent(self, category: str, period_days: int | None = None) -> int:
+        """Same rules as ``PromoGroup.get_discount_percent`` over the snapshot."""
+        period_discount = self._get_period_discount(period_days)
+        if category == 'period':
+            return max(0, min(100, period_discount))
+
+        mapping = {
+            'servers': self.server_discount_percent,
+            'traffic': self.traffic_discount_percent,
+            'devices': self.device_discount_percent,
+        }
+        percent = mapping.get(category) or 0
+        if percent == 0 and self.is_default:
+            percent = max(percent, period_discount)
+        return max(0, min(100, percent))
+
+    def _get_period_discount(self, period_days: int | None) -> int:
+        if not period_days:
+            return 0
+        if period_days in self.period_discounts:
+            return self.period_discounts[period_days]
+        if self.is_default:
+            # Скидки базовой группы из настроек читаем на лету: их изменение не пересобирает каталог
+            try:
+                if settings.is_base_promo_group_period_discount_enabled():
+                    return settings.get_base_promo_group_period_discounts().get(period_days, 0)
+            except Exception:
+                return 0
+        return 0
+
+
+@dataclass(frozen=True, slots=True)
+class PricingCatalog:
+    version: int
+    built_at: datetime
+    servers: Mapping[int, CatalogServer]
+    promo_groups: Mapping[int, CatalogPromoGroup]
+    period_prices: Mapping[int, int]
+    traffic_packages: tuple[tuple[int, int], ...]
+    default_device_limit: int
+    price_per_device: int
+    _traffic_price_cache: dict[int, int] = field(default_factory=dict, compare=False, repr=False)
+
+    def get_traffic_price(self, gb: int | None) -> int:
+        """Same rules as ``Settings.get_traffic_price`` over the pre-parsed packages."""
+        gb = gb or 0
+        cached = self._traffic_price_cache.get(gb)
+        if cached is not None:
+            return cached
+
+        price = _resolve_traffic_price(self.traffic_packages, gb)
+        self._traffic_price_cache[gb] = price
+        return price
+
+    def get_server_prices(self, server_ids: Iterable[int], promo_group_id: int | None = None) -> list[int]:
+        prices: list[int] = []
+        for server_id in server_ids:
+            server = self.servers.get(server_id)
+            if server is None:
+                prices.append(0)
+                continue
+            if not (server.is_available and server.is_allowed_for(promo_group_id)):
+                logger.warning(
+                    '⚠️ Сервер %s (id=%s) недоступен для промогруппы пользователя (promo_group_id=%s)',
+                    server.display_name,
+                    server_id,
+                    promo_group_id,
+                )
+            # Цену берём всегда реальную, как и при расчёте напрямую из БД
+            prices.append(server.price_kopeks)
+        return prices
+
+
+@dataclass(frozen=True, slots=True)
+class PriceQuote:
+    period_days: int
+    traffic_gb: int
+    devices: int
+    total: int
+    original_total: int
+    base_price: int
+    base_price_original: int
+    base_discount_percent: int
+    traffic_price_per_month: int
+    traffic_price: int
+    servers_price: int
+    devices_price_per_month: int
+    devices_price: int
+
+
+def _resolve_traffic_price(packages: Sequence[tuple[int, int]], gb: int) -> int:
+    if not packages:
+        return 0
+
+    for package_gb, price in packages:
+        if package_gb == gb:
+            return price
+
+    unlimited_price = next((price for package_gb, price in packages if package_gb == 0), None)
+
+    if gb <= 0:
+        return unlimited_price or 0
+
+    finite_packages = [(package_gb, price) for package_gb, price in packages if package_gb > 0]
+    if not finite_packages:
+        return unlimited_price or 0
+
+    max_gb, max_price = max(finite_packages, key=lambda item: item[0])
+    if gb >= max_gb:
+        return unlimited_price if unlimited_price is not None else max_price
+
+    suitable = [item for item in finite_packages if item[0] >= gb]
+    if suitable:
+        return min(suitable, key=lambda item: item[0])[1]
+
+    return unlimited_price or 0
+
+
+class PricingCatalogStore:
+    """Holds the current catalog snapshot and rebuilds it on demand."""
+
+    def __init__(self) -> None:
+        self._catalog: PricingCatalog | None = None
+        self._generation = 0
+        self._built_generation = -1
+        self._built_monotonic = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._generation
+
+    def invalidate(self, reason: str | None = None) -> None:
+        self._generation += 1
+        if reason:
+            logger.debug('Pricing catalog invalidated (%s), generation=%s', reason, self._generation)
+
+    def peek(self) -> PricingCatalog | None:
+        """Return the current snapshot if it is still fresh, without touching the DB."""
+        if self._is_fresh():
+            return self._catalog
+        return None
+
+    async def get(self, db: AsyncSession) -> PricingCatalog:
+        catalog = self.peek()
+        if catalog is not None:
+            return catalog
+
+        async with self._lock:
+            catalog = self.peek()
+            if catalog is not None:
+                return catalog
+            generation = self._generation
+            catalog = await self._build(db, generation)
+            self._catalog = catalog
+            self._built_generation = generation
+            self._built_monotonic = time.monotonic()
+            return catalog
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._catalog is not None
+            and self._built_generation == self._generation
+            and time.monotonic() - self._built_monotonic < CATALOG_MAX_AGE_SECONDS
+        )
+
+    async def _build(self, db: AsyncSession, generation: int) -> PricingCatalog:
+        started = time.perf_counter()
+
+        servers_result = await db.execute(select(ServerSquad))
+        servers: dict[int, CatalogServer] = {}
+        for server in servers_result.scalars().all():
+            servers[server.id] = CatalogServer(
+                id=server.id,
+                squad_uuid=server.squad_uuid,
+                display_name=server.display_name,
+                price_kopeks=int(server.price_kopeks or 0),
+                is_available=bool(server.is_available),
+                allowed_promo_group_ids=frozenset(pg.id for pg in server.allowed_promo_groups or []),
+            )
+
+        promo_groups_result = await db.execute(select(PromoGroup))
+        promo_groups: dict[int, CatalogPromoGroup] = {}
+        for group in promo_groups_result.scalars().all():
+            promo_groups[group.id] = CatalogPromoGroup(
+                id=group.id,
+                server_discount_percent=int(group.server_discount_percent or 0),
+                traffic_discount_percent=int(group.traffic_discount_percent or 0),
+                device_discount_percent=int(group.device_discount_percent or 0),
+                period_discounts=MappingProxyType(group._get_period_discounts_map()),
+                is_default=bool(group.is_default),
+            )
+
+        traffic_packages = tuple(
+            (int(package['gb']), int(package['price']))
+            for package in settings.get_traffic_packages()
+            if package['enabled']
+        )
+
+        catalog = PricingCatalog(
+            version=generation,
+            built_at=datetime.now(UTC),
+            servers=MappingProxyType(servers),
+            promo_groups=MappingProxyType(promo_groups),
+            period_prices=MappingProxyType(dict(PERIOD_PRICES)),
+            traffic_packages=traffic_packages,
+            default_device_limit=int(settings.DEFAULT_DEVICE_LIMIT or 0),
+            price_per_device=int(settings.PRICE_PER_DEVICE or 0),
+        )
+
+        logger.info(
+            'Pricing catalog v%s built in %.1f ms: %s servers, %s promo groups',
+            generation,
+            (time.perf_counter() - started) * 1000,
+            len(servers),
+            len(promo_groups),
+        )
+        return catalog
+
+
+pricing_catalog_store = PricingCatalogStore()
+
+
+async def get_pricing_catalog(db: AsyncSession) -> PricingCatalog:
+    return await pricing_catalog_store.get(db)
+
+
+def invalidate_pricing_catalog(reason: str | None = None) -> None:
+    """Drop the current snapshot; the next reader rebuilds it.
+
+    Called after admin changes to servers, promo groups and price settings.
+    """
+    pricing_catalog_store.invalidate(reason)
+
+
+def resolve_promo_group_id(user: User | None) -> int | None:
+    if user is None:
+        return None
+    try:
+        primary_group = user.get_primary_promo_group()
+    except Exception as error:
+        logger.warning('Не удалось получить промогруппу пользователя: %s', error)
+        return None
+    return getattr(primary_group, 'id', None)
+
+
+def get_discount_percent(
+    catalog: PricingCatalog,
+    user: User | None,
+    promo_group: PromoGroup | None,
+    category: str,
+    *,
+    period_days: int | None = None,
+) -> int:
+    """Catalog counterpart of ``_get_discount_percent``: the user's primary group wins over ``promo_group``."""
+    if user is not None:
+        group_id = resolve_promo_group_id(user)
+        if group_id is None:
+            return 0
+    elif promo_group is not None:
+        group_id = promo_group.id
+    else:
+        return 0
+
+    group = catalog.promo_groups.get(group_id)
+    if group is None:
+        # Группа создана после сборки снимка — считаем по ORM-объекту
+        return _get_discount_percent(user, promo_group, category, period_days=period_days)
+    return group.get_discount_percent(category, period_days)
+
+
+def calculate_total_cost(
+    catalog: PricingCatalog,
+    period_days: int,
+    traffic_gb: int,
+    server_squad_ids: Sequence[int],
+    devices: int,
+    *,
+    user: User | None = None,
+    promo_group: PromoGroup | None = None,
+) -> tuple[int, dict]:
+    """Price a single selection against the catalog.
+
+    Returns the same ``(total_cost, details)`` pair as
+    ``calculate_subscription_total_cost`` without touching the database.
+    """
+    months_in_period = calculate_months_from_days(period_days)
+
+    base_price_original = catalog.period_prices.get(period_days, 0)
+    period_discount_percent = get_discount_percent(catalog, user, promo_group, 'period', period_days=period_days)
+    base_discount_total = base_price_original * period_discount_percent // 100
+    base_price = base_price_original - base_discount_total
+
+    promo_group = promo_group or (user.promo_group if user else None)
+
+    traffic_price_per_month = catalog.get_traffic_price(traffic_gb)
+    traffic_discount_percent = get_discount_percent(catalog, user, promo_group, 'traffic', period_days=period_days)
+    traffic_discount_per_month = traffic_price_per_month * traffic_discount_percent // 100
+    total_traffic_price = (traffic_price_per_month - traffic_discount_per_month) * months_in_period
+    total_traffic_discount = traffic_discount_per_month * months_in_period
+
+    servers_prices = catalog.get_server_prices(server_squad_ids, resolve_promo_group_id(user))
+    servers_price_per_month = sum(servers_prices)
+    servers_discount_percent = get_discount_percent(catalog, user, promo_group, 'servers', period_days=period_days)
+    servers_discount_per_month = servers_price_per_month * servers_discount_percent // 100
+    total_servers_price = (servers_price_per_month - servers_discount_per_month) * months_in_period
+    total_servers_discount = servers_discount_per_month * months_in_period
+
+    additional_devices = max(0, devices - catalog.default_device_limit)
+    devices_price_per_month = additional_devices * catalog.price_per_device
+    devices_discount_percent = get_discount_percent(catalog, user, promo_group, 'devices', period_days=period_days)
+    devices_discount_per_month = devices_price_per_month * devices_discount_percent // 100
+    total_devices_price = (devices_price_per_month - devices_discount_per_month) * months_in_period
+    total_devices_discount = devices_discount_per_month * months_in_period
+
+    total_cost = base_price + total_traffic_price + total_servers_price + total_devices_price
+
+    details = {
+        'base_price': base_price,
+        'base_price_original': base_price_original,
+        'base_discount_percent': period_discount_percent,
+        'base_discount_total': base_discount_total,
+        'traffic_price_per_month': traffic_price_per_month,
+        'traffic_discount_percent': traffic_discount_percent,
+        'traffic_discount_total': total_traffic_discount,
+        'total_traffic_price': total_traffic_price,
+        'servers_price_per_month': servers_price_per_month,
+        'servers_discount_percent': servers_discount_percent,
+        'servers_discount_total': total_servers_discount,
+        'total_servers_price': total_servers_price,
+        'devices_price_per_month': devices_price_per_month,
+        'devices_discount_percent': devices_discount_percent,
+        'devices_discount_total': total_devices_discount,
+        'total_devices_price': total_devices_price,
+        'months_in_period': months_in_period,
+        'servers_individual_prices': [
+            (price - (price * servers_discount_percent // 100)) * months_in_period for price in servers_prices
+        ],
+    }
+
+    return total_cost, details
+
+
+def calculate_price_matrix(
+    catalog: PricingCatalog,
+    *,
+    periods: Iterable[int],
+    traffic_options: Iterable[int],
+    device_options: Iterable[int],
+    server_squad_ids: Sequence[int] = (),
+    user: User | None = None,
+    promo_group: PromoGroup | None = None,
+) -> dict[tuple[int, int, int], PriceQuote]:
+    """Price every period × traffic × devices combination in one pass.
+
+    Discounts are resolved once per period and each component is priced once
+    per option, so the cost is linear in the number of options rather than in
+    the number of combinations. Every quote equals :func:`calculate_total_cost`
+    for the same selection.
+    """
+    traffic_options = list(dict.fromkeys(traffic_options))
+    device_options = list(dict.fromkeys(device_options))
+
+    servers_price_per_month = sum(catalog.get_server_prices(server_squad_ids, resolve_promo_group_id(user)))
+    traffic_prices = {gb: catalog.get_traffic_price(gb) for gb in traffic_options}
+    device_prices = {
+        devices: max(0, devices - catalog.default_device_limit) * catalog.price_per_device for devices in device_options
+    }
+    fallback_group = promo_group or (user.promo_group if user else None)
+
+    quotes: dict[tuple[int, int, int], PriceQuote] = {}
+
+    for period_days in dict.fromkeys(periods):
+        months = calculate_months_from_days(period_days)
+
+        base_original = catalog.period_prices.get(period_days, 0)
+        period_percent = get_discount_percent(catalog, user, promo_group, 'period', period_days=period_days)
+        base_price = base_original - base_original * period_percent // 100
+
+        traffic_percent = get_discount_percent(catalog, user, fallback_group, 'traffic', period_days=period_days)
+        servers_percent = get_discount_percent(catalog, user, fallback_group, 'servers', period_days=period_days)
+        devices_percent = get_discount_percent(catalog, user, fallback_group, 'devices', period_days=period_days)
+
+        servers_total = (servers_price_per_month - servers_price_per_month * servers_percent // 100) * months
+        servers_original = servers_price_per_month * months
+
+        traffic_per_month = {gb: price - price * traffic_percent // 100 for gb, price in traffic_prices.items()}
+        devices_per_month = {
+            devices: price - price * devices_percent // 100 for devices, price in device_prices.items()
+        }
+
+        for traffic_gb, traffic_monthly in traffic_per_month.items():
+            traffic_original = traffic_prices[traffic_gb] * months
+            for devices, devices_monthly in devices_per_month.items():
+                devices_original = device_prices[devices] * months
+                quotes[(period_days, traffic_gb, devices)] = PriceQuote(
+                    period_days=period_days,
+                    traffic_gb=traffic_gb,
+                    devices=devices,
+                    total=base_price + traffic_monthly * months + servers_total + devices_monthly * months,
+                    original_total=base_original + traffic_original + servers_original + devices_original,
+                    base_price=base_price,
+                    base_price_original=base_original,
+                    base_discount_percent=period_percent,
+                    traffic_price_per_month=traffic_monthly,
+                    traffic_price=traffic_monthly * months,
+                    servers_price=servers_total,
+                    devices_price_per_month=devices_monthly,
+                    devices_price=devices_monthly * months,
+                )
+
+    return quotes
+
+
+def get_device_options(catalog: PricingCatalog) -> range:
+    """Device counts offered by the devices keyboard."""
+    max_devices = settings.MAX_DEVICES_LIMIT if settings.MAX_DEVICES_LIMIT > 0 else 50
+    return range(catalog.default_device_limit, min(max_devices + 1, catalog.default_device_limit + 10))
+
+
+async def get_period_quotes(db: AsyncSession, user: User | None) -> dict[int, PriceQuote]:
+    """Quotes for the period keyboard, keyed by period in days."""
+    catalog = await get_pricing_catalog(db)
+    matrix = calculate_price_matrix(
+        catalog,
+        periods=settings.get_available_subscription_periods(),
+        traffic_options=[0],
+        device_options=[catalog.default_device_limit],
+        user=user,
+    )
+    return {period_days: quote for (period_days, _, _), quote in matrix.items()}
+
+
+async def get_traffic_quotes(db: AsyncSession, user: User | None, period_days: int | None) -> dict[int, PriceQuote]:
+    """Quotes for the traffic keyboard, keyed by package size in GB; empty without a chosen period."""
+    if not period_days:
+        return {}
+    catalog = await get_pricing_catalog(db)
+    matrix = calculate_price_matrix(
+        catalog,
+        periods=[period_days],
+        traffic_options=[gb for gb, _ in catalog.traffic_packages],
+        device_options=[catalog.default_device_limit],
+        user=user,
+    )
+    return {traffic_gb: quote for (_, traffic_gb, _), quote in matrix.items()}
+
+
+async def get_device_quotes(db: AsyncSession, user: User | None, period_days: int | None) -> dict[int, PriceQuote]:
+    """Quotes for the devices keyboard, keyed by device count; empty without a chosen period."""
+    if not period_days:
+        return {}
+    catalog = await get_pricing_catalog(db)
+    matrix = calculate_price_matrix(
+        catalog,
+        periods=[period_days],
+        traffic_options=[0],
+        device_options=get_device_options(catalog),
+        user=user,
+    )
+    return {devices: quote for (_, _, devices), quote in matrix.items()}
@@ -0,0 +1,223 @@
+"""Incremental leaderboard of referral contests.
+
+Scores live in a Redis sorted set per contest (or in an in-memory sorted list
+when Redis is unavailable) and are updated on every contest event, so top-N and
+"your place" reads are O(log n) instead of aggregating ``ReferralContestEvent``.
+The index is rebuilt from the database on first use and periodically by the
+contest service, which also repairs any missed increments.
+"""
+
+import bisect
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.crud.referral_contest import (
+    get_contest_referrers,
+    get_contest_scores,
+    list_virtual_participants,
+)
+from app.database.models import User
+from app.utils.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_KEY_PREFIX = 'referral_contest_leaderboard'
+# Маркер полной синхронизации с БД; без него индекс перестраивается при чтении
+LEADERBOARD_SYNC_TTL_SECONDS = 24 * 3600
+LEADERBOARD_TTL_SECONDS = 30 * 24 * 3600
+# Score в Redis: количество зачётов * SCALE + сумма, чтобы порядок совпадал с SQL (count, amount)
+SCORE_AMOUNT_SCALE = 10**10
+
+
+@dataclass
+class LeaderboardEntry:
+    referrer_id: int
+    rank: int
+    score: int
+    amount_kopeks: int
+
+
+def encode_score(count: int, amount_kopeks: int) -> float:
+    return float(count * SCORE_AMOUNT_SCALE + min(max(amount_kopeks, 0), SCORE_AMOUNT_SCALE - 1))
+
+
+def decode_score(value: float) -> tuple[int, int]:
+    count, amount = divmod(int(value), SCORE_AMOUNT_SCALE)
+    return count, amount
+
+
+class SortedBoard:
+    """In-memory leaderboard: sorted list of (-count, -amount, referrer_id) with bisect lookups."""
+
+    def __init__(self) -> None:
+        self._keys: list[tuple[int, int, int]] = []
+        self._scores: dict[int, tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def set(self, referrer_id: int, count: int, amount_kopeks: int) -> None:
+        previous = self._scores.get(referrer_id)
+        if previous is not None:
+            position = bisect.bisect_left(self._keys, (-previous[0], -previous[1], referrer_id))
+            del self._keys[position]
+        self._scores[referrer_id] = (count, amount_kopeks)
+        bisect.insort(self._keys, (-count, -amount_kopeks, referrer_id))
+
+    def increment(self, referrer_id: int, count: int, amount_kopeks: int) -> None:
+        current_count, current_amount = self._scores.get(referrer_id, (0, 0))
+        self.set(referrer_id, current_count + count, current_amount + amount_kopeks)
+
+    def entry(self, referrer_id: int) -> LeaderboardEntry | None:
+        score = self._scores.get(referrer_id)
+        if score is None:
+            return None
+        position = bisect.bisect_left(self._keys, (-score[0], -score[1], referrer_id))
+        return LeaderboardEntry(referrer_id, position + 1, score[0], score[1])
+
+    def top(self, limit: int | None = None) -> list[LeaderboardEntry]:
+        keys = self._keys if limit is None else self._keys[:limit]
+        return [
+            LeaderboardEntry(referrer_id, position, -count, -amount)
+            for position, (count, amount, referrer_id) in enumerate(keys, start=1)
+        ]
+
+
+class ReferralContestLeaderboard:
+    def __init__(self) -> None:
+        self._boards: dict[int, SortedBoard] = {}
+        self._synced_at: dict[int, float] = {}
+
+    def _key(self, contest_id: int) -> str:
+        return f'{LEADERBOARD_KEY_PREFIX}:{contest_id}'
+
+    def _sync_key(self, contest_id: int) -> str:
+        return f'{LEADERBOARD_KEY_PREFIX}:{contest_id}:synced'
+
+    async def _is_synced(self, contest_id: int) -> bool:
+        if cache.is_connected:
+            return await cache.exists(self._sync_key(contest_id))
+        return contest_id in self._synced_at
+
+    async def reconcile(self, db: AsyncSession, contest_id: int) -> int:
+        """Перестроить индекс конкурса по событиям в БД. Возвращает число участников."""
+        scores = await get_contest_scores(db, contest_id)
+
+        board = SortedBoard()
+        for referrer_id, count, amount in scores:
+            board.set(referrer_id, count, amount)
+        self._boards[contest_id] = board
+        self._synced_at[contest_id] = time.monotonic()
+
+        if cache.is_connected:
+            mapping = {str(referrer_id): encode_score(count, amount) for referrer_id, count, amount in scores}
+            if await cache.replace_sorted_set(self._key(contest_id), mapping, expire=LEADERBOARD_TTL_SECONDS):
+                await cache.set(self._sync_key(contest_id), int(time.time()), expire=LEADERBOARD_SYNC_TTL_SECONDS)
+
+        logger.debug('Лидерборд конкурса %s синхронизирован: %s участников', contest_id, len(scores))
+        return len(scores)
+
+    async def ensure_synced(self, db: AsyncSession, contest_id: int) -> None:
+        if not await self._is_synced(contest_id):
+            await self.reconcile(db, contest_id)
+
+    async def record_event(self, contest_id: int, referrer_id: int, amount_kopeks: int = 0) -> None:
+        """Учесть новый зачёт. Несинхронизированный индекс не трогаем — он соберётся из БД при чтении."""
+        board = self._boards.get(contest_id)
+        if board is not None:
+            board.increment(referrer_id, 1, amount_kopeks)
+
+        if cache.is_connected and await cache.exists(self._sync_key(contest_id)):
+            await cache.zincrby(self._key(contest_id), encode_score(1, amount_kopeks), str(referrer_id))
+
+    async def drop(self, contest_id: int) -> None:
+        self._boards.pop(contest_id, None)
+        self._synced_at.pop(contest_id, None)
+        await cache.delete(self._sync_key(contest_id))
+        await cache.delete(self._key(contest_id))
+
+    async def get_top(self, db: AsyncSession, contest_id: int, limit: int | None = None) -> list[LeaderboardEntry]:
+        await self.ensure_synced(db, contest_id)
+
+        if cache.is_connected:
+            items = await cache.zrevrange(self._key(contest_id), 0, -1 if limit is None else limit - 1)
+            if items is not None:
+                return [
+                    LeaderboardEntry(int(member), position, *decode_score(value))
+                    for position, (member, value) in enumerate(items, start=1)
+                ]
+
+        return self._memory_board(contest_id).top(limit)
+
+    async def get_entry(self, db: AsyncSession, contest_id: int, referrer_id: int) -> LeaderboardEntry | None:
+        """Место и счёт участника."""
+        await self.ensure_synced(db, contest_id)
+
+        if cache.is_connected:
+            value = await cache.zscore(self._key(contest_id), str(referrer_id))
+            if value is None:
+                return None
+            position = await cache.zrevrank(self._key(contest_id), str(referrer_id))
+            if position is not None:
+                return LeaderboardEntry(referrer_id, position + 1, *decode_score(value))
+
+        return self._memory_board(contest_id).entry(referrer_id)
+
+    async def count(self, db: AsyncSession, contest_id: int) -> int:
+        await self.ensure_synced(db, contest_id)
+
+        if cache.is_connected:
+            size = await cache.zcard(self._key(contest_id))
+            if size is not None:
+                return size
+        return len(self._memory_board(contest_id))
+
+    def _memory_board(self, contest_id: int) -> SortedBoard:
+        return self._boards.get(contest_id) or SortedBoard()
+
+    async def get_leaderboard(
+        self,
+        db: AsyncSession,
+        contest_id: int,
+        *,
+        limit: int | None = None,
+    ) -> list[tuple[User, int, int]]:
+        """Тот же формат, что у get_contest_leaderboard: (User, referral_count, total_amount)."""
+        entries = await self.get_top(db, contest_id, limit)
+        users = await get_contest_referrers(db, [entry.referrer_id for entry in entries])
+        return [
+            (users[entry.referrer_id], entry.score, entry.amount_kopeks)
+            for entry in entries
+            if entry.referrer_id in users
+        ]
+
+    async def get_leaderboard_with_virtual(
+        self,
+        db: AsyncSession,
+        contest_id: int,
+        *,
+        limit: int | None = None,
+    ) -> list[tuple[str, int, int, bool]]:
+        """Тот же формат, что у get_contest_leaderboard_with_virtual."""
+        real = await self.get_leaderboard(db, contest_id, limit=limit)
+        virtual = await list_virtual_participants(db, contest_id)
+
+        merged: list[tuple[str, int, int, bool]] = []
+        for user, score, amount in real:
+            merged.append((user.full_name, score, amount, False))
+        for vp in virtual:
+            merged.append((vp.display_name, vp.referral_count, vp.total_amount_kopeks, True))
+
+        merged.sort(key=lambda x: (-x[1], -x[2]))
+
+        if limit:
+            merged = merged[:limit]
+
+        return merged
+
+
+contest_leaderboard = ReferralContestLeaderboard()
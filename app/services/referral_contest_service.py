@@ -12,7 +12,7 @@ from app.config import settings
 from app.database.crud.referral_contest import (
     add_contest_event,
     get_contest_events_count,
-    get_contest_leaderboard_with_virtual,
+    get_contest_referrers,
     get_contests_for_events,
     get_contests_for_summaries,
     get_referrer_score,
@@ -22,7 +22,8 @@ from app.database.crud.referral_contest import (
 )
 from app.database.crud.user import get_user_by_id
 from app.database.database import AsyncSessionLocal
-from app.database.models import ReferralContest, User
+from app.database.models import ReferralContest
+from app.services.referral_contest_leaderboard import contest_leaderboard
 
 
 logger = logging.getLogger(__name__)
@@ -33,6 +34,8 @@ class ReferralContestService:
         self.bot: Bot | None = None
         self._task: asyncio.Task | None = None
         self._poll_interval_seconds = 60
+        self._leaderboard_reconcile_seconds = 900
+        self._leaderboard_synced_at: dict[int, datetime] = {}
 
     def set_bot(self, bot: Bot) -> None:
         self.bot = bot
@@ -88,6 +91,7 @@ class ReferralContestService:
 
             for contest in contests:
                 try:
+                    await self._maybe_reconcile_leaderboard(db, contest, now_utc)
                     await self._maybe_send_daily_summary(db, contest, now_utc)
                     await self._maybe_send_final_summary(db, contest, now_utc)
                 except asyncio.CancelledError:
@@ -100,6 +104,20 @@ class ReferralContestService:
                         exc,
                     )
 
+    async def _maybe_reconcile_leaderboard(
+        self,
+        db: AsyncSession,
+        contest: ReferralContest,
+        now_utc: datetime,
+    ) -> None:
+        """Периодически сверяет инкрементальный лидерборд с событиями в БД."""
+        synced_at = self._leaderboard_synced_at.get(contest.id)
+        if synced_at and (now_utc - synced_at).total_seconds() < self._leaderboard_reconcile_seconds:
+            return
+
+        await contest_leaderboard.reconcile(db, contest.id)
+        self._leaderboard_synced_at[contest.id] = now_utc
+
     async def _maybe_send_daily_summary(
         self,
         db: AsyncSession,
@@ -174,9 +192,10 @@ class ReferralContestService:
         day_start_utc = day_start_local.astimezone(UTC).replace(tzinfo=None)
         day_end_utc = day_end_local.astimezone(UTC).replace(tzinfo=None)
 
-        leaderboard = await get_contest_leaderboard_with_virtual(db, contest.id)
+        leaderboard = await contest_leaderboard.get_leaderboard_with_virtual(db, contest.id, limit=5)
         virtual_participants = await list_virtual_participants(db, contest.id)
         virtual_count = sum(vp.referral_count for vp in virtual_participants)
+        participants_count = await contest_leaderboard.count(db, contest.id) + len(virtual_participants)
         total_events = await get_contest_events_count(db, contest.id) + virtual_count
         today_events = await get_contest_events_count(
             db,
@@ -197,6 +216,7 @@ class ReferralContestService:
         await self._notify_public_channel(
             contest=contest,
             leaderboard=leaderboard,
+            participants_count=participants_count,
             total_events=total_events,
             today_events=today_events,
             is_final=is_final,
@@ -216,7 +236,6 @@ class ReferralContestService:
         db: AsyncSession,
         *,
         contest: ReferralContest,
-        leaderboard: Sequence[tuple[User, int, int]],
         total_events: int,
         today_events: int,
         day_start_utc: datetime,
@@ -226,11 +245,15 @@ class ReferralContestService:
         if not self.bot:
             return
 
-        # leaderboard already sorted by helper
-        score_map = {user.id: (idx + 1, score) for idx, (user, score, _) in enumerate(leaderboard)}
+        # Место и счёт берутся из индекса лидерборда, без пересчёта событий
+        entries = await contest_leaderboard.get_top(db, contest.id)
+        users = await get_contest_referrers(db, [entry.referrer_id for entry in entries])
 
-        for user, score, _ in leaderboard:
-            rank = score_map.get(user.id, (None, score))[0]
+        for entry in entries:
+            user = users.get(entry.referrer_id)
+            if user is None:
+                continue
+            rank, score = entry.rank, entry.score
             today_score = (
                 await get_referrer_score(
                     db=db,
@@ -321,6 +344,7 @@ class ReferralContestService:
         *,
         contest: ReferralContest,
         leaderboard: Sequence[tuple[str, int, int, bool]],
+        participants_count: int,
         total_events: int,
         today_events: int,
         is_final: bool,
@@ -342,7 +366,7 @@ class ReferralContestService:
             f'🏆 {contest.title}',
             '🏁 Итоги конкурса' if is_final else '📊 Промежуточные итоги',
             f'Время зоны: {tz.key}',
-            f'Всего участников: <b>{len(leaderboard)}</b>',
+            f'Всего участников: <b>{participants_count}</b>',
             '',
             'Топ участников:',
         ]
@@ -405,7 +429,6 @@ class ReferralContestService:
 
     async def get_detailed_contest_stats(self, db: AsyncSession, contest_id: int) -> dict:
         from app.database.crud.referral_contest import (
-            get_contest_leaderboard,
             get_contest_payment_stats,
             get_contest_transaction_breakdown,
             get_referral_contest,
@@ -426,7 +449,7 @@ class ReferralContestService:
             }
 
         # Get leaderboard - already includes User objects
-        leaderboard = await get_contest_leaderboard(db, contest_id)
+        leaderboard = await contest_leaderboard.get_leaderboard(db, contest_id)
 
         # Получаем статистику оплат
         payment_stats = await get_contest_payment_stats(db, contest_id)
@@ -567,6 +590,7 @@ class ReferralContestService:
                     event_type='subscription_purchase',
                 )
                 if event:
+                    await contest_leaderboard.record_event(contest.id, user.referred_by_id, amount_kopeks)
                     logger.info(
                         'Записан зачёт конкурса %s: реферер %s, реферал %s',
                         contest.id,
@@ -628,6 +652,7 @@ class ReferralContestService:
                     event_type='referral_registration',
                 )
                 if event:
+                    await contest_leaderboard.record_event(contest.id, user.referred_by_id)
                     logger.info(
                         'Записан зачёт конкурса регистрации %s: реферер %s, реферал %s',
                         contest.id,
@@ -652,6 +677,7 @@ class ReferralContestService:
         try:
             stats = await sync_contest_events(db, contest_id)
             if 'error' not in stats:
+                await contest_leaderboard.reconcile(db, contest_id)
                 logger.info(
                     'Синхронизация конкурса %s: создано %s, обновлено %s, пропущено %s',
                     contest_id,
@@ -679,6 +705,7 @@ class ReferralContestService:
         try:
             stats = await cleanup_invalid_contest_events(db, contest_id)
             if 'error' not in stats:
+                await contest_leaderboard.reconcile(db, contest_id)
                 logger.info(
                     'Очистка конкурса %s: удалено %s невалидных событий, осталось %s',
                     contest_id,
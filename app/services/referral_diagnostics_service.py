@@ -7,10 +7,13 @@
 - Выявление потерянных рефералов
 """
 
+import asyncio
 import logging
 import re
+import tarfile
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Optional
 
@@ -19,12 +22,30 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.database.crud.referral import create_referral_earning
+from app.database.crud.referral_click_event import (
+    create_referral_click_event,
+    get_first_referral_click_time,
+    get_referral_click_events,
+)
 from app.database.crud.user import add_user_balance
+from app.database.database import AsyncSessionLocal
 from app.database.models import ReferralEarning, User
 
 
 logger = logging.getLogger(__name__)
 
+# Паттерн timestamp строки лога
+_TIMESTAMP_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - .+ - .+ - (.+)$')
+# /start refXXX или /start ref_refXXX
+_START_PATTERN = re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)')
+# Сохранение payload
+_PAYLOAD_PATTERN = re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)")
+# Архивы LogRotationService: logs_YYYY-MM-DD.tar.gz / logs_YYYY-MM-DD.tar
+_ARCHIVE_NAME_PATTERN = re.compile(r'^logs_(\d{4}-\d{2}-\d{2})\.tar(?:\.gz)?$')
+
+# Ссылки на фоновые записи кликов, чтобы задачи не собрал сборщик мусора
+_click_tasks: set[asyncio.Task] = set()
+
 
 @dataclass
 class ReferralClick:
@@ -286,6 +307,143 @@ class MissingBonusReport:
         )
 
 
+def _iter_log_lines(path: Path) -> Iterator[str]:
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        yield from f
+
+
+def _iter_archive_lines(path: Path) -> Iterator[str]:
+    """Строки bot.log из архива LogRotationService."""
+    with tarfile.open(path, 'r:*') as tar:
+        for member in tar.getmembers():
+            if not member.isfile() or Path(member.name).name != 'bot.log':
+                continue
+            extracted = tar.extractfile(member)
+            if extracted is None:
+                continue
+            with extracted:
+                for raw_line in extracted:
+                    yield raw_line.decode('utf-8', errors='ignore')
+
+
+def _parse_click_lines(
+    lines: Iterable[str],
+    start_date: datetime,
+    end_date: datetime,
+    skip_date_filter: bool = False,
+) -> tuple[list[ReferralClick], int, int]:
+    """Синхронный разбор строк лога; вызывается в отдельном потоке."""
+    clicks: list[ReferralClick] = []
+    total_lines = 0
+    lines_in_period = 0
+
+    # Для быстрой фильтрации по дате (только если период укладывается в одни сутки)
+    use_date_prefix = not skip_date_filter and start_date.date() == (end_date - timedelta(microseconds=1)).date()
+    date_prefix = start_date.strftime('%Y-%m-%d') if use_date_prefix else None
+
+    for line in lines:
+        total_lines += 1
+        line = line.strip()
+        if not line:
+            continue
+
+        # Убираем Docker-префикс
+        if ' | ' in line[:50]:
+            line = line.split(' | ', 1)[-1]
+
+        # Быстрая проверка по дате (только для периода в пределах суток)
+        if date_prefix and date_prefix not in line[:10]:
+            continue
+
+        match = _TIMESTAMP_PATTERN.match(line)
+        if not match:
+            continue
+
+        timestamp_str, message = match.groups()
+        try:
+            timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            continue
+
+        if not skip_date_filter and not (start_date <= timestamp < end_date):
+            continue
+
+        lines_in_period += 1
+
+        event_match = _START_PATTERN.search(message)
+        if event_match:
+            telegram_id = int(event_match.group(1))
+            raw_code = event_match.group(2)
+        else:
+            event_match = _PAYLOAD_PATTERN.search(message)
+            if not event_match:
+                continue
+            raw_code = event_match.group(1)
+            telegram_id = int(event_match.group(2))
+
+        clicks.append(
+            ReferralClick(
+                timestamp=timestamp,
+                telegram_id=telegram_id,
+                raw_code=raw_code,
+                clean_code=ReferralDiagnosticsService.clean_referral_code(raw_code),
+                log_line=line,
+            )
+        )
+
+    return clicks, total_lines, lines_in_period
+
+
+def _parse_log_source(
+    path: Path,
+    start_date: datetime,
+    end_date: datetime,
+    skip_date_filter: bool = False,
+) -> tuple[list[ReferralClick], int, int]:
+    try:
+        lines = _iter_archive_lines(path) if _ARCHIVE_NAME_PATTERN.match(path.name) else _iter_log_lines(path)
+        return _parse_click_lines(lines, start_date, end_date, skip_date_filter)
+    except Exception as e:
+        logger.error(f'Ошибка парсинга логов {path}: {e}', exc_info=True)
+        return [], 0, 0
+
+
+def _local_to_utc(value: datetime) -> datetime:
+    """Наивное локальное время (как в логах) -> наивное UTC (как в БД)."""
+    return value.astimezone(UTC).replace(tzinfo=None)
+
+
+def _utc_to_local(value: datetime) -> datetime:
+    return value.replace(tzinfo=UTC).astimezone().replace(tzinfo=None)
+
+
+def track_referral_click(telegram_id: int | None, raw_code: str | None, source: str) -> None:
+    """Записывает переход по реф-ссылке в журнал в фоне, не блокируя обработку апдейта."""
+    if not telegram_id or not raw_code:
+        return
+
+    async def _store() -> None:
+        try:
+            async with AsyncSessionLocal() as db:
+                await create_referral_click_event(
+                    db,
+                    telegram_id=telegram_id,
+                    raw_code=raw_code,
+                    clean_code=ReferralDiagnosticsService.clean_referral_code(raw_code),
+                    source=source,
+                )
+        except Exception as e:
+            logger.warning(f'Не удалось записать реф-клик {telegram_id} ({raw_code}): {e}')
+
+    try:
+        task = asyncio.get_running_loop().create_task(_store())
+    except RuntimeError:
+        logger.debug('Нет активного event loop для записи реф-клика')
+        return
+    _click_tasks.add(task)
+    task.add_done_callback(_click_tasks.discard)
+
+
 class ReferralDiagnosticsService:
     """Сервис диагностики реферальной системы."""
 
@@ -346,8 +504,8 @@ class ReferralDiagnosticsService:
     async def analyze_period(self, db: AsyncSession, start_date: datetime, end_date: datetime) -> DiagnosticReport:
         """Анализирует реферальные события за указанный период."""
 
-        # 1. Парсим логи — находим все переходы по реф-ссылкам
-        clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, end_date)
+        # 1. Берём переходы из журнала; логи читаем только за период до его появления
+        clicks, total_lines, lines_in_period = await self._collect_clicks(db, start_date, end_date)
 
         # 2. Группируем по telegram_id (берём последний клик)
         user_clicks: dict[int, ReferralClick] = {}
@@ -367,6 +525,47 @@ class ReferralDiagnosticsService:
             lines_in_period=lines_in_period,
         )
 
+    async def _collect_clicks(
+        self, db: AsyncSession, start_date: datetime, end_date: datetime
+    ) -> tuple[list[ReferralClick], int, int]:
+        """Переходы за период: журнал referral_click_events + логи за время до его появления."""
+        legacy_end = end_date
+        try:
+            journal_start = await get_first_referral_click_time(db)
+            if journal_start is not None:
+                legacy_end = min(end_date, _utc_to_local(journal_start))
+        except Exception as e:
+            # Журнал недоступен (например, миграция ещё не применена) — анализируем только логи
+            logger.warning(f'⚠️ Журнал реф-кликов недоступен, используем логи: {e}')
+            journal_start = None
+
+        legacy_clicks: list[ReferralClick] = []
+        total_lines = 0
+        lines_in_period = 0
+
+        if start_date < legacy_end:
+            legacy_clicks, total_lines, lines_in_period = await self._parse_clicks(start_date, legacy_end)
+
+        stored_clicks: list[ReferralClick] = []
+        if journal_start is not None:
+            events = await get_referral_click_events(
+                db, _local_to_utc(max(start_date, legacy_end)), _local_to_utc(end_date)
+            )
+            stored_clicks = [
+                ReferralClick(
+                    timestamp=_utc_to_local(event.clicked_at),
+                    telegram_id=event.telegram_id,
+                    raw_code=event.raw_code,
+                    clean_code=event.clean_code,
+                    log_line=f'[{event.source}] /start {event.raw_code}',
+                )
+                for event in events
+            ]
+            lines_in_period += len(stored_clicks)
+
+        logger.info(f'📊 Реф-клики за период: из журнала={len(stored_clicks)}, из логов={len(legacy_clicks)}')
+        return legacy_clicks + stored_clicks, total_lines, lines_in_period
+
     async def analyze_file(self, db: AsyncSession, file_path: str) -> DiagnosticReport:
         """
         Анализирует загруженный лог-файл на наличие потерянных рефералов.
@@ -419,93 +618,56 @@ class ReferralDiagnosticsService:
             # Восстанавливаем оригинальный путь
             self.log_path = original_log_path
 
+    def _find_archives(self, start_date: datetime, end_date: datetime) -> list[Path]:
+        """Архивы LogRotationService, покрывающие период (архив за день X содержит логи дня X)."""
+        archive_dir = self.log_path.parent.parent / 'archive'
+        if not archive_dir.is_dir():
+            return []
+
+        first_day = start_date.date()
+        last_day = (end_date - timedelta(microseconds=1)).date()
+
+        archives = []
+        for archive_file in archive_dir.iterdir():
+            match = _ARCHIVE_NAME_PATTERN.match(archive_file.name)
+            if not match or not archive_file.is_file():
+                continue
+            try:
+                archive_day = datetime.strptime(match.group(1), '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            if first_day <= archive_day <= last_day:
+                archives.append(archive_file)
+
+        return sorted(archives)
+
     async def _parse_clicks(
         self, start_date: datetime, end_date: datetime, skip_date_filter: bool = False
     ) -> tuple[list[ReferralClick], int, int]:
-        """Парсит логи и находит все переходы по реф-ссылкам."""
+        """Парсит логи (текущий файл и архивы) в пуле потоков, не блокируя event loop."""
 
-        clicks = []
-        total_lines = 0
-        lines_in_period = 0
-
-        if not self.log_path.exists():
+        sources: list[Path] = []
+        if self.log_path.exists():
+            sources.append(self.log_path)
+        else:
             logger.warning(f'❌ Лог-файл не найден: {self.log_path}')
-            return clicks, 0, 0
 
-        file_size = self.log_path.stat().st_size
-        logger.info(f'📂 Читаю лог-файл: {self.log_path} ({file_size / 1024 / 1024:.2f} MB)')
+        if not skip_date_filter:
+            sources.extend(self._find_archives(start_date, end_date))
 
-        # Паттерн timestamp
-        timestamp_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - .+ - .+ - (.+)$')
+        if not sources:
+            return [], 0, 0
 
-        # Паттерны для поиска реф-кликов
-        # /start refXXX или /start ref_refXXX
-        start_pattern = re.compile(r'📩 Сообщение от ID:(\d+).*?/start\s+(ref[\w_]+)')
-        # Сохранение payload
-        payload_pattern = re.compile(r"💾 Сохранен start payload '(ref[\w_]+)' для пользователя\s*(\d+)")
+        logger.info(f'📂 Читаю логи: {", ".join(str(path) for path in sources)}')
 
-        # Для быстрой фильтрации по дате (только если не пропускаем фильтр)
-        use_date_prefix = not skip_date_filter and (end_date - start_date).days <= 31
-        date_prefix = start_date.strftime('%Y-%m-%d') if use_date_prefix else None
-
-        try:
-            with open(self.log_path, encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    total_lines += 1
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Убираем Docker-префикс
-                    if ' | ' in line[:50]:
-                        line = line.split(' | ', 1)[-1]
-
-                    # Быстрая проверка по дате (только для коротких периодов)
-                    if date_prefix and date_prefix not in line[:10]:
-                        continue
-
-                    # Парсим timestamp
-                    match = timestamp_pattern.match(line)
-                    if not match:
-                        continue
-
-                    timestamp_str, message = match.groups()
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S')
-                    except ValueError:
-                        continue
-
-                    if not (start_date <= timestamp < end_date):
-                        continue
-
-                    lines_in_period += 1
-
-                    # Ищем реф-клики
-                    for pattern in [start_pattern, payload_pattern]:
-                        event_match = pattern.search(message)
-                        if event_match:
-                            if pattern == start_pattern:
-                                telegram_id = int(event_match.group(1))
-                                raw_code = event_match.group(2)
-                            else:
-                                raw_code = event_match.group(1)
-                                telegram_id = int(event_match.group(2))
-
-                            clean_code = self.clean_referral_code(raw_code)
-
-                            clicks.append(
-                                ReferralClick(
-                                    timestamp=timestamp,
-                                    telegram_id=telegram_id,
-                                    raw_code=raw_code,
-                                    clean_code=clean_code,
-                                    log_line=line,
-                                )
-                            )
-                            break
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_parse_log_source, path, start_date, end_date, skip_date_filter) for path in sources)
+        )
 
-        except Exception as e:
-            logger.error(f'Ошибка парсинга логов: {e}', exc_info=True)
+        clicks = [click for source_clicks, _, _ in results for click in source_clicks]
+        clicks.sort(key=lambda click: click.timestamp)
+        total_lines = sum(result[1] for result in results)
+        lines_in_period = sum(result[2] for result in results)
 
         logger.info(f'📊 Парсинг: строк={total_lines}, за период={lines_in_period}, реф-кликов={len(clicks)}')
         return clicks, total_lines, lines_in_period
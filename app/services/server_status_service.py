@@ -1,18 +1,24 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import hashlib
 import logging
 import re
+import time
 from dataclasses import dataclass
+from datetime import datetime
 
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ServerStatusEntry:
     address: str
     instance: str | None
@@ -24,11 +30,86 @@ class ServerStatusEntry:
     is_online: bool
 
 
+ServerStatusPage = tuple[tuple[ServerStatusEntry, ...], tuple[ServerStatusEntry, ...]]
+
+
+@dataclass(frozen=True, slots=True)
+class ServerStatusSnapshot:
+    """Immutable parsed metrics with pagination precomputed for the status screen."""
+
+    servers: tuple[ServerStatusEntry, ...]
+    online_count: int
+    offline_count: int
+    pages: tuple[ServerStatusPage, ...]
+    items_per_page: int
+    fetched_at: datetime
+    checked_at: float  # time.monotonic() of the last successful fetch or 304
+
+    @classmethod
+    def build(cls, servers: list[ServerStatusEntry], items_per_page: int) -> ServerStatusSnapshot:
+        online = tuple(server for server in servers if server.is_online)
+        offline = tuple(server for server in servers if not server.is_online)
+        return cls(
+            servers=tuple(servers),
+            online_count=len(online),
+            offline_count=len(offline),
+            pages=_split_into_pages(online, offline, items_per_page),
+            items_per_page=items_per_page,
+            fetched_at=datetime.now(),
+            checked_at=time.monotonic(),
+        )
+
+    @property
+    def total_pages(self) -> int:
+        return len(self.pages)
+
+    def page(self, number: int) -> tuple[ServerStatusPage, int]:
+        """Page by 1-based number (clamped) and the actual page number."""
+        index = min(max(number - 1, 0), len(self.pages) - 1)
+        return self.pages[index], index + 1
+
+    def paginated(self, items_per_page: int) -> ServerStatusSnapshot:
+        if items_per_page == self.items_per_page:
+            return self
+        online = tuple(server for server in self.servers if server.is_online)
+        offline = tuple(server for server in self.servers if not server.is_online)
+        return dataclasses.replace(
+            self, pages=_split_into_pages(online, offline, items_per_page), items_per_page=items_per_page
+        )
+
+    def touched(self) -> ServerStatusSnapshot:
+        return dataclasses.replace(self, fetched_at=datetime.now(), checked_at=time.monotonic())
+
+
+def _split_into_pages(
+    online: tuple[ServerStatusEntry, ...],
+    offline: tuple[ServerStatusEntry, ...],
+    items_per_page: int,
+) -> tuple[ServerStatusPage, ...]:
+    """Online servers first, then offline ones, at most ``items_per_page`` per page."""
+    ordered = online + offline
+    size = max(1, items_per_page)
+    online_total = len(online)
+    pages = [
+        (ordered[start : min(start + size, online_total)], ordered[max(start, online_total) : start + size])
+        for start in range(0, len(ordered), size)
+    ]
+    return tuple(pages) or (((), ()),)
+
+
 class ServerStatusError(Exception):
     """Raised when server status information cannot be fetched or parsed."""
 
 
 class ServerStatusService:
+    """Keeps a shared snapshot of XrayChecker metrics.
+
+    A background poller refreshes the snapshot every ``SERVER_STATUS_POLL_INTERVAL``
+    seconds; handlers read it without touching the metrics endpoint. Refreshes are
+    single-flight, conditional (ETag / Last-Modified) and skip parsing when the
+    body did not change. Without the poller the snapshot is refreshed on demand.
+    """
+
     _LATENCY_PATTERN = re.compile(r'xray_proxy_latency_ms\{(?P<labels>[^}]*)\}\s+(?P<value>[-+]?\d+(?:\.\d+)?)')
     _STATUS_PATTERN = re.compile(r'xray_proxy_status\{(?P<labels>[^}]*)\}\s+(?P<value>[-+]?\d+(?:\.\d+)?)')
     _LABEL_PATTERN = re.compile(r'(?P<key>[a-zA-Z_][a-zA-Z0-9_]*)=\"(?P<value>(?:\\.|[^\"])*)\"')
@@ -36,8 +117,89 @@ class ServerStatusService:
 
     def __init__(self) -> None:
         self._logger = logging.getLogger(self.__class__.__name__)
+        self._snapshot: ServerStatusSnapshot | None = None
+        self._etag: str | None = None
+        self._last_modified: str | None = None
+        self._body_digest: bytes | None = None
+        self._refresh_task: asyncio.Task[ServerStatusSnapshot] | None = None
+        self._poller: asyncio.Task | None = None
+        self._stats = {'fetches': 0, 'not_modified': 0, 'unchanged_body': 0, 'parsed': 0, 'errors': 0}
+
+    @property
+    def _poll_interval(self) -> int:
+        return settings.get_server_status_poll_interval()
+
+    def is_running(self) -> bool:
+        return self._poller is not None and not self._poller.done()
+
+    async def start(self) -> None:
+        if settings.get_server_status_mode() != 'xray' or not settings.get_server_status_metrics_url():
+            return
+        if self.is_running():
+            return
+        self._poller = asyncio.create_task(self._poll_loop(), name='server-status-poller')
+        self._logger.info('📡 Опрос метрик статуса серверов запущен (интервал: %s с)', self._poll_interval)
+
+    async def stop(self) -> None:
+        if self._poller and not self._poller.done():
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+        self._poller = None
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except ServerStatusError as error:
+                self._logger.warning('Server status poll failed: %s', error)
+            except Exception as error:  # pragma: no cover - defensive logging
+                self._logger.error('Unexpected server status poll error: %s', error)
+            await asyncio.sleep(self._poll_interval)
+
+    async def get_snapshot(self) -> ServerStatusSnapshot:
+        """Current snapshot; refreshed only when the poller has fallen behind.
+
+        If the refresh fails but an older snapshot exists, the older one is returned.
+        """
+        if settings.get_server_status_mode() != 'xray':
+            raise ServerStatusError('Server status integration is not enabled')
+
+        items_per_page = settings.get_server_status_items_per_page()
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.checked_at < self._poll_interval:
+            return snapshot.paginated(items_per_page)
+
+        try:
+            snapshot = await self.refresh()
+        except ServerStatusError:
+            if self._snapshot is None:
+                raise
+            snapshot = self._snapshot
+        return snapshot.paginated(items_per_page)
 
     async def get_servers(self) -> list[ServerStatusEntry]:
+        return list((await self.get_snapshot()).servers)
+
+    async def refresh(self) -> ServerStatusSnapshot:
+        """Fetch metrics; concurrent callers share one request."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        # shield: a cancelled reader must not cancel the refresh for the others
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> ServerStatusSnapshot:
+        try:
+            snapshot = await self._fetch_snapshot()
+        except ServerStatusError:
+            self._stats['errors'] += 1
+            raise
+        self._snapshot = snapshot
+        return snapshot
+
+    async def _fetch_snapshot(self) -> ServerStatusSnapshot:
         mode = settings.get_server_status_mode()
         if mode != 'xray':
             raise ServerStatusError('Server status integration is not enabled')
@@ -53,59 +215,92 @@ class ServerStatusService:
             username, password = auth_credentials
             auth = aiohttp.BasicAuth(username, password)
 
+        previous = self._snapshot
+        headers = {}
+        if previous is not None:
+            if self._etag:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified:
+                headers['If-Modified-Since'] = self._last_modified
+
+        self._stats['fetches'] += 1
         try:
-            async with (
-                aiohttp.ClientSession(timeout=timeout) as session,
-                session.get(
-                    url,
-                    auth=auth,
-                    ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
-                ) as response,
-            ):
+            async with http_clients.request(
+                'server_status',
+                'GET',
+                url,
+                auth=auth,
+                headers=headers,
+                ssl=settings.SERVER_STATUS_METRICS_VERIFY_SSL,
+                timeout=timeout,
+            ) as response:
+                if response.status == 304 and previous is not None:
+                    self._stats['not_modified'] += 1
+                    return previous.touched()
                 if response.status != 200:
                     text = await response.text()
                     raise ServerStatusError(f'Unexpected response status: {response.status} - {text[:200]}')
-                metrics_body = await response.text()
+                raw_body = await response.read()
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                charset = response.get_encoding()
         except TimeoutError as error:
             raise ServerStatusError('Request to metrics endpoint timed out') from error
         except aiohttp.ClientError as error:
             raise ServerStatusError('Failed to fetch metrics') from error
 
-        return self._parse_metrics(metrics_body)
+        self._etag, self._last_modified = etag, last_modified
+
+        # Экспортёры Prometheus обычно не отдают ETag — сравниваем тело
+        digest = hashlib.blake2b(raw_body, digest_size=16).digest()
+        if previous is not None and digest == self._body_digest:
+            self._stats['unchanged_body'] += 1
+            return previous.touched()
+
+        servers = await asyncio.to_thread(self._parse_metrics, raw_body.decode(charset, errors='replace'))
+        self._body_digest = digest
+        self._stats['parsed'] += 1
+        return ServerStatusSnapshot.build(servers, settings.get_server_status_items_per_page())
+
+    def get_stats(self) -> dict[str, object]:
+        snapshot = self._snapshot
+        return {
+            'polling': self.is_running(),
+            'poll_interval_seconds': self._poll_interval,
+            'servers': len(snapshot.servers) if snapshot else 0,
+            'snapshot_age_seconds': round(time.monotonic() - snapshot.checked_at, 1) if snapshot else None,
+            **self._stats,
+        }
 
     def _parse_metrics(self, body: str) -> list[ServerStatusEntry]:
-        servers: dict[tuple[str, str, str, str], ServerStatusEntry] = {}
+        latencies: dict[tuple[str, str, str, str], int | None] = {}
+        statuses: dict[tuple[str, str, str, str], bool] = {}
+        labels_by_key: dict[tuple[str, str, str, str], dict[str, str]] = {}
 
         for match in self._LATENCY_PATTERN.finditer(body):
             labels = self._parse_labels(match.group('labels'))
             key = self._build_key(labels)
-            entry = servers.get(key)
-            if not entry:
-                entry = self._create_entry(labels)
-                servers[key] = entry
-
+            labels_by_key.setdefault(key, labels)
             try:
-                value = float(match.group('value'))
-                entry.latency_ms = int(round(value))
+                latencies[key] = int(round(float(match.group('value'))))
             except (TypeError, ValueError):
-                entry.latency_ms = None
+                latencies[key] = None
 
         for match in self._STATUS_PATTERN.finditer(body):
             labels = self._parse_labels(match.group('labels'))
             key = self._build_key(labels)
-            entry = servers.get(key)
-            if not entry:
-                entry = self._create_entry(labels)
-                servers[key] = entry
-
+            labels_by_key.setdefault(key, labels)
             try:
-                value = float(match.group('value'))
-                entry.is_online = value >= 1
+                statuses[key] = float(match.group('value')) >= 1
             except (TypeError, ValueError):
-                entry.is_online = False
+                statuses[key] = False
 
+        servers = [
+            self._create_entry(labels, latencies.get(key), statuses.get(key, False))
+            for key, labels in labels_by_key.items()
+        ]
         return sorted(
-            servers.values(),
+            servers,
             key=lambda item: (
                 0 if item.is_online else 1,
                 (item.display_name or item.name).lower(),
@@ -120,7 +315,7 @@ class ServerStatusService:
             labels.get('name', labels.get('address', '')),
         )
 
-    def _create_entry(self, labels: dict[str, str]) -> ServerStatusEntry:
+    def _create_entry(self, labels: dict[str, str], latency_ms: int | None, is_online: bool) -> ServerStatusEntry:
         name = labels.get('name') or labels.get('address') or 'Unknown'
         flag, display_name = self._extract_flag(name)
         return ServerStatusEntry(
@@ -130,8 +325,8 @@ class ServerStatusService:
             name=name,
             flag=flag,
             display_name=display_name or name,
-            latency_ms=None,
-            is_online=False,
+            latency_ms=latency_ms,
+            is_online=is_online,
         )
 
     def _extract_flag(self, name: str) -> tuple[str, str]:
@@ -148,3 +343,6 @@ class ServerStatusService:
             value = match.group('value').replace('\\"', '"')
             labels[key] = value
         return labels
+
+
+server_status_service = ServerStatusService()
@@ -923,13 +923,17 @@ class SubscriptionService:
         promo_group_id: int | None = None,
     ) -> tuple[int, list[int]]:
         try:
-            from app.database.crud.server_squad import get_server_squad_by_uuid
+            from app.database.crud.server_squad import get_server_squads_by_uuids
 
             total_price = 0
             prices_list = []
 
+            servers_by_uuid = {
+                server.squad_uuid: server for server in await get_server_squads_by_uuids(db, list(country_uuids))
+            }
+
             for country_uuid in country_uuids:
-                server = await get_server_squad_by_uuid(db, country_uuid)
+                server = servers_by_uuid.get(country_uuid)
                 is_allowed = True
                 if promo_group_id is not None and server:
                     allowed_ids = {pg.id for pg in server.allowed_promo_groups}
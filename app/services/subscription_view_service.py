@@ -0,0 +1,274 @@
+"""Per-user cache of the subscription screen shown by the miniapp and the cabinet.
+
+Every user has a version counter. It is bumped after a committed change to the
+user row, the subscription, transactions, discount offers, traffic purchases
+or temporary accesses. Purchases, balance top-ups and panel webhooks all write
+through these models, so handlers never invalidate the cache by hand; CRUD
+helpers issuing bulk UPDATE statements, which the ORM does not track, register
+their users with :func:`invalidate_on_commit`. A cached
+view is served while its version matches and ``MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL``
+has not expired, so time-derived fields (days left, progress) lag by at most the TTL.
+
+The cache and the counters live in the process that serves the web API, which
+is also where the bot and webhooks write.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from itertools import chain
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from app.config import settings
+from app.database.models import (
+    DiscountOffer,
+    Subscription,
+    SubscriptionTemporaryAccess,
+    TrafficPurchase,
+    Transaction,
+    User,
+)
+from app.database.session_hooks import defer_until_commit, on_commit
+
+
+logger = logging.getLogger(__name__)
+
+ViewKey = tuple[str, int]
+ViewBuilder = Callable[[], Awaitable[BaseModel]]
+
+
+@dataclass(frozen=True, slots=True)
+class SubscriptionView:
+    body: bytes
+    etag: str
+    version: int
+    created_at: float
+
+    @classmethod
+    def from_model(cls, model: BaseModel, version: int) -> SubscriptionView:
+        body = model.model_dump_json(by_alias=True).encode()
+        etag = f'W/"{version}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        return cls(body=body, etag=etag, version=version, created_at=time.monotonic())
+
+    def matches(self, if_none_match: str | None) -> bool:
+        if not if_none_match:
+            return False
+        candidates = {tag.strip() for tag in if_none_match.split(',')}
+        return '*' in candidates or self.etag in candidates
+
+
+class SubscriptionViewService:
+    def __init__(self) -> None:
+        self._versions: dict[int, int] = {}
+        self._views: OrderedDict[ViewKey, SubscriptionView] = OrderedDict()
+        self._builds: dict[ViewKey, asyncio.Future[SubscriptionView]] = {}
+        self._usage_synced_at: dict[int, float] = {}
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'not_modified': 0,
+            'invalidations': 0,
+            'usage_syncs': 0,
+            'usage_syncs_skipped': 0,
+        }
+
+    def version(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    def invalidate(self, *user_ids: int) -> None:
+        for user_id in user_ids:
+            # Устаревшие представления отбрасываются при следующем чтении или вытесняются LRU
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            self._stats['invalidations'] += 1
+
+        if len(self._versions) > 4 * max(1, settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE):
+            self._prune_versions()
+
+    def _prune_versions(self) -> None:
+        # Счётчик без кешированного и строящегося представления можно сбросить:
+        # устаревать нечему
+        live = {user_id for _, user_id in chain(self._views, self._builds)}
+        self._versions = {user_id: version for user_id, version in self._versions.items() if user_id in live}
+
+    def get(self, scope: str, user_id: int) -> SubscriptionView | None:
+        key = (scope, user_id)
+        view = self._views.get(key)
+        if view is None:
+            return None
+        ttl = max(0, settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL)
+        if view.version != self.version(user_id) or time.monotonic() - view.created_at >= ttl:
+            del self._views[key]
+            return None
+        self._views.move_to_end(key)
+        return view
+
+    def store(self, scope: str, user_id: int, model: BaseModel, version: int) -> SubscriptionView:
+        view = SubscriptionView.from_model(model, version)
+        if version == self.version(user_id) and settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL > 0:
+            self._views[scope, user_id] = view
+            self._views.move_to_end((scope, user_id))
+            while len(self._views) > max(1, settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE):
+                self._views.popitem(last=False)
+        return view
+
+    async def get_or_build(self, scope: str, user_id: int, build: ViewBuilder) -> SubscriptionView:
+        """Return the cached view or build it once, even if several requests arrive together."""
+        view = self.get(scope, user_id)
+        if view is not None:
+            self._stats['hits'] += 1
+            return view
+
+        key = (scope, user_id)
+        pending = self._builds.get(key)
+        if pending is not None:
+            self._stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Отменили запрос, который строил представление, — строим сами
+                return await self.get_or_build(scope, user_id, build)
+
+        self._stats['misses'] += 1
+        version = self.version(user_id)
+        future: asyncio.Future[SubscriptionView] = asyncio.get_running_loop().create_future()
+        self._builds[key] = future
+        try:
+            view = self.store(scope, user_id, await build(), version)
+        except BaseException as error:
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
+                # Ошибку получит и этот запрос; ожидающим она передаётся через future
+                future.exception()
+            raise
+        else:
+            future.set_result(view)
+            return view
+        finally:
+            self._builds.pop(key, None)
+
+    def record_not_modified(self) -> None:
+        self._stats['not_modified'] += 1
+
+    def should_sync_usage(self, user_id: int) -> bool:
+        """Allow one panel traffic sync per user per ``MINIAPP_USAGE_SYNC_INTERVAL`` seconds."""
+        interval = max(0, settings.MINIAPP_USAGE_SYNC_INTERVAL)
+        now = time.monotonic()
+        last = self._usage_synced_at.get(user_id)
+        if last is not None and now - last < interval:
+            self._stats['usage_syncs_skipped'] += 1
+            return False
+
+        self._usage_synced_at[user_id] = now
+        self._stats['usage_syncs'] += 1
+        if len(self._usage_synced_at) > 4 * max(1, settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE):
+            self._usage_synced_at = {
+                owner: synced_at for owner, synced_at in self._usage_synced_at.items() if now - synced_at < interval
+            }
+        return True
+
+    def get_stats(self) -> dict:
+        requests = self._stats['hits'] + self._stats['misses'] + self._stats['coalesced']
+        return {
+            **self._stats,
+            'hit_rate': round(self._stats['hits'] / requests, 4) if requests else None,
+            'cached_views': len(self._views),
+            'tracked_users': len(self._versions),
+            'ttl_seconds': settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL,
+            'max_entries': settings.MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE,
+            'usage_sync_interval_seconds': settings.MINIAPP_USAGE_SYNC_INTERVAL,
+        }
+
+
+subscription_view_service = SubscriptionViewService()
+
+
+_PENDING_USERS_KEY = 'subscription_view_users'
+_SUBSCRIPTION_OWNERS_MAX_SIZE = 10_000
+
+# subscription_id -> user_id: докупки трафика и временные доступы ссылаются только на подписку
+_subscription_owners: OrderedDict[int, int] = OrderedDict()
+
+
+def _remember_owner(subscription_id: int | None, user_id: int | None) -> None:
+    if subscription_id is None or user_id is None:
+        return
+    _subscription_owners[subscription_id] = user_id
+    _subscription_owners.move_to_end(subscription_id)
+    while len(_subscription_owners) > _SUBSCRIPTION_OWNERS_MAX_SIZE:
+        _subscription_owners.popitem(last=False)
+
+
+def _resolve_subscription_owners(session: Session, subscription_ids: set[int]) -> set[int]:
+    owners: set[int] = set()
+    missing: set[int] = set()
+    for subscription_id in subscription_ids:
+        subscription = session.identity_map.get(identity_key(Subscription, subscription_id))
+        if subscription is not None:
+            _remember_owner(subscription_id, subscription.user_id)
+        if subscription_id in _subscription_owners:
+            _subscription_owners.move_to_end(subscription_id)
+            owners.add(_subscription_owners[subscription_id])
+        else:
+            missing.add(subscription_id)
+
+    if missing:
+        # Подписки нет ни в сессии, ни в кеше — один запрос на весь flush
+        rows = session.connection().execute(
+            select(Subscription.id, Subscription.user_id).where(Subscription.id.in_(sorted(missing)))
+        )
+        for subscription_id, user_id in rows:
+            _remember_owner(subscription_id, user_id)
+            owners.add(user_id)
+    return owners
+
+
+def collect_affected_user_ids(session: Session) -> set[int]:
+    """Users whose subscription view is changed by the pending flush."""
+    user_ids: set[int | None] = set()
+    subscription_ids: set[int] = set()
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+
+    for obj in chain(session.new, dirty, session.deleted):
+        if isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, Subscription):
+            user_ids.add(obj.user_id)
+            _remember_owner(obj.id, obj.user_id)
+        elif isinstance(obj, Transaction | DiscountOffer):
+            user_ids.add(obj.user_id)
+        elif isinstance(obj, TrafficPurchase | SubscriptionTemporaryAccess) and obj.subscription_id is not None:
+            subscription_ids.add(obj.subscription_id)
+
+    if subscription_ids:
+        user_ids.update(_resolve_subscription_owners(session, subscription_ids))
+
+    user_ids.discard(None)
+    return user_ids
+
+
+def invalidate_on_commit(session: Session | AsyncSession, user_ids: Iterable[int]) -> None:
+    """Bump the views of ``user_ids`` once ``session`` commits; used by bulk UPDATEs the flush never sees."""
+    defer_until_commit(session, _PENDING_USERS_KEY, user_ids)
+
+
+def _invalidate_views(user_ids: set[int]) -> None:
+    subscription_view_service.invalidate(*user_ids)
+
+
+on_commit(_PENDING_USERS_KEY, _invalidate_views, collect=collect_affected_user_ids)
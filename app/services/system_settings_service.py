@@ -21,6 +21,8 @@ from app.database.crud.system_setting import (
 from app.database.database import AsyncSessionLocal
 from app.database.models import SystemSetting
 from app.database.universal_migration import ensure_default_web_api_token
+from app.keyboards.cache import invalidate_keyboard_cache
+from app.services.pricing_catalog import invalidate_pricing_catalog
 
 
 logger = logging.getLogger(__name__)
@@ -281,6 +283,9 @@ class BotConfigurationService:
         'ADMIN_NOTIFICATIONS_CHAT_ID': 'ADMIN_NOTIFICATIONS',
         'ADMIN_NOTIFICATIONS_TOPIC_ID': 'ADMIN_NOTIFICATIONS',
         'ADMIN_NOTIFICATIONS_TICKET_TOPIC_ID': 'ADMIN_NOTIFICATIONS',
+        'ADMIN_NOTIFICATIONS_DIGEST_ENABLED': 'ADMIN_NOTIFICATIONS',
+        'ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS': 'ADMIN_NOTIFICATIONS',
+        'ADMIN_NOTIFICATIONS_DIGEST_URGENT_AMOUNT_KOPEKS': 'ADMIN_NOTIFICATIONS',
         'ADMIN_REPORTS_ENABLED': 'ADMIN_REPORTS',
         'ADMIN_REPORTS_CHAT_ID': 'ADMIN_REPORTS',
         'ADMIN_REPORTS_TOPIC_ID': 'ADMIN_REPORTS',
@@ -296,6 +301,7 @@ class BotConfigurationService:
         'DEFAULT_REPORTING_CURRENCY': 'PAYMENT',
         'SUPPORTED_BALANCE_CURRENCIES': 'PAYMENT',
         'SUPPORTED_DISPLAY_CURRENCIES': 'PAYMENT',
+        'CURRENCY_RATES_REFRESH_INTERVAL_MINUTES': 'PAYMENT',
         'AUTO_PURCHASE_AFTER_TOPUP_ENABLED': 'PAYMENT',
         'SIMPLE_SUBSCRIPTION_ENABLED': 'SIMPLE_SUBSCRIPTION',
         'SIMPLE_SUBSCRIPTION_PERIOD_DAYS': 'SIMPLE_SUBSCRIPTION',
@@ -325,6 +331,9 @@ class BotConfigurationService:
         'SUSPICIOUS_NOTIFICATIONS_TOPIC_ID': 'MONITORING',
         'TRAFFIC_CHECK_BATCH_SIZE': 'MONITORING',
         'TRAFFIC_CHECK_CONCURRENCY': 'MONITORING',
+        'TRAFFIC_HISTORY_ENABLED': 'MONITORING',
+        'TRAFFIC_HISTORY_COLLECT_INTERVAL_MINUTES': 'MONITORING',
+        'TRAFFIC_HISTORY_RETENTION_DAYS': 'MONITORING',
         'ENABLE_LOGO_MODE': 'INTERFACE_BRANDING',
         'LOGO_FILE': 'INTERFACE_BRANDING',
         'HIDE_SUBSCRIPTION_LINK': 'INTERFACE_SUBSCRIPTION',
@@ -1702,6 +1711,7 @@ class BotConfigurationService:
             return
         try:
             setattr(settings, key, value)
+            invalidate_keyboard_cache(key)
             if key in {
                 'PRICE_14_DAYS',
                 'PRICE_30_DAYS',
@@ -1711,8 +1721,12 @@ class BotConfigurationService:
                 'PRICE_360_DAYS',
             }:
                 refresh_period_prices()
+                invalidate_pricing_catalog(key)
             elif key.startswith('PRICE_TRAFFIC_') or key == 'TRAFFIC_PACKAGES_CONFIG':
                 refresh_traffic_prices()
+                invalidate_pricing_catalog(key)
+            elif key in {'DEFAULT_DEVICE_LIMIT', 'PRICE_PER_DEVICE'}:
+                invalidate_pricing_catalog(key)
             elif key in {'REMNAWAVE_AUTO_SYNC_ENABLED', 'REMNAWAVE_AUTO_SYNC_TIMES'}:
                 try:
                     from app.services.remnawave_sync_service import remnawave_sync_service
@@ -0,0 +1,385 @@
+"""Локальная история трафика пользователей по нодам.
+
+Сборщик раз в TRAFFIC_HISTORY_COLLECT_INTERVAL_MINUTES забирает с панели суточную
+статистику нод (legacy-эндпоинт отдаёт ``{userUuid, nodeUuid, total, date}``) и
+сохраняет её в ``user_node_traffic_daily``. Для страницы трафика в кабинете вся
+история держится в памяти колонками NumPy, отсортированными по дню, поэтому суммы
+за любой диапазон суток считаются срезом и одним ``np.add.at`` без запросов к панели.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import UTC, date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.database.models import TrafficHistoryDay, UserNodeTrafficDaily
+from app.services.remnawave_service import RemnaWaveService
+
+
+logger = logging.getLogger(__name__)
+
+_CONCURRENCY_LIMIT = 5  # Параллельных запросов к панели
+_INSERT_CHUNK_SIZE = 5000
+_LOAD_CHUNK_SIZE = 50000
+
+
+@dataclass(frozen=True, slots=True)
+class TrafficNode:
+    uuid: str
+    name: str
+    country_code: str
+
+
+@dataclass(slots=True)
+class TrafficMatrix:
+    """Суммарный трафик за период: строка — пользователь, колонка — нода."""
+
+    user_uuids: list[str]
+    node_uuids: list[str]
+    bytes: np.ndarray  # int64, shape (len(user_uuids), len(node_uuids))
+
+    @classmethod
+    def empty(cls) -> 'TrafficMatrix':
+        return cls([], [], np.zeros((0, 0), dtype=np.int64))
+
+    @classmethod
+    def from_columns(
+        cls, users: list[str], nodes: list[str], user_ids: np.ndarray, node_ids: np.ndarray, totals: np.ndarray
+    ) -> 'TrafficMatrix':
+        """Сворачивает записи (пользователь, нода, байты) в матрицу и убирает пользователей без трафика."""
+        matrix = np.zeros((len(users), len(nodes)), dtype=np.int64)
+        np.add.at(matrix, (user_ids, node_ids), totals)
+        active = np.flatnonzero(matrix.any(axis=1))
+        return cls([users[index] for index in active.tolist()], list(nodes), matrix[active])
+
+    @classmethod
+    def from_entries(cls, entries: list[tuple[str, str, int]]) -> 'TrafficMatrix':
+        if not entries:
+            return cls.empty()
+        user_uuids, node_uuids, totals = zip(*entries, strict=True)
+        users, user_ids = np.unique(np.array(user_uuids, dtype=object), return_inverse=True)
+        nodes, node_ids = np.unique(np.array(node_uuids, dtype=object), return_inverse=True)
+        return cls.from_columns(users.tolist(), nodes.tolist(), user_ids, node_ids, np.array(totals, dtype=np.int64))
+
+
+@dataclass(frozen=True, slots=True)
+class _Columns:
+    """Неизменяемый снимок истории; заменяется целиком, чтобы читатели не видели промежуточных состояний."""
+
+    days: np.ndarray  # int32, ordinal дня, отсортирован по возрастанию
+    user_ids: np.ndarray  # int32, индекс в TrafficHistoryStore._users
+    node_ids: np.ndarray  # int32, индекс в TrafficHistoryStore._nodes
+    totals: np.ndarray  # int64
+
+    @classmethod
+    def empty(cls) -> '_Columns':
+        return cls(
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int32),
+            np.empty(0, dtype=np.int64),
+        )
+
+    def before(self, day: int) -> '_Columns':
+        end = int(np.searchsorted(self.days, day, side='left'))
+        return _Columns(self.days[:end], self.user_ids[:end], self.node_ids[:end], self.totals[:end])
+
+    def since(self, day: int) -> '_Columns':
+        start = int(np.searchsorted(self.days, day, side='left'))
+        return _Columns(self.days[start:], self.user_ids[start:], self.node_ids[start:], self.totals[start:])
+
+    def concat(self, other: '_Columns') -> '_Columns':
+        return _Columns(
+            np.concatenate((self.days, other.days)),
+            np.concatenate((self.user_ids, other.user_ids)),
+            np.concatenate((self.node_ids, other.node_ids)),
+            np.concatenate((self.totals, other.totals)),
+        )
+
+
+@dataclass(slots=True)
+class TrafficHistoryStore:
+    """Колоночное хранилище суточного трафика в памяти."""
+
+    nodes: list[TrafficNode] = field(default_factory=list)
+    covered_days: frozenset[int] = frozenset()
+    _columns: _Columns = field(default_factory=_Columns.empty)
+    _users: list[str] = field(default_factory=list)
+    _user_index: dict[str, int] = field(default_factory=dict)
+    _nodes: list[str] = field(default_factory=list)
+    _node_index: dict[str, int] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self._columns.days)
+
+    def _intern(self, values: list[str], index: dict[str, int], known: list[str]) -> np.ndarray:
+        result = np.empty(len(values), dtype=np.int32)
+        for position, value in enumerate(values):
+            value_id = index.get(value)
+            if value_id is None:
+                value_id = index[value] = len(known)
+                known.append(value)
+            result[position] = value_id
+        return result
+
+    def build_columns(self, rows: list[tuple[date, str, str, int]]) -> _Columns:
+        """Переводит записи (день, пользователь, нода, байты) в колонки, отсортированные по дню."""
+        if not rows:
+            return _Columns.empty()
+        days, user_uuids, node_uuids, totals = zip(*rows, strict=True)
+        day_column = np.fromiter((day.toordinal() for day in days), dtype=np.int32, count=len(days))
+        order = np.argsort(day_column, kind='stable')
+        return _Columns(
+            day_column[order],
+            self._intern(list(user_uuids), self._user_index, self._users)[order],
+            self._intern(list(node_uuids), self._node_index, self._nodes)[order],
+            np.array(totals, dtype=np.int64)[order],
+        )
+
+    def append(self, columns: _Columns) -> None:
+        """Добавляет колонки с днями не раньше уже загруженных (последовательная загрузка из БД)."""
+        self._columns = self._columns.concat(columns)
+
+    def replace_since(self, first_day: date, columns: _Columns, covered_days: list[date]) -> None:
+        """Заменяет все дни начиная с first_day свежими данными сборщика."""
+        ordinal = first_day.toordinal()
+        self._columns = self._columns.before(ordinal).concat(columns.since(ordinal))
+        self.covered_days = self.covered_days | {day.toordinal() for day in covered_days}
+
+    def prune(self, first_day: date) -> None:
+        ordinal = first_day.toordinal()
+        self._columns = self._columns.since(ordinal)
+        self.covered_days = frozenset(day for day in self.covered_days if day >= ordinal)
+
+    def covers(self, start_day: date, end_day: date) -> bool:
+        if not self.nodes or start_day > end_day:
+            return False
+        covered = self.covered_days
+        return all(day in covered for day in range(start_day.toordinal(), end_day.toordinal() + 1))
+
+    def aggregate(self, start_day: date, end_day: date) -> TrafficMatrix:
+        """Сумма трафика пользователь × нода за сутки [start_day, end_day] включительно."""
+        columns = self._columns
+        start = int(np.searchsorted(columns.days, start_day.toordinal(), side='left'))
+        end = int(np.searchsorted(columns.days, end_day.toordinal(), side='right'))
+        return TrafficMatrix.from_columns(
+            self._users,
+            self._nodes,
+            columns.user_ids[start:end],
+            columns.node_ids[start:end],
+            columns.totals[start:end],
+        )
+
+
+def _parse_day(value) -> date | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class TrafficHistoryService:
+    """Фоновый сбор суточного трафика с панели и агрегация по локальной истории."""
+
+    def __init__(self) -> None:
+        self.store = TrafficHistoryStore()
+        self._task: asyncio.Task | None = None
+        self._running = False
+        self._loaded = False
+        self._last_collected_at: datetime | None = None
+
+    @property
+    def _interval(self) -> int:
+        return max(int(settings.TRAFFIC_HISTORY_COLLECT_INTERVAL_MINUTES), 1) * 60
+
+    @property
+    def retention_days(self) -> int:
+        return max(int(settings.TRAFFIC_HISTORY_RETENTION_DAYS), 1)
+
+    def is_running(self) -> bool:
+        return self._running and self._task is not None and not self._task.done()
+
+    def is_ready(self, start_day: date, end_day: date) -> bool:
+        """Можно ли ответить за период из локальной истории, не обращаясь к панели."""
+        return settings.TRAFFIC_HISTORY_ENABLED and self._loaded and self.store.covers(start_day, end_day)
+
+    def aggregate(self, start_day: date, end_day: date) -> TrafficMatrix:
+        return self.store.aggregate(start_day, end_day)
+
+    async def start(self) -> None:
+        if not settings.TRAFFIC_HISTORY_ENABLED:
+            logger.info('История трафика отключена настройками')
+            return
+        if not RemnaWaveService().is_configured:
+            logger.info('RemnaWave не настроен, сбор истории трафика не запущен')
+            return
+        if self.is_running():
+            return
+
+        self._running = True
+        self._task = asyncio.create_task(self._collect_loop(), name='traffic-history-collector')
+        logger.info(
+            f'📊 Сбор истории трафика запущен (интервал: {self._interval // 60} мин, '
+            f'хранение: {self.retention_days} дн.)'
+        )
+
+    async def stop(self) -> None:
+        self._running = False
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _collect_loop(self) -> None:
+        try:
+            await self.load()
+        except Exception as error:
+            logger.error(f'❌ Ошибка загрузки истории трафика: {error}')
+
+        while self._running:
+            try:
+                await self.collect()
+            except Exception as error:
+                logger.error(f'❌ Ошибка сбора истории трафика: {error}')
+            await asyncio.sleep(self._interval)
+
+    async def load(self) -> None:
+        """Загружает историю из БД в колоночный снимок."""
+        store = TrafficHistoryStore(nodes=self.store.nodes)
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(
+                    UserNodeTrafficDaily.day,
+                    UserNodeTrafficDaily.user_uuid,
+                    UserNodeTrafficDaily.node_uuid,
+                    UserNodeTrafficDaily.total_bytes,
+                )
+                .order_by(UserNodeTrafficDaily.day)
+                .execution_options(yield_per=_LOAD_CHUNK_SIZE)
+            )
+            async for partition in result.partitions():
+                store.append(store.build_columns([tuple(row) for row in partition]))
+
+            days = await db.execute(select(TrafficHistoryDay.day))
+            store.covered_days = frozenset(day.toordinal() for day in days.scalars().all())
+
+        self.store = store
+        self._loaded = True
+        logger.info(f'📊 История трафика загружена: {len(store)} записей, {len(store.covered_days)} суток')
+
+    def _first_missing_day(self, today: date) -> date:
+        """Первые сутки для сбора: самый ранний пропуск в окне хранения, но не позже вчерашних."""
+        first_day = today - timedelta(days=self.retention_days - 1)
+        covered = self.store.covered_days
+        for ordinal in range(first_day.toordinal(), today.toordinal()):
+            if ordinal not in covered:
+                return date.fromordinal(ordinal)
+        return today - timedelta(days=1)
+
+    async def collect(self) -> int:
+        """Забирает с панели сутки от первого пропуска до сегодня и заменяет их в БД и в памяти."""
+        now = datetime.now(UTC)
+        today = now.date()
+        first_day = self._first_missing_day(today)
+        start_str = f'{first_day.isoformat()}T00:00:00Z'
+        end_str = now.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        service = RemnaWaveService()
+        if not service.is_configured:
+            return 0
+
+        async with service.get_api_client() as api:
+            nodes = await api.get_all_nodes()
+            semaphore = asyncio.Semaphore(_CONCURRENCY_LIMIT)
+
+            async def fetch_node_users(node):
+                async with semaphore:
+                    try:
+                        return node.uuid, await api.get_bandwidth_stats_node_users_legacy(node.uuid, start_str, end_str)
+                    except Exception:
+                        logger.warning('Failed to get traffic history for node %s', node.name, exc_info=True)
+                        return node.uuid, None
+
+            results = await asyncio.gather(*(fetch_node_users(node) for node in nodes))
+
+        if any(not isinstance(entries, list) for _, entries in results):
+            # Частичные данные затёрли бы уже собранные сутки — ждём следующего цикла
+            logger.warning('⚠️ История трафика не обновлена: не все ноды ответили')
+            return 0
+
+        totals: dict[tuple[date, str, str], int] = {}
+        for node_uuid, entries in results:
+            for entry in entries:
+                day = _parse_day(entry.get('date'))
+                user_uuid = entry.get('userUuid')
+                total = int(entry.get('total') or 0)
+                if day is None or not user_uuid or total <= 0 or day < first_day:
+                    continue
+                key = (day, user_uuid, entry.get('nodeUuid') or node_uuid)
+                totals[key] = totals.get(key, 0) + total
+
+        rows = [(day, user_uuid, node_uuid, total) for (day, user_uuid, node_uuid), total in totals.items()]
+        collected_days = [first_day + timedelta(days=offset) for offset in range((today - first_day).days + 1)]
+        retention_start = today - timedelta(days=self.retention_days - 1)
+
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(delete(UserNodeTrafficDaily).where(UserNodeTrafficDaily.day >= first_day))
+                collected_at = now.replace(tzinfo=None)
+                for start in range(0, len(rows), _INSERT_CHUNK_SIZE):
+                    await db.execute(
+                        insert(UserNodeTrafficDaily),
+                        [
+                            {
+                                'day': day,
+                                'user_uuid': user_uuid,
+                                'node_uuid': node_uuid,
+                                'total_bytes': total,
+                                'updated_at': collected_at,
+                            }
+                            for day, user_uuid, node_uuid, total in rows[start : start + _INSERT_CHUNK_SIZE]
+                        ],
+                    )
+                await db.execute(delete(TrafficHistoryDay).where(TrafficHistoryDay.day >= first_day))
+                await db.execute(
+                    insert(TrafficHistoryDay), [{'day': day, 'collected_at': collected_at} for day in collected_days]
+                )
+                await db.execute(delete(UserNodeTrafficDaily).where(UserNodeTrafficDaily.day < retention_start))
+                await db.execute(delete(TrafficHistoryDay).where(TrafficHistoryDay.day < retention_start))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        self.store.nodes = [TrafficNode(node.uuid, node.name, node.country_code) for node in nodes]
+        self.store.replace_since(first_day, self.store.build_columns(rows), collected_days)
+        self.store.prune(retention_start)
+        self._last_collected_at = now
+
+        logger.debug(f'История трафика обновлена с {first_day}: {len(rows)} записей')
+        return len(rows)
+
+    def get_stats(self) -> dict:
+        covered = sorted(self.store.covered_days)
+        return {
+            'running': self.is_running(),
+            'loaded': self._loaded,
+            'records': len(self.store),
+            'nodes': len(self.store.nodes),
+            'covered_days': len(covered),
+            'first_day': date.fromordinal(covered[0]).isoformat() if covered else None,
+            'last_collected_at': self._last_collected_at.isoformat() if self._last_collected_at else None,
+        }
+
+
+traffic_history_service = TrafficHistoryService()
@@ -0,0 +1,153 @@
+"""Snapshot of a bot user's identity for ``AuthMiddleware``.
+
+Every update from Telegram goes through ``AuthMiddleware``, which used to load
+the user with all relations before it could even tell whether the user is
+blocked. The snapshot keeps what the middleware decides on (status, language)
+per ``telegram_id``:
+
+- blocked users are rejected without opening a database session;
+- deleted users skip the user load and go straight to the re-registration check;
+- everyone else still gets a freshly loaded ``db_user``, so a stale "active"
+  snapshot never leaks into handlers.
+
+A snapshot is dropped after a committed change to the user's status or language,
+or when the user is deleted, and expires after
+``AUTH_IDENTITY_CACHE_TTL`` seconds in any case.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import chain
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import User, UserStatus
+from app.database.session_hooks import on_commit
+
+
+logger = logging.getLogger(__name__)
+
+# Изменение этих полей пользователя меняет решение AuthMiddleware
+_TRACKED_USER_ATTRIBUTES = ('status', 'language', 'telegram_id')
+
+
+@dataclass(frozen=True, slots=True)
+class UserIdentity:
+    user_id: int
+    telegram_id: int
+    status: str
+    language: str
+    cached_at: float
+
+    @classmethod
+    def from_user(cls, user: User) -> UserIdentity:
+        return cls(
+            user_id=user.id,
+            telegram_id=user.telegram_id,
+            status=user.status,
+            language=user.language,
+            cached_at=time.monotonic(),
+        )
+
+    @property
+    def is_blocked(self) -> bool:
+        return self.status == UserStatus.BLOCKED.value
+
+    @property
+    def is_deleted(self) -> bool:
+        return self.status == UserStatus.DELETED.value
+
+
+class UserIdentityCache:
+    def __init__(self) -> None:
+        self._entries: OrderedDict[int, UserIdentity] = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0}
+
+    def get(self, telegram_id: int) -> UserIdentity | None:
+        identity = self._entries.get(telegram_id)
+        if identity is None:
+            self._stats['misses'] += 1
+            return None
+        if time.monotonic() - identity.cached_at >= settings.AUTH_IDENTITY_CACHE_TTL:
+            self._stats['expired'] += 1
+            self._drop(telegram_id)
+            return None
+        self._entries.move_to_end(telegram_id)
+        self._stats['hits'] += 1
+        return identity
+
+    def store(self, user: User) -> UserIdentity | None:
+        if user.telegram_id is None or user.id is None:
+            return None
+        identity = UserIdentity.from_user(user)
+        self._entries.pop(identity.telegram_id, None)
+        self._entries[identity.telegram_id] = identity
+        while len(self._entries) > max(1, settings.AUTH_IDENTITY_CACHE_SIZE):
+            self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, *telegram_ids: int) -> None:
+        for telegram_id in telegram_ids:
+            if self._drop(telegram_id):
+                self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _drop(self, telegram_id: int) -> bool:
+        return self._entries.pop(telegram_id, None) is not None
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            'entries': len(self._entries),
+            'max_entries': settings.AUTH_IDENTITY_CACHE_SIZE,
+            'ttl_seconds': settings.AUTH_IDENTITY_CACHE_TTL,
+        }
+
+
+user_identity_cache = UserIdentityCache()
+
+
+# ----------------------------------------------------------------------
+# Инвалидация по коммитам сессий
+# ----------------------------------------------------------------------
+
+_PENDING_KEY = 'user_identity_cache_pending'
+
+
+def _user_changed(user: User) -> bool:
+    state = inspect(user)
+    return any(state.attrs[name].history.has_changes() for name in _TRACKED_USER_ATTRIBUTES)
+
+
+def collect_affected_identities(session: Session) -> set[int]:
+    """Telegram ids whose snapshot is changed by the pending flush."""
+    telegram_ids: set[int | None] = set()
+    dirty = (obj for obj in session.dirty if session.is_modified(obj, include_collections=False))
+
+    for obj in chain(session.new, session.deleted):
+        if isinstance(obj, User):
+            telegram_ids.add(obj.telegram_id)
+
+    for obj in dirty:
+        # last_activity и профиль меняются почти на каждый апдейт и на снимок не влияют
+        if isinstance(obj, User) and _user_changed(obj):
+            telegram_ids.add(obj.telegram_id)
+            telegram_ids.update(inspect(obj).attrs.telegram_id.history.deleted)
+
+    telegram_ids.discard(None)
+    return telegram_ids
+
+
+def _invalidate_identities(telegram_ids: set[int]) -> None:
+    user_identity_cache.invalidate(*telegram_ids)
+
+
+on_commit(_PENDING_KEY, _invalidate_identities, collect=collect_affected_identities)
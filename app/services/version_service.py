@@ -3,10 +3,10 @@ import logging
 import re
 from datetime import datetime, timedelta
 
-import aiohttp
 from packaging import version
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -73,7 +73,7 @@ class VersionService:
     async def get_latest_stable_version(self) -> str:
         try:
             url = f'https://api.github.com/repos/{self.repo}/releases/latest'
-            async with aiohttp.ClientSession() as session, session.get(url) as response:
+            async with http_clients.request('github', 'GET', url) as response:
                 if response.status == 200:
                     data = await response.json()
                     return data['tag_name']
@@ -138,8 +138,7 @@ class VersionService:
         url = f'https://api.github.com/repos/{self.repo}/releases'
 
         try:
-            timeout = aiohttp.ClientTimeout(total=10)
-            async with aiohttp.ClientSession(timeout=timeout) as session, session.get(url) as response:
+            async with http_clients.request('github', 'GET', url) as response:
                 if response.status == 200:
                     data = await response.json()
                     releases = []
@@ -11,6 +11,7 @@ from typing import Any
 import aiohttp
 
 from app.config import settings
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -84,16 +85,15 @@ class WataService:
         last_error: WataAPIError | None = None
         for attempt in range(1 + self._MAX_RETRIES):
             try:
-                async with (
-                    aiohttp.ClientSession(timeout=timeout) as session,
-                    session.request(
-                        method,
-                        url,
-                        json=json,
-                        params=params,
-                        headers=self._build_headers(),
-                    ) as response,
-                ):
+                async with http_clients.request(
+                    'wata',
+                    method,
+                    url,
+                    json=json,
+                    params=params,
+                    headers=self._build_headers(),
+                    timeout=timeout,
+                ) as response:
                     response_text = await response.text()
 
                     if response.status == 429:
@@ -5,7 +5,8 @@ import hashlib
 import hmac
 import json
 import logging
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, field
 from typing import Any
 
 import aiohttp
@@ -16,10 +17,18 @@ from app.database.crud.webhook import (
     record_webhook_delivery,
     update_webhook_stats,
 )
+from app.database.database import AsyncSessionLocal
 
 
 logger = logging.getLogger(__name__)
 
+# Фоновая доставка: размер очереди событий, размер пачки и параллелизм HTTP запросов
+WEBHOOK_QUEUE_MAX_SIZE = 1000
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_MAX_CONCURRENCY = 10
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_RETRY_BASE_DELAY = 1.0
+
 
 @dataclass
 class DeliveryResult:
@@ -32,6 +41,36 @@ class DeliveryResult:
     response_status: int | None = None
     response_body: str | None = None
     error_message: str | None = None
+    attempt_number: int = 1
+
+
+@dataclass
+class QueuedEvent:
+    """Событие, ожидающее фоновой доставки."""
+
+    event_type: str
+    payload: dict[str, Any]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class WebhookLagStats:
+    """Метрики доставки для одного webhook."""
+
+    delivered: int = 0
+    failed: int = 0
+    retries: int = 0
+    last_lag_seconds: float = 0.0
+    max_lag_seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retries': self.retries,
+            'last_lag_seconds': round(self.last_lag_seconds, 3),
+            'max_lag_seconds': round(self.max_lag_seconds, 3),
+        }
 
 
 class WebhookService:
@@ -39,6 +78,10 @@ class WebhookService:
 
     def __init__(self) -> None:
         self._session: aiohttp.ClientSession | None = None
+        self._queue: asyncio.Queue[QueuedEvent] | None = None
+        self._worker_task: asyncio.Task | None = None
+        self._dropped_events = 0
+        self._lag_stats: dict[int, WebhookLagStats] = {}
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Получить или создать HTTP сессию."""
@@ -52,6 +95,114 @@ class WebhookService:
         if self._session and not self._session.closed:
             await self._session.close()
 
+    def enqueue(self, event_type: str, payload: dict[str, Any]) -> bool:
+        """Поставить событие в очередь фоновой доставки, не дожидаясь HTTP запросов."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=WEBHOOK_QUEUE_MAX_SIZE)
+
+        try:
+            self._queue.put_nowait(QueuedEvent(event_type=event_type, payload=payload))
+        except asyncio.QueueFull:
+            self._dropped_events += 1
+            logger.warning('Webhook queue is full, event %s dropped', event_type)
+            return False
+
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker_loop(self._queue), name='webhook-delivery-worker')
+        return True
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Дождаться доставки очереди (с таймаутом), остановить воркер и закрыть сессию."""
+        if self._queue is not None and self._worker_task and not self._worker_task.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+            except TimeoutError:
+                logger.warning('Webhook queue not drained on shutdown: %d events left', self._queue.qsize())
+
+        if self._worker_task and not self._worker_task.done():
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+        self._worker_task = None
+
+        await self.close()
+
+    def get_stats(self) -> dict[str, Any]:
+        """Метрики фоновой доставки: размер очереди, потери и лаг по каждому webhook."""
+        return {
+            'queue_size': self._queue.qsize() if self._queue is not None else 0,
+            'queue_max_size': WEBHOOK_QUEUE_MAX_SIZE,
+            'dropped_events': self._dropped_events,
+            'worker_running': bool(self._worker_task and not self._worker_task.done()),
+            'webhooks': {webhook_id: stats.to_dict() for webhook_id, stats in self._lag_stats.items()},
+        }
+
+    async def _worker_loop(self, queue: asyncio.Queue[QueuedEvent]) -> None:
+        """Забирает события пачками и доставляет их вне пути бизнес-операции."""
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < WEBHOOK_BATCH_SIZE and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            try:
+                await self._deliver_batch(batch)
+            except Exception as error:
+                logger.exception('Webhook batch delivery failed: %s', error)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _deliver_batch(self, batch: list[QueuedEvent]) -> None:
+        async with AsyncSessionLocal() as db:
+            # Один запрос подписок на тип события для всей пачки
+            webhooks_by_event: dict[str, list[Any]] = {}
+            for event_type in {event.event_type for event in batch}:
+                webhooks_by_event[event_type] = await get_active_webhooks_for_event(db, event_type)
+
+            semaphore = asyncio.Semaphore(WEBHOOK_MAX_CONCURRENCY)
+
+            async def deliver(webhook: Any, event: QueuedEvent) -> DeliveryResult:
+                async with semaphore:
+                    return await self._deliver_with_retry(webhook, event)
+
+            tasks = [
+                deliver(webhook, event) for event in batch for webhook in webhooks_by_event.get(event.event_type, [])
+            ]
+            if not tasks:
+                return
+
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error('Unexpected error during webhook delivery: %s', result, exc_info=result)
+                    continue
+                await self._record_result(db, result)
+
+    async def _deliver_with_retry(self, webhook: Any, event: QueuedEvent) -> DeliveryResult:
+        """Доставка с повторами и экспоненциальной задержкой; фиксирует лаг от постановки в очередь."""
+        stats = self._lag_stats.setdefault(webhook.id, WebhookLagStats())
+
+        result = await self._deliver_webhook_http(webhook, event.event_type, event.payload)
+        attempt = 1
+        while result.status != 'success' and attempt < WEBHOOK_MAX_ATTEMPTS:
+            await asyncio.sleep(WEBHOOK_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+            attempt += 1
+            stats.retries += 1
+            result = await self._deliver_webhook_http(webhook, event.event_type, event.payload)
+
+        result.attempt_number = attempt
+        lag = time.monotonic() - event.enqueued_at
+        stats.last_lag_seconds = lag
+        stats.max_lag_seconds = max(stats.max_lag_seconds, lag)
+        if result.status == 'success':
+            stats.delivered += 1
+        else:
+            stats.failed += 1
+        return result
+
     def _sign_payload(self, payload: str, secret: str) -> str:
         """Подписать payload с помощью секрета."""
         return hmac.new(
@@ -161,6 +312,7 @@ class WebhookService:
                 response_status=result.response_status,
                 response_body=result.response_body,
                 error_message=result.error_message,
+                attempt_number=result.attempt_number,
             )
 
             await update_webhook_stats(db, result.webhook, result.status == 'success')
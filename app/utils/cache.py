@@ -1,5 +1,6 @@
 import json
 import logging
+import time
 from datetime import timedelta
 from typing import Any
 
@@ -10,6 +11,35 @@ from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Надёжная очередь: элемент атомарно переносится в список обработки и получает
+# аренду (visibility timeout) в ZSET; не подтверждённые вовремя элементы возвращаются
+_RELIABLE_CLAIM_SCRIPT = """
+local item = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+if item then
+    redis.call('ZADD', KEYS[3], ARGV[1], item)
+end
+return item
+"""
+
+_RELIABLE_RELEASE_SCRIPT = """
+local removed = redis.call('LREM', KEYS[2], 1, ARGV[1])
+redis.call('ZREM', KEYS[3], ARGV[1])
+if removed > 0 and ARGV[2] ~= '' then
+    redis.call('LPUSH', KEYS[1], ARGV[2])
+end
+return removed
+"""
+
+_RELIABLE_RECOVER_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+for _, item in ipairs(expired) do
+    redis.call('LREM', KEYS[2], 1, item)
+    redis.call('ZREM', KEYS[3], item)
+    redis.call('RPUSH', KEYS[1], item)
+end
+return #expired
+"""
+
 
 class CacheService:
     def __init__(self):
@@ -31,6 +61,10 @@ class CacheService:
             await self.redis_client.close()
             self._connected = False
 
+    @property
+    def is_connected(self) -> bool:
+        return self._connected
+
     async def get(self, key: str) -> Any | None:
         if not self._connected:
             return None
@@ -238,6 +272,137 @@ class CacheService:
             logger.error(f'Ошибка чтения очереди {key}: {e}')
             return []
 
+    async def reliable_claim(
+        self, key: str, processing_key: str, leases_key: str, visibility_timeout: int
+    ) -> tuple[str, Any] | None:
+        """Взять элемент из очереди в обработку.
+
+        Возвращает ``(token, value)``; token нужно передать в ``reliable_release``.
+        Если подтверждения не будет за ``visibility_timeout`` секунд, элемент
+        вернёт ``reliable_recover``.
+        """
+        if not self._connected:
+            return None
+
+        try:
+            deadline = time.time() + visibility_timeout
+            raw = await self.redis_client.eval(_RELIABLE_CLAIM_SCRIPT, 3, key, processing_key, leases_key, deadline)
+            if raw is None:
+                return None
+            token = raw.decode() if isinstance(raw, bytes) else raw
+            return token, json.loads(token)
+        except Exception as e:
+            logger.error(f'Ошибка извлечения из очереди {key}: {e}')
+            return None
+
+    async def reliable_release(
+        self, key: str, processing_key: str, leases_key: str, token: str, requeue_value: Any = None
+    ) -> bool:
+        """Подтвердить обработку элемента или вернуть его в очередь с новым значением.
+
+        Возвращает False, если аренда уже истекла и элемент вернулся в очередь сам.
+        """
+        if not self._connected:
+            return False
+
+        try:
+            requeue = json.dumps(requeue_value, default=str) if requeue_value is not None else ''
+            removed = await self.redis_client.eval(
+                _RELIABLE_RELEASE_SCRIPT, 3, key, processing_key, leases_key, token, requeue
+            )
+            return bool(removed)
+        except Exception as e:
+            logger.error(f'Ошибка подтверждения элемента очереди {key}: {e}')
+            return False
+
+    async def reliable_recover(self, key: str, processing_key: str, leases_key: str) -> int:
+        """Вернуть в начало очереди элементы с истёкшей арендой."""
+        if not self._connected:
+            return 0
+
+        try:
+            return await self.redis_client.eval(
+                _RELIABLE_RECOVER_SCRIPT, 3, key, processing_key, leases_key, time.time()
+            )
+        except Exception as e:
+            logger.error(f'Ошибка восстановления очереди {key}: {e}')
+            return 0
+
+    async def zincrby(self, key: str, amount: float, member: str) -> float | None:
+        """Увеличить score элемента отсортированного множества."""
+        if not self._connected:
+            return None
+
+        try:
+            return float(await self.redis_client.zincrby(key, amount, member))
+        except Exception as e:
+            logger.error(f'Ошибка инкремента в множестве {key}: {e}')
+            return None
+
+    async def zscore(self, key: str, member: str) -> float | None:
+        if not self._connected:
+            return None
+
+        try:
+            score = await self.redis_client.zscore(key, member)
+            return float(score) if score is not None else None
+        except Exception as e:
+            logger.error(f'Ошибка чтения score из множества {key}: {e}')
+            return None
+
+    async def zrevrank(self, key: str, member: str) -> int | None:
+        """Позиция элемента (с нуля) при сортировке по убыванию score."""
+        if not self._connected:
+            return None
+
+        try:
+            return await self.redis_client.zrevrank(key, member)
+        except Exception as e:
+            logger.error(f'Ошибка чтения позиции в множестве {key}: {e}')
+            return None
+
+    async def zrevrange(self, key: str, start: int = 0, end: int = -1) -> list[tuple[str, float]] | None:
+        """Элементы множества со score по убыванию score."""
+        if not self._connected:
+            return None
+
+        try:
+            items = await self.redis_client.zrevrange(key, start, end, withscores=True)
+            return [
+                (member.decode() if isinstance(member, bytes) else str(member), float(score)) for member, score in items
+            ]
+        except Exception as e:
+            logger.error(f'Ошибка чтения множества {key}: {e}')
+            return None
+
+    async def zcard(self, key: str) -> int | None:
+        if not self._connected:
+            return None
+
+        try:
+            return await self.redis_client.zcard(key)
+        except Exception as e:
+            logger.error(f'Ошибка чтения размера множества {key}: {e}')
+            return None
+
+    async def replace_sorted_set(self, key: str, mapping: dict[str, float], expire: int | None = None) -> bool:
+        """Атомарно заменить содержимое отсортированного множества."""
+        if not self._connected:
+            return False
+
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if mapping:
+                    pipe.zadd(key, mapping)
+                    if expire:
+                        pipe.expire(key, expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f'Ошибка записи множества {key}: {e}')
+            return False
+
 
 cache = CacheService()
 
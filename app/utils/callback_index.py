@@ -0,0 +1,190 @@
+"""Pre-indexed callback_query dispatch.
+
+aiogram checks the handlers of a router one by one, so a click on a button
+registered late walks hundreds of ``F.data`` filters. The index reads those
+filters once: ``F.data == ...`` and ``F.data.in_(...)`` go into a dict,
+``F.data.startswith(...)`` into a prefix trie. For each callback only the
+handlers that can match its data are checked, together with the handlers whose
+filters cannot be indexed (lambdas, regexps, state-only filters), in the
+original registration order. Each candidate still runs its full filter chain,
+so the index only skips handlers that are guaranteed to be rejected.
+"""
+
+import heapq
+import logging
+import operator
+from typing import Any
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.types import TelegramObject
+from magic_filter.operations import CallOperation, ComparatorOperation, FunctionOperation, GetAttributeOperation
+from magic_filter.util import in_op
+
+
+logger = logging.getLogger(__name__)
+
+_TERMINAL = ''
+
+
+def _is_str_collection(value: Any) -> bool:
+    return isinstance(value, list | tuple | set | frozenset) and all(isinstance(item, str) for item in value)
+
+
+def extract_data_constraint(handler: HandlerObject) -> tuple[str, tuple[str, ...]] | None:
+    """
+    Returns ``('exact', values)`` or ``('prefix', prefixes)`` for the first
+    indexable ``F.data`` filter of the handler, or None.
+    """
+    for filter_object in handler.filters or ():
+        magic = getattr(filter_object, 'magic', None)
+        if magic is None:
+            continue
+
+        operations = magic._operations
+        if len(operations) < 2:
+            continue
+        first = operations[0]
+        if not isinstance(first, GetAttributeOperation) or first.name != 'data':
+            continue
+
+        if len(operations) == 2:
+            operation = operations[1]
+            if (
+                isinstance(operation, ComparatorOperation)
+                and operation.comparator is operator.eq
+                and isinstance(operation.right, str)
+            ):
+                return 'exact', (operation.right,)
+            if (
+                isinstance(operation, FunctionOperation)
+                and operation.function is in_op
+                and len(operation.args) == 1
+                and not operation.kwargs
+                and _is_str_collection(operation.args[0])
+            ):
+                return 'exact', tuple(operation.args[0])
+
+        if len(operations) == 3:
+            method, call = operations[1], operations[2]
+            if (
+                isinstance(method, GetAttributeOperation)
+                and method.name == 'startswith'
+                and isinstance(call, CallOperation)
+                and len(call.args) == 1
+                and not call.kwargs
+            ):
+                prefix = call.args[0]
+                if isinstance(prefix, str):
+                    return 'prefix', (prefix,)
+                if isinstance(prefix, tuple) and _is_str_collection(prefix):
+                    return 'prefix', prefix
+
+    return None
+
+
+class CallbackIndex:
+    """Exact-match dict, prefix trie and the list of unindexed handlers."""
+
+    def __init__(self, handlers: list[HandlerObject]) -> None:
+        self.handlers = handlers
+        self.size = len(handlers)
+        self._exact: dict[str, list[int]] = {}
+        self._trie: dict[str, Any] = {}
+        self._generic: list[int] = []
+
+        for position, handler in enumerate(handlers):
+            constraint = extract_data_constraint(handler)
+            if constraint is None:
+                self._generic.append(position)
+                continue
+
+            kind, values = constraint
+            for value in dict.fromkeys(values):
+                if kind == 'exact':
+                    self._exact.setdefault(value, []).append(position)
+                else:
+                    self._insert_prefix(value, position)
+
+    def _insert_prefix(self, prefix: str, position: int) -> None:
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node.setdefault(_TERMINAL, []).append(position)
+
+    @property
+    def indexed_count(self) -> int:
+        return self.size - len(self._generic)
+
+    def candidates(self, data: str | None) -> list[HandlerObject]:
+        if data is None:
+            return self.handlers
+
+        matched: list[int] = list(self._exact.get(data, ()))
+        node = self._trie
+        if _TERMINAL in node:
+            matched.extend(node[_TERMINAL])
+        for char in data:
+            node = node.get(char)
+            if node is None:
+                break
+            if _TERMINAL in node:
+                matched.extend(node[_TERMINAL])
+
+        if not matched:
+            positions = self._generic
+        else:
+            matched.sort()
+            positions = list(heapq.merge(matched, self._generic))
+        return [self.handlers[position] for position in positions]
+
+
+class IndexedCallbackTrigger:
+    """Replacement for ``TelegramEventObserver.trigger`` of a callback_query observer."""
+
+    def __init__(self, observer: TelegramEventObserver) -> None:
+        self.observer = observer
+        self.index = CallbackIndex(observer.handlers)
+
+    def _current_index(self) -> CallbackIndex:
+        # Ленивые роутеры добавляют обработчики после установки индекса
+        if self.index.size != len(self.observer.handlers) or self.index.handlers is not self.observer.handlers:
+            self.index = CallbackIndex(self.observer.handlers)
+        return self.index
+
+    async def __call__(self, event: TelegramObject, **kwargs: Any) -> Any:
+        observer = self.observer
+        for handler in self._current_index().candidates(getattr(event, 'data', None)):
+            kwargs['handler'] = handler
+            result, data = await handler.check(event, **kwargs)
+            if result:
+                kwargs.update(data)
+                try:
+                    wrapped_inner = observer.outer_middleware.wrap_middlewares(
+                        observer._resolve_middlewares(),
+                        handler.call,
+                    )
+                    return await wrapped_inner(event, kwargs)
+                except SkipHandler:
+                    continue
+
+        return UNHANDLED
+
+
+def install_callback_index(router: Router) -> dict[str, int]:
+    """Installs the index on callback_query observers of the router and all its sub-routers."""
+    total = 0
+    indexed = 0
+    for current in router.chain_tail:
+        observer = current.callback_query
+        trigger = observer.__dict__.get('trigger')
+        if not isinstance(trigger, IndexedCallbackTrigger):
+            trigger = IndexedCallbackTrigger(observer)
+            observer.trigger = trigger
+        total += trigger.index.size
+        indexed += trigger.index.indexed_count
+
+    logger.info('🗂️ Индекс callback-обработчиков: %s из %s проиндексированы', indexed, total)
+    return {'handlers': total, 'indexed': indexed}
@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime
 
-import aiohttp
+from app.utils.http_clients import http_clients
 
 
 logger = logging.getLogger(__name__)
@@ -23,17 +23,13 @@ class CurrencyConverter:
         if (
             cache_key in self._cache
             and cache_key in self._last_update
-            and (now - self._last_update[cache_key]).seconds < self._cache_ttl
+            and (now - self._last_update[cache_key]).total_seconds() < self._cache_ttl
         ):
             return self._cache[cache_key]
 
         # Получаем новый курс
-        rate = await self._fetch_exchange_rate()
-
+        rate = await self.refresh_usd_to_rub_rate()
         if rate:
-            self._cache[cache_key] = rate
-            self._last_update[cache_key] = now
-            logger.info(f'Обновлен курс USD/RUB: {rate}')
             return rate
 
         # Возвращаем из кеша если API недоступен
@@ -45,6 +41,23 @@ class CurrencyConverter:
         logger.warning('Используем fallback курс USD/RUB: 95')
         return 95.0
 
+    async def refresh_usd_to_rub_rate(self) -> float | None:
+        """Запрашивает курс у источников и обновляет кеш; None, если все недоступны.
+
+        Вызывается фоновым обновлением таблицы курсов, чтобы пользовательские
+        запросы брали курс из кеша и не ждали внешние API.
+        """
+        rate = await self._fetch_exchange_rate()
+        if rate:
+            self._cache['USD_RUB'] = rate
+            self._last_update['USD_RUB'] = datetime.utcnow()
+            logger.info(f'Обновлен курс USD/RUB: {rate}')
+        return rate
+
+    def get_cached_usd_to_rub_rate(self) -> float | None:
+        """Последний полученный курс USD/RUB (без fallback)."""
+        return self._cache.get('USD_RUB')
+
     async def _fetch_exchange_rate(self) -> float | None:
         """Получает курс с нескольких источников"""
 
@@ -64,12 +77,13 @@ class CurrencyConverter:
     async def _fetch_from_cbr(self) -> float | None:
         """Получает курс с сайта ЦБ РФ"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get('https://www.cbr-xml-daily.ru/daily_json.js') as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        usd_rate = data['Valute']['USD']['Value']
-                        return float(usd_rate)
+            async with http_clients.request(
+                'fx_rates', 'GET', 'https://www.cbr-xml-daily.ru/daily_json.js'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json(content_type=None)
+                    usd_rate = data['Valute']['USD']['Value']
+                    return float(usd_rate)
         except Exception as e:
             logger.debug(f'Ошибка получения курса ЦБ: {e}')
             return None
@@ -77,12 +91,13 @@ class CurrencyConverter:
     async def _fetch_from_exchangerate_api(self) -> float | None:
         """Получает курс с exchangerate-api.com"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get('https://api.exchangerate-api.com/v4/latest/USD') as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        rub_rate = data['rates']['RUB']
-                        return float(rub_rate)
+            async with http_clients.request(
+                'fx_rates', 'GET', 'https://api.exchangerate-api.com/v4/latest/USD'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    rub_rate = data['rates']['RUB']
+                    return float(rub_rate)
         except Exception as e:
             logger.debug(f'Ошибка получения курса exchangerate-api: {e}')
             return None
@@ -90,19 +105,18 @@ class CurrencyConverter:
     async def _fetch_from_fixer(self) -> float | None:
         """Получает курс с fixer.io (бесплатный план)"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                # Используем бесплатный endpoint (EUR base)
-                async with session.get(
-                    'https://api.fixer.io/latest?access_key=YOUR_API_KEY&symbols=USD,RUB'
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data.get('success'):
-                            # Конвертируем EUR -> USD -> RUB
-                            usd_eur = data['rates']['USD']
-                            rub_eur = data['rates']['RUB']
-                            usd_rub = rub_eur / usd_eur
-                            return float(usd_rub)
+            # Используем бесплатный endpoint (EUR base)
+            async with http_clients.request(
+                'fx_rates', 'GET', 'https://api.fixer.io/latest?access_key=YOUR_API_KEY&symbols=USD,RUB'
+            ) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    if data.get('success'):
+                        # Конвертируем EUR -> USD -> RUB
+                        usd_eur = data['rates']['USD']
+                        rub_eur = data['rates']['RUB']
+                        usd_rub = rub_eur / usd_eur
+                        return float(usd_rub)
         except Exception as e:
             logger.debug(f'Ошибка получения курса fixer: {e}')
             return None
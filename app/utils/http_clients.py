@@ -0,0 +1,309 @@
+"""Общие исходящие HTTP-клиенты для внешних интеграций.
+
+Вместо ``aiohttp.ClientSession()`` / ``httpx.AsyncClient()`` на каждый вызов
+интеграции берут клиент из реестра: одна keep-alive сессия на upstream, политика
+таймаутов, повторов и circuit breaker на upstream, метрики задержек и ошибок.
+Сессии закрываются при остановке бота (``http_clients.close()``).
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiohttp
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+_IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+_RETRYABLE_STATUSES = frozenset({502, 503, 504})
+_LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(frozen=True, slots=True)
+class UpstreamPolicy:
+    """Параметры работы с одним внешним сервисом."""
+
+    timeout: float = 30.0  # Общий таймаут запроса (секунды), можно переопределить в вызове
+    connect_timeout: float = 10.0
+    retries: int = 1  # Повторы при ошибке соединения (запрос не ушёл) — безопасны для любого метода
+    retry_idempotent: bool = True  # Повторять ли таймауты и 502/503/504 для GET/HEAD/PUT/DELETE
+    retry_backoff: float = 0.5  # Задержка перед повтором, растёт линейно с номером попытки
+    failure_threshold: int = 5  # Подряд неудачных запросов до размыкания цепи
+    recovery_timeout: float = 30.0  # Сколько секунд цепь разомкнута
+    limit_per_host: int = 20
+    keepalive_timeout: float = 30.0
+
+
+# Интеграции со своими циклами повторов получают retries=0, чтобы не умножать попытки
+UPSTREAM_POLICIES: dict[str, UpstreamPolicy] = {
+    'freekassa': UpstreamPolicy(),
+    'kassa_ai': UpstreamPolicy(),
+    'wata': UpstreamPolicy(retries=0),
+    'platega': UpstreamPolicy(retries=0),
+    'mulenpay': UpstreamPolicy(retries=0),
+    'cloudpayments': UpstreamPolicy(),
+    'oauth_google': UpstreamPolicy(retry_idempotent=False),
+    'oauth_yandex': UpstreamPolicy(retry_idempotent=False),
+    'oauth_discord': UpstreamPolicy(retry_idempotent=False),
+    'oauth_vk': UpstreamPolicy(retry_idempotent=False),
+    'server_status': UpstreamPolicy(retries=0, failure_threshold=3),
+    'github': UpstreamPolicy(timeout=10.0, retries=2),
+    'fx_rates': UpstreamPolicy(timeout=10.0),
+    'public_ip': UpstreamPolicy(timeout=5.0, retries=0, failure_threshold=10),
+}
+DEFAULT_POLICY = UpstreamPolicy()
+
+
+class CircuitOpenError(aiohttp.ClientConnectionError):
+    """Upstream временно отключён после серии ошибок; запрос не отправлялся."""
+
+    def __init__(self, upstream: str, retry_in: float) -> None:
+        super().__init__(f'Circuit for upstream {upstream!r} is open, retry in {retry_in:.0f}s')
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+@dataclass(slots=True)
+class _UpstreamState:
+    policy: UpstreamPolicy
+    requests: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    latency_buckets: list[int] = field(default_factory=lambda: [0] * (len(_LATENCY_BUCKETS_MS) + 1))
+    latency_sum_ms: float = 0.0
+    consecutive_failures: int = 0
+    opened_at: float | None = None
+    opened_total: int = 0
+
+    def check_circuit(self, upstream: str) -> None:
+        if self.opened_at is None:
+            return
+        retry_in = self.opened_at + self.policy.recovery_timeout - time.monotonic()
+        if retry_in > 0:
+            self.count_error('circuit_open')
+            raise CircuitOpenError(upstream, retry_in)
+        # Полуоткрытое состояние: пропускаем запросы, первая же ошибка снова разомкнёт цепь
+
+    def count_error(self, kind: str) -> None:
+        self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def observe(self, started: float, error_kind: str | None, upstream: str) -> None:
+        elapsed_ms = (time.monotonic() - started) * 1000
+        self.requests += 1
+        self.latency_sum_ms += elapsed_ms
+        self.latency_buckets[bisect.bisect_left(_LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+        if error_kind is None:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return
+
+        self.count_error(error_kind)
+        if error_kind == 'http_4xx':
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.policy.failure_threshold:
+            if self.opened_at is None:
+                self.opened_total += 1
+                logger.warning(
+                    '⚠️ Upstream %s: %d ошибок подряд, запросы приостановлены на %.0f с',
+                    upstream,
+                    self.consecutive_failures,
+                    self.policy.recovery_timeout,
+                )
+            self.opened_at = time.monotonic()
+
+    def as_dict(self) -> dict[str, Any]:
+        labels = [f'le_{bound}ms' for bound in _LATENCY_BUCKETS_MS] + ['le_inf']
+        return {
+            'requests': self.requests,
+            'errors': dict(self.errors),
+            'latency_avg_ms': round(self.latency_sum_ms / self.requests, 1) if self.requests else 0.0,
+            'latency_histogram': dict(zip(labels, self.latency_buckets, strict=True)),
+            'circuit': 'open' if self.opened_at is not None else 'closed',
+            'consecutive_failures': self.consecutive_failures,
+            'circuit_opened_total': self.opened_total,
+        }
+
+
+def _status_error_kind(status: int) -> str | None:
+    if status >= 500:
+        return 'http_5xx'
+    if status >= 400:
+        return 'http_4xx'
+    return None
+
+
+class HttpClientRegistry:
+    """Реестр пулов соединений: по одной сессии aiohttp и/или клиенту httpx на upstream."""
+
+    def __init__(self, policies: dict[str, UpstreamPolicy] | None = None) -> None:
+        self._policies = dict(UPSTREAM_POLICIES if policies is None else policies)
+        self._states: dict[str, _UpstreamState] = {}
+        self._sessions: dict[str, tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+        self._httpx_clients: dict[str, tuple[asyncio.AbstractEventLoop, httpx.AsyncClient]] = {}
+
+    def _state(self, upstream: str) -> _UpstreamState:
+        state = self._states.get(upstream)
+        if state is None:
+            state = self._states[upstream] = _UpstreamState(self._policies.get(upstream, DEFAULT_POLICY))
+        return state
+
+    def session(self, upstream: str) -> aiohttp.ClientSession:
+        """Общая keep-alive сессия aiohttp для upstream (пересоздаётся, если закрыта или loop сменился)."""
+        loop = asyncio.get_running_loop()
+        cached = self._sessions.get(upstream)
+        if cached and cached[0] is loop and not cached[1].closed:
+            return cached[1]
+
+        policy = self._state(upstream).policy
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=policy.timeout, connect=policy.connect_timeout),
+            connector=aiohttp.TCPConnector(
+                limit_per_host=policy.limit_per_host,
+                keepalive_timeout=policy.keepalive_timeout,
+                ttl_dns_cache=300,
+            ),
+        )
+        self._sessions[upstream] = (loop, session)
+        return session
+
+    def httpx_client(self, upstream: str) -> httpx.AsyncClient:
+        """Общий клиент httpx для upstream."""
+        loop = asyncio.get_running_loop()
+        cached = self._httpx_clients.get(upstream)
+        if cached and cached[0] is loop and not cached[1].is_closed:
+            return cached[1]
+
+        policy = self._state(upstream).policy
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(policy.timeout, connect=policy.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=policy.limit_per_host,
+                max_keepalive_connections=policy.limit_per_host,
+                keepalive_expiry=policy.keepalive_timeout,
+            ),
+        )
+        self._httpx_clients[upstream] = (loop, client)
+        return client
+
+    def _should_retry(self, policy: UpstreamPolicy, method: str, attempt: int, error_kind: str) -> bool:
+        if attempt >= policy.retries:
+            return False
+        if error_kind == 'connect':
+            return True
+        return policy.retry_idempotent and method in _IDEMPOTENT_METHODS and error_kind in {'timeout', 'http_5xx'}
+
+    @asynccontextmanager
+    async def request(
+        self, upstream: str, method: str, url: str, **kwargs: Any
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """``async with`` запрос через общую сессию aiohttp с политикой upstream.
+
+        Повторы выполняются до передачи ответа вызывающему коду; аргументы те же,
+        что у ``ClientSession.request`` (``timeout=`` переопределяет таймаут политики).
+        """
+        state = self._state(upstream)
+        policy = state.policy
+        method = method.upper()
+
+        attempt = 0
+        while True:
+            state.check_circuit(upstream)
+            started = time.monotonic()
+            try:
+                response = await self.session(upstream).request(method, url, **kwargs)
+            except aiohttp.ClientConnectorError:
+                error_kind = 'connect'
+                state.observe(started, error_kind, upstream)
+                if not self._should_retry(policy, method, attempt, error_kind):
+                    raise
+            except TimeoutError:
+                error_kind = 'timeout'
+                state.observe(started, error_kind, upstream)
+                if not self._should_retry(policy, method, attempt, error_kind):
+                    raise
+            except aiohttp.ClientError:
+                state.observe(started, 'client_error', upstream)
+                raise
+            else:
+                error_kind = _status_error_kind(response.status)
+                state.observe(started, error_kind, upstream)
+                if response.status in _RETRYABLE_STATUSES and self._should_retry(policy, method, attempt, 'http_5xx'):
+                    response.release()
+                else:
+                    try:
+                        yield response
+                    finally:
+                        response.release()
+                    return
+
+            attempt += 1
+            await asyncio.sleep(policy.retry_backoff * attempt)
+
+    async def send(self, upstream: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Запрос через общий клиент httpx с политикой upstream; ответ уже прочитан."""
+        state = self._state(upstream)
+        policy = state.policy
+        method = method.upper()
+
+        attempt = 0
+        while True:
+            try:
+                state.check_circuit(upstream)
+            except CircuitOpenError as error:
+                raise httpx.ConnectError(str(error)) from error
+
+            started = time.monotonic()
+            try:
+                response = await self.httpx_client(upstream).request(method, url, **kwargs)
+            except httpx.ConnectError:
+                error_kind = 'connect'
+                state.observe(started, error_kind, upstream)
+                if not self._should_retry(policy, method, attempt, error_kind):
+                    raise
+            except httpx.TimeoutException:
+                error_kind = 'timeout'
+                state.observe(started, error_kind, upstream)
+                if not self._should_retry(policy, method, attempt, error_kind):
+                    raise
+            except httpx.HTTPError:
+                state.observe(started, 'client_error', upstream)
+                raise
+            else:
+                state.observe(started, _status_error_kind(response.status_code), upstream)
+                if response.status_code not in _RETRYABLE_STATUSES or not self._should_retry(
+                    policy, method, attempt, 'http_5xx'
+                ):
+                    return response
+
+            attempt += 1
+            await asyncio.sleep(policy.retry_backoff * attempt)
+
+    async def close(self) -> None:
+        sessions = [session for _, session in self._sessions.values()]
+        clients = [client for _, client in self._httpx_clients.values()]
+        self._sessions.clear()
+        self._httpx_clients.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+        for client in clients:
+            if not client.is_closed:
+                await client.aclose()
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            'upstreams': {name: state.as_dict() for name, state in sorted(self._states.items())},
+            'open_sessions': sum(1 for _, session in self._sessions.values() if not session.closed)
+            + sum(1 for _, client in self._httpx_clients.values() if not client.is_closed),
+        }
+
+
+http_clients = HttpClientRegistry()
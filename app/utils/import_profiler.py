@@ -0,0 +1,121 @@
+"""Import-time profiler in the spirit of ``python -X importtime``.
+
+Wraps module loaders on ``sys.meta_path`` and measures self and cumulative
+execution time of every module imported while it is active. Only the standard
+library is used here so it can be started before any application import.
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+from importlib.abc import MetaPathFinder
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+
+class _TimedLoader:
+    def __init__(self, profiler: 'ImportProfiler', loader) -> None:
+        self._profiler = profiler
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        profiler = self._profiler
+        profiler._stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            cumulative = time.perf_counter() - started
+            children = profiler._stack.pop()
+            if profiler._stack:
+                profiler._stack[-1] += cumulative
+            profiler.records.append(
+                ImportRecord(
+                    module=module.__name__,
+                    self_seconds=cumulative - children,
+                    cumulative_seconds=cumulative,
+                    depth=len(profiler._stack),
+                )
+            )
+
+
+class ImportProfiler(MetaPathFinder):
+    def __init__(self) -> None:
+        self.records: list[ImportRecord] = []
+        self.started_at: float | None = None
+        self.total_seconds = 0.0
+        self._stack: list[float] = []
+        self._resolving = False
+
+    @property
+    def active(self) -> bool:
+        return self in sys.meta_path
+
+    def start(self) -> None:
+        if self.active:
+            return
+        self.started_at = time.perf_counter()
+        sys.meta_path.insert(0, self)
+
+    def stop(self) -> None:
+        if self.active:
+            sys.meta_path.remove(self)
+        if self.started_at is not None:
+            self.total_seconds = time.perf_counter() - self.started_at
+
+    def find_spec(self, fullname, path, target=None):
+        if self._resolving:
+            return None
+
+        self._resolving = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._resolving = False
+
+        if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+
+    def top_modules(self, limit: int = 10, max_depth: int = 1) -> list[ImportRecord]:
+        """Slowest imports close to the entry point, by cumulative time."""
+        records = [record for record in self.records if record.depth <= max_depth]
+        return sorted(records, key=lambda record: record.cumulative_seconds, reverse=True)[:limit]
+
+    def heaviest_modules(self, limit: int = 10) -> list[ImportRecord]:
+        """Modules with the largest own execution time, excluding nested imports."""
+        return sorted(self.records, key=lambda record: record.self_seconds, reverse=True)[:limit]
+
+    def report_lines(self, limit: int = 10) -> list[str]:
+        lines = [f'Всего модулей: {len(self.records)}, время импорта {self.total_seconds:.2f}s']
+        lines.append('Самые долгие (с вложенными импортами):')
+        lines.extend(
+            f'  {record.module}: {record.cumulative_seconds * 1000:.0f} ms' for record in self.top_modules(limit)
+        )
+        lines.append('Самые тяжёлые (собственное время):')
+        lines.extend(
+            f'  {record.module}: {record.self_seconds * 1000:.0f} ms' for record in self.heaviest_modules(limit)
+        )
+        return lines
+
+
+import_profiler = ImportProfiler()
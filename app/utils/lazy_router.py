@@ -0,0 +1,60 @@
+import importlib
+import logging
+import time
+from collections.abc import Callable
+from typing import Any
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import TelegramObject
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyHandlersRouter(Router):
+    """
+    Router that imports its handler module on the first event reaching it.
+
+    The module's ``register`` function receives this router instead of the
+    dispatcher, so handlers end up here with the dispatcher middlewares applied.
+    ``enabled`` is checked on every event: while it returns False the module is
+    not imported, or its already loaded handlers are skipped, so toggling the
+    feature at runtime does not need a restart.
+
+    Handlers of a lazy router are checked after the handlers registered on the
+    dispatcher itself, so use it only for modules whose filters do not overlap
+    with other modules.
+    """
+
+    def __init__(
+        self,
+        module_path: str,
+        register: str = 'register_handlers',
+        *,
+        enabled: Callable[[], bool] | None = None,
+    ) -> None:
+        super().__init__(name=f'lazy:{module_path}')
+        self.module_path = module_path
+        self.register_name = register
+        self._enabled = enabled
+        self.loaded = False
+        self.load_seconds = 0.0
+
+    def load(self) -> None:
+        if self.loaded:
+            return
+
+        started = time.perf_counter()
+        module = importlib.import_module(self.module_path)
+        getattr(module, self.register_name)(self)
+        self.loaded = True
+        self.load_seconds = time.perf_counter() - started
+        logger.info('📦 Обработчики %s загружены за %.3fs', self.module_path, self.load_seconds)
+
+    async def propagate_event(self, update_type: str, event: TelegramObject, **kwargs: Any) -> Any:
+        if self._enabled is not None and not self._enabled():
+            return UNHANDLED
+        if not self.loaded:
+            self.load()
+        return await super().propagate_event(update_type, event, **kwargs)
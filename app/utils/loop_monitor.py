@@ -0,0 +1,55 @@
+"""Измерение блокировок event loop во время длительных операций."""
+
+import asyncio
+import time
+from typing import Any, Self
+
+
+class EventLoopBlockMonitor:
+    """
+    Фоновая проба: засыпает на ``interval`` и считает опоздание пробуждения.
+
+    Опоздание больше ``threshold`` означает, что loop был занят синхронной
+    работой и не обслуживал другие задачи (апдейты бота, вебхуки).
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.max_lag = 0.0
+        self.blocked_total = 0.0
+        self.stalls = 0
+        self.samples = 0
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        self._task = asyncio.create_task(self._probe(), name='event-loop-block-monitor')
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                self.blocked_total += lag
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'blocked_ms': round(self.blocked_total * 1000, 1),
+            'stalls': self.stalls,
+            'samples': self.samples,
+        }
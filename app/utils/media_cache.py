@@ -0,0 +1,189 @@
+"""Content-addressed cache of Telegram photo file_id.
+
+After the first upload Telegram returns a ``file_id`` that can be reused without
+sending the file again. Entries are keyed by a hash of the content (or of the
+payload the image is generated from, e.g. QR data) and stored in process memory
+and in Redis, so repeat views cost zero uploads and survive restarts.
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from app.config import settings
+from app.utils.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_PREFIX = 'media_file_id'
+MEDIA_CACHE_TTL_SECONDS = 90 * 24 * 3600
+_LOCAL_CACHE_MAX_SIZE = 4096
+
+# file_id действителен только для бота, который его получил
+_BOT_ID = (settings.BOT_TOKEN or '').split(':', 1)[0]
+
+_local_cache: OrderedDict[str, str] = OrderedDict()
+# Ответы Telegram на file_id, который больше нельзя переиспользовать
+_STALE_FILE_ID_ERRORS = (
+    'wrong file identifier',
+    'wrong remote file identifier',
+    'file reference expired',
+    'FILE_REFERENCE_EXPIRED',
+    'FILE_ID_INVALID',
+)
+# Ссылки на фоновые записи в Redis, чтобы задачи не собрал сборщик мусора
+_store_tasks: set[asyncio.Task] = set()
+
+
+def media_digest(content: bytes | str) -> str:
+    """Content address: sha256 of bytes or of a generation payload."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    return media_digest(path.read_bytes())
+
+
+def _redis_key(digest: str) -> str:
+    return f'{MEDIA_CACHE_PREFIX}:{_BOT_ID}:{digest}'
+
+
+def _remember_local(digest: str, file_id: str) -> None:
+    _local_cache[digest] = file_id
+    _local_cache.move_to_end(digest)
+    while len(_local_cache) > _LOCAL_CACHE_MAX_SIZE:
+        _local_cache.popitem(last=False)
+
+
+def get_local_file_id(digest: str) -> str | None:
+    """Synchronous lookup in process memory only."""
+    file_id = _local_cache.get(digest)
+    if file_id:
+        _local_cache.move_to_end(digest)
+    return file_id
+
+
+async def get_file_id(digest: str) -> str | None:
+    file_id = get_local_file_id(digest)
+    if file_id:
+        return file_id
+
+    file_id = await cache.get(_redis_key(digest))
+    if isinstance(file_id, str) and file_id:
+        _remember_local(digest, file_id)
+        return file_id
+    return None
+
+
+async def store_file_id(digest: str, file_id: str) -> None:
+    _remember_local(digest, file_id)
+    await cache.set(_redis_key(digest), file_id, expire=MEDIA_CACHE_TTL_SECONDS)
+
+
+async def forget_file_id(digest: str) -> None:
+    _local_cache.pop(digest, None)
+    await cache.delete(_redis_key(digest))
+
+
+def is_stale_file_id_error(error: Exception) -> bool:
+    """Проверяет, что Telegram отклонил именно сохранённый file_id, а не подпись или разметку."""
+    if not isinstance(error, TelegramBadRequest):
+        return False
+
+    description = str(error).lower()
+    return any(err.lower() in description for err in _STALE_FILE_ID_ERRORS)
+
+
+def extract_photo_file_id(message: Message | None) -> str | None:
+    if message is None:
+        return None
+    photo = getattr(message, 'photo', None)
+    if photo:
+        return photo[-1].file_id
+    return None
+
+
+def remember_sent_photo(digest: str, message: Message | None) -> None:
+    """Store file_id from a sent message; the Redis write runs in the background."""
+    file_id = extract_photo_file_id(message)
+    if not file_id or get_local_file_id(digest) == file_id:
+        return
+    _remember_local(digest, file_id)
+    try:
+        task = asyncio.get_running_loop().create_task(store_file_id(digest, file_id))
+    except RuntimeError:
+        return
+    _store_tasks.add(task)
+    task.add_done_callback(_store_tasks.discard)
+
+
+def _render_qr_png(data: str) -> bytes:
+    import qrcode
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(data)
+    qr.make(fit=True)
+    image = qr.make_image(fill_color='black', back_color='white')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+async def render_qr_png(data: str) -> bytes:
+    """Render a QR code to PNG in a worker thread, off the event loop."""
+    return await asyncio.to_thread(_render_qr_png, data)
+
+
+async def send_cached_photo(
+    send: Callable[[str | BufferedInputFile], Awaitable[Message]],
+    digest: str,
+    build: Callable[[], Awaitable[BufferedInputFile]],
+) -> Message:
+    """
+    Send a photo by cached file_id, uploading it only on a cache miss.
+
+    Args:
+        send: Callable that sends the given media (file_id or file) and returns the message
+        digest: Content address of the photo
+        build: Coroutine factory producing the file to upload on a miss
+
+    Returns:
+        The sent message
+    """
+    file_id = await get_file_id(digest)
+    if file_id:
+        try:
+            return await send(file_id)
+        except TelegramBadRequest as error:
+            if not is_stale_file_id_error(error):
+                raise
+            logger.info('Кешированный file_id устарел (%s), загружаем файл заново', error)
+            await forget_file_id(digest)
+
+    message = await send(await build())
+    file_id = extract_photo_file_id(message)
+    if file_id:
+        await store_file_id(digest, file_id)
+    return message
+
+
+async def send_qr_photo(
+    send: Callable[[str | BufferedInputFile], Awaitable[Message]],
+    data: str,
+) -> Message:
+    """Send a QR code for ``data``; it is rendered and uploaded only once per payload."""
+
+    async def build() -> BufferedInputFile:
+        return BufferedInputFile(await render_qr_png(data), filename='qrcode.png')
+
+    return await send_cached_photo(send, media_digest(f'qr:{data}'), build)
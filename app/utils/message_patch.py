@@ -6,14 +6,38 @@ from aiogram.types import FSInputFile, InaccessibleMessage, InputMediaPhoto, Mes
 
 from app.config import settings
 from app.localization.texts import get_texts
+from app.utils import media_cache
 
 
 LOGO_PATH = Path(settings.LOGO_FILE)
 _PRIVACY_RESTRICTED_CODE = 'BUTTON_USER_PRIVACY_RESTRICTED'
 
 # Кеш file_id логотипа: после первой загрузки Telegram возвращает file_id,
-# который можно переиспользовать без повторной загрузки файла (экономит 3-4 сек)
+# который можно переиспользовать без повторной загрузки файла (экономит 3-4 сек).
+# Ключ — хеш содержимого файла, значение хранится в media_cache (память + Redis).
 _logo_file_id: str | None = None
+_logo_digest: str | None = None
+
+
+def _get_logo_digest() -> str | None:
+    global _logo_digest
+    if _logo_digest is None and LOGO_PATH.exists():
+        try:
+            _logo_digest = media_cache.file_digest(LOGO_PATH)
+        except OSError:
+            return None
+    return _logo_digest
+
+
+async def load_logo_file_id() -> None:
+    """Подтягивает file_id логотипа из постоянного кеша при старте бота."""
+    global _logo_file_id
+    digest = _get_logo_digest()
+    if not digest:
+        return
+    file_id = await media_cache.get_file_id(digest)
+    if file_id:
+        _logo_file_id = file_id
 
 
 def get_logo_media():
@@ -30,6 +54,20 @@ def _cache_logo_file_id(result: Message | None) -> None:
         return
     if hasattr(result, 'photo') and result.photo:
         _logo_file_id = result.photo[-1].file_id
+        digest = _get_logo_digest()
+        if digest:
+            media_cache.remember_sent_photo(digest, result)
+
+
+async def _forget_stale_logo_file_id(error: Exception) -> None:
+    """Сбрасывает кешированный file_id логотипа, если Telegram его больше не принимает."""
+    global _logo_file_id
+    if not _logo_file_id or not media_cache.is_stale_file_id_error(error):
+        return
+    _logo_file_id = None
+    digest = _get_logo_digest()
+    if digest:
+        await media_cache.forget_file_id(digest)
 
 
 _TOPIC_REQUIRED_ERRORS = (
@@ -136,6 +174,8 @@ async def _answer_with_photo(self: Message, text: str = None, **kwargs):
             _cache_logo_file_id(result)
             return result
         except TelegramBadRequest as error:
+            # Следующее сообщение загрузит логотип заново
+            await _forget_stale_logo_file_id(error)
             if is_topic_required_error(error):
                 # Канал с топиками — просто игнорируем, нельзя ответить без message_thread_id
                 return None
@@ -200,6 +240,7 @@ async def _edit_with_photo(self: Message, text: str, **kwargs):
         try:
             return await self.edit_media(InputMediaPhoto(**media_kwargs), **edit_kwargs)
         except TelegramBadRequest as error:
+            await _forget_stale_logo_file_id(error)
             if is_topic_required_error(error):
                 return None
             if is_privacy_restricted_error(error):
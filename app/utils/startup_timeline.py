@@ -2,7 +2,7 @@ import platform
 import time
 from collections.abc import Iterable, Sequence
 from contextlib import asynccontextmanager
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any
 
 
@@ -13,6 +13,7 @@ class StepRecord:
     status_label: str
     message: str
     duration: float
+    substeps: list[tuple[str, float]] = field(default_factory=list)
 
 
 class StageHandle:
@@ -29,6 +30,7 @@ class StageHandle:
         self.message = success_message or ''
         self.status_icon = '✅'
         self.status_label = 'Готово'
+        self.substeps: list[tuple[str, float]] = []
         self._explicit_status = False
 
     def success(self, message: str | None = None) -> None:
@@ -59,14 +61,27 @@ class StageHandle:
     def log(self, message: str, icon: str = '•') -> None:
         self.timeline.logger.info(f'┃ {icon} {message}')
 
+    def add_substep(self, title: str, duration: float) -> None:
+        self.substeps.append((title, duration))
+
 
 class StartupTimeline:
+    SLOWEST_SUBSTEPS_TO_LOG = 5
+
     def __init__(self, logger: Any, app_name: str) -> None:
         self.logger = logger
         self.app_name = app_name
         self.steps: list[StepRecord] = []
 
-    def _record_step(self, title: str, icon: str, status_label: str, message: str, duration: float) -> None:
+    def _record_step(
+        self,
+        title: str,
+        icon: str,
+        status_label: str,
+        message: str,
+        duration: float,
+        substeps: list[tuple[str, float]] | None = None,
+    ) -> None:
         self.steps.append(
             StepRecord(
                 title=title,
@@ -74,9 +89,15 @@ class StartupTimeline:
                 status_label=status_label,
                 message=message,
                 duration=duration,
+                substeps=substeps or [],
             )
         )
 
+    def _log_slowest_substeps(self, substeps: list[tuple[str, float]]) -> None:
+        slowest = sorted(substeps, key=lambda item: item[1], reverse=True)[: self.SLOWEST_SUBSTEPS_TO_LOG]
+        for title, duration in slowest:
+            self.logger.info(f'┣ ⏱️ {title} [{duration:.2f}s]')
+
     def log_banner(self, metadata: Sequence[tuple[str, Any]] | None = None) -> None:
         title_text = f'🚀 {self.app_name}'
         subtitle_parts = [f'Python {platform.python_version()}']
@@ -112,10 +133,11 @@ class StartupTimeline:
         icon: str,
         status_label: str,
         message: str,
+        duration: float = 0.0,
     ) -> None:
         self.logger.info(f'┏ {icon} {title}')
         self.logger.info(f'┗ {icon} {title} — {status_label}: {message}')
-        self._record_step(title, icon, status_label, message, 0.0)
+        self._record_step(title, icon, status_label, message, duration)
 
     @asynccontextmanager
     async def stage(
@@ -143,6 +165,8 @@ class StartupTimeline:
             duration = time.perf_counter() - start_time
             if not handle._explicit_status:
                 handle.success(handle.message or 'Готово')
+            if handle.substeps:
+                self._log_slowest_substeps(handle.substeps)
             self.logger.info(f'┗ {handle.status_icon} {title} — {handle.message} [{duration:.2f}s]')
             self._record_step(
                 title=title,
@@ -150,6 +174,7 @@ class StartupTimeline:
                 status_label=handle.status_label,
                 message=handle.message,
                 duration=duration,
+                substeps=handle.substeps,
             )
 
     def log_summary(self) -> None:
@@ -23,7 +23,6 @@ from app.database.crud.referral_contest import (
     create_referral_contest,
     delete_referral_contest,
     get_contest_events_count,
-    get_contest_leaderboard,
     get_referral_contest,
     get_referral_contests_count,
     list_referral_contests,
@@ -39,6 +38,7 @@ from app.database.models import (
     User,
 )
 from app.services.contest_rotation_service import contest_rotation_service
+from app.services.referral_contest_leaderboard import contest_leaderboard
 from app.webapi.dependencies import get_db_session, require_api_token
 from app.webapi.schemas.contests import (
     ContestAttemptListResponse,
@@ -538,7 +538,7 @@ async def get_referral(
         raise HTTPException(status.HTTP_404_NOT_FOUND, 'Contest not found')
 
     total_events = await get_contest_events_count(db, contest.id)
-    leaderboard_rows = await get_contest_leaderboard(db, contest.id, limit=leaderboard_limit)
+    leaderboard_rows = await contest_leaderboard.get_leaderboard(db, contest.id, limit=leaderboard_limit)
     leaderboard = [_serialize_leaderboard_item(row) for row in leaderboard_rows]
 
     return ReferralContestDetailResponse(
@@ -584,6 +584,9 @@ async def update_referral(
 
     if fields:
         contest = await update_referral_contest(db, contest, **fields)
+        if 'start_at' in fields or 'end_at' in fields:
+            # Границы периода влияют на учитываемые события
+            await contest_leaderboard.reconcile(db, contest.id)
 
     return _serialize_referral_contest(contest)
 
@@ -626,6 +629,7 @@ async def delete_referral(
             'Можно удалять только завершённые конкурсы',
         )
     await delete_referral_contest(db, contest)
+    await contest_leaderboard.drop(contest_id)
     return {'status': 'deleted'}
 
 
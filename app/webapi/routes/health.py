@@ -2,9 +2,19 @@ from __future__ import annotations
 
 from fastapi import APIRouter, Security
 
+from app.cabinet.auth.password_utils import get_password_hashing_stats
+from app.cabinet.services.websocket_hub import cabinet_ws_manager
 from app.config import settings
 from app.database import db_manager, get_pool_metrics
+from app.services.admin_notification_digest import admin_notification_digest
+from app.services.event_emitter import event_emitter
+from app.services.payment_verification_service import auto_payment_verification_service
+from app.services.server_status_service import server_status_service
+from app.services.subscription_view_service import subscription_view_service
+from app.services.traffic_history_service import traffic_history_service
+from app.services.user_identity_cache import user_identity_cache
 from app.services.version_service import version_service
+from app.utils.http_clients import http_clients
 
 from ..dependencies import require_api_token
 from ..schemas.health import HealthCheckResponse, HealthFeatureFlags
@@ -40,3 +50,73 @@ async def pool_metrics(_: object = Security(require_api_token)) -> dict:
     """Метрики пула подключений к базе данных."""
 
     return await get_pool_metrics()
+
+
+@router.get('/metrics/events', tags=['health'])
+async def event_metrics(_: object = Security(require_api_token)) -> dict:
+    """Метрики доставки событий: очереди WebSocket подписчиков и webhooks."""
+
+    return event_emitter.get_stats()
+
+
+@router.get('/metrics/payment-verification', tags=['health'])
+async def payment_verification_metrics(_: object = Security(require_api_token)) -> dict:
+    """Метрики последнего цикла автопроверки пополнений по провайдерам."""
+
+    return auto_payment_verification_service.get_stats()
+
+
+@router.get('/metrics/password-hashing', tags=['health'])
+async def password_hashing_metrics(_: object = Security(require_api_token)) -> dict:
+    """Метрики пула bcrypt: очередь и время вычисления хешей."""
+
+    return get_password_hashing_stats()
+
+
+@router.get('/metrics/admin-notifications', tags=['health'])
+async def admin_notification_metrics(_: object = Security(require_api_token)) -> dict:
+    """Метрики сводок админ-уведомлений: буфер, очередь и задержка отправки."""
+
+    return admin_notification_digest.get_stats()
+
+
+@router.get('/metrics/traffic-history', tags=['health'])
+async def traffic_history_metrics(_: object = Security(require_api_token)) -> dict:
+    """Состояние локальной истории трафика: записи, покрытые сутки и время последнего сбора."""
+
+    return traffic_history_service.get_stats()
+
+
+@router.get('/metrics/http-clients', tags=['health'])
+async def http_client_metrics(_: object = Security(require_api_token)) -> dict:
+    """Метрики исходящих HTTP-клиентов: задержки, ошибки и состояние circuit breaker по upstream."""
+
+    return http_clients.get_stats()
+
+
+@router.get('/metrics/server-status', tags=['health'])
+async def server_status_metrics(_: object = Security(require_api_token)) -> dict:
+    """Снимок статуса серверов: возраст, число опросов, ответы 304 и повторные разборы метрик."""
+
+    return server_status_service.get_stats()
+
+
+@router.get('/metrics/subscription-view', tags=['health'])
+async def subscription_view_metrics(_: object = Security(require_api_token)) -> dict:
+    """Кеш экрана подписки: попадания, ответы 304, сбросы версий и пропущенные синхронизации трафика."""
+
+    return subscription_view_service.get_stats()
+
+
+@router.get('/metrics/cabinet-ws', tags=['health'])
+async def cabinet_ws_metrics(_: object = Security(require_api_token)) -> dict:
+    """WebSocket-хаб кабинета: подключения, глубина очередей отправки, отброшенные сообщения и relay через Redis."""
+
+    return cabinet_ws_manager.get_stats()
+
+
+@router.get('/metrics/auth-identity', tags=['health'])
+async def auth_identity_metrics(_: object = Security(require_api_token)) -> dict:
+    """Снимки пользователей в AuthMiddleware: попадания, истёкшие записи и сбросы после изменений."""
+
+    return user_identity_cache.get_stats()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import math
@@ -12,7 +13,7 @@ from typing import Any
 from uuid import uuid4
 
 from aiogram import Bot
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from pydantic import ValidationError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -46,6 +47,7 @@ from app.database.crud.transaction import (
     get_user_total_spent_kopeks,
 )
 from app.database.crud.user import get_user_by_telegram_id, subtract_user_balance
+from app.database.database import AsyncSessionLocal
 from app.database.models import (
     PaymentMethod,
     PromoGroup,
@@ -84,6 +86,7 @@ from app.services.subscription_renewal_service import (
     with_admin_notification_service,
 )
 from app.services.subscription_service import SubscriptionService
+from app.services.subscription_view_service import SubscriptionView, subscription_view_service
 from app.services.trial_activation_service import (
     TrialPaymentChargeFailed,
     TrialPaymentInsufficientFunds,
@@ -3237,8 +3240,9 @@ def _is_trial_available_for_user(user: User) -> bool:
 @router.post('/subscription', response_model=MiniAppSubscriptionResponse)
 async def get_subscription_details(
     payload: MiniAppSubscriptionRequest,
+    request: Request,
     db: AsyncSession = Depends(get_db_session),
-) -> MiniAppSubscriptionResponse:
+) -> Response:
     # Check maintenance mode first
     if maintenance_service.is_maintenance_active():
         status_info = maintenance_service.get_status_info()
@@ -3315,7 +3319,8 @@ async def get_subscription_details(
     subscription = getattr(user, 'subscription', None)
     usage_synced = False
 
-    if subscription and _is_remnawave_configured():
+    # Экран открывают намного чаще, чем меняется трафик: в панель ходим не чаще MINIAPP_USAGE_SYNC_INTERVAL
+    if subscription and _is_remnawave_configured() and subscription_view_service.should_sync_usage(user.id):
         service = SubscriptionService()
         try:
             usage_synced = await service.sync_subscription_usage(db, subscription)
@@ -3345,84 +3350,45 @@ async def get_subscription_details(
             user = await get_user_by_telegram_id(db, telegram_id)
 
         subscription = getattr(user, 'subscription', subscription)
-    lifetime_used = _bytes_to_gb(getattr(user, 'lifetime_used_traffic_bytes', 0))
 
-    transactions_query = (
-        select(Transaction).where(Transaction.user_id == user.id).order_by(Transaction.created_at.desc()).limit(10)
+    view = await subscription_view_service.get_or_build(
+        'miniapp',
+        user.id,
+        lambda: _build_subscription_details(db, user, subscription, purchase_url),
     )
-    transactions_result = await db.execute(transactions_query)
-    transactions = list(transactions_result.scalars().all())
+    return _subscription_view_response(view, request)
 
-    balance_currency = getattr(user, 'balance_currency', None)
-    if isinstance(balance_currency, str):
-        balance_currency = balance_currency.upper()
 
-    promo_group = getattr(user, 'promo_group', None)
-    total_spent_kopeks = await get_user_total_spent_kopeks(db, user.id)
-    auto_assign_groups = await get_auto_assign_promo_groups(db)
+def _subscription_view_response(view: SubscriptionView, request: Request) -> Response:
+    headers = {'ETag': view.etag, 'Cache-Control': 'private, no-cache'}
+    if view.matches(request.headers.get('if-none-match')):
+        subscription_view_service.record_not_modified()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=view.body, media_type='application/json', headers=headers)
 
-    auto_promo_levels: list[MiniAppAutoPromoGroupLevel] = []
-    for group in auto_assign_groups:
-        threshold = group.auto_assign_total_spent_kopeks or 0
-        if threshold <= 0:
-            continue
 
-        auto_promo_levels.append(
-            MiniAppAutoPromoGroupLevel(
-                id=group.id,
-                name=group.name,
-                threshold_kopeks=threshold,
-                threshold_rubles=round(threshold / 100, 2),
-                threshold_label=settings.format_price(threshold),
-                is_reached=total_spent_kopeks >= threshold,
-                is_current=bool(promo_group and promo_group.id == group.id),
-                **_extract_promo_discounts(group),
-            )
+async def _load_spending_summary(user_id: int) -> tuple[list[Transaction], int, list[PromoGroup]]:
+    async with AsyncSessionLocal() as db:
+        transactions_result = await db.execute(
+            select(Transaction).where(Transaction.user_id == user_id).order_by(Transaction.created_at.desc()).limit(10)
         )
+        transactions = list(transactions_result.scalars().all())
+        total_spent_kopeks = await get_user_total_spent_kopeks(db, user_id)
+        auto_assign_groups = await get_auto_assign_promo_groups(db)
+    return transactions, total_spent_kopeks, list(auto_assign_groups)
 
-    active_discount_percent = 0
-    try:
-        active_discount_percent = int(getattr(user, 'promo_offer_discount_percent', 0) or 0)
-    except (TypeError, ValueError):
-        active_discount_percent = 0
-
-    active_discount_expires_at = getattr(user, 'promo_offer_discount_expires_at', None)
-    now = datetime.utcnow()
-    if active_discount_expires_at and active_discount_expires_at <= now:
-        active_discount_expires_at = None
-        active_discount_percent = 0
-
-    available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
-
-    promo_offer_source = getattr(user, 'promo_offer_discount_source', None)
-    active_offer_contexts: list[ActiveOfferContext] = []
-    if promo_offer_source or active_discount_percent > 0:
-        active_discount_offer = await get_latest_claimed_offer_for_user(
-            db,
-            user.id,
-            promo_offer_source,
-        )
-        if active_discount_offer and active_discount_percent > 0:
-            active_offer_contexts.append(
-                (
-                    active_discount_offer,
-                    active_discount_percent,
-                    active_discount_expires_at,
-                )
-            )
-
-    if subscription:
-        active_offer_contexts.extend(await _find_active_test_access_offers(db, subscription))
 
-    promo_offers = await _build_promo_offer_models(
-        db,
-        available_promo_offers,
-        active_offer_contexts,
-        user=user,
-    )
+async def _load_content_documents(
+    content_language_preference: str,
+) -> tuple[MiniAppFaq | None, MiniAppLegalDocuments | None]:
+    async with AsyncSessionLocal() as db:
+        return await _build_content_documents(db, content_language_preference)
 
-    content_language_preference = user.language or settings.DEFAULT_LANGUAGE or 'ru'
 
+async def _build_content_documents(
+    db: AsyncSession,
+    content_language_preference: str,
+) -> tuple[MiniAppFaq | None, MiniAppLegalDocuments | None]:
     def _normalize_language_code(language: str | None) -> str:
         base_language = language or settings.DEFAULT_LANGUAGE or 'ru'
         return base_language.split('-')[0].lower()
@@ -3534,9 +3500,168 @@ async def get_subscription_details(
             updated_at=getattr(service_rules, 'updated_at', None),
         )
 
-    links_payload: dict[str, Any] = {}
-    connected_squads: list[str] = []
-    connected_servers: list[MiniAppConnectedServer] = []
+    return faq_payload, legal_documents_payload
+
+
+async def _build_subscription_details(
+    db: AsyncSession,
+    user: User,
+    subscription: Subscription | None,
+    purchase_url: str,
+) -> MiniAppSubscriptionResponse:
+    content_language_preference = user.language or settings.DEFAULT_LANGUAGE or 'ru'
+
+    # Части, не зависящие от сессии запроса, читаются параллельно в своих сессиях и из панели;
+    # сессию запроса (она не допускает параллельных запросов) тем временем использует код ниже
+    independent = asyncio.gather(
+        _load_spending_summary(user.id),
+        _load_content_documents(content_language_preference),
+        _load_devices_info(user),
+        _load_subscription_links(subscription) if subscription else asyncio.sleep(0, result={}),
+    )
+    try:
+        lifetime_used = _bytes_to_gb(getattr(user, 'lifetime_used_traffic_bytes', 0))
+
+        balance_currency = getattr(user, 'balance_currency', None)
+        if isinstance(balance_currency, str):
+            balance_currency = balance_currency.upper()
+
+        promo_group = getattr(user, 'promo_group', None)
+
+        active_discount_percent = 0
+        try:
+            active_discount_percent = int(getattr(user, 'promo_offer_discount_percent', 0) or 0)
+        except (TypeError, ValueError):
+            active_discount_percent = 0
+
+        active_discount_expires_at = getattr(user, 'promo_offer_discount_expires_at', None)
+        now = datetime.utcnow()
+        if active_discount_expires_at and active_discount_expires_at <= now:
+            active_discount_expires_at = None
+            active_discount_percent = 0
+
+        available_promo_offers = await list_active_discount_offers_for_user(db, user.id)
+
+        promo_offer_source = getattr(user, 'promo_offer_discount_source', None)
+        active_offer_contexts: list[ActiveOfferContext] = []
+        if promo_offer_source or active_discount_percent > 0:
+            active_discount_offer = await get_latest_claimed_offer_for_user(
+                db,
+                user.id,
+                promo_offer_source,
+            )
+            if active_discount_offer and active_discount_percent > 0:
+                active_offer_contexts.append(
+                    (
+                        active_discount_offer,
+                        active_discount_percent,
+                        active_discount_expires_at,
+                    )
+                )
+
+        if subscription:
+            active_offer_contexts.extend(await _find_active_test_access_offers(db, subscription))
+
+        promo_offers = await _build_promo_offer_models(
+            db,
+            available_promo_offers,
+            active_offer_contexts,
+            user=user,
+        )
+
+        connected_squads: list[str] = list(subscription.connected_squads or []) if subscription else []
+        connected_servers = await _resolve_connected_servers(db, connected_squads)
+
+        # Загружаем данные суточного тарифа
+        is_daily_tariff = False
+        is_daily_paused = False
+        daily_tariff_name = None
+        daily_price_kopeks = None
+        daily_price_label = None
+        daily_next_charge_at = None
+
+        if subscription and getattr(subscription, 'tariff_id', None):
+            tariff = await get_tariff_by_id(db, subscription.tariff_id)
+            if tariff and getattr(tariff, 'is_daily', False):
+                is_daily_tariff = True
+                is_daily_paused = getattr(subscription, 'is_daily_paused', False)
+                daily_tariff_name = tariff.name
+                daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
+                daily_price_label = (
+                    settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
+                )
+                # Оставшееся время подписки (показываем даже при паузе)
+                if subscription.end_date:
+                    daily_next_charge_at = subscription.end_date
+
+        referral_info = await _build_referral_info(db, user)
+
+        # Получаем докупки трафика
+        traffic_purchases_data = []
+        if subscription:
+            from app.database.models import TrafficPurchase
+
+            purchases_query = (
+                select(TrafficPurchase)
+                .where(TrafficPurchase.subscription_id == subscription.id)
+                .where(TrafficPurchase.expires_at > now)
+                .order_by(TrafficPurchase.expires_at.asc())
+            )
+            purchases_result = await db.execute(purchases_query)
+            purchases = purchases_result.scalars().all()
+
+            for purchase in purchases:
+                time_remaining = purchase.expires_at - now
+                days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
+                total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
+                elapsed_seconds = (now - purchase.created_at).total_seconds()
+                progress_percent = min(
+                    100.0,
+                    max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0),
+                )
+
+                traffic_purchases_data.append(
+                    {
+                        'id': purchase.id,
+                        'traffic_gb': purchase.traffic_gb,
+                        'expires_at': purchase.expires_at,
+                        'created_at': purchase.created_at,
+                        'days_remaining': days_remaining,
+                        'progress_percent': round(progress_percent, 1),
+                    }
+                )
+
+        current_tariff = await _get_current_tariff_model(db, subscription, user) if subscription else None
+
+        (
+            (transactions, total_spent_kopeks, auto_assign_groups),
+            (faq_payload, legal_documents_payload),
+            (devices_count, devices),
+            links_payload,
+        ) = await independent
+    except BaseException:
+        independent.cancel()
+        raise
+
+    auto_promo_levels: list[MiniAppAutoPromoGroupLevel] = []
+    for group in auto_assign_groups:
+        threshold = group.auto_assign_total_spent_kopeks or 0
+        if threshold <= 0:
+            continue
+
+        auto_promo_levels.append(
+            MiniAppAutoPromoGroupLevel(
+                id=group.id,
+                name=group.name,
+                threshold_kopeks=threshold,
+                threshold_rubles=round(threshold / 100, 2),
+                threshold_label=settings.format_price(threshold),
+                is_reached=total_spent_kopeks >= threshold,
+                is_current=bool(promo_group and promo_group.id == group.id),
+                **_extract_promo_discounts(group),
+            )
+        )
+
     links: list[str] = []
     ss_conf_links: dict[str, str] = {}
     subscription_url: str | None = None
@@ -3556,14 +3681,11 @@ async def get_subscription_details(
         traffic_limit_value = subscription.traffic_limit_gb or 0
         status_actual = subscription.actual_status
         subscription_status_value = subscription.status
-        links_payload = await _load_subscription_links(subscription)
         # Флаг скрытия ссылки (скрывается только текст, кнопки работают)
         hide_subscription_link = settings.should_hide_subscription_link()
         subscription_url = links_payload.get('subscription_url') or subscription.subscription_url
         subscription_crypto_link = links_payload.get('happ_crypto_link') or subscription.subscription_crypto_link
         happ_redirect_link = get_happ_cryptolink_redirect_link(subscription_crypto_link)
-        connected_squads = list(subscription.connected_squads or [])
-        connected_servers = await _resolve_connected_servers(db, connected_squads)
         links = links_payload.get('links') or connected_squads
         ss_conf_links = links_payload.get('ss_conf_links') or {}
         remnawave_short_uuid = subscription.remnawave_short_uuid
@@ -3580,28 +3702,6 @@ async def get_subscription_details(
         autopay_payload,
     )
 
-    devices_count, devices = await _load_devices_info(user)
-
-    # Загружаем данные суточного тарифа
-    is_daily_tariff = False
-    is_daily_paused = False
-    daily_tariff_name = None
-    daily_price_kopeks = None
-    daily_price_label = None
-    daily_next_charge_at = None
-
-    if subscription and getattr(subscription, 'tariff_id', None):
-        tariff = await get_tariff_by_id(db, subscription.tariff_id)
-        if tariff and getattr(tariff, 'is_daily', False):
-            is_daily_tariff = True
-            is_daily_paused = getattr(subscription, 'is_daily_paused', False)
-            daily_tariff_name = tariff.name
-            daily_price_kopeks = getattr(tariff, 'daily_price_kopeks', 0)
-            daily_price_label = settings.format_price(daily_price_kopeks) + '/день' if daily_price_kopeks > 0 else None
-            # Оставшееся время подписки (показываем даже при паузе)
-            if subscription.end_date:
-                daily_next_charge_at = subscription.end_date
-
     response_user = MiniAppSubscriptionUser(
         telegram_id=user.telegram_id,
         username=user.username,
@@ -3639,8 +3739,6 @@ async def get_subscription_details(
         daily_next_charge_at=daily_next_charge_at,
     )
 
-    referral_info = await _build_referral_info(db, user)
-
     trial_available = _is_trial_available_for_user(user)
     trial_duration_days = settings.TRIAL_DURATION_DAYS if settings.TRIAL_DURATION_DAYS > 0 else None
     trial_price_kopeks = settings.get_trial_activation_price()
@@ -3654,43 +3752,6 @@ async def get_subscription_details(
         else:
             subscription_missing_reason = 'not_found'
 
-    # Получаем докупки трафика
-    traffic_purchases_data = []
-    if subscription:
-        from sqlalchemy import select as sql_select
-
-        from app.database.models import TrafficPurchase
-
-        now = datetime.utcnow()
-        purchases_query = (
-            sql_select(TrafficPurchase)
-            .where(TrafficPurchase.subscription_id == subscription.id)
-            .where(TrafficPurchase.expires_at > now)
-            .order_by(TrafficPurchase.expires_at.asc())
-        )
-        purchases_result = await db.execute(purchases_query)
-        purchases = purchases_result.scalars().all()
-
-        for purchase in purchases:
-            time_remaining = purchase.expires_at - now
-            days_remaining = max(0, int(time_remaining.total_seconds() / 86400))
-            total_duration_seconds = (purchase.expires_at - purchase.created_at).total_seconds()
-            elapsed_seconds = (now - purchase.created_at).total_seconds()
-            progress_percent = min(
-                100.0, max(0.0, (elapsed_seconds / total_duration_seconds * 100) if total_duration_seconds > 0 else 0)
-            )
-
-            traffic_purchases_data.append(
-                {
-                    'id': purchase.id,
-                    'traffic_gb': purchase.traffic_gb,
-                    'expires_at': purchase.expires_at,
-                    'created_at': purchase.created_at,
-                    'days_remaining': days_remaining,
-                    'progress_percent': round(progress_percent, 1),
-                }
-            )
-
     return MiniAppSubscriptionResponse(
         traffic_purchases=traffic_purchases_data,
         subscription_id=getattr(subscription, 'id', None),
@@ -3748,7 +3809,7 @@ async def get_subscription_details(
         trial_price_kopeks=trial_price_kopeks if trial_payment_required else None,
         trial_price_label=trial_price_label,
         sales_mode=settings.get_sales_mode(),
-        current_tariff=await _get_current_tariff_model(db, subscription, user) if subscription else None,
+        current_tariff=current_tariff,
         **autopay_extras,
     )
 
@@ -163,6 +163,17 @@ def create_unified_app(
     async def stop_disposable_email_service() -> None:  # pragma: no cover - event hook
         await disposable_email_service.stop()
 
+    if settings.is_cabinet_enabled():
+        from app.cabinet.services.websocket_hub import cabinet_ws_manager
+
+        @app.on_event('startup')
+        async def start_cabinet_ws_relay() -> None:  # pragma: no cover - event hook
+            await cabinet_ws_manager.start()
+
+        @app.on_event('shutdown')
+        async def stop_cabinet_ws_relay() -> None:  # pragma: no cover - event hook
+            await cabinet_ws_manager.stop()
+
     miniapp_mounted, miniapp_path = _mount_miniapp_static(app)
 
     unified_health_path = '/health/unified' if settings.is_web_api_enabled() else '/health'
@@ -3,11 +3,20 @@ import logging
 import os
 import signal
 import sys
+import time
 from pathlib import Path
 
 
 sys.path.append(str(Path(__file__).parent))
 
+from app.utils.import_profiler import import_profiler
+
+
+# IMPORT_PROFILE=true — отчёт о времени импорта модулей в стиле `python -X importtime`
+if os.getenv('IMPORT_PROFILE', 'false').lower() == 'true':
+    import_profiler.start()
+_imports_started_at = time.perf_counter()
+
 from app.bot import setup_bot
 from app.config import settings
 from app.database.database import init_db
@@ -15,10 +24,12 @@ from app.database.models import PaymentMethod
 from app.database.universal_migration import run_universal_migration
 from app.localization.loader import ensure_locale_templates
 from app.logging_handler import TelegramErrorHandler
+from app.services.admin_notification_digest import admin_notification_digest
 from app.services.backup_service import backup_service
 from app.services.ban_notification_service import ban_notification_service
 from app.services.broadcast_service import broadcast_service
 from app.services.contest_rotation_service import contest_rotation_service
+from app.services.currency_rate_service import currency_rate_service
 from app.services.daily_subscription_service import daily_subscription_service
 from app.services.external_admin_service import ensure_external_admin_token
 from app.services.log_rotation_service import log_rotation_service
@@ -36,15 +47,21 @@ from app.services.payment_verification_service import (
 from app.services.referral_contest_service import referral_contest_service
 from app.services.remnawave_sync_service import remnawave_sync_service
 from app.services.reporting_service import reporting_service
+from app.services.server_status_service import server_status_service
 from app.services.system_settings_service import bot_configuration_service
+from app.services.traffic_history_service import traffic_history_service
 from app.services.traffic_monitoring_service import traffic_monitoring_scheduler
 from app.services.version_service import version_service
+from app.services.webhook_service import webhook_service
+from app.utils.http_clients import http_clients
 from app.utils.log_handlers import ExcludePaymentFilter, LevelFilterHandler
 from app.utils.payment_logger import configure_payment_logger
 from app.utils.startup_timeline import StartupTimeline
 from app.utils.timezone import TimezoneAwareFormatter
-from app.webapi.server import WebAPIServer
-from app.webserver.unified_app import create_unified_app
+
+
+MODULE_IMPORT_SECONDS = time.perf_counter() - _imports_started_at
+import_profiler.stop()
 
 
 class GracefulExit:
@@ -167,6 +184,15 @@ async def main():
             ('Режим БД', settings.DATABASE_MODE),
         ]
     )
+    timeline.add_manual_step(
+        'Импорт модулей',
+        '📦',
+        'Готово',
+        f'{MODULE_IMPORT_SECONDS:.2f}s',
+        duration=MODULE_IMPORT_SECONDS,
+    )
+    if import_profiler.records:
+        timeline.log_section('Профиль импорта модулей', import_profiler.report_lines(), icon='📦')
 
     async with timeline.stage('Подготовка локализаций', '🗂️', success_message='Шаблоны локализаций готовы') as stage:
         try:
@@ -206,7 +232,7 @@ async def main():
                 success_message='Миграция завершена успешно',
             ) as stage:
                 try:
-                    migration_success = await run_universal_migration()
+                    migration_success = await run_universal_migration(stage)
                     if migration_success:
                         stage.success('Миграция завершена успешно')
                     else:
@@ -497,6 +523,45 @@ async def main():
             else:
                 stage.skip('NaloGO отключен настройками')
 
+        async with timeline.stage(
+            'Курсы валют',
+            '💱',
+            success_message='Таблица курсов загружена',
+        ) as stage:
+            try:
+                table = await currency_rate_service.reload()
+                stage.log(f'Пар в таблице: {len(table.rates)}')
+                await currency_rate_service.start()
+            except Exception as e:
+                stage.warning(f'Ошибка загрузки курсов валют: {e}')
+                logger.error(f'❌ Ошибка загрузки курсов валют: {e}')
+
+        async with timeline.stage(
+            'Статус серверов',
+            '📡',
+            success_message='Опрос метрик серверов запущен',
+        ) as stage:
+            try:
+                await server_status_service.start()
+                if not server_status_service.is_running():
+                    stage.skip('Интеграция XrayChecker не настроена')
+            except Exception as e:
+                stage.warning(f'Ошибка запуска опроса статуса серверов: {e}')
+                logger.error(f'❌ Ошибка запуска опроса статуса серверов: {e}')
+
+        async with timeline.stage(
+            'История трафика',
+            '📊',
+            success_message='Сбор истории трафика запущен',
+        ) as stage:
+            try:
+                await traffic_history_service.start()
+                if not traffic_history_service.is_running():
+                    stage.skip('Сбор истории трафика выключен или RemnaWave не настроен')
+            except Exception as e:
+                stage.warning(f'Ошибка запуска сбора истории трафика: {e}')
+                logger.error(f'❌ Ошибка запуска сбора истории трафика: {e}')
+
         async with timeline.stage(
             'Внешняя админка',
             '🛡️',
@@ -545,6 +610,10 @@ async def main():
             )
 
             if should_start_web_app:
+                # FastAPI и роуты админки/кабинета импортируются только когда веб-сервер нужен
+                from app.webapi.server import WebAPIServer
+                from app.webserver.unified_app import create_unified_app
+
                 web_app = create_unified_app(
                     bot,
                     dp,
@@ -883,6 +952,36 @@ async def main():
         except Exception as e:
             logger.error(f'Ошибка остановки очереди чеков NaloGO: {e}')
 
+        logger.info('ℹ️ Остановка обновления курсов валют...')
+        try:
+            await currency_rate_service.stop()
+        except Exception as e:
+            logger.error(f'Ошибка остановки обновления курсов валют: {e}')
+
+        logger.info('ℹ️ Остановка опроса статуса серверов...')
+        try:
+            await server_status_service.stop()
+        except Exception as e:
+            logger.error(f'Ошибка остановки опроса статуса серверов: {e}')
+
+        logger.info('ℹ️ Остановка сбора истории трафика...')
+        try:
+            await traffic_history_service.stop()
+        except Exception as e:
+            logger.error(f'Ошибка остановки сбора истории трафика: {e}')
+
+        logger.info('ℹ️ Остановка доставки webhooks...')
+        try:
+            await webhook_service.stop()
+        except Exception as e:
+            logger.error(f'Ошибка остановки доставки webhooks: {e}')
+
+        logger.info('ℹ️ Отправка накопленных сводок админ-уведомлений...')
+        try:
+            await admin_notification_digest.stop()
+        except Exception as e:
+            logger.error(f'Ошибка отправки сводок админ-уведомлений: {e}')
+
         logger.info('ℹ️ Остановка сервиса бекапов...')
         try:
             await backup_service.stop_auto_backup()
@@ -912,6 +1011,12 @@ async def main():
             except Exception as error:
                 logger.error(f'Ошибка остановки веб-API: {error}')
 
+        try:
+            await http_clients.close()
+            logger.info('✅ HTTP-клиенты внешних интеграций закрыты')
+        except Exception as error:
+            logger.error(f'Ошибка закрытия HTTP-клиентов: {error}')
+
         if 'bot' in locals():
             try:
                 await bot.session.close()
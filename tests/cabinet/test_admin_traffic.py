@@ -0,0 +1,92 @@
+import csv
+import io
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.cabinet.routes.admin_traffic import _build_traffic_items, _render_traffic_csv
+from app.cabinet.schemas.traffic import TrafficNodeInfo, UserTrafficEnrichment
+from app.services.traffic_history_service import TrafficMatrix
+
+
+GB = 1024**3
+
+
+def _user(index: int, tariff: str | None = 'Basic', status: str = 'active'):
+    subscription = SimpleNamespace(
+        tariff=SimpleNamespace(name=tariff) if tariff else None,
+        actual_status=status,
+        traffic_limit_gb=100,
+        device_limit=index % 3 + 1,
+    )
+    return SimpleNamespace(
+        id=index,
+        telegram_id=1000 + index,
+        username=f'user{index}',
+        email=None,
+        full_name=f'User {index:03d}',
+        remnawave_uuid=f'uuid-{index}',
+        subscription=subscription,
+    )
+
+
+def _fixture():
+    rng = np.random.default_rng(3)
+    users = {f'uuid-{i}': _user(i, tariff='Pro' if i % 4 == 0 else 'Basic') for i in range(60)}
+    nodes = [TrafficNodeInfo(node_uuid=f'n{i}', node_name=f'Node {i}', country_code='DE') for i in range(3)]
+    entries = [
+        (f'uuid-{i}', f'n{node}', int(rng.integers(1, 40 * GB)))
+        for i in range(0, 60, 2)
+        for node in range(3)
+        if rng.random() > 0.3
+    ]
+    entries.append(('uuid-unknown', 'n0', 5 * GB))
+    return users, nodes, entries
+
+
+def test_selection_matches_naive_filter_sort_and_top_n():
+    users, nodes, entries = _fixture()
+    traffic = TrafficMatrix.from_entries(entries)
+
+    expected = {}
+    for user_uuid, node_uuid, total in entries:
+        if user_uuid in users and users[user_uuid].subscription.tariff.name == 'Pro' and node_uuid != 'n2':
+            expected[users[user_uuid].id] = expected.get(users[user_uuid].id, 0) + total
+
+    selection = _build_traffic_items(traffic, users, nodes, tariff_filter={'Pro'}, node_filter={'n0', 'n1'}, top=5)
+    top = selection.items(selection.order)
+    assert len(selection) == 15
+    assert [item.total_bytes for item in top] == sorted(expected.values(), reverse=True)[:5]
+    assert all(set(item.node_traffic) <= {'n0', 'n1'} for item in top)
+
+    by_node = _build_traffic_items(traffic, users, nodes, sort_by='node_n2', sort_desc=False)
+    values = [item.node_traffic.get('n2', 0) for item in by_node.items(by_node.order)]
+    assert values == sorted(values) and len(values) == 60
+
+    by_name = _build_traffic_items(traffic, users, nodes, search='user 00', sort_by='full_name', sort_desc=True)
+    assert [item.full_name for item in by_name.items(by_name.order)] == [f'User 00{i}' for i in range(9, -1, -1)]
+
+
+def test_csv_risk_columns_match_per_row_formula():
+    users, nodes, entries = _fixture()
+    selection = _build_traffic_items(TrafficMatrix.from_entries(entries), users, nodes)
+    period_days, total_thr, node_thr = 7, 4.0, 2.0
+
+    content = _render_traffic_csv(
+        selection, {0: UserTrafficEnrichment(total_spent_kopeks=12345)}, period_days, total_thr, node_thr
+    )
+    rows = list(csv.DictReader(io.StringIO(content.decode('utf-8-sig'))))
+    assert len(rows) == 60
+    assert rows[-1]['Total (bytes)'] == '0'
+
+    for row, item in zip(rows, selection.items(selection.order), strict=True):
+        daily_total = item.total_bytes / period_days / GB
+        node_daily = [value / period_days / GB for value in item.node_traffic.values()]
+        worst_node = max(node_daily, default=0.0)
+        ratio = max(daily_total / total_thr, worst_node / node_thr)
+        level = 'low' if ratio < 0.5 else 'medium' if ratio < 0.8 else 'high' if ratio < 1.2 else 'critical'
+        assert row['User ID'] == str(item.user_id)
+        assert row['Risk Level'] == level
+        assert float(row['Risk Ratio']) == round(ratio, 3)
+        assert sum(int(row[f'{node.node_name} (bytes)']) for node in nodes) == item.total_bytes
+    assert {row['Total Spent (RUB)'] for row in rows if row['User ID'] == '0'} == {'123.45'}
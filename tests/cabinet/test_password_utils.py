@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import bcrypt
+
+from app.cabinet.auth import password_utils
+from app.cabinet.auth.password_utils import (
+    PasswordHasher,
+    hash_password,
+    needs_rehash,
+    verify_and_update_password,
+)
+
+
+def _p99(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+
+async def _measure_unrelated_endpoint(stop: asyncio.Event) -> list[float]:
+    """Имитация постороннего запроса: короткое ожидание, считаем задержку сверх него."""
+    delays = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.002)
+        delays.append(time.perf_counter() - started - 0.002)
+    return delays
+
+
+def test_needs_rehash_detects_cost_change(monkeypatch):
+    monkeypatch.setattr(password_utils, 'BCRYPT_ROUNDS', 4)
+    current = hash_password('secret')
+    legacy = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=5)).decode()
+
+    assert needs_rehash(current) is False
+    assert needs_rehash(legacy) is True
+    assert needs_rehash('not-a-bcrypt-hash') is False
+
+
+async def test_verify_and_update_password_rehashes_on_cost_change(monkeypatch):
+    monkeypatch.setattr(password_utils, 'BCRYPT_ROUNDS', 4)
+    monkeypatch.setattr(password_utils, 'password_hasher', PasswordHasher(workers=2))
+    legacy = bcrypt.hashpw(b'secret', bcrypt.gensalt(rounds=5)).decode()
+
+    assert await verify_and_update_password('wrong', legacy) == (False, None)
+
+    matches, new_hash = await verify_and_update_password('secret', legacy)
+    assert matches is True
+    assert new_hash is not None and new_hash.startswith('$2b$04$')
+    assert await verify_and_update_password('secret', new_hash) == (True, None)
+
+    stats = password_utils.get_password_hashing_stats()
+    assert stats['completed'] == 4
+    assert stats['waiting'] == 0
+
+
+async def test_login_storm_does_not_stall_unrelated_requests(monkeypatch):
+    """Нагрузочный тест: p99 постороннего запроса во время серии логинов."""
+    monkeypatch.setattr(password_utils, 'BCRYPT_ROUNDS', 10)
+    hasher = PasswordHasher(workers=2)
+    stored_hash = hash_password('secret')
+    storm_size = 6
+
+    async def run_storm(verify) -> list[float]:
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_measure_unrelated_endpoint(stop))
+        await asyncio.sleep(0.01)
+        await asyncio.gather(*(verify() for _ in range(storm_size)))
+        stop.set()
+        return await probe
+
+    async def blocking_verify() -> bool:
+        return password_utils.verify_password('secret', stored_hash)
+
+    async def offloaded_verify() -> bool:
+        return await hasher.verify('secret', stored_hash)
+
+    blocking_p99 = _p99(await run_storm(blocking_verify))
+    offloaded_p99 = _p99(await run_storm(offloaded_verify))
+    hasher.shutdown()
+
+    assert hasher.stats.completed == storm_size
+    assert hasher.stats.max_waiting >= storm_size - 2
+    assert offloaded_p99 < blocking_p99 / 2
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.cabinet.services.websocket_hub import CabinetWebSocketHub
+from app.config import settings
+
+
+class _Socket:
+    def __init__(self, gate: asyncio.Event | None = None, fail: bool = False) -> None:
+        self.sent: list[str] = []
+        self.gate = gate
+        self.fail = fail
+
+    async def send_text(self, data: str) -> None:
+        if self.fail:
+            raise RuntimeError('closed')
+        if self.gate is not None:
+            await self.gate.wait()
+        self.sent.append(data)
+
+
+class _Redis:
+    def __init__(self) -> None:
+        self.published: list[tuple[str, str]] = []
+
+    async def publish(self, channel: str, message: str) -> int:
+        self.published.append((channel, message))
+        return 1
+
+
+@pytest.fixture(autouse=True)
+def _settings(monkeypatch):
+    monkeypatch.setattr(settings, 'CABINET_WS_SEND_QUEUE_SIZE', 3)
+    monkeypatch.setattr(settings, 'CABINET_WS_REDIS_CHANNEL', 'cabinet:ws')
+
+
+async def _drain() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_slow_admin_does_not_delay_others_and_drops_oldest():
+    hub = CabinetWebSocketHub()
+    gate = asyncio.Event()
+    fast, slow, user = _Socket(), _Socket(gate), _Socket()
+    await hub.connect(fast, 1, True)
+    await hub.connect(slow, 2, True)
+    await hub.connect(user, 3, False)
+
+    for index in range(6):
+        await hub.send_to_admins({'type': 'ticket.new', 'ticket_id': index})
+        await _drain()
+
+    assert len(fast.sent) == 6 and not user.sent
+    # Первое сообщение ушло в писателя и ждёт сокет; из остальных в очереди остались три последних
+    stats = hub.get_stats()
+    assert (stats['dropped'], stats['queue_depth_max'], stats['admin_connections']) == (2, 3, 2)
+
+    gate.set()
+    await _drain()
+    assert [message[-2] for message in slow.sent] == ['0', '3', '4', '5']
+    # Сообщение сериализуется один раз, получатели делят одну строку
+    assert slow.sent[-1] is fast.sent[-1]
+
+    await hub.disconnect(slow, 2)
+    await hub.send_to_user(3, {'type': 'balance.topup', 'amount_kopeks': 100})
+    await _drain()
+    assert user.sent == ['{"type": "balance.topup", "amount_kopeks": 100}']
+    assert hub.get_stats()['connections'] == 2
+    await hub.disconnect(fast, 1)
+    await hub.disconnect(user, 3)
+
+
+async def test_failed_socket_is_unregistered():
+    hub = CabinetWebSocketHub()
+    broken = _Socket(fail=True)
+    await hub.connect(broken, 1, True)
+
+    await hub.send_to_admins({'type': 'ticket.new'})
+    await _drain()
+
+    stats = hub.get_stats()
+    assert (stats['connections'], stats['send_errors']) == (0, 1)
+    await hub.disconnect(broken, 1)
+
+
+async def test_messages_are_relayed_to_other_replicas():
+    first, second = CabinetWebSocketHub(), CabinetWebSocketHub()
+    redis_stub = _Redis()
+    first._redis, first._relay_ready = redis_stub, True
+    admin, user = _Socket(), _Socket()
+    await second.connect(admin, 10, True)
+    await second.connect(user, 11, False)
+
+    await first.send_to_admins({'type': 'ticket.new', 'title': 'Нет | доступа'})
+    await first.send_to_user(11, {'type': 'payment.received'})
+    assert [channel for channel, _ in redis_stub.published] == ['cabinet:ws', 'cabinet:ws']
+
+    for _, envelope in redis_stub.published:
+        # Своё сообщение реплика не доставляет повторно
+        first._handle_envelope(envelope)
+        second._handle_envelope(envelope.encode())
+    await _drain()
+
+    assert admin.sent == ['{"type": "ticket.new", "title": "Нет | доступа"}']
+    assert user.sent == ['{"type": "payment.received"}']
+    assert (first.get_stats()['relay_received'], second.get_stats()['relay_received']) == (0, 2)
+
+    await second.disconnect(admin, 10)
+    await second.disconnect(user, 11)
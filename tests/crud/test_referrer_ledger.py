@@ -0,0 +1,94 @@
+from sqlalchemy import create_engine, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.database import referrer_ledger
+from app.database.models import ReferralEarning, ReferrerLedger, Transaction, TransactionType, User
+from app.database.referrer_ledger import build_ledger_insert, ledger_matches_source, reconcile_stale_referrers
+
+
+def _ledger(session: Session) -> dict[int, tuple[int, int, int, int]]:
+    rows = session.execute(select(ReferrerLedger).execution_options(populate_existing=True)).scalars().all()
+    return {
+        row.referrer_id: (row.referrals_count, row.earnings_kopeks, row.rewards_kopeks, row.total_earned_kopeks)
+        for row in rows
+        if row.referrals_count or row.total_earned_kopeks
+    }
+
+
+def _rebuilt(session: Session) -> dict[int, tuple[int, int, int, int]]:
+    session.execute(delete(ReferrerLedger))
+    session.execute(build_ledger_insert())
+    return _ledger(session)
+
+
+def _user(user_id: int, referred_by_id: int | None = None) -> User:
+    return User(id=user_id, telegram_id=1000 + user_id, referral_code=f'ref{user_id}', referred_by_id=referred_by_id)
+
+
+def test_session_events_keep_ledger_equal_to_full_rebuild():
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all([_user(1), _user(2), _user(3, referred_by_id=1), _user(4, referred_by_id=1)])
+        session.flush()
+        session.add_all(
+            [
+                ReferralEarning(user_id=1, referral_id=3, amount_kopeks=5000, reason='first_topup'),
+                ReferralEarning(user_id=1, referral_id=4, amount_kopeks=2500, reason='commission'),
+                Transaction(user_id=2, type=TransactionType.REFERRAL_REWARD.value, amount_kopeks=10000),
+                Transaction(user_id=2, type=TransactionType.DEPOSIT.value, amount_kopeks=99900),
+            ]
+        )
+        session.flush()
+        assert _ledger(session) == {1: (2, 7500, 0, 7500), 2: (0, 0, 10000, 10000)}
+
+        # Смена реферера объектом и массовым update()
+        session.get(User, 4).referred_by_id = 2
+        session.flush()
+        session.execute(update(User).where(User.id == 3).values(referred_by_id=2))
+        session.execute(delete(ReferralEarning).where(ReferralEarning.amount_kopeks == 2500))
+        session.delete(session.get(User, 4))
+        session.flush()
+
+        incremental = _ledger(session)
+        assert incremental == {1: (0, 5000, 0, 5000), 2: (1, 0, 10000, 10000)}
+        assert incremental == _rebuilt(session)
+
+
+def test_failed_ledger_update_is_reconciled_after_commit(monkeypatch):
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine)
+    monkeypatch.setattr(referrer_ledger, '_stale_referrers', set())
+
+    def broken_apply(connection, deltas):
+        raise RuntimeError('lock timeout')
+
+    with Session(engine) as session:
+        session.add_all([_user(1), _user(2)])
+        session.commit()
+
+        with monkeypatch.context() as patch:
+            patch.setattr(referrer_ledger, '_apply_deltas', broken_apply)
+            session.add(_user(3, referred_by_id=1))
+            session.flush()
+            session.rollback()
+            # Откат уносит и данные, и пропущенную дельту
+            assert referrer_ledger._stale_referrers == set()
+
+            session.add(_user(4, referred_by_id=2))
+            session.commit()
+
+        assert referrer_ledger._stale_referrers == {2}
+        assert _ledger(session) == {}
+        assert not ledger_matches_source(session)
+
+        assert reconcile_stale_referrers(session) == 1
+        session.rollback()
+        assert referrer_ledger._stale_referrers == {2}
+
+        assert reconcile_stale_referrers(session) == 1
+        session.commit()
+        assert referrer_ledger._stale_referrers == set()
+        assert _ledger(session) == {2: (1, 0, 0, 0)}
+        assert ledger_matches_source(session)
@@ -0,0 +1,144 @@
+"""Тесты снимка пользователя в AuthMiddleware: загрузка по флагу, пропуск БД и сброс после коммитов."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram.types import CallbackQuery, User as TgUser
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import Subscription, User, UserStatus
+from app.middlewares import auth
+from app.services.user_identity_cache import user_identity_cache
+
+
+TELEGRAM_ID = 2002
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.commit = AsyncMock()
+        self.rollback = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    user_identity_cache.clear()
+    monkeypatch.setattr(settings, 'AUTH_IDENTITY_CACHE_TTL', 300)
+    monkeypatch.setattr(settings, 'AUTH_LAST_ACTIVITY_UPDATE_INTERVAL', 60)
+    monkeypatch.setattr(CallbackQuery, 'answer', AsyncMock())
+    monkeypatch.setattr(auth, 'AsyncSessionLocal', _Session)
+    yield
+    user_identity_cache.clear()
+
+
+def _user(status: str = UserStatus.ACTIVE.value, last_activity: datetime | None = None) -> User:
+    return User(
+        id=1,
+        telegram_id=TELEGRAM_ID,
+        status=status,
+        language='en',
+        first_name='A',
+        last_activity=last_activity,
+    )
+
+
+def _loaders(monkeypatch, user: User) -> tuple[AsyncMock, AsyncMock]:
+    full, light = AsyncMock(return_value=user), AsyncMock(return_value=user)
+    monkeypatch.setattr(auth, 'get_user_by_telegram_id', full)
+    monkeypatch.setattr(auth, 'get_user_identity_by_telegram_id', light)
+    return full, light
+
+
+async def _dispatch(light: bool = False) -> SimpleNamespace:
+    seen = SimpleNamespace(calls=0, data=None)
+
+    async def handler(event, data):
+        seen.calls += 1
+        seen.data = data
+
+    callback = CallbackQuery(
+        id='1',
+        from_user=TgUser(id=TELEGRAM_ID, is_bot=False, first_name='A'),
+        chat_instance='c',
+        data='noop',
+    )
+    data = {'handler': SimpleNamespace(flags={'light_user': True} if light else {})}
+    await auth.AuthMiddleware()(handler, callback, data)
+    return seen
+
+
+async def test_light_flag_selects_loader_and_activity_is_throttled(monkeypatch):
+    recent = datetime.utcnow() - timedelta(seconds=5)
+    user = _user(last_activity=recent)
+    full, light = _loaders(monkeypatch, user)
+
+    seen = await _dispatch(light=True)
+    assert (full.await_count, light.await_count, seen.calls) == (0, 1, 1)
+    assert seen.data['db_user'] is user and seen.data['user_identity'].language == 'en'
+    # Активность записана недавно — лишнего UPDATE нет
+    assert user.last_activity == recent
+
+    user.last_activity = datetime.utcnow() - timedelta(minutes=5)
+    await _dispatch()
+    assert (full.await_count, light.await_count) == (1, 1)
+    assert datetime.utcnow() - user.last_activity < timedelta(seconds=5)
+
+
+async def test_blocked_and_deleted_snapshots_skip_user_load(monkeypatch):
+    full, _ = _loaders(monkeypatch, _user(status=UserStatus.BLOCKED.value))
+
+    assert (await _dispatch()).calls == 0
+    assert (await _dispatch()).calls == 0
+    assert full.await_count == 1
+    assert CallbackQuery.answer.await_count == 2
+
+    user_identity_cache.clear()
+    hits = user_identity_cache.get_stats()['hits']
+    full, _ = _loaders(monkeypatch, _user(status=UserStatus.DELETED.value))
+    await _dispatch()
+    await _dispatch()
+    assert full.await_count == 1
+    assert user_identity_cache.get_stats()['hits'] == hits + 1
+
+
+def test_committed_user_changes_drop_snapshots():
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all([User(id=1, telegram_id=1001, referral_code='r1'), User(id=2, telegram_id=1002)])
+        session.add(Subscription(user_id=2, end_date=datetime.utcnow() + timedelta(days=30)))
+        session.commit()
+        first, second = session.get(User, 1), session.get(User, 2)
+        user_identity_cache.store(first)
+        user_identity_cache.store(second)
+
+        # Активность, профиль и подписка на снимок не влияют
+        first.last_activity = datetime.utcnow()
+        first.username = 'renamed'
+        second.subscription.status = 'expired'
+        session.commit()
+        assert user_identity_cache.get(1001) is not None
+        assert user_identity_cache.get(1002) is not None
+
+        first.status = UserStatus.BLOCKED.value
+        session.flush()
+        session.rollback()
+        assert user_identity_cache.get(1001) is not None
+
+        first.language = 'en'
+        second.status = UserStatus.BLOCKED.value
+        invalidations = user_identity_cache.get_stats()['invalidations']
+        session.commit()
+        assert (user_identity_cache.get(1001), user_identity_cache.get(1002)) == (None, None)
+        assert user_identity_cache.get_stats()['invalidations'] == invalidations + 2
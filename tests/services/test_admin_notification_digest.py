@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services import admin_notification_digest as digest_module
+from app.services.admin_notification_digest import AdminNotificationDigest, DigestEvent
+from app.services.admin_notification_service import AdminNotificationService
+
+
+class _RecordingBot:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.sent: list[dict] = []
+        self.delay = delay
+
+    async def send_message(self, **kwargs):
+        await asyncio.sleep(self.delay)
+        self.sent.append(kwargs)
+
+
+def _kwargs(text: str, thread_id: int | None = 5) -> dict:
+    kwargs = {'chat_id': '-100', 'text': text, 'parse_mode': 'HTML', 'disable_web_page_preview': True}
+    if thread_id:
+        kwargs['message_thread_id'] = thread_id
+    return kwargs
+
+
+def _enable(monkeypatch, window: int = 60, urgent: int = 0) -> None:
+    monkeypatch.setattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_ENABLED', True, raising=False)
+    monkeypatch.setattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_WINDOW_SECONDS', window, raising=False)
+    monkeypatch.setattr(settings, 'ADMIN_NOTIFICATIONS_DIGEST_URGENT_AMOUNT_KOPEKS', urgent, raising=False)
+
+
+async def test_events_are_aggregated_per_type_and_topic(monkeypatch):
+    _enable(monkeypatch)
+    monkeypatch.setattr(digest_module, 'DIGEST_MAX_ITEMS_PER_TYPE', 2)
+    digest = AdminNotificationDigest()
+    bot = _RecordingBot()
+
+    for index in range(3):
+        digest.add(bot, _kwargs(f'purchase {index}'), DigestEvent('purchase', f'user {index}', 10000))
+    digest.add(bot, _kwargs('topup'), DigestEvent('balance_topup', 'user 9', 5000))
+    digest.add(bot, _kwargs('visit', thread_id=7), DigestEvent('campaign_visit', 'promo: user'))
+    assert bot.sent == []
+
+    await digest.stop()
+
+    assert len(bot.sent) == 2
+    summary, single = bot.sent
+    assert summary['message_thread_id'] == 5
+    assert '💎 Покупки подписок: <b>3</b>' in summary['text']
+    assert settings.format_price(30000) in summary['text']
+    assert '• user 0\n• user 1\n… и ещё 1' in summary['text']
+    assert '💰 Пополнения баланса: <b>1</b>' in summary['text']
+    # Одиночное событие за окно отправляется как обычное уведомление
+    assert single == _kwargs('visit', thread_id=7)
+    assert digest.get_stats()['digests_sent'] == 1
+
+
+async def test_urgent_events_are_sent_without_waiting_for_window(monkeypatch):
+    _enable(monkeypatch, window=3600, urgent=100000)
+    digest = AdminNotificationDigest()
+    bot = _RecordingBot()
+
+    digest.add(bot, _kwargs('small'), DigestEvent('purchase', 'user 1', 9900))
+    digest.add(bot, _kwargs('large'), DigestEvent('purchase', 'user 2', 250000))
+    await asyncio.sleep(0.01)
+
+    assert [message['text'] for message in bot.sent] == ['large']
+    await digest.stop()
+    assert [message['text'] for message in bot.sent] == ['large', 'small']
+
+
+def test_long_digest_is_split_under_telegram_limit():
+    digest = AdminNotificationDigest()
+    buckets = {}
+    for index in range(40):
+        bucket = digest_module.DigestBucket()
+        for _ in range(2):
+            bucket.add(DigestEvent(f'type_{index}', 'x' * 200, 100), 'text')
+        buckets[f'type_{index}'] = bucket
+
+    texts = digest.build_digest_texts(buckets)
+
+    assert len(texts) > 1
+    assert all(len(text) <= digest_module.DIGEST_MAX_MESSAGE_LENGTH for text in texts)
+
+
+async def test_service_does_not_await_telegram_in_digest_mode(monkeypatch):
+    _enable(monkeypatch, window=3600)
+    digest = AdminNotificationDigest()
+    monkeypatch.setattr('app.services.admin_notification_service.admin_notification_digest', digest)
+    bot = _RecordingBot(delay=10)
+    service = AdminNotificationService(bot)
+    service.chat_id = '-100'
+    service.topic_id = 5
+
+    assert await asyncio.wait_for(
+        service._send_message('purchase', digest=DigestEvent('purchase', 'user', 100)), timeout=0.5
+    )
+    assert digest.get_stats()['buffered_events'] == 1
+
+    # Уведомления без типа (техработы, тикеты) отправляются напрямую, как раньше
+    direct_bot = SimpleNamespace(sent=[])
+
+    async def send_message(**kwargs):
+        direct_bot.sent.append(kwargs)
+
+    direct_bot.send_message = send_message
+    service.bot = direct_bot
+    assert await service._send_message('maintenance')
+    assert direct_bot.sent == [_kwargs('maintenance')]
+
+    digest._flush_task.cancel()
@@ -0,0 +1,106 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import Base, PromoGroup, ReferralEarning, ReferrerLedger, Transaction, User
+from app.services import backup_service as backup_module
+from app.services.backup_service import BackupService
+
+
+class _AsyncSessionAdapter:
+    """Асинхронный интерфейс AsyncSession поверх синхронной сессии SQLite."""
+
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    def get_bind(self):
+        return self.session.get_bind()
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def stream(self, statement):
+        rows = self.session.execute(statement).all()
+        size = statement.get_execution_options().get('yield_per')
+
+        class _Result:
+            async def partitions(self):
+                for start in range(0, len(rows), size):
+                    yield rows[start : start + size]
+
+        return _Result()
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        with self.session.begin_nested():
+            yield
+
+    async def flush(self):
+        self.session.flush()
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _database() -> Session:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+async def test_orm_dump_round_trip_in_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'BACKUP_LOCATION', str(tmp_path / 'backups'))
+    monkeypatch.setattr(backup_module, 'BACKUP_CHUNK_SIZE', 3)
+
+    source = _database()
+    source.add(PromoGroup(id=1, name='Base'))
+    source.add_all(
+        [
+            User(id=index, telegram_id=1000 + index, referral_code=f'ref{index}', referred_by_id=index - 1 or None)
+            for index in range(1, 8)
+        ]
+    )
+    source.flush()
+    source.add_all(
+        [
+            ReferralEarning(user_id=1, referral_id=2, amount_kopeks=1500, reason='first_topup'),
+            Transaction(user_id=3, type='deposit', amount_kopeks=9900, created_at=datetime(2026, 1, 2, 3, 4, 5)),
+        ]
+    )
+    source.commit()
+
+    service = BackupService()
+    monkeypatch.setattr(backup_module, 'AsyncSessionLocal', lambda: _AsyncSessionAdapter(source))
+    info = await service._dump_postgres_json(tmp_path / 'staging', include_logs=False)
+
+    assert info['format'] == 'jsonl'
+    tables = {table['name']: table for table in info['tables']}
+    assert tables['users']['rows'] == 7
+    assert (tmp_path / 'staging' / 'database' / 'users.jsonl').read_text().count('\n') == 7
+
+    target = _database()
+    monkeypatch.setattr(backup_module, 'AsyncSessionLocal', lambda: _AsyncSessionAdapter(target))
+    await service._restore_postgres_jsonl(tmp_path / 'staging' / 'database', info, clear_existing=False)
+
+    users = target.execute(select(User.id, User.referred_by_id).order_by(User.id)).all()
+    assert users == [(index, index - 1 or None) for index in range(1, 8)]
+    transaction = target.execute(select(Transaction)).scalar_one()
+    assert (transaction.amount_kopeks, transaction.created_at) == (9900, datetime(2026, 1, 2, 3, 4, 5))
+    ledger = target.execute(select(ReferrerLedger).where(ReferrerLedger.referrer_id == 1)).scalar_one()
+    assert (ledger.referrals_count, ledger.earnings_kopeks) == (1, 1500)
+
+    # Повторное восстановление поверх тех же данных обновляет записи, а не дублирует их
+    await service._restore_postgres_jsonl(tmp_path / 'staging' / 'database', info, clear_existing=False)
+    assert target.execute(select(User.id)).all() == [(index,) for index in range(1, 8)]
@@ -0,0 +1,109 @@
+import random
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+from app.database.models import Base, CurrencyRate
+from app.services.currency_rate_service import CurrencyRateService, CurrencyRateTable
+from app.utils.currency_converter import currency_converter
+from app.utils.money import convert_minor_with_rate
+
+
+class _AsyncSessionAdapter:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+        self.queries = 0
+
+    async def execute(self, *args, **kwargs):
+        self.queries += 1
+        return self.session.execute(*args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_rates(monkeypatch):
+    monkeypatch.setattr(CurrencyRateService, '_table', None)
+    monkeypatch.setattr(CurrencyRateService, '_admin_rates', {})
+    monkeypatch.setattr(CurrencyRateService, '_listeners', [])
+    monkeypatch.setattr(CurrencyRateService, '_reload_lock', None)
+    monkeypatch.setattr(currency_converter, '_cache', {})
+
+
+def test_table_derives_inverse_and_cross_rates_with_admin_priority():
+    table = CurrencyRateTable.build(
+        {('EUR', 'RUB'): Decimal(100), ('RUB', 'IRR'): Decimal(500), ('USD', 'RUB'): Decimal(92)},
+        {('USD', 'RUB'): Decimal(90), ('USD', 'EUR'): Decimal('0.95')},
+    )
+
+    assert table.lookup('USD', 'RUB') == 92
+    assert table.lookup('RUB', 'EUR') == Decimal('0.01')
+    # Рыночный курс используется, если админ не задал пару и её нельзя получить инверсией
+    assert table.lookup('USD', 'EUR') == Decimal('0.95')
+    assert table.lookup('EUR', 'IRR') == 50000
+    # Два звена: EUR -> RUB -> IRR -> TMN
+    assert table.lookup('EUR', 'TMN') == 5000
+    assert table.lookup('IRR', 'TMN') == Decimal('0.1')
+    assert table.lookup('GBP', 'RUB') is None
+    with pytest.raises(TypeError):
+        table.rates['GBP', 'RUB'] = Decimal(1)
+
+
+async def test_convert_many_matches_per_amount_conversion(monkeypatch):
+    table = CurrencyRateTable.build(
+        {('USD', 'RUB'): Decimal('91.37'), ('RUB', 'IRR'): Decimal('512.3')},
+        {},
+    )
+    monkeypatch.setattr(CurrencyRateService, '_table', table)
+    rng = random.Random(5)
+    amounts = [(rng.randint(0, 10**7), rng.choice(['USD', 'rub', 'IRR', 'TMN', None])) for _ in range(2000)]
+
+    converted = await CurrencyRateService.convert_many(None, amounts, to_currency='usd')
+
+    expected = [
+        convert_minor_with_rate(
+            amount,
+            from_currency=currency,
+            to_currency='USD',
+            rate=table.lookup((currency or 'RUB').upper(), 'USD'),
+        )
+        for amount, currency in amounts
+    ]
+    assert converted == expected
+    with pytest.raises(ValueError):
+        await CurrencyRateService.convert_many(None, [(100, 'GBP')], to_currency='RUB')
+
+
+async def test_reload_serves_from_memory_and_notifies_only_on_change():
+    session = Session(create_engine('sqlite://'))
+    Base.metadata.create_all(session.get_bind())
+    session.add_all(
+        [
+            CurrencyRate(from_currency='USD', to_currency='RUB', rate=90.0, is_active=True),
+            CurrencyRate(from_currency='EUR', to_currency='RUB', rate=100.0, is_active=False),
+        ]
+    )
+    session.commit()
+    db = _AsyncSessionAdapter(session)
+    updates = []
+    CurrencyRateService.subscribe(lambda table, previous: updates.append((table.version, previous)))
+
+    for _ in range(50):
+        assert await CurrencyRateService.get_rate(db, from_currency='RUB', to_currency='USD') == Decimal(1) / 90
+    assert db.queries == 1
+    with pytest.raises(ValueError):
+        await CurrencyRateService.convert_minor(db, amount_minor=100, from_currency='EUR', to_currency='RUB')
+    assert updates == [(1, None)]
+
+    await CurrencyRateService.reload(db)
+    assert len(updates) == 1
+
+    session.execute(delete(CurrencyRate))
+    session.add(CurrencyRate(from_currency='EUR', to_currency='RUB', rate=100.0, is_active=True))
+    session.commit()
+    table = await CurrencyRateService.reload(db)
+    assert [version for version, _ in updates] == [1, 2]
+    assert table.lookup('USD', 'RUB') is None
+    assert (
+        await CurrencyRateService.convert_minor(db, amount_minor=150, from_currency='EUR', to_currency='RUB') == 15000
+    )
@@ -0,0 +1,151 @@
+from types import SimpleNamespace
+
+from app.config import settings
+from app.database.models import TransactionType
+from app.services import daily_subscription_service as daily_module
+from app.services.daily_subscription_service import DailyChargeOutcome, DailySubscriptionService
+
+
+class _Session:
+    def __init__(self) -> None:
+        self.commits = 0
+
+    async def commit(self) -> None:
+        self.commits += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+
+def _plan(subscription_id: int, user_id: int, price: int) -> SimpleNamespace:
+    return SimpleNamespace(id=subscription_id, user_id=user_id, tariff_name='Daily', daily_price_kopeks=price)
+
+
+def _user_row(user_id: int, balance: int, currency: str = 'RUB') -> SimpleNamespace:
+    return SimpleNamespace(
+        id=user_id,
+        telegram_id=user_id * 100,
+        email=None,
+        email_verified=False,
+        language='ru',
+        balance_kopeks=balance,
+        balance_currency=currency,
+    )
+
+
+def _outcome(subscription_id: int) -> DailyChargeOutcome:
+    return DailyChargeOutcome.from_row(subscription_id, _user_row(subscription_id, 0), 100)
+
+
+async def test_charge_batch_charges_and_suspends_with_single_commit(monkeypatch):
+    monkeypatch.setattr(settings, 'DEFAULT_BALANCE_CURRENCY', 'RUB')
+    plans = [_plan(1, 10, 500), _plan(2, 20, 500), _plan(3, 30, 0), _plan(4, 40, 500)]
+    calls = {}
+
+    async def fake_lock(db, subscription_ids, now):
+        calls['locked'] = subscription_ids
+        return plans
+
+    async def fake_debit(db, charges, currency, now):
+        calls['debit'] = (charges, currency)
+        return {10: _user_row(10, 500)}
+
+    async def fake_balances(db, user_ids):
+        calls['balances'] = user_ids
+        return {20: _user_row(20, 100), 40: _user_row(40, 1000, 'USD')}
+
+    async def fake_extend(db, subscription_ids, now):
+        calls['extended'] = subscription_ids
+
+    async def fake_suspend(db, subscription_ids):
+        calls['suspended'] = subscription_ids
+
+    async def fake_add_transactions(db, entries):
+        calls['entries'] = [(entry.user_id, entry.type, entry.currency) for entry in entries]
+        return [SimpleNamespace(user_id=entry.user_id) for entry in entries]
+
+    async def fake_hooks(db, transaction):
+        calls.setdefault('hooked', []).append(transaction.user_id)
+
+    monkeypatch.setattr(daily_module, 'lock_daily_subscriptions_for_charge', fake_lock)
+    monkeypatch.setattr(daily_module, 'debit_user_balances', fake_debit)
+    monkeypatch.setattr(daily_module, 'get_user_balances', fake_balances)
+    monkeypatch.setattr(daily_module, 'extend_daily_subscriptions', fake_extend)
+    monkeypatch.setattr(daily_module, 'suspend_daily_subscriptions', fake_suspend)
+    monkeypatch.setattr(daily_module, 'add_transactions_batch', fake_add_transactions)
+    monkeypatch.setattr(daily_module, 'run_transaction_hooks', fake_hooks)
+
+    session = _Session()
+    charged, suspended, errors = await DailySubscriptionService()._charge_batch(session, [1, 2, 3, 4])
+
+    assert session.commits == 1
+    # Нулевая цена и несовпадение валюты баланса — ошибки, а не приостановка
+    assert errors == 2
+    assert calls['debit'] == ({10: 500, 20: 500, 40: 500}, 'RUB')
+    assert calls['balances'] == [20, 40]
+    assert (calls['extended'], calls['suspended']) == ([1], [2])
+    assert [(outcome.subscription_id, outcome.balance_kopeks) for outcome in charged] == [(1, 500)]
+    assert [(outcome.subscription_id, outcome.balance_kopeks) for outcome in suspended] == [(2, 100)]
+    assert calls['entries'] == [(10, TransactionType.SUBSCRIPTION_PAYMENT, 'RUB')]
+    assert calls['hooked'] == [10]
+
+
+async def test_failed_batch_does_not_affect_other_batches(monkeypatch):
+    service = DailySubscriptionService()
+    sessions = []
+    synced = []
+
+    def session_factory():
+        sessions.append(_Session())
+        return sessions[-1]
+
+    async def fake_ids(db):
+        return [1, 2, 3, 4, 5]
+
+    async def fake_charge_batch(db, subscription_ids):
+        if 3 in subscription_ids:
+            raise RuntimeError('deadlock detected')
+        return [_outcome(subscription_id) for subscription_id in subscription_ids], [], 0
+
+    async def fake_sync(charged):
+        synced.extend(outcome.subscription_id for outcome in charged)
+
+    monkeypatch.setattr(daily_module, 'DAILY_CHARGE_BATCH_SIZE', 2)
+    monkeypatch.setattr(daily_module, 'AsyncSessionLocal', session_factory)
+    monkeypatch.setattr(daily_module, 'get_daily_subscription_ids_for_charge', fake_ids)
+    monkeypatch.setattr(service, '_charge_batch', fake_charge_batch)
+    monkeypatch.setattr(service, '_sync_panel', fake_sync)
+
+    stats = await service.process_daily_charges()
+
+    # Выборка и каждая пачка — в своей сессии
+    assert len(sessions) == 4
+    assert (stats['checked'], stats['charged'], stats['errors']) == (5, 3, 2)
+    assert synced == [1, 2, 5]
+
+
+async def test_notifications_are_rate_limited(monkeypatch):
+    service = DailySubscriptionService()
+    sleeps = []
+    sent = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    async def fake_notify_charge(user, subscription_id, amount):
+        sent.append(('charge', subscription_id, user.telegram_id))
+
+    async def fake_notify_insufficient(user, subscription_id, amount):
+        sent.append(('insufficient', subscription_id, user.telegram_id))
+
+    monkeypatch.setattr(daily_module.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(service, '_notify_daily_charge', fake_notify_charge)
+    monkeypatch.setattr(service, '_notify_insufficient_balance', fake_notify_insufficient)
+
+    await service._send_notifications([_outcome(1), _outcome(2)], [_outcome(3)])
+
+    assert sent == [('charge', 1, 100), ('charge', 2, 200), ('insufficient', 3, 300)]
+    assert sleeps == [1 / daily_module.NOTIFICATION_RATE_PER_SECOND] * 2
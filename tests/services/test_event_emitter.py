@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.services import event_emitter as event_emitter_module, webhook_service as webhook_module
+from app.services.event_emitter import EventEmitter
+from app.services.webhook_service import DeliveryResult, WebhookService
+
+
+class _SlowWebSocket:
+    def __init__(self) -> None:
+        self.release = asyncio.Event()
+        self.sent: list[str] = []
+        self.closed_with: int | None = None
+
+    async def send_text(self, message: str) -> None:
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int, reason: str) -> None:
+        self.closed_with = code
+
+
+async def test_emit_does_not_wait_for_slow_websocket(monkeypatch):
+    monkeypatch.setattr(event_emitter_module, 'WEBSOCKET_QUEUE_MAX_SIZE', 2)
+    emitter = EventEmitter()
+    slow = _SlowWebSocket()
+    fast = _SlowWebSocket()
+    fast.release.set()
+    emitter.register_websocket(slow)
+    emitter.register_websocket(fast)
+
+    for index in range(2):
+        await asyncio.wait_for(emitter.emit('ticket.created', {'id': index}), timeout=0.5)
+    await asyncio.sleep(0)
+
+    assert len(fast.sent) == 2
+    assert slow.sent == []
+
+    # Очередь медленного клиента переполнена — он отключается, остальные продолжают получать события
+    await emitter.emit('ticket.created', {'id': 2})
+    await emitter.emit('ticket.created', {'id': 3})
+    await asyncio.sleep(0)
+
+    stats = emitter.get_stats()
+    assert stats['slow_consumers_disconnected'] == 1
+    assert len(stats['websocket_subscribers']) == 1
+    assert slow.closed_with == 1013
+    await asyncio.sleep(0)
+    assert event_emitter_module._close_tasks == set()
+    assert len(fast.sent) == 4
+    emitter.unregister_websocket(fast)
+
+
+async def test_webhook_worker_batches_lookups_and_retries(monkeypatch):
+    service = WebhookService()
+    webhook = SimpleNamespace(id=7, url='https://example.com/hook', secret=None)
+    lookups: list[str] = []
+    attempts: list[int] = []
+    recorded: list[DeliveryResult] = []
+
+    @asynccontextmanager
+    async def fake_session():
+        yield object()
+
+    async def fake_get_webhooks(db, event_type):
+        lookups.append(event_type)
+        return [webhook]
+
+    async def fake_deliver(hook, event_type, payload):
+        attempts.append(payload['id'])
+        status = 'failed' if len(attempts) == 1 else 'success'
+        return DeliveryResult(webhook=hook, event_type=event_type, payload=payload, status=status)
+
+    async def fake_record(db, result):
+        recorded.append(result)
+
+    monkeypatch.setattr(webhook_module, 'AsyncSessionLocal', fake_session)
+    monkeypatch.setattr(webhook_module, 'get_active_webhooks_for_event', fake_get_webhooks)
+    monkeypatch.setattr(webhook_module, 'WEBHOOK_RETRY_BASE_DELAY', 0)
+    monkeypatch.setattr(service, '_deliver_webhook_http', fake_deliver)
+    monkeypatch.setattr(service, '_record_result', fake_record)
+
+    for index in range(3):
+        assert service.enqueue('user.created', {'id': index})
+
+    await service.stop()
+
+    assert lookups == ['user.created']
+    assert sorted(result.payload['id'] for result in recorded) == [0, 1, 2]
+    assert all(result.status == 'success' for result in recorded)
+    assert max(result.attempt_number for result in recorded) == 2
+
+    stats = service.get_stats()['webhooks'][7]
+    assert stats['delivered'] == 3
+    assert stats['retries'] == 1
@@ -1,10 +1,13 @@
 """Тесты для MenuLayoutService."""
 
+import random
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
 from aiogram.types import InlineKeyboardButton
 
+from app.localization.texts import get_texts
 from app.services.menu_layout.context import MenuContext
 from app.services.menu_layout.service import MenuLayoutService
 
@@ -137,3 +140,111 @@ async def test_build_button_connect_direct_mode_fallback_to_callback():
         assert isinstance(button, InlineKeyboardButton)
         # Должен fallback на callback_data, так как URL не найден
         assert button.callback_data == 'subscription_connect'
+
+
+def _legacy_keyboard(config: dict, context: MenuContext) -> list[list[InlineKeyboardButton]]:
+    """Построение меню обходом конфигурации, как до появления скомпилированного плана."""
+    texts = get_texts(context.language)
+    rows = []
+    for row_config in config.get('rows', []):
+        if not MenuLayoutService._evaluate_conditions(row_config.get('conditions'), context):
+            continue
+        row_buttons = []
+        for button_id in row_config.get('buttons', []):
+            button_cfg = config['buttons'].get(button_id)
+            if (
+                button_cfg is None
+                or not button_cfg.get('enabled', True)
+                or not MenuLayoutService._check_visibility(button_cfg.get('visibility', 'all'), context)
+                or not MenuLayoutService._evaluate_conditions(button_cfg.get('conditions'), context)
+            ):
+                continue
+            button = MenuLayoutService._build_button(button_cfg, context, texts, button_id=button_id)
+            if button:
+                row_buttons.append(button)
+        max_per_row = row_config.get('max_per_row', 2)
+        rows.extend(row_buttons[i : i + max_per_row] for i in range(0, len(row_buttons), max_per_row))
+    return rows
+
+
+def _config_with_custom_buttons() -> dict:
+    config = MenuLayoutService.get_default_config()
+    config['buttons']['custom_balance'] = {
+        'type': 'callback',
+        'text': {'ru': 'Баланс {balance}, {username}', 'en': '{traffic_left} left of {subscription_days}d'},
+        'icon': '💰',
+        'action': 'menu_balance',
+        'dynamic_text': True,
+        'visibility': 'subscribers',
+        'conditions': {'min_balance_kopeks': 100, 'exclude_promo_group_ids': ['7']},
+    }
+    config['buttons']['custom_site'] = {
+        'type': 'url',
+        'text': {'en': 'Site'},
+        'action': 'https://example.com',
+        'conditions': {'max_registration_days': 30, 'has_referrals': True, 'promo_group_ids': ['1', '2']},
+    }
+    config['rows'].insert(
+        0,
+        {
+            'id': 'custom',
+            'buttons': ['custom_balance', 'custom_site', 'missing'],
+            'conditions': {'max_subscription_days_left': 60},
+            'max_per_row': 1,
+        },
+    )
+    return config
+
+
+async def test_compiled_plan_matches_config_walk(monkeypatch):
+    """Тест: скомпилированный план строит то же меню, что и обход конфигурации."""
+    monkeypatch.setattr(MenuLayoutService, '_cache', _config_with_custom_buttons())
+    monkeypatch.setattr(MenuLayoutService, '_plan', None)
+    rng = random.Random(3)
+    dynamic_rendered = 0
+
+    for _ in range(300):
+        subscription = SimpleNamespace(traffic_limit_gb=rng.choice([0, 50]), is_trial=rng.random() < 0.3)
+        context = MenuContext(
+            language=rng.choice(['ru', 'en', 'fa']),
+            is_admin=rng.random() < 0.2,
+            is_moderator=rng.random() < 0.2,
+            has_active_subscription=rng.random() < 0.6,
+            subscription_is_active=rng.random() < 0.6,
+            has_had_paid_subscription=rng.random() < 0.5,
+            balance_kopeks=rng.randint(0, 500),
+            subscription=subscription if rng.random() < 0.7 else None,
+            has_saved_cart=rng.random() < 0.2,
+            username=rng.choice(['', 'alice', '{balance}']),
+            subscription_days=rng.randint(0, 90),
+            traffic_left_gb=rng.random() * 100,
+            referral_count=rng.randint(0, 2),
+            registration_days=rng.randint(0, 60),
+            promo_group_id=rng.choice([None, '1', '7']),
+            has_autopay=rng.random() < 0.5,
+        )
+        if context.username == '{balance}':
+            # Подстановка больше не применяется повторно к значению плейсхолдера
+            context.username = 'bob'
+
+        markup = await MenuLayoutService.build_keyboard(None, context)
+        assert markup.inline_keyboard == _legacy_keyboard(MenuLayoutService._cache, context)
+        dynamic_rendered += any(
+            button.callback_data == 'menu_balance' for row in markup.inline_keyboard for button in row
+        )
+
+    assert dynamic_rendered > 10
+
+
+async def test_plan_is_reused_until_config_changes(monkeypatch):
+    """Тест: план компилируется один раз и сбрасывается вместе с кешем конфигурации."""
+    monkeypatch.setattr(MenuLayoutService, '_cache', MenuLayoutService.get_default_config())
+    monkeypatch.setattr(MenuLayoutService, '_plan', None)
+
+    plan = await MenuLayoutService.get_plan(None)
+    assert await MenuLayoutService.get_plan(None) is plan
+
+    MenuLayoutService.invalidate_cache()
+    assert MenuLayoutService._plan is None
+    MenuLayoutService._cache = _config_with_custom_buttons()
+    assert await MenuLayoutService.get_plan(None) is not plan
@@ -17,7 +17,9 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from app.config import settings
+from app.services import mulenpay_service as mulenpay_module
 from app.services.mulenpay_service import MulenPayService
+from app.utils.http_clients import HttpClientRegistry
 
 
 class _DummyResponse:
@@ -43,6 +45,9 @@ class _DummyResponse:
     async def text(self) -> str:
         return self._body
 
+    def release(self) -> None:
+        return None
+
 
 class _DummySession:
     def __init__(self, result: Any) -> None:
@@ -54,7 +59,7 @@ class _DummySession:
     async def __aexit__(self, exc_type, exc, tb) -> bool:  # pragma: no cover - interface
         return False
 
-    def request(self, *args: Any, **kwargs: Any) -> Any:
+    async def request(self, *args: Any, **kwargs: Any) -> Any:
         if isinstance(self._result, BaseException):
             raise self._result
         return self._result
@@ -71,6 +76,12 @@ def _session_factory(responses: Sequence[Any]) -> Any:
     return _factory
 
 
+def _patch_session(monkeypatch: pytest.MonkeyPatch, responses: Sequence[Any]) -> None:
+    registry = HttpClientRegistry()
+    monkeypatch.setattr(registry, 'session', _session_factory(responses))
+    monkeypatch.setattr(mulenpay_module, 'http_clients', registry)
+
+
 @pytest.fixture
 def anyio_backend() -> str:
     return 'asyncio'
@@ -168,13 +179,11 @@ async def test_request_success(monkeypatch: pytest.MonkeyPatch) -> None:
     service = MulenPayService()
 
     response_payload = {'ok': True}
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory(
-            [
-                _DummyResponse(status=200, body=json.dumps(response_payload)),
-            ]
-        ),
+    _patch_session(
+        monkeypatch,
+        [
+            _DummyResponse(status=200, body=json.dumps(response_payload)),
+        ],
     )
 
     result = await service._request('GET', '/ping')
@@ -197,14 +206,12 @@ async def test_request_retries_on_server_error(monkeypatch: pytest.MonkeyPatch)
         fake_sleep,
     )
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory(
-            [
-                _DummyResponse(status=502, body='{"error": "bad gateway"}'),
-                _DummyResponse(status=200, body='{"ok": true}'),
-            ]
-        ),
+    _patch_session(
+        monkeypatch,
+        [
+            _DummyResponse(status=502, body='{"error": "bad gateway"}'),
+            _DummyResponse(status=200, body='{"ok": true}'),
+        ],
     )
 
     result = await service._request('GET', '/retry')
@@ -226,10 +233,7 @@ async def test_request_returns_none_after_timeouts(monkeypatch: pytest.MonkeyPat
         fake_sleep,
     )
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory([TimeoutError()]),
-    )
+    _patch_session(monkeypatch, [TimeoutError()])
 
     result = await service._request('GET', '/timeout')
     assert result is None
@@ -240,10 +244,7 @@ async def test_request_reraises_cancelled(monkeypatch: pytest.MonkeyPatch) -> No
     _enable_service(monkeypatch)
     service = MulenPayService()
 
-    monkeypatch.setattr(
-        'app.services.mulenpay_service.aiohttp.ClientSession',
-        _session_factory([asyncio.CancelledError()]),
-    )
+    _patch_session(monkeypatch, [asyncio.CancelledError()])
 
     with pytest.raises(asyncio.CancelledError):
         await service._request('GET', '/cancel')
@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config import settings
+from app.services import nalogo_queue_service as queue_module
+from app.services.nalogo_queue_service import NalogoQueueService
+
+
+class _ReliableQueueNalogo:
+    """NaloGoService с очередью в памяти и той же семантикой claim/ack/requeue, что в Redis."""
+
+    configured = True
+
+    def __init__(self, count: int, fail: bool = False) -> None:
+        self.queue = [
+            json.dumps({'payment_id': f'p{i}', 'amount': 100.0, 'attempts': 0, 'quantity': 1}) for i in range(count)
+        ]
+        self.processing: dict[str, float] = {}
+        self.now = 0.0
+        self.fail = fail
+        self.sent: list[str] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.block = asyncio.Event()
+        self.block.set()
+
+    async def recover_expired_receipts(self) -> int:
+        expired = [token for token, deadline in self.processing.items() if deadline <= self.now]
+        for token in expired:
+            del self.processing[token]
+            self.queue.insert(0, token)
+        return len(expired)
+
+    async def get_queue_length(self) -> int:
+        return len(self.queue)
+
+    async def get_processing_length(self) -> int:
+        return len(self.processing)
+
+    async def get_queued_receipts(self) -> list:
+        return [json.loads(token) for token in self.queue]
+
+    async def claim_receipt(self, visibility_timeout: int):
+        if not self.queue:
+            return None
+        token = self.queue.pop(0)
+        self.processing[token] = self.now + visibility_timeout
+        return token, json.loads(token)
+
+    async def ack_receipt(self, token: str) -> bool:
+        return self.processing.pop(token, None) is not None
+
+    async def requeue_receipt(self, receipt_data: dict, token: str | None = None) -> bool:
+        receipt_data['attempts'] = receipt_data.get('attempts', 0) + 1
+        if self.processing.pop(token, None) is None:
+            return False
+        self.queue.append(json.dumps(receipt_data))
+        return True
+
+    async def create_receipt(self, *, payment_id: str, **kwargs) -> str | None:
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await self.block.wait()
+            await asyncio.sleep(0.001)
+            if self.fail:
+                return None
+            self.sent.append(payment_id)
+            return f'uuid-{payment_id}'
+        finally:
+            self.in_flight -= 1
+
+    async def get_pending_verification_count(self) -> int:
+        return 0
+
+
+@pytest.fixture(autouse=True)
+def _queue_settings(monkeypatch):
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_RECEIPT_DELAY', 0)
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_MAX_CONCURRENCY', 4)
+    monkeypatch.setattr(settings, 'NALOGO_QUEUE_VISIBILITY_TIMEOUT', 60)
+    monkeypatch.setattr(queue_module.cache, 'delete', _noop)
+
+
+async def _noop(*args, **kwargs):
+    return True
+
+
+async def test_drain_ramps_up_concurrency_and_reports_rate():
+    nalogo = _ReliableQueueNalogo(40)
+    service = NalogoQueueService(nalogo)
+
+    await service._process_pending_receipts()
+
+    assert sorted(nalogo.sent) == sorted(f'p{i}' for i in range(40))
+    assert nalogo.queue == [] and nalogo.processing == {}
+    assert 1 < nalogo.peak_in_flight <= 4
+
+    status = await service.get_status()
+    assert status['last_drain']['processed'] == 40
+    assert status['last_drain']['peak_concurrency'] == 4
+    assert status['drain_rate_per_minute'] > 0
+    assert status['eta_seconds'] is None
+
+
+async def test_backs_off_on_failures_without_losing_receipts():
+    nalogo = _ReliableQueueNalogo(10, fail=True)
+    service = NalogoQueueService(nalogo)
+
+    await service._process_pending_receipts()
+
+    assert nalogo.sent == [] and nalogo.processing == {}
+    assert len(nalogo.queue) == 10
+    attempts = [json.loads(token)['attempts'] for token in nalogo.queue]
+    assert sum(attempts) == 3 and set(attempts) == {0, 1}
+
+
+async def test_receipt_interrupted_mid_send_returns_after_visibility_timeout():
+    nalogo = _ReliableQueueNalogo(1)
+    nalogo.block.clear()
+    service = NalogoQueueService(nalogo)
+
+    drain = asyncio.create_task(service._process_pending_receipts())
+    while not nalogo.in_flight:
+        await asyncio.sleep(0)
+    drain.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await drain
+
+    assert nalogo.queue == [] and len(nalogo.processing) == 1
+    assert (await service.get_status())['processing_count'] == 1
+
+    nalogo.block.set()
+    await service._process_pending_receipts()
+    assert nalogo.sent == []
+
+    nalogo.now = 61
+    await service._process_pending_receipts()
+    assert nalogo.sent == ['p0'] and nalogo.processing == {}
@@ -151,3 +151,102 @@ async def test_create_cryptobot_payment_handles_empty_response(monkeypatch: pyte
     )
     assert result is None
     assert called is False
+
+
+@pytest.mark.anyio('asyncio')
+async def test_get_cryptobot_payment_statuses_uses_single_request(monkeypatch: pytest.MonkeyPatch) -> None:
+    class BatchStub:
+        def __init__(self) -> None:
+            self.calls: list[dict[str, Any]] = []
+
+        async def get_invoices(self, **kwargs: Any) -> list[dict[str, Any]]:
+            self.calls.append(kwargs)
+            return [
+                {'invoice_id': 101, 'status': 'expired'},
+                {'invoice_id': 102, 'status': 'active'},
+            ]
+
+    class LocalPayment:
+        def __init__(self, payment_id: int, invoice_id: str) -> None:
+            self.id = payment_id
+            self.invoice_id = invoice_id
+            self.status = 'active'
+
+    payments = {1: LocalPayment(1, '101'), 2: LocalPayment(2, '102'), 3: LocalPayment(3, '103')}
+    status_updates: list[tuple[str, str]] = []
+
+    async def fake_get_by_id(db: Any, payment_id: int) -> Any:
+        return payments.get(payment_id)
+
+    async def fake_update_status(db: Any, invoice_id: str, status: str, paid_at: Any) -> None:
+        status_updates.append((invoice_id, status))
+
+    monkeypatch.setattr(cryptobot_crud, 'get_cryptobot_payment_by_id', fake_get_by_id)
+    monkeypatch.setattr(cryptobot_crud, 'update_cryptobot_payment_status', fake_update_status)
+
+    stub = BatchStub()
+    service = _make_service(stub)  # type: ignore[arg-type]
+
+    results = await service.get_cryptobot_payment_statuses(DummySession(), [1, 2, 3])
+
+    assert len(stub.calls) == 1
+    assert stub.calls[0]['invoice_ids'] == ['101', '102', '103']
+    assert set(results) == {1, 2, 3}
+    assert status_updates == [('101', 'expired')]
+
+
+@pytest.mark.anyio('asyncio')
+async def test_get_cryptobot_payment_statuses_rolls_back_failed_invoice(monkeypatch: pytest.MonkeyPatch) -> None:
+    class BatchStub:
+        async def get_invoices(self, **kwargs: Any) -> list[dict[str, Any]]:
+            return [
+                {'invoice_id': 101, 'status': 'expired'},
+                {'invoice_id': 102, 'status': 'expired'},
+                {'invoice_id': 103, 'status': 'expired'},
+            ]
+
+    class RollbackSession(DummySession):
+        def __init__(self) -> None:
+            super().__init__()
+            self.rollbacks = 0
+            self.refreshed: list[int] = []
+
+        def in_transaction(self) -> bool:
+            return True
+
+        async def rollback(self) -> None:
+            self.rollbacks += 1
+
+        async def refresh(self, obj: Any) -> None:
+            self.refreshed.append(obj.id)
+
+    class LocalPayment:
+        def __init__(self, payment_id: int, invoice_id: str) -> None:
+            self.id = payment_id
+            self.invoice_id = invoice_id
+            self.status = 'active'
+
+    payments = {1: LocalPayment(1, '101'), 2: LocalPayment(2, '102'), 3: LocalPayment(3, '103')}
+    status_updates: list[str] = []
+
+    async def fake_get_by_id(db: Any, payment_id: int) -> Any:
+        return payments.get(payment_id)
+
+    async def fake_update_status(db: Any, invoice_id: str, status: str, paid_at: Any) -> None:
+        if invoice_id == '102':
+            raise RuntimeError('db failure')
+        status_updates.append(invoice_id)
+
+    monkeypatch.setattr(cryptobot_crud, 'get_cryptobot_payment_by_id', fake_get_by_id)
+    monkeypatch.setattr(cryptobot_crud, 'update_cryptobot_payment_status', fake_update_status)
+
+    db = RollbackSession()
+    service = _make_service(BatchStub())  # type: ignore[arg-type]
+
+    results = await service.get_cryptobot_payment_statuses(db, [1, 2, 3])
+
+    assert db.rollbacks == 1
+    assert db.refreshed == [3]
+    assert status_updates == ['101', '103']
+    assert isinstance(results[2]['error'], RuntimeError)
+    assert 'error' not in results[1] and 'error' not in results[3]
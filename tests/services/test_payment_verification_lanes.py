@@ -0,0 +1,127 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any
+
+from app.database.models import PaymentMethod
+from app.services import payment_verification_service as verification
+from app.services.payment_verification_service import (
+    AutoPaymentVerificationService,
+    PendingPayment,
+    get_polling_interval,
+)
+
+
+class _Session:
+    def in_transaction(self) -> bool:
+        return False
+
+
+@asynccontextmanager
+async def _fake_session():
+    yield _Session()
+
+
+def _record(method: PaymentMethod, local_id: int, age: timedelta) -> PendingPayment:
+    return PendingPayment(
+        method=method,
+        local_id=local_id,
+        identifier=f'{method.value}-{local_id}',
+        amount_kopeks=10000,
+        status='pending',
+        is_paid=False,
+        created_at=datetime.utcnow() - age,
+        user=SimpleNamespace(),
+        payment=None,
+    )
+
+
+def test_polling_interval_grows_with_payment_age():
+    base = timedelta(minutes=10)
+
+    assert get_polling_interval(timedelta(minutes=5), base) == timedelta(minutes=1)
+    assert get_polling_interval(timedelta(hours=1), base) == base
+    assert get_polling_interval(timedelta(hours=3), base) == base * 3
+    assert get_polling_interval(timedelta(hours=12), base) == base * 6
+
+
+async def test_run_checks_uses_provider_lanes_and_batches(monkeypatch):
+    records = [
+        _record(PaymentMethod.CRYPTOBOT, 1, timedelta(minutes=5)),
+        _record(PaymentMethod.CRYPTOBOT, 2, timedelta(hours=3)),
+        _record(PaymentMethod.PAL24, 3, timedelta(minutes=5)),
+        _record(PaymentMethod.YOOKASSA, 4, timedelta(minutes=5)),
+    ]
+    pal24_release = asyncio.Event()
+    checked: list[tuple[PaymentMethod, int]] = []
+    batches: list[list[int]] = []
+
+    async def fake_list(db):
+        return records
+
+    async def fake_manual_check(db, method, local_id, payment_service):
+        if method == PaymentMethod.PAL24:
+            await pal24_release.wait()
+        checked.append((method, local_id))
+
+    async def fake_get_record(db, method, local_id):
+        return None
+
+    async def fake_batch(db, local_ids: list[int]) -> dict[int, Any]:
+        batches.append(local_ids)
+        return {}
+
+    monkeypatch.setattr(verification, 'AsyncSessionLocal', _fake_session)
+    monkeypatch.setattr(verification, 'list_recent_pending_payments', fake_list)
+    monkeypatch.setattr(verification, 'run_manual_check', fake_manual_check)
+    monkeypatch.setattr(verification, 'get_payment_record', fake_get_record)
+
+    service = AutoPaymentVerificationService()
+    service.set_payment_service(SimpleNamespace(get_cryptobot_payment_statuses=fake_batch))
+    methods = [PaymentMethod.CRYPTOBOT, PaymentMethod.PAL24, PaymentMethod.YOOKASSA]
+
+    run = asyncio.create_task(service._run_checks(methods))
+    await asyncio.sleep(0.05)
+
+    # Медленный PayPalych не задерживает остальные провайдеры
+    assert batches == [[1, 2]]
+    assert checked == [(PaymentMethod.YOOKASSA, 4)]
+
+    pal24_release.set()
+    await run
+
+    stats = service.get_stats()
+    assert stats[PaymentMethod.CRYPTOBOT.value]['checked'] == 2
+    assert stats[PaymentMethod.PAL24.value]['checked'] == 1
+
+    # Свежие инвойсы пока не пора перепроверять, старые — тем более
+    await service._run_checks(methods)
+    assert batches == [[1, 2]]
+    assert service._next_sleep == verification.MIN_AUTO_CHECK_SLEEP_SECONDS
+
+
+async def test_batch_lane_counts_failed_invoices(monkeypatch):
+    records = [
+        _record(PaymentMethod.CRYPTOBOT, 1, timedelta(minutes=5)),
+        _record(PaymentMethod.CRYPTOBOT, 2, timedelta(minutes=5)),
+    ]
+    fetched: list[int] = []
+
+    async def fake_get_record(db, method, local_id):
+        fetched.append(local_id)
+
+    async def fake_batch(db, local_ids: list[int]) -> dict[int, Any]:
+        return {1: {'payment': None, 'error': RuntimeError('db failure')}, 2: {'payment': None}}
+
+    monkeypatch.setattr(verification, 'AsyncSessionLocal', _fake_session)
+    monkeypatch.setattr(verification, 'get_payment_record', fake_get_record)
+
+    service = AutoPaymentVerificationService()
+    service.set_payment_service(SimpleNamespace(get_cryptobot_payment_statuses=fake_batch))
+    stats = verification.ProviderCycleStats()
+
+    await service._run_batch_lane(PaymentMethod.CRYPTOBOT, records, stats)
+
+    assert stats.errors == 1
+    assert fetched == [2]
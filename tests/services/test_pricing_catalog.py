@@ -0,0 +1,181 @@
+from datetime import UTC, datetime
+from types import MappingProxyType, SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.database.crud import subscription as subscription_crud
+from app.database.models import PromoGroup
+from app.keyboards.inline import get_devices_keyboard
+from app.localization.texts import get_texts
+from app.services import pricing_catalog
+from app.services.pricing_catalog import (
+    CatalogPromoGroup,
+    CatalogServer,
+    PricingCatalog,
+    calculate_price_matrix,
+    calculate_total_cost,
+)
+
+
+TRAFFIC_PACKAGES = ((10, 10000), (50, 30000), (0, 60000))
+
+
+def _build_catalog(version: int = 1) -> PricingCatalog:
+    servers = {
+        1: CatalogServer(1, 'uuid-1', 'NL', 5000, True, frozenset()),
+        2: CatalogServer(2, 'uuid-2', 'DE', 7000, True, frozenset({10})),
+    }
+    return PricingCatalog(
+        version=version,
+        built_at=datetime.now(UTC),
+        servers=MappingProxyType(servers),
+        promo_groups=MappingProxyType(
+            {
+                10: CatalogPromoGroup(
+                    id=10,
+                    server_discount_percent=20,
+                    traffic_discount_percent=10,
+                    device_discount_percent=50,
+                    period_discounts=MappingProxyType({90: 15}),
+                    is_default=False,
+                )
+            }
+        ),
+        period_prices=MappingProxyType({30: 19900, 90: 49900}),
+        traffic_packages=TRAFFIC_PACKAGES,
+        default_device_limit=1,
+        price_per_device=5000,
+    )
+
+
+def _make_user() -> SimpleNamespace:
+    group = PromoGroup(
+        id=10,
+        name='VIP',
+        server_discount_percent=20,
+        traffic_discount_percent=10,
+        device_discount_percent=50,
+        period_discounts={90: 15},
+        is_default=False,
+    )
+    return SimpleNamespace(
+        promo_group=group,
+        get_primary_promo_group=lambda: group,
+        get_promo_discount=group.get_discount_percent,
+    )
+
+
+@pytest.mark.parametrize('gb', [0, 5, 10, 11, 50, 500])
+def test_catalog_traffic_price_matches_settings(monkeypatch, gb):
+    monkeypatch.setattr(settings, 'TRAFFIC_PACKAGES_CONFIG', '10:10000:true,50:30000:true,0:60000:true,25:1:false')
+    catalog = _build_catalog()
+
+    assert catalog.get_traffic_price(gb) == settings.get_traffic_price(gb)
+
+
+def test_total_cost_applies_promo_group_discounts():
+    catalog = _build_catalog()
+    user = _make_user()
+
+    total, details = calculate_total_cost(catalog, 90, 10, [1, 2], 3, user=user)
+
+    assert details['base_price'] == 49900 - 49900 * 15 // 100
+    assert details['total_traffic_price'] == 9000 * 3
+    assert details['total_servers_price'] == 9600 * 3
+    assert details['total_devices_price'] == 5000 * 3
+    assert details['servers_individual_prices'] == [4000 * 3, 5600 * 3]
+    assert total == details['base_price'] + 27000 + 28800 + 15000
+
+
+def test_price_matrix_matches_total_cost():
+    catalog = _build_catalog()
+    user = _make_user()
+
+    quotes = calculate_price_matrix(
+        catalog,
+        periods=[30, 90],
+        traffic_options=[0, 10, 50, 70],
+        device_options=range(1, 6),
+        server_squad_ids=[1, 2],
+        user=user,
+    )
+
+    assert len(quotes) == 2 * 4 * 5
+    for (period_days, traffic_gb, devices), quote in quotes.items():
+        total, details = calculate_total_cost(catalog, period_days, traffic_gb, [1, 2], devices, user=user)
+        assert quote.total == total
+        assert quote.base_price == details['base_price']
+        assert quote.traffic_price == details['total_traffic_price']
+        assert quote.servers_price == details['total_servers_price']
+        assert quote.devices_price == details['total_devices_price']
+
+
+def test_price_matrix_resolves_discounts_once_per_period(monkeypatch):
+    catalog = _build_catalog()
+    user = _make_user()
+    lookups: list[tuple[str, int | None]] = []
+    original = pricing_catalog.get_discount_percent
+
+    def counting(catalog, user, promo_group, category, *, period_days=None):
+        lookups.append((category, period_days))
+        return original(catalog, user, promo_group, category, period_days=period_days)
+
+    monkeypatch.setattr(pricing_catalog, 'get_discount_percent', counting)
+
+    quotes = calculate_price_matrix(
+        catalog,
+        periods=[30, 90, 180],
+        traffic_options=[0, 10, 50],
+        device_options=range(1, 11),
+        server_squad_ids=[1, 2],
+        user=user,
+    )
+
+    assert len(quotes) == 3 * 3 * 10
+    assert len(lookups) == 3 * 4
+    assert quotes[(90, 10, 3)].devices_price_per_month == 5000
+
+
+async def test_device_quotes_render_discounted_keyboard(monkeypatch):
+    catalog = _build_catalog()
+    user = _make_user()
+
+    async def fake_get_catalog(db):
+        return catalog
+
+    monkeypatch.setattr(pricing_catalog, 'get_pricing_catalog', fake_get_catalog)
+    monkeypatch.setattr(settings, 'MAX_DEVICES_LIMIT', 3)
+
+    quotes = await pricing_catalog.get_device_quotes(object(), user, 90)
+    keyboard = get_devices_keyboard(2, 'ru', quotes)
+
+    assert list(quotes) == [1, 2, 3]
+    assert [button.callback_data for button in keyboard.inline_keyboard[0]] == ['devices_1', 'devices_2']
+    assert get_texts('ru').format_price(2500) in keyboard.inline_keyboard[0][1].text
+    assert await pricing_catalog.get_device_quotes(object(), user, None) == {}
+
+
+async def test_total_cost_uses_cached_catalog(monkeypatch):
+    catalog = _build_catalog()
+    store = pricing_catalog.PricingCatalogStore()
+    builds: list[int] = []
+
+    async def fake_build(db, generation):
+        builds.append(generation)
+        return catalog
+
+    monkeypatch.setattr(store, '_build', fake_build)
+    monkeypatch.setattr(pricing_catalog, 'pricing_catalog_store', store)
+
+    for _ in range(3):
+        total, details = await subscription_crud.calculate_subscription_total_cost(object(), 90, 10, [1, 2], 2)
+
+    assert builds == [0]
+    assert details['servers_individual_prices'] == [5000 * 3, 7000 * 3]
+    assert total == 49900 + 10000 * 3 + 12000 * 3 + 5000 * 3
+
+    pricing_catalog.invalidate_pricing_catalog('test')
+    await subscription_crud.calculate_subscription_total_cost(object(), 30, 10, [1], 1)
+
+    assert builds == [0, 1]
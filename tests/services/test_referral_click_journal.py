@@ -0,0 +1,118 @@
+import asyncio
+import io
+import tarfile
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services import referral_diagnostics_service as diagnostics
+from app.services.referral_diagnostics_service import ReferralDiagnosticsService
+
+
+def _log_line(timestamp: str, message: str) -> str:
+    return f'{timestamp},123 - app.handlers - INFO - {message}\n'
+
+
+def _write_archive(path, content: str) -> None:
+    data = content.encode('utf-8')
+    with tarfile.open(path, 'w:gz') as tar:
+        info = tarfile.TarInfo('current/bot.log')
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+
+async def test_parse_clicks_reads_current_log_and_archives(tmp_path):
+    current_dir = tmp_path / 'logs' / 'current'
+    archive_dir = tmp_path / 'logs' / 'archive'
+    current_dir.mkdir(parents=True)
+    archive_dir.mkdir()
+
+    log_path = current_dir / 'bot.log'
+    log_path.write_text(
+        _log_line('2026-03-03 10:00:00', '📩 Сообщение от ID:111 текст: /start ref_refAAA')
+        + _log_line('2026-03-04 10:00:00', '📩 Сообщение от ID:999 текст: /start refOUT')
+    )
+    _write_archive(
+        archive_dir / 'logs_2026-03-02.tar.gz',
+        _log_line('2026-03-02 09:00:00', "💾 Сохранен start payload 'refBBB' для пользователя 222"),
+    )
+    _write_archive(
+        archive_dir / 'logs_2026-02-20.tar.gz',
+        _log_line('2026-02-20 09:00:00', '📩 Сообщение от ID:333 текст: /start refOLD'),
+    )
+
+    service = ReferralDiagnosticsService(log_path=str(log_path))
+    clicks, total_lines, lines_in_period = await service._parse_clicks(datetime(2026, 3, 1), datetime(2026, 3, 4))
+
+    assert [(click.telegram_id, click.clean_code) for click in clicks] == [(222, 'refBBB'), (111, 'refAAA')]
+    assert total_lines == 3
+    assert lines_in_period == 2
+
+
+async def test_collect_clicks_prefers_journal_over_logs(monkeypatch, tmp_path):
+    service = ReferralDiagnosticsService(log_path=str(tmp_path / 'missing.log'))
+    journal_start = datetime(2026, 3, 2)
+    parsed_periods = []
+
+    async def fake_first_click(db):
+        return journal_start
+
+    async def fake_events(db, start_utc, end_utc):
+        return [
+            SimpleNamespace(
+                telegram_id=555,
+                raw_code='refCCC',
+                clean_code='refCCC',
+                source='start',
+                clicked_at=datetime(2026, 3, 2, 12),
+            )
+        ]
+
+    async def fake_parse(start_date, end_date, skip_date_filter=False):
+        parsed_periods.append((start_date, end_date))
+        return [], 0, 0
+
+    monkeypatch.setattr(diagnostics, 'get_first_referral_click_time', fake_first_click)
+    monkeypatch.setattr(diagnostics, 'get_referral_click_events', fake_events)
+    monkeypatch.setattr(diagnostics, '_utc_to_local', lambda value: value)
+    monkeypatch.setattr(diagnostics, '_local_to_utc', lambda value: value)
+    monkeypatch.setattr(service, '_parse_clicks', fake_parse)
+
+    clicks, _, lines_in_period = await service._collect_clicks(None, datetime(2026, 3, 1), datetime(2026, 3, 3))
+
+    assert parsed_periods == [(datetime(2026, 3, 1), journal_start)]
+    assert [click.telegram_id for click in clicks] == [555]
+    assert lines_in_period == 1
+
+    parsed_periods.clear()
+    await service._collect_clicks(None, datetime(2026, 3, 2), datetime(2026, 3, 3))
+    assert parsed_periods == []
+
+
+async def test_track_referral_click_keeps_task_until_stored(monkeypatch):
+    stored = []
+    release = asyncio.Event()
+
+    class _Session:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            return None
+
+    async def fake_create(db, **fields):
+        await release.wait()
+        stored.append(fields)
+
+    monkeypatch.setattr(diagnostics, '_click_tasks', set())
+    monkeypatch.setattr(diagnostics, 'AsyncSessionLocal', _Session)
+    monkeypatch.setattr(diagnostics, 'create_referral_click_event', fake_create)
+
+    diagnostics.track_referral_click(555, 'refAAA', 'start')
+    assert len(diagnostics._click_tasks) == 1
+
+    task = next(iter(diagnostics._click_tasks))
+    release.set()
+    await task
+
+    assert diagnostics._click_tasks == set()
+    assert [(fields['telegram_id'], fields['clean_code']) for fields in stored] == [(555, 'refAAA')]
@@ -0,0 +1,130 @@
+import random
+
+import pytest
+
+from app.services import referral_contest_leaderboard as leaderboard_module
+from app.services.referral_contest_leaderboard import (
+    ReferralContestLeaderboard,
+    SortedBoard,
+    decode_score,
+    encode_score,
+)
+
+
+class _SortedSetCache:
+    """Минимальная замена CacheService с отсортированными множествами в памяти."""
+
+    is_connected = True
+
+    def __init__(self) -> None:
+        self.values: dict[str, object] = {}
+        self.sets: dict[str, dict[str, float]] = {}
+
+    async def exists(self, key):
+        return key in self.values
+
+    async def set(self, key, value, expire=None):
+        self.values[key] = value
+        return True
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+        self.sets.pop(key, None)
+        return True
+
+    async def replace_sorted_set(self, key, mapping, expire=None):
+        self.sets[key] = dict(mapping)
+        return True
+
+    async def zincrby(self, key, amount, member):
+        members = self.sets.setdefault(key, {})
+        members[member] = members.get(member, 0.0) + amount
+        return members[member]
+
+    def _ordered(self, key):
+        return sorted(self.sets.get(key, {}).items(), key=lambda item: (-item[1], item[0]))
+
+    async def zrevrange(self, key, start=0, end=-1):
+        items = self._ordered(key)
+        return items[start:] if end == -1 else items[start : end + 1]
+
+    async def zscore(self, key, member):
+        return self.sets.get(key, {}).get(member)
+
+    async def zrevrank(self, key, member):
+        members = [name for name, _ in self._ordered(key)]
+        return members.index(member) if member in members else None
+
+    async def zcard(self, key):
+        return len(self.sets.get(key, {}))
+
+
+class _NoCache:
+    is_connected = False
+
+    async def delete(self, key):
+        return False
+
+
+def test_sorted_board_matches_sql_ordering():
+    rng = random.Random(7)
+    board = SortedBoard()
+    scores: dict[int, list[int]] = {}
+
+    for _ in range(2000):
+        referrer_id = rng.randint(1, 200)
+        amount = rng.choice([0, 0, 9900, 19900])
+        board.increment(referrer_id, 1, amount)
+        current = scores.setdefault(referrer_id, [0, 0])
+        current[0] += 1
+        current[1] += amount
+
+    expected = sorted(scores.items(), key=lambda item: (-item[1][0], -item[1][1], item[0]))
+    top = board.top()
+    assert [(entry.referrer_id, entry.score, entry.amount_kopeks) for entry in top] == [
+        (referrer_id, count, amount) for referrer_id, (count, amount) in expected
+    ]
+    for rank, (referrer_id, _) in enumerate(expected, start=1):
+        assert board.entry(referrer_id).rank == rank
+    assert board.entry(100500) is None
+
+
+def test_score_encoding_keeps_order():
+    assert decode_score(encode_score(12, 345600)) == (12, 345600)
+    assert encode_score(2, 0) > encode_score(1, 10**9)
+    assert encode_score(1, 200) > encode_score(1, 100)
+
+
+@pytest.mark.parametrize('backend', [_NoCache, _SortedSetCache])
+async def test_incremental_updates_follow_reconciled_scores(monkeypatch, backend):
+    monkeypatch.setattr(leaderboard_module, 'cache', backend())
+    db_scores = [(1, 3, 0), (2, 3, 50000), (3, 1, 0)]
+    loads = []
+
+    async def fake_scores(db, contest_id):
+        loads.append(contest_id)
+        return list(db_scores)
+
+    monkeypatch.setattr(leaderboard_module, 'get_contest_scores', fake_scores)
+    leaderboard = ReferralContestLeaderboard()
+
+    top = await leaderboard.get_top(None, 10)
+    assert [(entry.referrer_id, entry.rank) for entry in top] == [(2, 1), (1, 2), (3, 3)]
+
+    await leaderboard.record_event(10, 3, 19900)
+    await leaderboard.record_event(10, 3, 0)
+    await leaderboard.record_event(10, 3, 0)
+    await leaderboard.record_event(10, 4, 0)
+
+    entry = await leaderboard.get_entry(None, 10, 3)
+    assert (entry.rank, entry.score, entry.amount_kopeks) == (1, 4, 19900)
+    assert (await leaderboard.get_entry(None, 10, 4)).rank == 4
+    assert await leaderboard.get_entry(None, 10, 99) is None
+    assert await leaderboard.count(None, 10) == 4
+    assert [entry.referrer_id for entry in await leaderboard.get_top(None, 10, limit=2)] == [3, 2]
+    # Чтения не обращаются к событиям после первой синхронизации
+    assert loads == [10]
+
+    await leaderboard.drop(10)
+    await leaderboard.get_top(None, 10)
+    assert loads == [10, 10]
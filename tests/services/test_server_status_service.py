@@ -0,0 +1,122 @@
+import asyncio
+import dataclasses
+from contextlib import asynccontextmanager
+
+import pytest
+from aiohttp import web
+
+from app.config import settings
+from app.handlers.server_status import _build_status_message
+from app.services import server_status_service as status_module
+from app.services.server_status_service import ServerStatusError, ServerStatusService
+from app.utils.http_clients import HttpClientRegistry, UpstreamPolicy
+
+
+def _metrics(count: int, offline_every: int = 3) -> str:
+    lines = []
+    for index in range(count):
+        labels = f'address="10.0.0.{index}",protocol="vless",name="🇩🇪 Node {index:02d}"'
+        lines.append(f'xray_proxy_latency_ms{{{labels}}} {index * 10 + 0.4}')
+        lines.append(f'xray_proxy_status{{{labels}}} {0 if index % offline_every == 0 else 1}')
+    return '\n'.join(lines)
+
+
+class _Texts:
+    def t(self, key, default):
+        return default
+
+
+@asynccontextmanager
+async def _metrics_server(monkeypatch):
+    state = {'body': _metrics(25), 'etag': None, 'requests': 0, 'status': 200}
+
+    async def handler(request: web.Request) -> web.Response:
+        state['requests'] += 1
+        await asyncio.sleep(0.01)
+        if state['status'] != 200:
+            return web.Response(status=state['status'])
+        if state['etag'] and request.headers.get('If-None-Match') == state['etag']:
+            return web.Response(status=304)
+        headers = {'ETag': state['etag']} if state['etag'] else {}
+        return web.Response(text=state['body'], headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/metrics', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    registry = HttpClientRegistry({'server_status': UpstreamPolicy(retries=0, failure_threshold=100)})
+    monkeypatch.setattr(status_module, 'http_clients', registry)
+    monkeypatch.setattr(settings, 'SERVER_STATUS_MODE', 'xray')
+    monkeypatch.setattr(settings, 'SERVER_STATUS_METRICS_URL', f'http://127.0.0.1:{port}/metrics')
+    monkeypatch.setattr(settings, 'SERVER_STATUS_ITEMS_PER_PAGE', 10)
+    monkeypatch.setattr(settings, 'SERVER_STATUS_POLL_INTERVAL', 30)
+    try:
+        yield state
+    finally:
+        await registry.close()
+        await runner.cleanup()
+
+
+async def test_concurrent_readers_share_one_fetch_and_pages_are_precomputed(monkeypatch):
+    async with _metrics_server(monkeypatch) as metrics_server:
+        service = ServerStatusService()
+
+        snapshots = await asyncio.gather(*(service.get_snapshot() for _ in range(20)))
+        assert metrics_server['requests'] == 1
+        snapshot = snapshots[0]
+        assert all(item is snapshot for item in snapshots)
+
+        assert (snapshot.online_count, snapshot.offline_count, snapshot.total_pages) == (16, 9, 3)
+        (online, offline), number = snapshot.page(3)
+        assert number == 3 and len(online) == 0 and len(offline) == 5
+        (online, offline), _ = snapshot.page(2)
+        assert [len(online), len(offline)] == [6, 4]
+        assert snapshot.servers[0].flag == '🇩🇪' and snapshot.servers[0].latency_ms == 10
+
+        message, total_pages, current_page = _build_status_message(snapshot, _Texts(), page=99)
+        assert (total_pages, current_page) == (3, 3)
+        assert 'Всего серверов: 25 (в сети: 16, вне сети: 9)' in message
+
+        # Смена размера страницы не требует нового запроса
+        metrics_server['requests'] = 0
+        settings.SERVER_STATUS_ITEMS_PER_PAGE = 25
+        assert (await service.get_snapshot()).total_pages == 1
+        assert metrics_server['requests'] == 0
+
+
+async def test_refresh_skips_parsing_on_304_and_unchanged_body(monkeypatch):
+    async with _metrics_server(monkeypatch) as metrics_server:
+        service = ServerStatusService()
+        first = await service.refresh()
+
+        second = await service.refresh()
+        assert second.servers is first.servers
+        assert service.get_stats()['unchanged_body'] == 1
+
+        metrics_server['etag'] = '"v2"'
+        metrics_server['body'] = _metrics(4)
+        third = await service.refresh()
+        assert len(third.servers) == 4
+
+        fourth = await service.refresh()
+        assert fourth.servers is third.servers
+        stats = service.get_stats()
+        assert (stats['fetches'], stats['not_modified'], stats['parsed']) == (4, 1, 2)
+
+
+async def test_failed_refresh_serves_last_snapshot(monkeypatch):
+    async with _metrics_server(monkeypatch) as metrics_server:
+        service = ServerStatusService()
+        first = await service.get_snapshot()
+
+        metrics_server['status'] = 502
+        service._snapshot = dataclasses.replace(first, checked_at=first.checked_at - 60)
+        assert (await service.get_snapshot()).servers is first.servers
+        assert service.get_stats()['errors'] == 1
+
+        with pytest.raises(ServerStatusError):
+            await ServerStatusService().get_snapshot()
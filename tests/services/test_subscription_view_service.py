@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pydantic import BaseModel
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import Subscription, TrafficPurchase, Transaction, TransactionType, User
+from app.services import subscription_view_service as view_module
+from app.services.subscription_view_service import SubscriptionViewService
+
+
+class _Screen(BaseModel):
+    balance_kopeks: int
+
+
+@pytest.fixture
+def service(monkeypatch):
+    fresh = SubscriptionViewService()
+    monkeypatch.setattr(view_module, 'subscription_view_service', fresh)
+    monkeypatch.setattr(settings, 'MINIAPP_SUBSCRIPTION_VIEW_CACHE_TTL', 60)
+    monkeypatch.setattr(settings, 'MINIAPP_SUBSCRIPTION_VIEW_CACHE_SIZE', 100)
+    monkeypatch.setattr(settings, 'MINIAPP_USAGE_SYNC_INTERVAL', 120)
+    return fresh
+
+
+def test_committed_writes_bump_the_owner_version(service):
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all([User(id=1, telegram_id=1001, referral_code='r1'), User(id=2, telegram_id=1002)])
+        session.commit()
+        assert (service.version(1), service.version(2)) == (1, 1)
+
+        subscription = Subscription(user_id=1, end_date=datetime.utcnow() + timedelta(days=30))
+        session.add(subscription)
+        session.commit()
+        assert (service.version(1), service.version(2)) == (2, 1)
+
+        # Докупка трафика ссылается на подписку, владелец берётся из identity map
+        now = datetime.utcnow()
+        session.add(TrafficPurchase(subscription_id=subscription.id, traffic_gb=10, expires_at=now, created_at=now))
+        session.commit()
+        assert service.version(1) == 3
+
+        session.add(Transaction(user_id=2, type=TransactionType.DEPOSIT.value, amount_kopeks=10000))
+        session.get(User, 2).balance_kopeks = 10000
+        session.flush()
+        assert service.version(2) == 1
+        session.rollback()
+        assert service.version(2) == 1
+
+        # Чтение без изменений версию не трогает
+        session.get(User, 2).balance_kopeks = session.get(User, 2).balance_kopeks
+        session.commit()
+        assert (service.version(1), service.version(2)) == (3, 1)
+        subscription_id = subscription.id
+
+    view_module._subscription_owners.clear()
+    with Session(engine) as session:
+        # Подписки нет в identity map и в кеше владельцев — владелец находится запросом
+        now = datetime.utcnow()
+        session.add(TrafficPurchase(subscription_id=subscription_id, traffic_gb=5, expires_at=now, created_at=now))
+        session.commit()
+        assert service.version(1) == 4
+        assert view_module._subscription_owners == {subscription_id: 1}
+
+
+def test_bulk_updates_bump_registered_users_on_commit(service):
+    engine = create_engine('sqlite://')
+    User.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all([User(id=1, telegram_id=1001, referral_code='r1'), User(id=2, telegram_id=1002)])
+        session.commit()
+
+        # Пакетный UPDATE минует flush — без регистрации версия бы не изменилась
+        rows = session.execute(
+            update(User)
+            .where(User.id.in_([1, 2]))
+            .values(balance_kopeks=500)
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        view_module.invalidate_on_commit(session, rows.scalars().all())
+        assert (service.version(1), service.version(2)) == (1, 1)
+        session.rollback()
+        assert (service.version(1), service.version(2)) == (1, 1)
+
+        session.execute(update(User).where(User.id == 2).values(balance_kopeks=700))
+        view_module.invalidate_on_commit(session, [2])
+        session.commit()
+        assert (service.version(1), service.version(2)) == (1, 2)
+
+
+async def test_views_are_shared_invalidated_and_match_etags(service):
+    builds = 0
+    gate = asyncio.Event()
+
+    async def build():
+        nonlocal builds
+        builds += 1
+        await gate.wait()
+        return _Screen(balance_kopeks=100 * builds)
+
+    pending = [asyncio.create_task(service.get_or_build('miniapp', 7, build)) for _ in range(5)]
+    await asyncio.sleep(0)
+    gate.set()
+    views = await asyncio.gather(*pending)
+    assert builds == 1
+    assert all(view is views[0] for view in views)
+    assert views[0].body == b'{"balance_kopeks":100}'
+
+    etag = views[0].etag
+    assert views[0].matches(f'"other", {etag}') and not views[0].matches(None)
+    assert (await service.get_or_build('miniapp', 7, build)) is views[0]
+    assert (await service.get_or_build('cabinet', 7, build)).body == b'{"balance_kopeks":200}'
+
+    service.invalidate(7)
+    rebuilt = await service.get_or_build('miniapp', 7, build)
+    assert rebuilt.body == b'{"balance_kopeks":300}'
+    assert not rebuilt.matches(etag)
+
+    # Изменение во время построения: результат отдаётся, но не кешируется
+    async def racing_build():
+        service.invalidate(7)
+        return _Screen(balance_kopeks=1)
+
+    service.invalidate(7)
+    await service.get_or_build('miniapp', 7, racing_build)
+    assert service.get('miniapp', 7) is None
+
+    stats = service.get_stats()
+    assert (stats['hits'], stats['misses'], stats['coalesced']) == (1, 4, 4)
+
+
+def test_usage_sync_is_rate_limited_per_user(service):
+    assert service.should_sync_usage(1)
+    assert not service.should_sync_usage(1)
+    assert service.should_sync_usage(2)
+
+    service._usage_synced_at[1] -= 121
+    assert service.should_sync_usage(1)
+    assert service.get_stats()['usage_syncs_skipped'] == 1
@@ -0,0 +1,138 @@
+from contextlib import asynccontextmanager
+from datetime import UTC, date, datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import Base, TrafficHistoryDay, UserNodeTrafficDaily
+from app.services import traffic_history_service as history_module
+from app.services.traffic_history_service import TrafficHistoryService, TrafficHistoryStore
+
+
+class _AsyncSessionAdapter:
+    def __init__(self, session: Session) -> None:
+        self.session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def stream(self, statement):
+        rows = self.session.execute(statement).all()
+        size = statement.get_execution_options().get('yield_per')
+
+        class _Result:
+            async def partitions(self):
+                for start in range(0, len(rows), size):
+                    yield rows[start : start + size]
+
+        return _Result()
+
+    async def commit(self):
+        self.session.commit()
+
+    async def rollback(self):
+        self.session.rollback()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _naive_sums(rows, start_day: date, end_day: date) -> dict[tuple[str, str], int]:
+    sums: dict[tuple[str, str], int] = {}
+    for day, user_uuid, node_uuid, total in rows:
+        if start_day <= day <= end_day:
+            sums[user_uuid, node_uuid] = sums.get((user_uuid, node_uuid), 0) + total
+    return sums
+
+
+def _matrix_sums(matrix) -> dict[tuple[str, str], int]:
+    return {
+        (user_uuid, node_uuid): int(matrix.bytes[row, column])
+        for row, user_uuid in enumerate(matrix.user_uuids)
+        for column, node_uuid in enumerate(matrix.node_uuids)
+        if matrix.bytes[row, column]
+    }
+
+
+def test_store_aggregates_arbitrary_ranges_like_naive_sum():
+    rng = np.random.default_rng(7)
+    first_day = date(2026, 1, 1)
+    rows = [
+        (
+            first_day + timedelta(days=int(rng.integers(0, 90))),
+            f'user-{rng.integers(0, 40)}',
+            f'node-{rng.integers(0, 5)}',
+            int(rng.integers(1, 5 * 1024**3)),
+        )
+        for _ in range(3000)
+    ]
+    store = TrafficHistoryStore()
+    store.append(store.build_columns(rows[:1500]))
+    store.replace_since(first_day, store.build_columns(rows), [])
+
+    for start, end in ((0, 89), (10, 10), (30, 59), (85, 120)):
+        start_day, end_day = first_day + timedelta(days=start), first_day + timedelta(days=end)
+        assert _matrix_sums(store.aggregate(start_day, end_day)) == _naive_sums(rows, start_day, end_day)
+
+    store.prune(first_day + timedelta(days=60))
+    assert _matrix_sums(store.aggregate(first_day, first_day + timedelta(days=59))) == {}
+
+
+async def test_collect_persists_days_and_serves_ranges_locally(monkeypatch):
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    monkeypatch.setattr(history_module, 'AsyncSessionLocal', lambda: _AsyncSessionAdapter(session))
+    monkeypatch.setattr(settings, 'TRAFFIC_HISTORY_RETENTION_DAYS', 3)
+
+    today = datetime.now(UTC).date()
+    yesterday = today - timedelta(days=1)
+    requested: list[tuple[str, str]] = []
+
+    class _Api:
+        async def get_all_nodes(self):
+            return [SimpleNamespace(uuid='node-a', name='A', country_code='NL')]
+
+        async def get_bandwidth_stats_node_users_legacy(self, node_uuid, start, end):
+            requested.append((start, end))
+            return [
+                {'userUuid': 'u1', 'nodeUuid': node_uuid, 'total': 100, 'date': yesterday.isoformat()},
+                {'userUuid': 'u1', 'nodeUuid': node_uuid, 'total': 50, 'date': today.isoformat()},
+                {'userUuid': 'u2', 'nodeUuid': node_uuid, 'total': 0, 'date': today.isoformat()},
+            ]
+
+    class _RemnaWaveService:
+        is_configured = True
+
+        @asynccontextmanager
+        async def get_api_client(self):
+            yield _Api()
+
+    monkeypatch.setattr(history_module, 'RemnaWaveService', _RemnaWaveService)
+
+    service = TrafficHistoryService()
+    await service.load()
+    assert not service.is_ready(yesterday, today)
+
+    assert await service.collect() == 2
+    assert requested[0][0] == f'{today - timedelta(days=2)}T00:00:00Z'
+    assert service.is_ready(today - timedelta(days=2), today)
+    assert _matrix_sums(service.aggregate(yesterday, today)) == {('u1', 'node-a'): 150}
+
+    # Повторный сбор перезаписывает последние сутки, а не суммирует их
+    await service.collect()
+    assert requested[1][0] == f'{yesterday}T00:00:00Z'
+    stored = session.execute(select(UserNodeTrafficDaily.total_bytes).order_by(UserNodeTrafficDaily.day))
+    assert stored.scalars().all() == [100, 50]
+    assert len(session.execute(select(TrafficHistoryDay)).all()) == 3
+
+    reloaded = TrafficHistoryService()
+    reloaded.store.nodes = service.store.nodes
+    await reloaded.load()
+    assert _matrix_sums(reloaded.aggregate(yesterday, today)) == {('u1', 'node-a'): 150}
@@ -0,0 +1,64 @@
+import pytest
+from aiogram.types import InlineKeyboardButton
+
+from app.config import settings
+from app.keyboards import admin as admin_keyboards, cache as keyboard_cache, inline as inline_keyboards
+from app.localization.texts import reload_locales
+from app.services.system_settings_service import BotConfigurationService
+
+
+CACHED_BUILDERS = [
+    builder
+    for module in (inline_keyboards, admin_keyboards)
+    for builder in vars(module).values()
+    if callable(builder) and hasattr(builder, 'uncached') and builder.__module__ == module.__name__
+]
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache(monkeypatch):
+    monkeypatch.setattr(keyboard_cache, '_cache', {})
+
+
+@pytest.mark.parametrize('builder', CACHED_BUILDERS, ids=lambda builder: f'{builder.__module__}.{builder.__name__}')
+def test_cached_builders_match_uncached(builder):
+    args = ('confirm_action',) if 'confirmation' in builder.__name__ else ()
+    for language in ('ru', 'en', 'ua'):
+        expected = builder.uncached(*args, language=language)
+        assert builder(*args, language=language) == expected
+        assert builder(*args, language=language) == expected
+
+
+def test_cached_markups_are_independent_copies():
+    first = inline_keyboards.get_back_keyboard('ru')
+    first.inline_keyboard.insert(0, [InlineKeyboardButton(text='x', callback_data='x')])
+    first.inline_keyboard[-1].append(InlineKeyboardButton(text='y', callback_data='y'))
+
+    second = inline_keyboards.get_back_keyboard('ru')
+    assert second == inline_keyboards.get_back_keyboard.uncached('ru')
+    assert second.inline_keyboard is not first.inline_keyboard
+
+
+def test_settings_changes_rebuild_keyboards(monkeypatch):
+    monkeypatch.setattr(settings, 'REFERRAL_PROGRAM_ENABLED', True)
+    monkeypatch.setattr(settings, 'REFERRAL_WITHDRAWAL_ENABLED', False)
+
+    def callbacks():
+        return [row[0].callback_data for row in inline_keyboards.get_referral_keyboard('ru').inline_keyboard]
+
+    assert 'referral_withdrawal' not in callbacks()
+    # Значение из depends_on входит в ключ — изменение видно без сброса кеша
+    monkeypatch.setattr(settings, 'REFERRAL_WITHDRAWAL_ENABLED', True)
+    assert 'referral_withdrawal' in callbacks()
+
+    inline_keyboards.get_balance_keyboard('ru')
+    version = keyboard_cache.keyboard_cache_version()
+    monkeypatch.setattr(settings, 'CONTESTS_BUTTON_VISIBLE', settings.CONTESTS_BUTTON_VISIBLE)
+    BotConfigurationService._apply_to_settings('CONTESTS_BUTTON_VISIBLE', settings.CONTESTS_BUTTON_VISIBLE)
+    assert keyboard_cache.keyboard_cache_version() == version + 1
+    assert keyboard_cache.get_keyboard_cache_stats()['entries'] == 0
+
+    inline_keyboards.get_balance_keyboard('ru')
+    reload_locales()
+    assert keyboard_cache.keyboard_cache_version() == version + 2
+    assert keyboard_cache.get_keyboard_cache_stats()['entries'] == 0
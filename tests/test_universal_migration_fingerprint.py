@@ -0,0 +1,121 @@
+import logging
+
+from app.database import universal_migration as migration
+from app.utils.startup_timeline import StageHandle, StartupTimeline
+
+
+def _stage() -> StageHandle:
+    return StageHandle(StartupTimeline(logging.getLogger('test'), 'test'), 'migration', '🧬', None)
+
+
+def _patch_common(monkeypatch, stored_fingerprint):
+    stored = []
+
+    async def fake_db_type():
+        return 'sqlite'
+
+    async def fake_stored():
+        return stored_fingerprint
+
+    async def fake_store(fingerprint):
+        stored.append(fingerprint)
+
+    async def ensure_default_web_api_token():
+        return True
+
+    monkeypatch.setattr(migration, 'get_database_type', fake_db_type)
+    monkeypatch.setattr(migration, 'get_stored_migration_fingerprint', fake_stored)
+    monkeypatch.setattr(migration, 'store_migration_fingerprint', fake_store)
+    monkeypatch.setattr(migration, 'ensure_default_web_api_token', ensure_default_web_api_token)
+    monkeypatch.delenv('FORCE_MIGRATION', raising=False)
+    return stored
+
+
+def _named_step(name):
+    async def step():
+        return True
+
+    step.__name__ = name
+    return step
+
+
+async def test_matching_fingerprint_skips_schema_steps(monkeypatch):
+    stored = _patch_common(monkeypatch, migration.get_migration_fingerprint('sqlite'))
+
+    async def fail_steps():
+        raise AssertionError('schema steps must be skipped')
+
+    monkeypatch.setattr(migration, '_run_migration_steps', fail_steps)
+
+    # Шаги исправления данных выполняются и при актуальной схеме
+    repairs = [
+        'migrate_existing_user_promo_groups_data',
+        'ensure_promo_groups_setup',
+        'fix_foreign_keys_for_user_deletion',
+        'reconcile_referrer_ledger_table',
+    ]
+    for name in repairs:
+        monkeypatch.setattr(migration, name, _named_step(name))
+    duplicates_checked = []
+
+    async def repair_duplicates():
+        duplicates_checked.append(True)
+        return True
+
+    monkeypatch.setattr(migration, '_repair_subscription_duplicates', repair_duplicates)
+    stage = _stage()
+
+    assert await migration.run_universal_migration(stage) is True
+
+    assert stored == [] and duplicates_checked == [True]
+    assert [title for title, _ in stage.substeps] == [*repairs, 'ensure_default_web_api_token']
+
+
+async def test_fingerprint_is_saved_only_when_every_step_succeeds(monkeypatch):
+    stored = _patch_common(monkeypatch, None)
+    results = {'add_column': True, 'create_table': False}
+
+    async def add_column():
+        return results['add_column']
+
+    async def create_table():
+        return results['create_table']
+
+    async def fake_steps():
+        await migration._run_step(add_column)
+        await migration._run_step(create_table)
+        return True
+
+    monkeypatch.setattr(migration, '_run_migration_steps', fake_steps)
+
+    stage = _stage()
+    assert await migration.run_universal_migration(stage) is True
+    assert stored == []
+    assert [title for title, _ in stage.substeps] == ['add_column', 'create_table']
+
+    results['create_table'] = True
+    assert await migration.run_universal_migration() is True
+    assert stored == [migration.get_migration_fingerprint('sqlite')]
+
+
+async def test_schema_catalog_reloads_only_after_ddl(monkeypatch):
+    catalog = migration.SchemaCatalog()
+    columns = {'users': {'id'}}
+
+    async def fake_load():
+        catalog._columns = {table: set(names) for table, names in columns.items()}
+        catalog._stale = False
+        catalog.loads += 1
+
+    monkeypatch.setattr(catalog, '_load', fake_load)
+
+    assert await catalog.has_table('users')
+    assert not await catalog.has_column('users', 'email')
+    catalog._on_cursor_execute(None, None, 'SELECT 1 FROM users', None, None, False)
+    assert catalog.loads == 1
+
+    columns['users'].add('email')
+    catalog._on_cursor_execute(None, None, 'ALTER TABLE users ADD COLUMN email VARCHAR(255)', None, None, False)
+
+    assert await catalog.has_column('users', 'email')
+    assert catalog.loads == 2
@@ -0,0 +1,126 @@
+import time
+
+from aiogram import Dispatcher, F
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import CallbackQuery, User
+
+from app.utils.callback_index import CallbackIndex, extract_data_constraint, install_callback_index
+from app.utils.lazy_router import LazyHandlersRouter
+
+
+def _callback(data: str | None) -> CallbackQuery:
+    return CallbackQuery(
+        id='1',
+        from_user=User(id=1, is_bot=False, first_name='Test'),
+        chat_instance='1',
+        data=data,
+    )
+
+
+def _handler(*filters) -> HandlerObject:
+    dp = Dispatcher()
+
+    async def handle(callback):
+        return None
+
+    dp.callback_query.register(handle, *filters)
+    return dp.callback_query.handlers[0]
+
+
+def test_extract_data_constraint():
+    assert extract_data_constraint(_handler(F.data == 'menu')) == ('exact', ('menu',))
+    assert extract_data_constraint(_handler(F.data.in_(['a', 'b']))) == ('exact', ('a', 'b'))
+    assert extract_data_constraint(_handler(F.data.startswith('admin_'))) == ('prefix', ('admin_',))
+    assert extract_data_constraint(_handler(F.data.startswith(('x_', 'y_')))) == ('prefix', ('x_', 'y_'))
+    assert extract_data_constraint(_handler(F.data.contains('pay'))) is None
+    assert extract_data_constraint(_handler(lambda c: c.data == 'menu')) is None
+
+
+def test_candidates_keep_registration_order():
+    handlers = [
+        _handler(F.data.startswith('admin_')),
+        _handler(F.data.regexp(r'^admin_\d+$')),
+        _handler(F.data == 'admin_users'),
+        _handler(F.data.startswith('admin_users')),
+        _handler(F.data == 'menu'),
+    ]
+    index = CallbackIndex(handlers)
+
+    assert index.candidates('admin_users') == handlers[:4]
+    assert index.candidates('menu') == [handlers[1], handlers[4]]
+    assert index.candidates('other') == [handlers[1]]
+    assert index.candidates(None) == handlers
+
+
+def _build_real_dispatcher() -> Dispatcher:
+    from app.bot import register_handlers
+
+    dp = Dispatcher()
+    register_handlers(dp)
+    for router in dp.chain_tail:
+        if isinstance(router, LazyHandlersRouter):
+            router.load()
+    return dp
+
+
+def _sample_callback_data(handlers: list[HandlerObject]) -> list[str]:
+    samples = []
+    for handler in handlers:
+        constraint = extract_data_constraint(handler)
+        if constraint is None:
+            continue
+        kind, values = constraint
+        samples.extend(value if kind == 'exact' else f'{value}1' for value in values)
+    samples.append('unknown_button')
+    return samples
+
+
+async def _first_match(handlers, event) -> HandlerObject | None:
+    for handler in handlers:
+        try:
+            matched, _ = await handler.check(event, raw_state=None, event_from_user=event.from_user)
+        except Exception:
+            matched = False
+        if matched:
+            return handler
+    return None
+
+
+def _p99(samples: list[float]) -> float:
+    ordered = sorted(samples)
+    return ordered[int(len(ordered) * 0.99) - 1]
+
+
+async def test_real_handler_set_dispatch_benchmark():
+    """Бенчмарк: задержка выбора обработчика по всем callback реального набора хендлеров."""
+    dp = _build_real_dispatcher()
+    install_callback_index(dp)
+    handlers = dp.callback_query.handlers
+    index = dp.callback_query.trigger.index
+    # Каждый пятый callback — равномерная выборка по порядку регистрации
+    samples = _sample_callback_data(handlers)[::5]
+    assert len(handlers) > 300
+
+    linear: list[float] = []
+    indexed: list[float] = []
+    for data in samples:
+        event = _callback(data)
+
+        started = time.perf_counter()
+        expected = await _first_match(handlers, event)
+        linear.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        actual = await _first_match(index.candidates(data), event)
+        indexed.append(time.perf_counter() - started)
+
+        assert actual is expected, data
+
+    linear_mean = sum(linear) / len(linear)
+    indexed_mean = sum(indexed) / len(indexed)
+    print(
+        f'\n{len(handlers)} handlers, {index.indexed_count} indexed, {len(samples)} callbacks: '
+        f'linear mean {linear_mean * 1e6:.0f} us / p99 {_p99(linear) * 1e6:.0f} us, '
+        f'indexed mean {indexed_mean * 1e6:.0f} us / p99 {_p99(indexed) * 1e6:.0f} us'
+    )
+    assert indexed_mean < linear_mean / 2
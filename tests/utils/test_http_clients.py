@@ -0,0 +1,81 @@
+import aiohttp
+import pytest
+from aiohttp import web
+
+from app.utils.http_clients import CircuitOpenError, HttpClientRegistry, UpstreamPolicy
+
+
+async def _start_server(statuses: list[int]) -> tuple[web.AppRunner, str, list[str]]:
+    calls: list[str] = []
+
+    async def handler(request: web.Request) -> web.Response:
+        calls.append(request.method)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        return web.json_response({'call': len(calls)}, status=status)
+
+    app = web.Application()
+    app.router.add_route('*', '/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{port}/', calls
+
+
+async def test_reuses_session_and_retries_only_idempotent_requests():
+    runner, url, calls = await _start_server([503, 200])
+    registry = HttpClientRegistry({'shop': UpstreamPolicy(retries=1, retry_backoff=0)})
+    try:
+        async with registry.request('shop', 'GET', url) as response:
+            assert response.status == 200
+            assert await response.json() == {'call': 2}
+        session = registry.session('shop')
+
+        calls.clear()
+        async with registry.request('shop', 'POST', url) as response:
+            assert response.status == 503
+        assert calls == ['POST']
+        assert registry.session('shop') is session
+
+        httpx_response = await registry.send('shop', 'GET', url)
+        assert httpx_response.json() == {'call': 2}
+
+        stats = registry.get_stats()
+        shop = stats['upstreams']['shop']
+        assert shop['requests'] == 4
+        assert shop['errors'] == {'http_5xx': 2}
+        assert sum(shop['latency_histogram'].values()) == 4
+        assert stats['open_sessions'] == 2
+    finally:
+        await registry.close()
+        await runner.cleanup()
+    assert session.closed
+    assert registry.get_stats()['open_sessions'] == 0
+
+
+async def test_circuit_opens_after_consecutive_failures():
+    runner, url, calls = await _start_server([500])
+    registry = HttpClientRegistry({'status': UpstreamPolicy(retries=0, failure_threshold=2, recovery_timeout=60)})
+    try:
+        for _ in range(2):
+            async with registry.request('status', 'GET', url) as response:
+                assert response.status == 500
+
+        with pytest.raises(CircuitOpenError):
+            async with registry.request('status', 'GET', url):
+                pass
+        assert len(calls) == 2
+
+        # Для остальных обработчиков это обычная ошибка соединения aiohttp
+        with pytest.raises(aiohttp.ClientConnectionError):
+            async with registry.request('status', 'GET', url):
+                pass
+
+        stats = registry.get_stats()['upstreams']['status']
+        assert stats['circuit'] == 'open'
+        assert stats['circuit_opened_total'] == 1
+        assert stats['errors'] == {'http_5xx': 2, 'circuit_open': 2}
+    finally:
+        await registry.close()
+        await runner.cleanup()
@@ -0,0 +1,29 @@
+import sys
+
+from app.utils.import_profiler import ImportProfiler
+
+
+def test_records_self_and_cumulative_time(tmp_path, monkeypatch):
+    (tmp_path / 'profiled_child.py').write_text('import time\ntime.sleep(0.02)\n')
+    (tmp_path / 'profiled_parent.py').write_text('import time\nimport profiled_child\ntime.sleep(0.01)\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    for name in ('profiled_parent', 'profiled_child'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    profiler = ImportProfiler()
+    profiler.start()
+    try:
+        import profiled_parent  # noqa: F401
+    finally:
+        profiler.stop()
+
+    assert not profiler.active
+    records = {record.module: record for record in profiler.records}
+    parent = records['profiled_parent']
+    child = records['profiled_child']
+    assert parent.depth == 0
+    assert child.depth == 1
+    assert parent.cumulative_seconds >= child.cumulative_seconds + 0.01
+    assert parent.self_seconds < parent.cumulative_seconds
+    assert profiler.top_modules(1)[0].module == 'profiled_parent'
+    assert 'profiled_child' in '\n'.join(profiler.report_lines())
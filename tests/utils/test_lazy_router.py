@@ -0,0 +1,59 @@
+import sys
+import types
+
+from aiogram import Dispatcher, F
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import CallbackQuery, User
+
+from app.utils.lazy_router import LazyHandlersRouter
+
+
+def _install_module(monkeypatch, handled: list[str]) -> None:
+    module = types.ModuleType('lazy_test_handlers')
+
+    async def handle(callback: CallbackQuery) -> str:
+        handled.append(callback.data)
+        return 'ok'
+
+    def register_handlers(dp) -> None:
+        dp.callback_query.register(handle, F.data == 'lazy_feature')
+
+    module.register_handlers = register_handlers
+    monkeypatch.setitem(sys.modules, 'lazy_test_handlers', module)
+
+
+def _callback(data: str) -> CallbackQuery:
+    return CallbackQuery(
+        id='1',
+        from_user=User(id=1, is_bot=False, first_name='Test'),
+        chat_instance='1',
+        data=data,
+    )
+
+
+async def test_module_is_loaded_on_first_event_and_gated_by_enabled(monkeypatch):
+    handled: list[str] = []
+    _install_module(monkeypatch, handled)
+    enabled = {'value': False}
+    router = LazyHandlersRouter('lazy_test_handlers', enabled=lambda: enabled['value'])
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    result = await dp.propagate_event('callback_query', _callback('lazy_feature'))
+
+    assert result is UNHANDLED
+    assert not router.loaded
+
+    enabled['value'] = True
+    result = await dp.propagate_event('callback_query', _callback('lazy_feature'))
+
+    assert result == 'ok'
+    assert router.loaded
+    assert handled == ['lazy_feature']
+
+    # Выключение после загрузки тоже действует без перезапуска
+    enabled['value'] = False
+    result = await dp.propagate_event('callback_query', _callback('lazy_feature'))
+
+    assert result is UNHANDLED
+    assert handled == ['lazy_feature']
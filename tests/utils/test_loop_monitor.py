@@ -0,0 +1,20 @@
+import asyncio
+import time
+
+from app.utils.loop_monitor import EventLoopBlockMonitor
+
+
+async def test_monitor_reports_blocking_work_but_not_threaded_work():
+    async with EventLoopBlockMonitor(interval=0.01, threshold=0.05) as blocked:
+        await asyncio.sleep(0.02)
+        time.sleep(0.2)  # noqa: ASYNC251 - имитация синхронной работы в event loop
+        await asyncio.sleep(0.02)
+
+    assert blocked.stalls >= 1
+    assert blocked.as_dict()['max_lag_ms'] >= 150
+
+    async with EventLoopBlockMonitor(interval=0.01, threshold=0.05) as threaded:
+        await asyncio.to_thread(time.sleep, 0.2)
+
+    assert threaded.stalls == 0
+    assert threaded.samples >= 5
@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from aiogram.types import BufferedInputFile
+
+from app.utils import media_cache
+
+
+class _FakeCache:
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, expire=None):
+        self.data[key] = value
+        return True
+
+    async def delete(self, key):
+        return self.data.pop(key, None) is not None
+
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    cache = _FakeCache()
+    monkeypatch.setattr(media_cache, 'cache', cache)
+    monkeypatch.setattr(media_cache, '_local_cache', media_cache.OrderedDict())
+    return cache
+
+
+def _photo_message(file_id: str) -> SimpleNamespace:
+    return SimpleNamespace(photo=[SimpleNamespace(file_id='thumb'), SimpleNamespace(file_id=file_id)])
+
+
+async def test_qr_is_rendered_and_uploaded_once(fake_cache, monkeypatch):
+    renders = []
+    sent = []
+
+    async def fake_render(data):
+        renders.append(data)
+        return b'png'
+
+    async def send(media):
+        sent.append(media)
+        return _photo_message('file-1')
+
+    monkeypatch.setattr(media_cache, 'render_qr_png', fake_render)
+
+    await media_cache.send_qr_photo(send, 'https://t.me/bot?start=abc')
+    # Повторный показ — без рендера и загрузки, в том числе после рестарта (память очищена)
+    media_cache._local_cache.clear()
+    await media_cache.send_qr_photo(send, 'https://t.me/bot?start=abc')
+
+    assert renders == ['https://t.me/bot?start=abc']
+    assert isinstance(sent[0], BufferedInputFile)
+    assert sent[1] == 'file-1'
+
+
+async def test_stale_file_id_is_reuploaded(fake_cache):
+    digest = media_cache.media_digest(b'logo')
+    await media_cache.store_file_id(digest, 'expired')
+    sent = []
+
+    async def send(media):
+        sent.append(media)
+        if media == 'expired':
+            raise TelegramBadRequest(SendPhoto(chat_id=1, photo=media), 'wrong file identifier')
+        return _photo_message('fresh')
+
+    async def build():
+        return BufferedInputFile(b'logo', filename='logo.png')
+
+    await media_cache.send_cached_photo(send, digest, build)
+
+    assert sent[0] == 'expired'
+    assert isinstance(sent[1], BufferedInputFile)
+    assert await media_cache.get_file_id(digest) == 'fresh'
+
+
+async def test_other_bad_requests_keep_cached_file_id(fake_cache):
+    digest = media_cache.media_digest(b'logo')
+    await media_cache.store_file_id(digest, 'cached')
+
+    async def send(media):
+        raise TelegramBadRequest(SendPhoto(chat_id=1, photo=media), 'message caption is too long')
+
+    with pytest.raises(TelegramBadRequest):
+        await media_cache.send_cached_photo(send, digest, None)
+
+    assert await media_cache.get_file_id(digest) == 'cached'
+
+
+@pytest.mark.parametrize(
+    ('description', 'stale'),
+    [
+        ('Bad Request: wrong file identifier/HTTP URL specified', True),
+        ('Bad Request: wrong remote file identifier specified: Wrong string length', True),
+        ('Bad Request: FILE_REFERENCE_EXPIRED', True),
+        ('Bad Request: file is too big', False),
+        ('Bad Request: failed to get HTTP URL content', False),
+    ],
+)
+def test_is_stale_file_id_error(description, stale):
+    error = TelegramBadRequest(SendPhoto(chat_id=1, photo='x'), description)
+
+    assert media_cache.is_stale_file_id_error(error) is stale
+
+
+async def test_remembered_photo_is_persisted_in_background(fake_cache, monkeypatch):
+    monkeypatch.setattr(media_cache, '_store_tasks', set())
+    digest = media_cache.media_digest(b'logo')
+
+    media_cache.remember_sent_photo(digest, _photo_message('logo-1'))
+    assert len(media_cache._store_tasks) == 1
+
+    await asyncio.gather(*media_cache._store_tasks)
+    await asyncio.sleep(0)
+
+    assert media_cache._store_tasks == set()
+    assert any(value == 'logo-1' for value in fake_cache.data.values())
+
+
+async def test_render_qr_png_produces_png():
+    pytest.importorskip('qrcode')
+
+    png = await media_cache.render_qr_png('hello')
+
+    assert png.startswith(b'\x89PNG')